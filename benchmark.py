@@ -0,0 +1,557 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能基准脚本
+使用回放的命令输出夹具在任意平台上测量Python侧解析的耗时
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import tracemalloc
+import subprocess
+
+from modules.collectors.hardware_batch import (
+    HARDWARE_QUERIES,
+    parse_hardware_batch_output,
+    parse_cpu_records,
+    parse_memory_module_records,
+    parse_graphics_records,
+    parse_motherboard_records,
+    parse_bios_records
+)
+from modules.json_stream import JsonLineStream
+from modules import replay
+from modules import registry_backend
+from modules import registry_snapshot
+from modules import registry_hive
+from modules.config import FAST_PROFILE_TARGET_SECONDS, REGISTRY_SNAPSHOT_ENABLED, REGISTRY_SNAPSHOT_DIR
+from modules.powershell_capabilities import PROBE_SCRIPT, build_powershell_argv
+from modules.collectors.hardware_batch import build_hardware_batch_script
+from modules.collectors.tabular_parser import parse_csv_table, parse_fixed_width_table, parse_list_blocks, row_count
+from modules.collectors.software_collector import get_all_installed_software
+from modules.collectors.uninstall_enumerator import iter_uninstall_entries, DEFAULT_FIELDS, UNINSTALL_PATH
+
+def make_hardware_batch_fixture():
+    """生成与批量硬件查询脚本输出格式相同的夹具"""
+    document = {
+        "cpu": {"data": [{"Name": "Intel(R) Core(TM) i9-13900K", "NumberOfCores": 24, "NumberOfLogicalProcessors": 32,
+                          "MaxClockSpeed": 3000, "L2CacheSize": 32768, "L3CacheSize": 36864}], "error": None},
+        "memory": {"data": [{"Capacity": 17179869184, "Speed": 5600, "Manufacturer": "Kingston",
+                             "PartNumber": f"KF556C40-{i}", "DeviceLocator": f"DIMM{i}"} for i in range(4)], "error": None},
+        "graphics": {"data": [{"Name": "NVIDIA GeForce RTX 4090", "AdapterRAM": 4293918720,
+                               "DriverVersion": "31.0.15.5222", "VideoProcessor": "NVIDIA GeForce RTX 4090"}], "error": None},
+        "motherboard": {"data": [{"Manufacturer": "ASUSTeK COMPUTER INC.", "Product": "ROG STRIX Z790-E",
+                                  "SerialNumber": "230612345678901", "Version": "Rev 1.xx"}], "error": None},
+        "bios": {"data": [{"Manufacturer": "American Megatrends Inc.", "Name": "2204",
+                           "SMBIOSBIOSVersion": "2204", "ReleaseDate": "/Date(1696118400000)/"}], "error": None},
+    }
+    return json.dumps(document, separators=(",", ":"))
+
+def benchmark_hardware_batch_parse(iterations=20000):
+    """测量批量硬件查询输出的解析与分发耗时"""
+    fixture = make_hardware_batch_fixture()
+    parsers = {
+        "cpu": parse_cpu_records,
+        "memory": parse_memory_module_records,
+        "graphics": parse_graphics_records,
+        "motherboard": parse_motherboard_records,
+        "bios": parse_bios_records,
+    }
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        batch = parse_hardware_batch_output(fixture)
+        for section in HARDWARE_QUERIES:
+            parsers[section](batch[section])
+    elapsed = time.perf_counter() - started
+
+    return {
+        "name": "hardware_batch_parse",
+        "iterations": iterations,
+        "total_seconds": round(elapsed, 4),
+        "per_iteration_us": round(elapsed / iterations * 1e6, 2)
+    }
+
+# 替身进程：把夹具文件原样写到标准输出，模拟PowerShell输出大量JSON
+REPLAY_SCRIPT = "import sys, shutil; shutil.copyfileobj(open(sys.argv[1], 'rb'), sys.stdout.buffer, 65536)"
+
+def make_driver_records(count):
+    """生成Win32_PnPSignedDriver形状的记录"""
+    return [{"DeviceName": f"PCI Express Root Port #{i}", "DriverVersion": f"10.0.22621.{i % 5000}",
+             "Manufacturer": "(标准系统设备)" if i % 3 else "Intel Corporation"} for i in range(count)]
+
+def measure(func):
+    """返回函数的耗时和Python侧峰值内存"""
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return round(elapsed, 3), round(peak / 1024)
+
+def benchmark_json_streaming(records=50000):
+    """比较完整缓冲后json.loads与逐行流式解析大体量PowerShell输出的耗时和峰值内存"""
+    data = make_driver_records(records)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # ConvertTo-Json默认输出缩进的数组；流式模式每行一个压缩对象
+        array_path = os.path.join(temp_dir, "drivers.json")
+        with open(array_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+        lines_path = os.path.join(temp_dir, "drivers.ndjson")
+        with open(lines_path, 'w', encoding='utf-8') as f:
+            for record in data:
+                f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        del data
+
+        def buffered():
+            result = subprocess.run([sys.executable, "-c", REPLAY_SCRIPT, array_path],
+                                    capture_output=True, text=True, encoding='utf-8', errors='ignore')
+            assert len(json.loads(result.stdout)) == records
+
+        def streamed_list():
+            assert len(list(JsonLineStream([sys.executable, "-c", REPLAY_SCRIPT, lines_path], timeout=None))) == records
+
+        def streamed_count():
+            assert sum(1 for _ in JsonLineStream([sys.executable, "-c", REPLAY_SCRIPT, lines_path], timeout=None)) == records
+
+        buffered_seconds, buffered_peak = measure(buffered)
+        list_seconds, list_peak = measure(streamed_list)
+        count_seconds, count_peak = measure(streamed_count)
+        output_bytes = os.path.getsize(array_path)
+
+    return {
+        "name": "json_streaming",
+        "records": records,
+        "buffered_output_bytes": output_bytes,
+        "buffered": {"seconds": buffered_seconds, "peak_kib": buffered_peak},
+        "streamed_into_list": {"seconds": list_seconds, "peak_kib": list_peak},
+        "streamed_without_retaining": {"seconds": count_seconds, "peak_kib": count_peak}
+    }
+
+def make_wmic_outputs(rows):
+    """生成WMIC三种输出格式（csv、按列对齐、list）的同一批软件记录，行尾与WMIC一致使用\\r\\r\\n"""
+    records = [{"InstallDate": f"2024{i % 12 + 1:02d}{i % 28 + 1:02d}", "Name": f"Contoso Tool {i}, x64 Edition",
+                "Vendor": "Contoso Ltd." if i % 2 else "Fabrikam Inc.", "Version": f"{i % 20}.{i % 7}.{i}"}
+               for i in range(rows)]
+    names = list(records[0])
+
+    csv_lines = ["Node," + ",".join(names)]
+    csv_lines += [f"HOST,{r['InstallDate']},{r['Name']},{r['Vendor']},{r['Version']}" for r in records]
+
+    widths = {name: max(len(name), *(len(r[name]) for r in records)) + 2 for name in names}
+    table_lines = ["".join(name.ljust(widths[name]) for name in names)]
+    table_lines += ["".join(r[name].ljust(widths[name]) for name in names) for r in records]
+
+    list_lines = []
+    for r in records:
+        list_lines += ["", ""] + [f"{name}={r[name]}" for name in names]
+
+    return {fmt: "\r\r\n".join(lines) + "\r\r\n" for fmt, lines in
+            (("csv", csv_lines), ("fixed_width", table_lines), ("list", list_lines))}
+
+def benchmark_tabular_parse(rows=100000):
+    """测量共享表格解析器处理三种WMIC输出格式的吞吐量"""
+    outputs = make_wmic_outputs(rows)
+    parsers = {
+        "csv": parse_csv_table,
+        "fixed_width": parse_fixed_width_table,
+        "list": parse_list_blocks,
+    }
+
+    results = {}
+    for fmt, parser in parsers.items():
+        started = time.perf_counter()
+        columns = parser(outputs[fmt])
+        elapsed = time.perf_counter() - started
+        assert row_count(columns) == rows
+        results[fmt] = {
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(rows / elapsed),
+            "output_bytes": len(outputs[fmt])
+        }
+
+    return {"name": "tabular_parse", "rows": rows, **results}
+
+# 回放夹具中Windows机器的platform信息
+REPLAY_PLATFORM = {
+    "system": "Windows", "release": "10", "version": "10.0.22631", "machine": "AMD64", "node": "BENCH-PC",
+    "processor": "Intel64 Family 6 Model 183 Stepping 1, GenuineIntel", "platform": "Windows-10-10.0.22631-SP0",
+    "architecture": ["64bit", "WindowsPE"], "win32_ver": ["10", "10.0.22631", "SP0", "Multiprocessor Free"],
+    "win32_edition": "Professional"
+}
+UNINSTALL_KEYS = {
+    "64": "HKEY_LOCAL_MACHINE\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Uninstall",
+    "32": "HKEY_LOCAL_MACHINE\\SOFTWARE\\Wow6432Node\\Microsoft\\Windows\\CurrentVersion\\Uninstall",
+}
+POWERSHELL_PATH = "C:\\Windows\\System32\\WindowsPowerShell\\v1.0\\powershell.exe"
+
+def make_replay_bundle(bundle_dir, software_count=2000):
+    """
+    生成一个回放录制包：PowerShell探测、批量硬件查询、python --version的输出，以及64位和32位视图下的卸载注册表项
+    """
+    capabilities = {"path": POWERSHELL_PATH, "needs_utf8_prefix": False}
+    commands = [
+        {"argv": ["where", "powershell"], "stdout": POWERSHELL_PATH + "\r\n"},
+        {"argv": [POWERSHELL_PATH, "-NoLogo", "-NoProfile", "-NonInteractive", "-Command", PROBE_SCRIPT],
+         "stdout": "edition=Desktop\nversion=5.1.22621.2506\ncim=True\nwmi=True\nencoding=utf-8\n"},
+        {"argv": build_powershell_argv(build_hardware_batch_script(use_cim=True), capabilities),
+         "stdout": make_hardware_batch_fixture(), "latency": 1.2},
+        {"argv": ["python", "--version"], "stdout": "Python 3.11.7\n", "latency": 0.05},
+    ]
+
+    registry = {}
+    for view, offset in (("64", 0), ("32", software_count // 2)):
+        subkeys = {}
+        for i in range(offset, offset + software_count // 2):
+            subkeys[f"{{{i:08X}-0000-0000-0000-000000000000}}"] = {"values": {
+                "DisplayName": (f"Contoso Tool {i}", 1),
+                "DisplayVersion": (f"{i % 20}.{i % 7}.{i}", 1),
+                "Publisher": ("Contoso Ltd." if i % 2 else "Fabrikam Inc.", 1),
+                "InstallLocation": (f"C:\\Program Files\\Contoso\\Tool {i}", 1),
+                "UninstallString": (f"MsiExec.exe /X{{{i:08X}}}", 2),
+                "InstallDate": (f"2024{i % 12 + 1:02d}{i % 28 + 1:02d}", 1),
+            }}
+        registry.update(replay.build_registry_entries(UNINSTALL_KEYS[view], {"subkeys": subkeys}, view))
+
+    replay.write_bundle(bundle_dir, commands, registry, REPLAY_PLATFORM)
+    return bundle_dir
+
+def benchmark_replay_pipeline(software_count=2000, repeat=3):
+    """在回放的录制包上完整运行main.py，测量Python侧的端到端耗时（不含命令耗时）和按录制耗时回放的耗时"""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "record_replay.py")
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        bundle = make_replay_bundle(os.path.join(temp_dir, "bundle"), software_count)
+        for name, extra in (("instant", []), ("recorded_latency", ["--latency"])):
+            output_dir = os.path.join(temp_dir, name)
+            completed = subprocess.run(
+                [sys.executable, script, "replay", bundle, "--repeat", str(1 if extra else repeat),
+                 "--output-dir", output_dir, *extra],
+                capture_output=True, text=True, encoding='utf-8', errors='ignore'
+            )
+            stats = json.loads(completed.stdout.strip().splitlines()[-1])
+            results[name] = {"best_seconds": stats["best_seconds"], "runs_seconds": stats["runs_seconds"],
+                             "served": stats["served"], "missing": stats["missing"]}
+            with open(os.path.join(output_dir, "Report", os.listdir(os.path.join(output_dir, "Report"))[0],
+                                   "json", "software_list.json"), 'r', encoding='utf-8') as f:
+                assert len(json.load(f)) == software_count
+
+    return {"name": "replay_pipeline", "software": software_count, **results}
+
+def benchmark_fast_profile(software_count=2000, repeat=5):
+    """
+    在回放的录制包上以 --profile fast --formats json 运行main.py，检查不启动任何命令且最好成绩在延迟目标之内
+    """
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "record_replay.py")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        bundle = make_replay_bundle(os.path.join(temp_dir, "bundle"), software_count)
+        completed = subprocess.run(
+            [sys.executable, script, "replay", bundle, "--repeat", str(repeat), "--output-dir", os.path.join(temp_dir, "fast"),
+             "--", "--profile", "fast", "--formats", "json"],
+            capture_output=True, text=True, encoding='utf-8', errors='ignore'
+        )
+        stats = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    assert stats["exit_code"] == 0 and stats["commands"] == 0, stats
+    assert stats["best_seconds"] < FAST_PROFILE_TARGET_SECONDS, \
+        f"fast profile took {stats['best_seconds']}s, target {FAST_PROFILE_TARGET_SECONDS}s"
+    return {"name": "fast_profile", "software": software_count, "target_seconds": FAST_PROFILE_TARGET_SECONDS,
+            "best_seconds": stats["best_seconds"], "runs_seconds": stats["runs_seconds"],
+            "commands": stats["commands"], "registry_reads": stats["registry_reads"]}
+
+def make_uninstall_backend(software_count):
+    """生成内存注册表：64位和32位视图下共software_count个卸载项，每项的值与回放录制包中的相同"""
+    backend = registry_backend.MemoryBackend()
+    for i in range(software_count):
+        path = f"{UNINSTALL_KEYS['64' if i % 2 else '32']}\\{{{i:08X}-0000-0000-0000-000000000000}}"
+        backend.set_value(path, "DisplayName", f"Contoso Tool {i}")
+        backend.set_value(path, "DisplayVersion", f"{i % 20}.{i % 7}.{i}")
+        backend.set_value(path, "Publisher", "Contoso Ltd." if i % 2 else "Fabrikam Inc.")
+        backend.set_value(path, "InstallLocation", f"C:\\Program Files\\Contoso\\Tool {i}")
+        backend.set_value(path, "UninstallString", f"MsiExec.exe /X{{{i:08X}}}", registry_backend.REG_EXPAND_SZ)
+        backend.set_value(path, "InstallDate", f"2024{i % 12 + 1:02d}{i % 28 + 1:02d}")
+        backend.set_value(path, "EstimatedSize", i * 17, registry_backend.REG_DWORD)
+    return backend
+
+def benchmark_registry_enumeration(software_count=50000):
+    """
+    在内存注册表后端上枚举software_count个卸载项：导出为 .reg、重新加载，再用软件采集器读取
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        reg_path = os.path.join(temp_dir, "uninstall.reg")
+        registry_backend.export_reg_file(make_uninstall_backend(software_count), reg_path)
+        size = os.path.getsize(reg_path)
+        started = time.perf_counter()
+        backend = registry_backend.load_reg_file(reg_path)
+        load_seconds = time.perf_counter() - started
+
+    with registry_backend.use_registry_backend(backend):
+        software = []
+        enumerate_seconds, peak_kb = measure(lambda: software.__setitem__(slice(None), get_all_installed_software(False)))
+    assert len(software) == software_count, len(software)
+    return {"name": "registry_enumeration", "software": software_count, "reg_file_kb": round(size / 1024),
+            "load_seconds": round(load_seconds, 3), "enumerate_seconds": enumerate_seconds, "peak_kb": peak_kb}
+
+# MSI安装的程序在卸载项中另外写入的值，make_uninstall_tree按extra_values取前几个
+MSI_EXTRA_VALUES = ("AuthorizedCDFPrefix", "Comments", "Contact", "HelpLink", "HelpTelephone", "InstallSource",
+                    "ModifyPath", "Readme", "URLInfoAbout", "URLUpdateInfo", "Language", "VersionMajor",
+                    "VersionMinor", "WindowsInstaller")
+
+def make_uninstall_tree(software_count, extra_values=0):
+    """卸载项的键树：常见的值都有，InstallDate和InstallLocation只有一半的项有；extra_values为每项另加的MSI值个数"""
+    subkeys = {}
+    for i in range(software_count):
+        values = {
+            "DisplayName": (f"Contoso Tool {i}", 1),
+            "DisplayVersion": (f"{i % 20}.{i % 7}.{i}", 1),
+            "Publisher": ("Contoso Ltd." if i % 2 else "Fabrikam Inc.", 1),
+            "UninstallString": (f"MsiExec.exe /X{{{i:08X}}}", 2),
+            "EstimatedSize": (i * 17, 4),
+            "NoModify": (1, 4),
+            "NoRepair": (1, 4),
+        }
+        if i % 2:
+            values["InstallDate"] = (f"2024{i % 12 + 1:02d}{i % 28 + 1:02d}", 1)
+            values["InstallLocation"] = (f"C:\\Program Files\\Contoso\\Tool {i}", 1)
+        for name in MSI_EXTRA_VALUES[:extra_values]:
+            values[name] = (f"{name} {i}", 1)
+        subkeys[f"{{{i:08X}-0000-0000-0000-000000000000}}"] = {"values": values}
+    return {"subkeys": subkeys}
+
+def query_per_field(locations, fields):
+    """统一枚举器之前的做法：每个子键对每个字段调用一次QueryValueEx，不存在的值经过异常处理"""
+    records = []
+    for root, path, view in locations:
+        with registry_backend.open_key(root, path, view) as key:
+            for name in key.subkey_names():
+                with key.open(name) as subkey:
+                    try:
+                        record = {fields[0]: subkey.query_value(fields[0])[0]}
+                    except OSError:
+                        continue
+                    for field in fields[1:]:
+                        try:
+                            record[field] = subkey.query_value(field)[0]
+                        except OSError:
+                            record[field] = ""
+                    records.append(record)
+    return records
+
+def count_registry_errors(winreg):
+    """
+    统计winreg读取函数抛出的错误（不存在的值）；Windows上每个错误都要格式化一条系统错误消息，是逐字段查询的主要开销
+
+    返回:
+    - 单元素列表，元素为错误数
+    """
+    errors = [0]
+    def counting(function):
+        def call(*args):
+            try:
+                return function(*args)
+            except OSError:
+                errors[0] += 1
+                raise
+        return call
+    for name in ("QueryValueEx", "EnumValue"):
+        setattr(winreg, name, counting(getattr(winreg, name)))
+    return errors
+
+def benchmark_uninstall_enumeration(software_count=20000, repeat=3, extra_values=0):
+    """
+    比较逐字段QueryValueEx和统一枚举器（一次EnumValue遍历）读取卸载项的每子键耗时，
+    分别在内存注册表后端（取repeat次中的最好成绩）和回放的winreg上测量，回放时同时统计每子键的注册表调用次数和错误数；
+    extra_values为每项另加的MSI值个数
+
+    回放中每次调用的开销相同，枚举器每个值调用一次，比逐字段查询调用更多、更慢；
+    它省去的只是不存在的值引发的错误，这部分在Windows上的开销这里无法测量
+    """
+    tree = make_uninstall_tree(software_count, extra_values)
+    locations = [(registry_backend.HKEY_LOCAL_MACHINE, UNINSTALL_PATH, "64")]
+    variants = {
+        "per_field": lambda: query_per_field(locations, DEFAULT_FIELDS),
+        "enumerator": lambda: list(iter_uninstall_entries(locations, DEFAULT_FIELDS)),
+    }
+    memory = registry_backend.MemoryBackend()
+    for subkey, subtree in tree["subkeys"].items():
+        for value_name, (data, value_type) in subtree["values"].items():
+            memory.set_value(f"{UNINSTALL_KEYS['64']}\\{subkey}", value_name, data, value_type)
+
+    result = {"name": "uninstall_enumeration", "software": software_count, "extra_values": extra_values}
+    with registry_backend.use_registry_backend(memory):
+        for variant, func in variants.items():
+            seconds = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                func()
+                seconds.append(time.perf_counter() - started)
+            result[f"memory_{variant}_us_per_subkey"] = round(min(seconds) * 1e6 / software_count, 2)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        replay.write_bundle(temp_dir, registry=replay.build_registry_entries(UNINSTALL_KEYS["64"], tree, "64"),
+                            platform_identity=REPLAY_PLATFORM)
+        with registry_backend.use_registry_backend(registry_backend.WinregBackend()):
+            for variant, func in variants.items():
+                replay.start_replay(temp_dir)
+                errors = count_registry_errors(sys.modules["winreg"])
+                try:
+                    started = time.perf_counter()
+                    assert len(func()) == software_count
+                    seconds = time.perf_counter() - started
+                finally:
+                    stats = replay.stop()
+                result[f"replay_{variant}_us_per_subkey"] = round(seconds * 1e6 / software_count, 2)
+                result[f"replay_{variant}_calls_per_subkey"] = round(stats["registry_reads"] / software_count, 2)
+                result[f"replay_{variant}_errors_per_subkey"] = round(errors[0] / software_count, 2)
+    return result
+
+def with_last_write_times(registry, key_path, view, last_writes):
+    """给build_registry_entries生成的条目中各子键的QueryInfoKey结果填上最后写入时间"""
+    for name, last_write in last_writes.items():
+        signature = replay.registry_signature("QueryInfoKey", f"{key_path}\\{name}", view)
+        registry[signature]["result"][2] = last_write
+    return registry
+
+def benchmark_registry_snapshot(software_count=50000, churn=0.01):
+    """
+    在回放的winreg上读取software_count个卸载项三次：不使用快照、首次运行（建立快照）、
+    以及1%的子键被修改后的再次运行（快照从磁盘重新加载），比较每子键的耗时和注册表调用次数
+    """
+    tree = make_uninstall_tree(software_count)
+    names = list(tree["subkeys"])
+    last_writes = {name: 133500000000000000 + i for i, name in enumerate(names)}
+    changed = names[::int(1 / churn)]
+    locations = [(registry_backend.HKEY_LOCAL_MACHINE, UNINSTALL_PATH, "64")]
+
+    def read(bundle):
+        replay.start_replay(bundle)
+        try:
+            started = time.perf_counter()
+            with registry_backend.use_registry_backend(registry_backend.WinregBackend()):
+                entries = list(iter_uninstall_entries(locations, DEFAULT_FIELDS))
+            seconds = time.perf_counter() - started
+        finally:
+            stats = replay.stop()
+        return entries, seconds, stats["registry_reads"]
+
+    result = {"name": "registry_snapshot", "software": software_count, "changed": len(changed)}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        before = os.path.join(temp_dir, "before")
+        registry = replay.build_registry_entries(UNINSTALL_KEYS["64"], tree, "64")
+        replay.write_bundle(before, registry=with_last_write_times(registry, UNINSTALL_KEYS["64"], "64", last_writes),
+                            platform_identity=REPLAY_PLATFORM)
+        for name in changed:
+            tree["subkeys"][name]["values"]["DisplayVersion"] = ("99.0", 1)
+            last_writes[name] += 10 ** 9
+        after = os.path.join(temp_dir, "after")
+        registry = replay.build_registry_entries(UNINSTALL_KEYS["64"], tree, "64")
+        replay.write_bundle(after, registry=with_last_write_times(registry, UNINSTALL_KEYS["64"], "64", last_writes),
+                            platform_identity=REPLAY_PLATFORM)
+
+        state_dir = os.path.join(temp_dir, "state")
+        try:
+            registry_snapshot.configure_registry_snapshot(enabled=False)
+            _, seconds, calls = read(before)
+            result.update(no_snapshot_us_per_subkey=round(seconds * 1e6 / software_count, 2),
+                          no_snapshot_calls_per_subkey=round(calls / software_count, 2))
+
+            registry_snapshot.configure_registry_snapshot(enabled=True, state_dir=state_dir)
+            registry_snapshot.reset_snapshot_stats()
+            _, seconds, calls = read(before)
+            registry_snapshot.flush()
+            result.update(cold_us_per_subkey=round(seconds * 1e6 / software_count, 2),
+                          cold_calls_per_subkey=round(calls / software_count, 2),
+                          snapshot_kb=round(os.path.getsize(os.path.join(state_dir, registry_snapshot.SNAPSHOT_FILENAME)) / 1024))
+
+            # 重新指定目录使快照从磁盘加载，与下一次运行相同
+            registry_snapshot.configure_registry_snapshot(state_dir=state_dir)
+            registry_snapshot.reset_snapshot_stats()
+            entries, seconds, calls = read(after)
+            summary = registry_snapshot.get_snapshot_summary()
+        finally:
+            registry_snapshot.configure_registry_snapshot(enabled=REGISTRY_SNAPSHOT_ENABLED, state_dir=REGISTRY_SNAPSHOT_DIR)
+            registry_snapshot.reset_snapshot_stats()
+
+    assert summary["hits"] == software_count - len(changed) and summary["misses"] == len(changed), summary
+    assert sum(entry.values[1] == "99.0" for entry in entries) == len(changed)
+    result.update(warm_us_per_subkey=round(seconds * 1e6 / software_count, 2),
+                  warm_calls_per_subkey=round(calls / software_count, 2), hits=summary["hits"], misses=summary["misses"])
+    return result
+
+def benchmark_registry_hive(software_count=2000, filler_keys=10000, filler_kb=4):
+    """
+    把software_count个卸载项和filler_keys个带filler_kb KB二进制值的其他键写成SOFTWARE hive文件，
+    测量映射文件、读取两个视图的卸载项（DEFAULT_FIELDS）和遍历全部键值的耗时；
+    读取卸载项只访问用到的单元，有效吞吐量按整个文件的大小计算
+    """
+    locations = [(registry_backend.HKEY_LOCAL_MACHINE, UNINSTALL_PATH, "64"),
+                 (registry_backend.HKEY_LOCAL_MACHINE, UNINSTALL_PATH, "32")]
+
+    def walk(key):
+        count = sum(1 for _ in key.enum_values())
+        for name in key.subkey_names():
+            with key.open(name) as subkey:
+                count += walk(subkey)
+        return count
+
+    machine = make_uninstall_backend(software_count)
+    for i in range(filler_keys):
+        machine.set_value(f"HKEY_LOCAL_MACHINE\\SOFTWARE\\Classes\\Installer\\Products\\{i:08X}", "Blob",
+                          bytes(range(256)) * (filler_kb * 4), registry_backend.REG_BINARY)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        hive_path = os.path.join(temp_dir, "SOFTWARE")
+        registry_hive.export_hive_file(machine, "HKLM\\SOFTWARE", hive_path)
+        size_mb = os.path.getsize(hive_path) / 1024 / 1024
+        try:
+            registry_snapshot.configure_registry_snapshot(enabled=False)
+            started = time.perf_counter()
+            backend = registry_hive.open_hive_backend([hive_path])
+            open_seconds = time.perf_counter() - started
+            with backend, registry_backend.use_registry_backend(backend):
+                started = time.perf_counter()
+                entries = list(iter_uninstall_entries(locations, DEFAULT_FIELDS))
+                enumerate_seconds = time.perf_counter() - started
+                started = time.perf_counter()
+                with backend.open_key(registry_backend.HKEY_LOCAL_MACHINE, "SOFTWARE") as root:
+                    values = walk(root)
+                walk_seconds = time.perf_counter() - started
+        finally:
+            registry_snapshot.configure_registry_snapshot(enabled=REGISTRY_SNAPSHOT_ENABLED)
+
+    assert len(entries) == software_count, len(entries)
+    assert values == software_count * 7 + filler_keys, values
+    return {"name": "registry_hive", "software": software_count, "hive_mb": round(size_mb, 1),
+            "open_ms": round(open_seconds * 1000, 2), "enumerate_seconds": round(enumerate_seconds, 4),
+            "us_per_subkey": round(enumerate_seconds * 1e6 / software_count, 2),
+            "effective_mb_per_s": round(size_mb / enumerate_seconds),
+            "walk_seconds": round(walk_seconds, 3), "walk_mb_per_s": round(size_mb / walk_seconds)}
+
+BENCHMARKS = [
+    benchmark_hardware_batch_parse,
+    benchmark_json_streaming,
+    benchmark_tabular_parse,
+    benchmark_replay_pipeline,
+    benchmark_fast_profile,
+    benchmark_registry_enumeration,
+    benchmark_uninstall_enumeration,
+    benchmark_registry_snapshot,
+    benchmark_registry_hive,
+]
+
+def main():
+    """主函数"""
+    selected = set(sys.argv[1:])
+    for benchmark in BENCHMARKS:
+        if selected and benchmark.__name__ not in selected:
+            continue
+        print(json.dumps(benchmark(), ensure_ascii=False))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,33 @@
 import os
 import sys
 import json
+import time
 import datetime
 import shutil
 import logging
+import argparse
+import platform
 from pathlib import Path
 
 # Import modules
-from modules.collectors.software_collector import get_all_installed_software
-from modules.collectors.system_info_collector import collect_all_system_info, save_system_info
-from modules.collectors.dev_env_collector import collect_all_dev_environment_info
-from modules.exporters.exporter_manager import export_all_formats
-from modules.config import get_output_directory
+# Collectors and exporters are imported only for the selected sections and formats:
+# they pull in winreg, psutil and pandas, which dominate the start-up time
+from modules.config import get_output_directory, EXPORT_FORMATS
+from modules import collector_registry
+from modules.powershell_capabilities import get_probe_stats
+from modules.command_cache import configure_command_cache, get_cache_summary
+from modules.time_budget import start_time_budget, get_budget_summary
+from modules.command_trace import start_trace, stop_trace, format_trace_summary
+from modules.config import (COMMAND_TRACE_ENABLED, DAEMON_ADDRESS, DAEMON_TOKEN_FILE, COLLECTION_PROFILES,
+                            DEFAULT_COLLECTION_PROFILE, FAST_PROFILE_TARGET_SECONDS)
+from modules.probe_registry import get_probe_summary
+from modules.json_refs import resolve_references
+from modules.run_journal import RunJournal, find_resumable_run
+from modules.scheduler import run_collectors, get_schedule_summary
+from modules.incremental import configure_incremental, get_incremental_summary, flush as flush_incremental_state
+from modules.resource_accounting import account, record_bytes, get_resource_summary, format_resource_summary, write_run_metrics
+from modules.process_isolation import configure_isolation, get_isolation_summary
+from modules.registry_snapshot import configure_registry_snapshot, get_snapshot_summary, flush as flush_registry_snapshot
 
 
 def setup_logging(base_output_dir):
@@ -51,11 +67,173 @@ def setup_logging(base_output_dir):
     return logger
 
 
-def main():
+def subsection_names(entry):
+    """Names of the sections a collector with a subgroup is made of (helpers such as hardware_batch are left out)"""
+    return [sub["name"] for sub in collector_registry.list_collectors(entry["subgroup"]) if sub["placement"]]
+
+
+def selectable_sections():
+    """Sections accepted by --only/--skip: the registered collectors and the individual sections of their subgroups"""
+    names = []
+    for entry in collector_registry.list_collectors("main"):
+        names.append(entry["name"])
+        if entry["subgroup"]:
+            names.extend(subsection_names(entry))
+    return names
+
+
+def comma_list(choices):
+    """Build an argparse type that splits a comma-separated list and checks every item against choices"""
+    def parse(value):
+        items = [item.strip() for item in value.split(",") if item.strip()]
+        unknown = [item for item in items if item not in choices]
+        if unknown:
+            raise argparse.ArgumentTypeError(f"unknown name(s): {', '.join(unknown)} (choose from {', '.join(choices)})")
+        return items
+    return parse
+
+
+def select_sections(only=None, skip=None):
+    """
+    Resolve --only/--skip into the collectors to run and the system information sections to collect
+    
+    Returns (main_sections, system_sections): main_sections keeps the registration order of the collectors,
+    system_sections is None when every system information section is selected
+    """
+    only = set(only or [])
+    skip = set(skip or [])
+    main_sections = []
+    system_sections = None
+    
+    for entry in collector_registry.list_collectors("main"):
+        name = entry["name"]
+        if entry["subgroup"]:
+            subsections = subsection_names(entry)
+            if only:
+                chosen = subsections if name in only else [sub for sub in subsections if sub in only]
+            else:
+                chosen = list(subsections)
+            if name in skip:
+                chosen = []
+            chosen = [sub for sub in chosen if sub not in skip]
+            selected = bool(chosen)
+            system_sections = None if chosen == subsections else chosen
+        else:
+            selected = (not only or name in only) and name not in skip
+        if selected:
+            main_sections.append(name)
+    
+    return main_sections, system_sections
+
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    # Third-party collectors register themselves on import and become selectable like the built-in ones
+    collector_registry.load_plugins()
+    sections = selectable_sections()
+    parser = argparse.ArgumentParser(description="Collect Windows software, hardware and development environment information")
+    cache_group = parser.add_mutually_exclusive_group()
+    cache_group.add_argument("--no-cache", action="store_true",
+                             help="Bypass the command result cache and the registry snapshot: neither read nor write cached results")
+    cache_group.add_argument("--refresh-cache", action="store_true",
+                             help="Ignore cached results and the registry snapshot but store the fresh results")
+    parser.add_argument("--time-budget", type=float, metavar="SECONDS",
+                        help="Overall deadline for the collection; low-priority sections are cut first and marked as partial")
+    parser.add_argument("--no-trace", action="store_true",
+                        help="Do not record external command calls to logs/trace.jsonl")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Reuse the previous run's result for sections whose fingerprint (registry LastWriteTimes, "
+                             "directory mtimes, PATH) has not changed")
+    parser.add_argument("--profile", choices=COLLECTION_PROFILES, default=DEFAULT_COLLECTION_PROFILE,
+                        help="fast: only direct registry reads, psutil and file metadata, no PowerShell/WMIC or other commands "
+                             f"(target: under {FAST_PROFILE_TARGET_SECONDS:g}s with --formats json); sections that need slow probes "
+                             "are marked as not collected")
+    parser.add_argument("--isolate", action="store_true",
+                        help="Run hang-prone probes (DNS lookup, disk usage, ipconfig, driver and dev tool commands) in worker "
+                             "processes that are killed when they overrun; the section is recorded as timed out")
+    parser.add_argument("--serial", action="store_true",
+                        help="Run the collectors one after another in the main thread (for debugging)")
+    parser.add_argument("--only", type=comma_list(sections), metavar="SECTIONS",
+                        help="Comma-separated sections to collect: " + ", ".join(sections))
+    parser.add_argument("--skip", type=comma_list(sections), metavar="SECTIONS",
+                        help="Comma-separated sections to leave out (same names as --only)")
+    parser.add_argument("--formats", type=comma_list(EXPORT_FORMATS), metavar="FORMATS", default=list(EXPORT_FORMATS),
+                        help="Comma-separated output formats: " + ", ".join(EXPORT_FORMATS) + " (default: all)")
+    parser.add_argument("--resume", nargs="?", const="latest", metavar="RUN_DIR",
+                        help="Finish an interrupted run (the latest one, or RUN_DIR) without recollecting its completed sections")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Stay running, refresh the selected sections on their own schedules (rate-limited, low priority) "
+                             "and serve the latest inventory on a local endpoint instead of writing reports")
+    parser.add_argument("--listen", default=DAEMON_ADDRESS, metavar="ADDRESS",
+                        help=f"Daemon endpoint: HOST:PORT for HTTP or unix:PATH for a Unix socket (default: {DAEMON_ADDRESS})")
+    parser.add_argument("--token-file", default=DAEMON_TOKEN_FILE, metavar="PATH",
+                        help="File the daemon writes its access token to, readable only by the current user; every request "
+                             f"must send 'Authorization: Bearer <token>' (default: {DAEMON_TOKEN_FILE})")
+    parser.add_argument("--list-collectors", action="store_true",
+                        help="List the registered collectors with their platform, cost, TTL, schema version, dependencies and fast-profile support")
+    args = parser.parse_args(argv)
+    args.main_sections, args.system_sections = select_sections(args.only, args.skip)
+    if not args.main_sections:
+        parser.error("no sections left to collect")
+    return args
+
+
+def available_sections(names):
+    """Drop the collectors that do not run on this platform, with a warning"""
+    sections = [name for name in names if collector_registry.is_available(collector_registry.get_collector(name))]
+    for name in names:
+        if name not in sections:
+            logging.warning(f"Skipping collector {name}: not available on {platform.system()}")
+    return sections
+
+
+def run_daemon_mode(args):
+    """Keep the selected collectors warm and serve the latest inventory on a local endpoint until interrupted"""
+    from modules.daemon import run_daemon
+    setup_logging(Path("Report") / "daemon")
+    sections = available_sections(args.main_sections)
+    options = {name: {"sections": args.system_sections} for name in sections
+               if collector_registry.get_collector(name)["subgroup"]}
+    return run_daemon(sections, options, address=args.listen, token_file=args.token_file)
+
+
+def print_collectors():
+    """Print the collector registry as a table"""
+    rows = collector_registry.describe_collectors()
+    columns = ["name", "group", "platform", "cost", "ttl", "schema", "deps", "fast", "available"]
+    widths = {column: max(len(column), *(len(str(row[column])) for row in rows)) for column in columns}
+    print("  ".join(column.ljust(widths[column]) for column in columns))
+    for row in rows:
+        print("  ".join(str(row[column]).ljust(widths[column]) for column in columns))
+
+
+def main(argv=None):
     """Main function to collect system information and export to different formats"""
+    started = time.perf_counter()
+    args = parse_args(argv)
+    if args.list_collectors:
+        print_collectors()
+        return 0
+    collector_registry.configure_profile(args.profile)
+    configure_command_cache(bypass=args.no_cache, refresh=args.refresh_cache)
+    configure_registry_snapshot(bypass=args.no_cache, refresh=args.refresh_cache)
+    if args.incremental:
+        configure_incremental(enabled=True)
+    if args.isolate:
+        configure_isolation(enabled=True)
+    if args.daemon:
+        return run_daemon_mode(args)
+    
+    journal = None
     try:
-        # Get output directory
-        base_output_dir = get_output_directory()
+        # Get output directory; an interrupted run is finished in its own directory
+        if args.resume:
+            base_output_dir = find_resumable_run() if args.resume == "latest" else Path(args.resume)
+            if base_output_dir is None:
+                logging.error("No interrupted run to resume")
+                return 1
+        else:
+            base_output_dir = get_output_directory()
         
         # Create output directory
         os.makedirs(base_output_dir, exist_ok=True)
@@ -63,118 +241,237 @@ def main():
         # Setup logging
         logger = setup_logging(base_output_dir)
         
-        # Create subdirectories for different file types
+        # Record every external command with its wall time, CPU time and output size
+        if COMMAND_TRACE_ENABLED and not args.no_trace:
+            trace_path = start_trace(base_output_dir / "logs")
+            logging.info(f"Tracing external commands to {trace_path}")
+        
+        # Create subdirectories for the selected output formats
         json_dir = base_output_dir / "json"
         html_dir = base_output_dir / "html"
         excel_dir = base_output_dir / "excel"
         markdown_dir = base_output_dir / "markdown"
         reports_dir = base_output_dir / "reports"
+        format_dirs = {"json": json_dir, "html": html_dir, "excel": excel_dir, "markdown": markdown_dir, "report": reports_dir}
         
-        # Create all subdirectories
-        for dir_path in [json_dir, html_dir, excel_dir, markdown_dir, reports_dir]:
-            os.makedirs(dir_path, exist_ok=True)
-            logging.debug(f"Created directory: {dir_path}")
+        for fmt, dir_path in format_dirs.items():
+            if fmt in args.formats:
+                os.makedirs(dir_path, exist_ok=True)
+                logging.debug(f"Created directory: {dir_path}")
+        
+        sections = available_sections(args.main_sections)
+        system_sections = args.system_sections
+        software_formats = [fmt for fmt in ("html", "markdown", "excel") if fmt in args.formats]
+        logging.info(f"Collecting sections: {', '.join(sections)}"
+                     + (f" (system info: {', '.join(system_sections)})" if system_sections is not None else ""))
+        
+        # Split the optional time budget across the selected sections by priority;
+        # collectors made of a subgroup budget each of their sections
+        budget_sections = []
+        options = {}
+        for name in sections:
+            entry = collector_registry.get_collector(name)
+            if entry["subgroup"]:
+                options[name] = {"sections": system_sections}
+                budget_sections.extend(collector_registry.collector_names(entry["subgroup"])
+                                       if system_sections is None else system_sections)
+            elif entry["budget"]:
+                budget_sections.append(name)
+        start_time_budget(args.time_budget, budget_sections)
         
         # Collect all data
         logging.info("Collecting system information...")
         
-        # 1. Get software list
-        logging.info("Gathering installed software information...")
-        software_list = get_all_installed_software()
-        logging.info(f"Found {len(software_list)} software items")
-        logging.debug(f"Software list first 5 items: {software_list[:5]}")
-        
-        # 2. Get system information
-        logging.info("Gathering system specifications...")
-        system_info = collect_all_system_info()
-        
-        # Save system info to file
-        system_info_path = os.path.join(json_dir, "system_info.json")
-        with open(system_info_path, 'w', encoding='utf-8') as f:
-            json.dump(system_info, f, indent=2, ensure_ascii=False)
-        logging.info(f"System information collected and saved to {system_info_path}")
-        
-        # 3. Get development environment information
-        logging.info("Gathering development environment information...")
-        dev_info = collect_all_dev_environment_info()
-        logging.debug(f"Collected development environment information")
-        
-        # Save collected data to JSON directory
-        with open(json_dir / "software_list.json", 'w', encoding='utf-8') as f:
-            json.dump(software_list, f, indent=2, ensure_ascii=False)
-            
-        with open(json_dir / "dev_environment.json", 'w', encoding='utf-8') as f:
-            json.dump(dev_info, f, indent=2, ensure_ascii=False)
-        
-        # Create comprehensive report data
-        report_data = {
-            "timestamp": datetime.datetime.now().isoformat(),
-            "software_list": software_list,
-            "system_info": system_info,
-            "dev_environment": dev_info
-        }
+        def export_software(software):
+            logging.info("Exporting software list to different formats...")
+            with account("software_exports", watch_dirs=[format_dirs[fmt] for fmt in software_formats]):
+                export_custom_formats(software, base_output_dir, software_formats)
         
-        # Save comprehensive report data
-        with open(json_dir / "complete_report_data.json", 'w', encoding='utf-8') as f:
-            json.dump(report_data, f, indent=2, ensure_ascii=False)
+        # Every finished section is written to disk at once and logged to logs/events.ndjson,
+        # so an interrupted run can be finished with --resume
+        journal = RunJournal(base_output_dir, resume=bool(args.resume))
+        journal.record("run_started", argv=list(sys.argv[1:] if argv is None else argv), sections=sections)
+        if journal.completed:
+            logging.info(f"Resuming {base_output_dir}: {', '.join(journal.completed)} already completed")
         
-        # Export to different formats
-        logging.info("\nExporting to different formats...")
+        def section_file(name):
+            """JSON output of a section, or None to keep it in the journal's .partial directory only"""
+            if "json" not in args.formats:
+                return None
+            return json_dir / collector_registry.get_collector(name)["output"]
         
-        # Modify export_all_formats to use our directory structure
-        export_custom_formats(software_list, base_output_dir)
+        # Collectors barely depend on each other: independent ones run at the same time, the slowest first,
+        # and the software exports start as soon as the software list is ready
+        tasks = collector_registry.build_tasks(sections, options)
+        if "software" in sections and software_formats and collector_registry.is_collected(collector_registry.get_collector("software")):
+            tasks.append({"name": "software_exports", "func": export_software, "deps": ("software",), "cost": "medium"})
+        # Only results that a pending task still depends on stay in memory once they are on disk
+        needed = {dep for task in tasks if not journal.is_completed(task["name"]) for dep in task.get("deps", ())}
         
-        # Create HTML report with comprehensive data
-        logging.info("Generating HTML report with all collected data...")
-        create_comprehensive_html_report(report_data, reports_dir / "system_report.html")
+        def persisted(name, func):
+            def run(**deps):
+                if journal.is_completed(name):
+                    logging.info(f"Section {name} already completed, not collecting it again")
+                    return journal.load_section(name) if name in needed and journal.section_path(name) else None
+                try:
+                    result = func(**deps)
+                    if name in sections:
+                        if isinstance(result, list):
+                            logging.info(f"Found {len(result)} {name} items")
+                        record_bytes(name, journal.save_section(name, result, section_file(name))["bytes"])
+                        logging.info(f"Saved {name} to {journal.section_path(name)}")
+                    else:
+                        journal.mark_completed(name)
+                except Exception as e:
+                    journal.record("section_failed", section=name, error=str(e))
+                    raise
+                return result if name in needed else None
+            return run
+        
+        for task in tasks:
+            task["func"] = persisted(task["name"], task["func"])
+        run_collectors(tasks, serial=args.serial)
+        
+        schedule = get_schedule_summary()
+        logging.info(f"Collectors ran in {schedule['mode']} mode with {schedule['workers']} workers: "
+                     f"{schedule['wall_seconds']}s wall for {schedule['sum_task_seconds']}s of work")
+        
+        # Sections shared between basic_info.hardware and the top level of system_info.json are written once
+        # and referenced by {"$ref": ...}
+        probe_summary = get_probe_summary()
+        if probe_summary is not None and "system_info" in journal.stats:
+            logging.info(f"Collect-once: {probe_summary['probes']} sections collected, {probe_summary['reused']} reused, "
+                         f"saved {probe_summary['seconds_saved']}s of collection and {journal.stats['system_info']['bytes_saved']} bytes of system_info.json")
+        
+        # Create comprehensive report data from the section files without loading them all into memory
+        report_fields = [("timestamp", datetime.datetime.now().isoformat())]
+        for name in sections:
+            if journal.section_path(name) is not None:
+                report_fields.append((collector_registry.get_collector(name)["report_key"], ("section", name)))
+        
+        budget_summary = get_budget_summary()
+        if budget_summary is not None:
+            report_fields.append(("time_budget", budget_summary))
+            logging.info(f"Time budget: {budget_summary['elapsed_seconds']}s of {budget_summary['total_seconds']}s used, "
+                         f"partial sections: {', '.join(budget_summary['partial_sections']) or 'none'}")
+        
+        incremental_summary = get_incremental_summary()
+        if incremental_summary is not None:
+            report_fields.append(("incremental", incremental_summary))
+            flush_incremental_state()
+            logging.info(f"Incremental: reused {', '.join(incremental_summary['reused']) or 'no sections'}, "
+                         f"saved {incremental_summary['seconds_saved']}s of collection "
+                         f"({incremental_summary['fingerprint_seconds']}s spent on fingerprints)")
+        
+        profile_summary = collector_registry.get_profile_summary()
+        if profile_summary is not None:
+            report_fields.append(("profile", profile_summary))
+            logging.info(f"Profile {profile_summary['profile']}: not collected: {', '.join(profile_summary['not_collected']) or 'none'}")
+        
+        snapshot_summary = get_snapshot_summary()
+        if snapshot_summary is not None:
+            report_fields.append(("registry_snapshot", snapshot_summary))
+            flush_registry_snapshot()
+            logging.info(f"Registry snapshot ({snapshot_summary['mode']}): {snapshot_summary['hits']} subkeys unchanged, "
+                         f"{snapshot_summary['misses']} re-read")
+        
+        isolation_summary = get_isolation_summary()
+        if isolation_summary is not None:
+            report_fields.append(("isolation", isolation_summary))
+            logging.info(f"Process isolation: {isolation_summary['calls']} probes, {isolation_summary['workers_killed']} workers killed, "
+                         f"timed out sections: {', '.join(isolation_summary['timed_out_sections']) or 'none'}")
+        
+        # Save comprehensive report data
+        report_data_path = (json_dir if "json" in args.formats else journal.partial_dir) / "complete_report_data.json"
+        if "json" in args.formats or "report" in args.formats:
+            journal.write_combined(report_data_path, report_fields)
+        
+        if "report" in args.formats:
+            # Create HTML report with comprehensive data
+            logging.info("Generating HTML report with all collected data...")
+            with open(report_data_path, 'r', encoding='utf-8') as f:
+                report_data = resolve_references(json.load(f))
+            create_comprehensive_html_report(report_data, reports_dir / "system_report.html")
+            del report_data
         
         logging.info(f"\nExport complete. Files saved to {base_output_dir}")
         
-        # Create an index.html file in the base directory that links to all reports
-        create_index_file(base_output_dir)
+        if "report" in args.formats:
+            # Create an index.html file in the base directory that links to all reports
+            create_index_file(base_output_dir)
+        
+        # Wall time, CPU time, peak RSS delta, child processes and bytes written of every collector
+        resource_summary = get_resource_summary()
+        if resource_summary is not None:
+            metrics_path = write_run_metrics(base_output_dir / "logs", {"schedule": schedule})
+            logging.info(format_resource_summary(resource_summary))
+            logging.info(f"Run metrics saved to {metrics_path}")
+        
+        journal.finish()
+        
+        if args.profile == "fast":
+            elapsed = time.perf_counter() - started
+            log = logging.info if elapsed <= FAST_PROFILE_TARGET_SECONDS else logging.warning
+            log(f"Fast profile finished in {elapsed:.2f}s (target {FAST_PROFILE_TARGET_SECONDS:g}s)")
+        
+        probe_stats = get_probe_stats()
+        logging.info(f"PowerShell capability probes: {probe_stats['probes']} run, {probe_stats['cache_hits']} saved by cache")
+        
+        cache_summary = get_cache_summary()
+        cached_sections = [name for name, source in cache_summary["sections"].items() if source == "cache"]
+        logging.info(f"Command cache ({cache_summary['mode']}): {cache_summary['hits']} hits, {cache_summary['misses']} misses, "
+                     f"sections served from cache: {', '.join(cached_sections) or 'none'}")
+        
+        trace_summary = stop_trace()
+        if trace_summary is not None:
+            logging.info("Most expensive external commands:\n" + format_trace_summary(trace_summary))
         
     except Exception as e:
         logging.error(f"Error: {e}", exc_info=True)
+        if journal is not None:
+            # Completed sections stay on disk for --resume
+            journal.record("run_failed", error=str(e))
+            journal.close()
         return 1
     
     return 0
 
 
-def export_custom_formats(software_list, base_output_dir):
-    """Export software list to different formats using custom directory structure"""
-    from modules.exporters.json_exporter import export_to_json
-    from modules.exporters.html_exporter import export_to_html
-    from modules.exporters.markdown_exporter import export_to_markdown
-    from modules.exporters.excel_exporter import export_to_excel
-    
+def export_custom_formats(software_list, base_output_dir, formats=("html", "markdown", "excel")):
+    """Export software list to the selected formats using custom directory structure"""
     # Export to JSON (already done in main function)
-    # export_to_json(software_list, base_output_dir / "json" / "software_list.json")
     
     # Export to HTML
-    try:
-        logging.debug("Exporting to HTML format...")
-        export_to_html(software_list, base_output_dir / "html" / "software_list.html")
-        logging.debug("HTML export complete")
-    except Exception as e:
-        logging.error(f"Error exporting to HTML: {e}", exc_info=True)
+    if "html" in formats:
+        try:
+            from modules.exporters.html_exporter import export_to_html
+            logging.debug("Exporting to HTML format...")
+            export_to_html(software_list, base_output_dir / "html" / "software_list.html")
+            logging.debug("HTML export complete")
+        except Exception as e:
+            logging.error(f"Error exporting to HTML: {e}", exc_info=True)
     
     # Export to Markdown if tabulate is available
-    try:
-        logging.debug("Exporting to Markdown format...")
-        export_to_markdown(software_list, base_output_dir / "markdown" / "software_list.md")
-        logging.debug("Markdown export complete")
-    except ImportError:
-        logging.warning("Missing 'tabulate' package. Markdown export skipped.")
-    except Exception as e:
-        logging.error(f"Error exporting to Markdown: {e}", exc_info=True)
+    if "markdown" in formats:
+        try:
+            from modules.exporters.markdown_exporter import export_to_markdown
+            logging.debug("Exporting to Markdown format...")
+            export_to_markdown(software_list, base_output_dir / "markdown" / "software_list.md")
+            logging.debug("Markdown export complete")
+        except ImportError:
+            logging.warning("Missing 'tabulate' package. Markdown export skipped.")
+        except Exception as e:
+            logging.error(f"Error exporting to Markdown: {e}", exc_info=True)
     
-    # Export to Excel
-    try:
-        logging.debug("Exporting to Excel format...")
-        export_to_excel(software_list, base_output_dir / "excel" / "software_list.xlsx")
-        logging.debug("Excel export complete")
-    except Exception as e:
-        logging.error(f"Error exporting to Excel: {e}", exc_info=True)
+    # Export to Excel (imports pandas and openpyxl)
+    if "excel" in formats:
+        try:
+            from modules.exporters.excel_exporter import export_to_excel
+            logging.debug("Exporting to Excel format...")
+            export_to_excel(software_list, base_output_dir / "excel" / "software_list.xlsx")
+            logging.debug("Excel export complete")
+        except Exception as e:
+            logging.error(f"Error exporting to Excel: {e}", exc_info=True)
 
 
 def create_comprehensive_html_report(data, output_path):
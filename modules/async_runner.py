@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import threading
+import subprocess
+import time
+import weakref
+
+from .config import ASYNC_MAX_CONCURRENCY
+from . import time_budget
+from . import command_trace
+from . import replay
+from . import resource_accounting
+
+# 每个事件循环一个信号量，限制同时运行的子进程数量
+_semaphores = weakref.WeakKeyDictionary()
+
+def _get_semaphore():
+    """获取当前事件循环的全局并发信号量"""
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(ASYNC_MAX_CONCURRENCY)
+        _semaphores[loop] = semaphore
+    return semaphore
+
+def _kill(process):
+    """终止子进程，进程已退出时忽略"""
+    try:
+        process.kill()
+    except ProcessLookupError:
+        pass
+
+async def run_command_async(argv, timeout=30, encoding='utf-8', errors='ignore', merge_stderr=False):
+    """
+    异步执行一个外部命令，带超时和取消处理
+
+    参数:
+    - argv: 命令行参数列表
+    - timeout: 超时时间（秒），None表示不限时
+    - encoding: 输出解码使用的编码
+    - errors: 解码错误的处理方式
+    - merge_stderr: 为True时将标准错误合并到标准输出（如 java -version）
+
+    返回:
+    - subprocess.CompletedProcess对象；命令不存在或超时时返回returncode=1的结果，任务被取消时终止子进程后重新抛出CancelledError
+    """
+    async with _get_semaphore():
+        # 超时不超过当前分区在运行时间预算中剩余的时间
+        timeout = time_budget.clamp_timeout(timeout)
+        if timeout is not None and timeout <= 0:
+            return subprocess.CompletedProcess(list(argv), returncode=1, stdout="", stderr="Time budget exhausted")
+
+        # asyncio自行回收子进程，跟踪记录中没有子进程CPU时间
+        with command_trace.trace_command("async", argv) as trace:
+            result = await _communicate(argv, timeout, encoding, errors, merge_stderr)
+            if trace is not None:
+                trace.set_result(result)
+        return result
+
+async def _communicate(argv, timeout, encoding, errors, merge_stderr):
+    """执行命令；录制模式下记录结果，回放模式下直接返回录制的结果"""
+    if replay.is_replaying():
+        return await replay.replay_async(argv, timeout, encoding, errors)
+
+    started = time.perf_counter()
+    # asyncio子进程在这里整体录制，不在Popen层录制
+    with replay.skip_popen_recording():
+        result = await _run_process(argv, timeout, encoding, errors, merge_stderr)
+    replay.record_result(argv, result, time.perf_counter() - started)
+    return result
+
+async def _run_process(argv, timeout, encoding, errors, merge_stderr):
+    """启动子进程并等待其输出，超时时终止子进程并返回失败结果"""
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *argv,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT if merge_stderr else subprocess.PIPE
+        )
+    except OSError as e:
+        logging.debug(f"Could not start {argv[0]}: {e}")
+        return subprocess.CompletedProcess(list(argv), returncode=1, stdout="", stderr=str(e))
+
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        _kill(process)
+        await process.wait()
+        logging.error(f"Command timed out after {timeout} seconds: {' '.join(map(str, argv))[:100]}")
+        time_budget.mark_partial("command timed out")
+        return subprocess.CompletedProcess(list(argv), returncode=1, stdout="", stderr=f"Command timed out after {timeout} seconds")
+    except asyncio.CancelledError:
+        # 先回收子进程再传播取消，避免事件循环关闭后残留管道
+        _kill(process)
+        await asyncio.shield(process.wait())
+        raise
+
+    return subprocess.CompletedProcess(
+        list(argv),
+        returncode=process.returncode,
+        stdout=(stdout or b"").decode(encoding, errors),
+        stderr=(stderr or b"").decode(encoding, errors)
+    )
+
+async def run_commands_async(commands, timeout=30, encoding='utf-8', errors='ignore'):
+    """
+    并发执行多个外部命令，总耗时约等于最慢的一条
+
+    参数:
+    - commands: 命令行参数列表的列表
+    - timeout: 每条命令的超时时间（秒）
+    - encoding: 输出解码使用的编码
+    - errors: 解码错误的处理方式
+
+    返回:
+    - 与commands顺序一致的subprocess.CompletedProcess列表
+    """
+    return await asyncio.gather(*(
+        run_command_async(argv, timeout=timeout, encoding=encoding, errors=errors)
+        for argv in commands
+    ))
+
+def run_async(coroutine):
+    """
+    在同步代码中运行协程并返回结果
+
+    当前线程没有运行中的事件循环时直接使用asyncio.run，否则在独立线程的新事件循环中运行，
+    因此同步的采集函数在任何调用环境下都可以使用异步接口
+
+    参数:
+    - coroutine: 要运行的协程对象
+
+    返回:
+    - 协程的返回值
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+
+    outcome = {}
+    # 新线程不继承上下文变量，在当前上下文的副本中运行以保留分区和时间预算信息，CPU时间计入当前采集器
+    run = resource_accounting.bind_worker(asyncio.run)
+
+    def runner():
+        try:
+            outcome["result"] = run(coroutine)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=runner, name="async-runner", daemon=True)
+    thread.start()
+    thread.join()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
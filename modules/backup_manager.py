@@ -4,11 +4,20 @@ import json
 from pathlib import Path
 
 # 导入收集器模块
-from .collectors.software_collector import get_all_installed_software
-from .collectors.system_info_collector import collect_all_system_info
 from .collectors.driver_collector import backup_drivers, list_drivers
 from .collectors.network_backup import backup_wifi_profiles, backup_network_settings, backup_wired_profiles
 from .collectors.dev_env_collector import save_dev_environment_info
+from .command_cache import get_cache_summary
+from .time_budget import start_time_budget, budget_section, get_budget_summary, is_partial
+from .command_trace import start_trace, stop_trace, format_trace_summary
+from .config import COMMAND_TRACE_ENABLED
+from .probe_registry import get_probe_summary
+from .json_refs import dump_json, measure_savings
+from .incremental import configure_incremental, reuse_or_collect, get_incremental_summary, flush as flush_incremental_state
+from .collector_registry import get_collector, resolve, run_collector, collector_names
+from .resource_accounting import account, get_resource_summary, format_resource_summary, write_run_metrics
+from .process_isolation import configure_isolation, get_isolation_summary
+from .registry_snapshot import get_snapshot_summary, flush as flush_registry_snapshot
 
 # 导入导出器模块
 from .exporters.html_report_exporter import generate_report_from_directory
@@ -42,7 +51,8 @@ class BackupManager:
         print("收集软件清单...")
         
         try:
-            software_list = get_all_installed_software()
+            # 时间预算已由run_budgeted_step分配，这里只按登记表取采集函数
+            software_list = reuse_or_collect("software", resolve(get_collector("software")))
             
             # 将软件列表保存为JSON文件
             software_file = self.output_dir / "software_list.json"
@@ -71,7 +81,7 @@ class BackupManager:
         print("收集系统信息...")
         
         try:
-            info = collect_all_system_info(self.output_dir)
+            info = run_collector("system_info")
             
             result = {
                 "step": "系统信息备份",
@@ -79,6 +89,11 @@ class BackupManager:
                 "message": "系统信息已保存",
                 "details": info
             }
+            
+            # 有分区因时间预算被截断或跳过
+            if info.get("partial_sections"):
+                result["status"] = "部分成功"
+                result["partial"] = True
         except Exception as e:
             result = {
                 "step": "系统信息备份",
@@ -237,14 +252,106 @@ class BackupManager:
         """保存备份摘要信息"""
         summary_path = self.output_dir / "backup_summary.json"
         
+        # 记录各分区的数据来自缓存还是实时采集
+        self.summary["command_cache"] = get_cache_summary()
+        
+        budget_summary = get_budget_summary()
+        if budget_summary is not None:
+            self.summary["time_budget"] = budget_summary
+        
+        # 停止外部命令跟踪，按耗时排序的汇总写入摘要
+        trace_summary = stop_trace()
+        if trace_summary is not None:
+            self.summary["command_trace"] = trace_summary
+            print(format_trace_summary(trace_summary))
+        
+        # 系统信息中共享的分区结果只写一次，记录复用省下的采集时间和字节数
+        probe_summary = get_probe_summary()
+        if probe_summary is not None:
+            self.summary["collect_once"] = probe_summary
+            probe_summary["bytes_saved"] = measure_savings(self.summary, indent=2, ensure_ascii=False)
+            print(f"分区复用: {probe_summary['reused']} 次，节省 {probe_summary['seconds_saved']} 秒、{probe_summary['bytes_saved']} 字节")
+        
+        # 增量采集时记录复用了哪些分区，并保存本次的分区结果和指纹
+        incremental_summary = get_incremental_summary()
+        if incremental_summary is not None:
+            self.summary["incremental"] = incremental_summary
+            flush_incremental_state()
+            print(f"增量采集: 复用 {len(incremental_summary['reused'])} 个分区，节省 {incremental_summary['seconds_saved']} 秒")
+        
+        # 卸载项中最后写入时间未变、直接取自快照的子键数，以及重新读取的子键数
+        snapshot_summary = get_snapshot_summary()
+        if snapshot_summary is not None:
+            self.summary["registry_snapshot"] = snapshot_summary
+            flush_registry_snapshot()
+            print(f"注册表快照: {snapshot_summary['hits']} 个子键未变，{snapshot_summary['misses']} 个重新读取")
+        
+        # 在工作进程中运行的探测，以及因超时被结束的探测和所在分区
+        isolation_summary = get_isolation_summary()
+        if isolation_summary is not None:
+            self.summary["isolation"] = isolation_summary
+            print(f"进程隔离: {isolation_summary['calls']} 次探测，超时分区: {', '.join(isolation_summary['timed_out_sections']) or '无'}")
+        
+        # 每个步骤和采集器的耗时、CPU时间、内存峰值增量、子进程数和写出的字节数，另外写入 logs/run_metrics.json
+        resource_summary = get_resource_summary()
+        if resource_summary is not None:
+            self.summary["resources"] = resource_summary
+            write_run_metrics(self.output_dir / "logs")
+            print(format_resource_summary(resource_summary))
+        
         with open(summary_path, 'w', encoding='utf-8') as f:
-            json.dump(self.summary, f, indent=2, ensure_ascii=False)
+            dump_json(self.summary, f, indent=2, ensure_ascii=False)
         
         self.summary["summary_file"] = str(summary_path)
         return summary_path
     
-    def backup_all(self):
-        """执行所有备份操作"""
+    def run_budgeted_step(self, section, step_name, step):
+        """
+        在运行时间预算分到的时间内执行一个备份步骤
+        
+        参数:
+        - section: 时间预算中的分区名
+        - step_name: 摘要中的步骤名称
+        - step: 执行备份步骤的方法
+        
+        返回:
+        - 步骤结果字典；因时间预算不足被跳过或截断时状态为"部分成功"
+        """
+        with budget_section(section) as allowed:
+            if not allowed:
+                result = {
+                    "step": step_name,
+                    "status": "部分成功",
+                    "partial": True,
+                    "message": "时间预算不足，已跳过"
+                }
+                self.summary["steps"].append(result)
+                print(f"{step_name}: 已跳过（时间预算不足）")
+                return result
+            
+            # 步骤写出的字节数按输出目录的增量统计
+            with account(section, watch_dirs=[self.output_dir]):
+                result = step()
+        
+        if is_partial(section):
+            result["status"] = "部分成功"
+            result["partial"] = True
+        return result
+    
+    def backup_all(self, time_budget=None, trace=COMMAND_TRACE_ENABLED, incremental=None, isolate=None):
+        """
+        执行所有备份操作
+        
+        参数:
+        - time_budget: 整个备份的时间预算（秒），按优先级分给各步骤，默认不限时
+        - trace: 是否把每次外部命令调用记录到 logs/trace.jsonl
+        - incremental: 是否复用指纹未变的分区的上次结果，默认使用配置INCREMENTAL_ENABLED
+        - isolate: 是否在超时即结束的工作进程中运行可能挂起的探测，默认使用配置PROBE_ISOLATION_ENABLED
+        """
+        if incremental is not None:
+            configure_incremental(enabled=incremental)
+        if isolate is not None:
+            configure_isolation(enabled=isolate)
         print(f"开始全面系统备份，时间戳: {self.timestamp}")
         print(f"备份目录: {self.output_dir}")
         
@@ -252,15 +359,22 @@ class BackupManager:
             # 创建输出目录
             self.create_output_dir()
             
-            # 执行各种备份操作
-            self.backup_software_list()
+            if trace:
+                start_trace(self.output_dir / "logs")
+            
+            start_time_budget(time_budget, [
+                "software", *collector_names("system_info"), "driver_backup", "network_configs", "dev_environment", "html_report"
+            ])
+            
+            # 执行各种备份操作，系统信息的各分区在采集时各自分配时间
+            self.run_budgeted_step("software", "软件清单备份", self.backup_software_list)
             self.backup_system_info()
-            self.backup_all_drivers()
-            self.backup_network_configs()
-            self.backup_dev_environment()
+            self.run_budgeted_step("driver_backup", "驱动程序备份", self.backup_all_drivers)
+            self.run_budgeted_step("network_configs", "网络配置备份", self.backup_network_configs)
+            self.run_budgeted_step("dev_environment", "开发环境备份", self.backup_dev_environment)
             
             # 生成HTML报告
-            self.generate_html_report()
+            self.run_budgeted_step("html_report", "HTML报告生成", self.generate_html_report)
             
             # 保存摘要信息
             summary_path = self.save_summary()
@@ -0,0 +1,334 @@
+import logging
+import platform
+import importlib
+import threading
+
+from .config import (COLLECTOR_COST_ORDER, COLLECTOR_PLUGINS, COLLECTOR_ENTRY_POINT_GROUP, COLLECTION_PROFILES,
+                     DEFAULT_COLLECTION_PROFILE)
+from . import time_budget
+from . import resource_accounting
+
+_lock = threading.Lock()
+_collectors = {}
+_plugins_loaded = False
+_options = {"profile": DEFAULT_COLLECTION_PROFILE}
+_stats = {"not_collected": []}
+
+def register_collector(name, func, group="main", platform="any", cost="medium", ttl=None, schema_version=1,
+                       deps=(), title=None, output=None, report_key=None, budget=True, subgroup=None,
+                       placement=None, batch=False, fingerprint=None, fast=None, replace=False):
+    """
+    登记一个采集器，main.py、BackupManager、collect_all_system_info、调度器和增量采集都从登记表读取采集器
+
+    参数:
+    - name: 采集器名，也是--only/--skip、时间预算和缓存中使用的分区名
+    - func: 采集函数，或 "模块路径:函数名" 字符串（第一次运行时才导入，保持启动速度）
+    - group: "main"为main.py中的顶层采集器，"system_info"为collect_all_system_info中的分区
+    - platform: 适用的平台（platform.system()的小写值，如 "windows"），"any"为全部平台
+    - cost: 预计耗时等级（见COLLECTOR_COST_ORDER），调度时耗时长的先启动
+    - ttl: 增量采集时结果的最长复用时间（秒），None使用INCREMENTAL_MAX_AGE
+    - schema_version: 输出结构版本，版本变化时不复用之前保存的结果
+    - deps: 依赖的采集器名，其结果以同名关键字参数传给采集函数
+    - title: 日志中显示的名称
+    - output: main.py写出的JSON文件名，默认为 "<name>.json"
+    - report_key: complete_report_data.json中的键，默认为name
+    - budget: 是否作为一个整体分配运行时间预算（分区各自分配预算的采集器为False）
+    - subgroup: 采集器由另一组的分区组成时为该组名，--only/--skip可以选择其中的单个分区
+    - placement: system_info分区在结果中的位置，{"hardware": 键, "top": 键}，默认为 {"top": name}
+    - batch: system_info分区是否使用批量硬件查询的结果
+    - fingerprint: 增量采集的指纹来源（格式见INCREMENTAL_FINGERPRINTS），None使用配置中的值
+    - fast: fast配置中的采集函数：True为func本身（只读注册表、psutil和文件元数据），
+      另一个函数或 "模块路径:函数名" 为只使用这些来源的替代实现，None为fast配置中不采集
+    - replace: 为True时替换同名采集器，否则同名登记抛出ValueError
+
+    返回:
+    - 登记的采集器字典
+    """
+    if cost not in COLLECTOR_COST_ORDER:
+        raise ValueError(f"Unknown cost class for collector {name}: {cost}")
+    entry = {
+        "name": name,
+        "func": func,
+        "group": group,
+        "platform": platform.lower(),
+        "cost": cost,
+        "ttl": ttl,
+        "schema_version": schema_version,
+        "deps": tuple(deps),
+        "title": title or name.replace("_", " "),
+        "output": output or f"{name}.json",
+        "report_key": report_key or name,
+        "budget": budget,
+        "subgroup": subgroup,
+        "placement": {"top": name} if placement is None else dict(placement),
+        "batch": batch,
+        "fingerprint": fingerprint,
+        "fast": fast
+    }
+    with _lock:
+        if name in _collectors and not replace:
+            raise ValueError(f"Collector {name} is already registered")
+        _collectors[name] = entry
+    return entry
+
+def collector(name, **options):
+    """
+    装饰器形式的register_collector，供第三方采集器模块使用
+
+    参数:
+    - name: 采集器名
+    - options: 传给register_collector的其他参数
+
+    返回:
+    - 装饰器，返回原函数
+    """
+    def decorate(func):
+        register_collector(name, func, **options)
+        return func
+    return decorate
+
+def unregister_collector(name):
+    """移除一个采集器，不存在时不做任何事"""
+    with _lock:
+        _collectors.pop(name, None)
+
+def get_collector(name):
+    """
+    按名称获取采集器
+
+    返回:
+    - 采集器字典，不存在时返回None
+    """
+    return _collectors.get(name)
+
+def configure_profile(profile):
+    """
+    设置采集配置，同时清除上次记录的未采集分区
+
+    参数:
+    - profile: COLLECTION_PROFILES中的名称，"fast"只运行登记了fast实现的采集器
+    """
+    if profile not in COLLECTION_PROFILES:
+        raise ValueError(f"Unknown collection profile: {profile}")
+    with _lock:
+        _options["profile"] = profile
+        _stats["not_collected"] = []
+
+def get_profile():
+    """当前的采集配置名"""
+    return _options["profile"]
+
+def is_collected(entry):
+    """采集器在当前采集配置中是否运行"""
+    return _options["profile"] == "full" or entry["fast"] is not None
+
+def not_collected_marker(name):
+    """
+    当前采集配置中不运行的分区在结果中的占位值，并记录该分区
+
+    返回:
+    - 形如 {"not_collected": True, "reason": "not collected in fast profile"} 的字典
+    """
+    with _lock:
+        if name not in _stats["not_collected"]:
+            _stats["not_collected"].append(name)
+    return {"not_collected": True, "reason": f"not collected in {_options['profile']} profile"}
+
+def get_profile_summary():
+    """
+    本次运行的采集配置
+
+    返回:
+    - {"profile", "not_collected"}，使用full配置时返回None
+    """
+    if _options["profile"] == "full":
+        return None
+    with _lock:
+        return {"profile": _options["profile"], "not_collected": list(_stats["not_collected"])}
+
+def is_available(entry):
+    """采集器是否适用于当前平台"""
+    return entry["platform"] == "any" or entry["platform"] == platform.system().lower()
+
+def list_collectors(group=None, available_only=False):
+    """
+    按登记顺序列出采集器
+
+    参数:
+    - group: 只列出该组的采集器，None为全部
+    - available_only: 为True时只列出适用于当前平台的采集器
+
+    返回:
+    - 采集器字典列表
+    """
+    with _lock:
+        entries = list(_collectors.values())
+    return [entry for entry in entries
+            if (group is None or entry["group"] == group) and (not available_only or is_available(entry))]
+
+def collector_names(group):
+    """某一组的采集器名列表，按登记顺序"""
+    return [entry["name"] for entry in list_collectors(group)]
+
+def resolve(entry):
+    """
+    获取采集函数（fast配置中为登记的替代实现），"模块路径:函数名" 形式的函数在这时才导入
+
+    返回:
+    - 可调用对象
+    """
+    func = entry["func"]
+    if _options["profile"] != "full" and entry["fast"] not in (None, True):
+        func = entry["fast"]
+    if isinstance(func, str):
+        module_name, _, attribute = func.partition(":")
+        func = getattr(importlib.import_module(module_name), attribute)
+    return func
+
+def run_collector(name, **kwargs):
+    """
+    在运行时间预算内执行一个采集器并统计其资源使用；启用增量采集且指纹未变时复用上次运行的结果
+
+    参数:
+    - name: 采集器名
+    - kwargs: 传给采集函数的关键字参数（依赖采集器的结果和运行选项）
+
+    返回:
+    - 采集函数的返回值；因时间预算不足被跳过时返回 {"partial": True, "reason": ...}，
+      当前采集配置中不运行时返回 {"not_collected": True, "reason": ...}
+    """
+    from . import incremental
+    entry = _collectors[name]
+    if not is_collected(entry):
+        logging.info(f"Skipping {entry['title']}: not collected in {_options['profile']} profile")
+        return not_collected_marker(name)
+    func = resolve(entry)
+    logging.info(f"Gathering {entry['title']}...")
+    with resource_accounting.account(name):
+        if not entry["budget"]:
+            return func(**kwargs)
+        with time_budget.budget_section(name) as allowed:
+            if not allowed:
+                return time_budget.partial_marker(name)
+            return incremental.reuse_or_collect(name, func, **kwargs)
+
+def build_tasks(names, options=None):
+    """
+    为调度器生成采集任务，依赖关系和耗时等级取自登记表
+
+    参数:
+    - names: 要运行的采集器名
+    - options: 采集器名到额外关键字参数的字典，如 {"system_info": {"sections": [...]}}
+
+    返回:
+    - run_collectors使用的任务列表
+    """
+    options = options or {}
+    tasks = []
+    for name in names:
+        entry = _collectors[name]
+        missing = [dep for dep in entry["deps"] if dep not in names]
+        if missing:
+            raise ValueError(f"Collector {name} needs {', '.join(missing)}, which is not selected")
+        extra = options.get(name, {})
+        tasks.append({
+            "name": name,
+            "func": (lambda name, extra: lambda **deps: run_collector(name, **deps, **extra))(name, extra),
+            "deps": entry["deps"],
+            "cost": entry["cost"]
+        })
+    return tasks
+
+def load_plugins(modules=None):
+    """
+    导入第三方采集器模块，模块在导入时用register_collector或@collector登记采集器；
+    另外加载已安装包在COLLECTOR_ENTRY_POINT_GROUP入口点组中声明的模块或登记函数。只加载一次
+
+    参数:
+    - modules: 模块名列表，默认为COLLECTOR_PLUGINS
+
+    返回:
+    - 成功加载的插件名列表
+    """
+    global _plugins_loaded
+    if _plugins_loaded and modules is None:
+        return []
+    _plugins_loaded = True
+
+    loaded = []
+    for module_name in (COLLECTOR_PLUGINS if modules is None else modules):
+        try:
+            importlib.import_module(module_name)
+            loaded.append(module_name)
+        except Exception as e:
+            logging.warning(f"Could not load collector plugin {module_name}: {e}")
+
+    if modules is None:
+        try:
+            from importlib.metadata import entry_points
+            plugins = entry_points(group=COLLECTOR_ENTRY_POINT_GROUP)
+        except Exception:
+            plugins = ()
+        for plugin in plugins:
+            try:
+                target = plugin.load()
+                if callable(target):
+                    target()
+                loaded.append(plugin.name)
+            except Exception as e:
+                logging.warning(f"Could not load collector plugin {plugin.name}: {e}")
+    return loaded
+
+def describe_collectors():
+    """
+    列出全部采集器的元数据，用于 main.py --list-collectors
+
+    返回:
+    - 每个采集器一行的字典列表
+    """
+    return [{
+        "name": entry["name"],
+        "group": entry["group"],
+        "platform": entry["platform"],
+        "cost": entry["cost"],
+        "ttl": entry["ttl"],
+        "schema": entry["schema_version"],
+        "deps": ",".join(entry["deps"]),
+        "fast": "yes" if entry["fast"] is True else "variant" if entry["fast"] is not None else "no",
+        "available": is_available(entry)
+    } for entry in list_collectors()]
+
+def _register_builtin_collectors():
+    """登记内置采集器，顺序即collect_all_system_info中的采集顺序和输出顺序"""
+    system_info = "modules.collectors.system_info_collector"
+    register_collector("software", "modules.collectors.software_collector:get_all_installed_software",
+                       platform="windows", cost="medium", ttl=24 * 3600, title="installed software information",
+                       output="software_list.json", report_key="software_list",
+                       fast="modules.collectors.software_collector:get_registry_installed_software")
+    register_collector("system_info", f"{system_info}:collect_all_system_info", cost="slow",
+                       title="system specifications", budget=False, subgroup="system_info", fast=True)
+    register_collector("dev_environment", "modules.collectors.dev_env_collector:collect_all_dev_environment_info",
+                       platform="windows", cost="medium", ttl=24 * 3600, title="development environment information")
+
+    # 最后一列为fast配置中的实现：只读注册表、psutil和文件元数据，None为fast配置中不采集
+    for name, function, cost, placement, batch, fast in (
+        ("hardware_batch", "get_hardware_batch", "slow", {}, False, None),
+        ("cpu", "get_cpu_info", "fast", {"hardware": "cpu", "top": "cpu"}, True, "get_cpu_info_fast"),
+        ("memory", "get_memory_info", "fast", {"hardware": "memory", "top": "memory"}, True, "get_memory_usage"),
+        ("disks", "get_disk_info", "fast", {"hardware": "disks", "top": "disk"}, False, "get_disk_volumes"),
+        ("graphics", "get_graphics_info", "fast", {"hardware": "graphics", "top": "graphics"}, True, "get_graphics_info_fast"),
+        ("motherboard", "get_motherboard_info", "fast", {"hardware": "motherboard"}, True, "get_motherboard_info_fast"),
+        ("bios", "get_bios_info", "fast", {"hardware": "bios"}, True, "get_bios_info_fast"),
+        ("network_adapters", "get_network_adapters", "medium", None, False, "get_network_adapters_fast"),
+        ("user_accounts", "get_user_accounts", "medium", None, False, None),
+        ("drivers", "get_installed_drivers", "slow", None, False, None),
+        ("startup_items", "get_startup_items", "medium", None, False, "get_startup_items_fast"),
+        ("scheduled_tasks", "get_scheduled_tasks", "slow", None, False, "get_scheduled_tasks_fast"),
+        ("services", "get_services", "slow", None, False, "get_services_fast"),
+        ("environment_variables", "get_environment_variables", "fast", None, False, True),
+    ):
+        register_collector(name, f"{system_info}:{function}", group="system_info", cost=cost,
+                           placement=placement, batch=batch,
+                           fast=f"{system_info}:{fast}" if isinstance(fast, str) else fast)
+
+_register_builtin_collectors()
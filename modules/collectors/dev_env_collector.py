@@ -4,7 +4,114 @@ import json
 import sys
 import re
 from pathlib import Path
-import winreg
+import locale
+import asyncio
+
+from ..async_runner import run_command_async, run_async
+from .. import time_budget
+from .. import incremental
+from .. import process_isolation
+from .. import registry_backend
+
+# 互不依赖的版本探测命令，采集开始时并发预取
+DEV_ENV_PROBE_COMMANDS = [
+    ["python", "--version"],
+    [sys.executable, "-m", "pip", "list", "--format=json"],
+    ["java", "-version"],
+    ["node", "--version"],
+    ["npm", "--version"],
+    ["npm", "list", "-g", "--json", "--depth=0"],
+    ["go", "version"],
+    ["ruby", "--version"],
+    ["gem", "list", "--local"],
+    ["php", "--version"],
+    ["dotnet", "--list-sdks"],
+    ["dotnet", "--list-runtimes"],
+    ["dotnet", "--info"],
+    ["git", "--version"],
+    ["git", "config", "--global", "--list"],
+    ["docker", "--version"],
+    ["docker", "info", "--format", "{{json .}}"]
+]
+
+# 把版本信息写到标准错误的命令
+MERGE_STDERR_COMMANDS = {("java", "-version")}
+
+# 单条探测命令的超时时间（秒）
+PROBE_TIMEOUT = 60
+
+# 预取的探测结果，键为命令行参数元组
+_probe_results = {}
+
+async def prefetch_probes_async(commands=None, timeout=PROBE_TIMEOUT):
+    """
+    并发执行探测命令
+    
+    参数:
+    - commands: 命令行参数列表的列表，默认DEV_ENV_PROBE_COMMANDS
+    - timeout: 每条命令的超时时间（秒）
+    
+    返回:
+    - 命令行参数元组到subprocess.CompletedProcess的字典
+    """
+    commands = commands or DEV_ENV_PROBE_COMMANDS
+    encoding = locale.getpreferredencoding(False)
+    results = await asyncio.gather(*(
+        run_command_async(argv, timeout=timeout, encoding=encoding,
+                          merge_stderr=tuple(argv) in MERGE_STDERR_COMMANDS)
+        for argv in commands
+    ))
+    return {tuple(argv): result for argv, result in zip(commands, results)}
+
+def prefetch_probes(commands=None, timeout=PROBE_TIMEOUT):
+    """
+    同步包装：并发预取探测命令的结果，之后的run_probe调用直接使用预取结果
+    
+    参数:
+    - commands: 命令行参数列表的列表，默认DEV_ENV_PROBE_COMMANDS
+    - timeout: 每条命令的超时时间（秒）
+    """
+    _probe_results.update(run_async(prefetch_probes_async(commands, timeout)))
+
+def clear_probe_results():
+    """清除预取的探测结果"""
+    _probe_results.clear()
+
+def run_probe(argv, merge_stderr=False, timeout=PROBE_TIMEOUT):
+    """
+    执行一条探测命令，已预取时直接返回预取结果
+    
+    参数:
+    - argv: 命令行参数列表
+    - merge_stderr: 为True时将标准错误合并到标准输出
+    - timeout: 超时时间（秒）
+    
+    返回:
+    - subprocess.CompletedProcess对象；命令不存在或超时时returncode为1
+    """
+    result = _probe_results.get(tuple(argv))
+    if result is not None:
+        return result
+    
+    timeout = time_budget.clamp_timeout(timeout)
+    if timeout <= 0:
+        return subprocess.CompletedProcess(argv, returncode=1, stdout="", stderr="Time budget exhausted")
+    
+    try:
+        # 启用进程隔离时在工作进程中运行，超时时连同命令的子进程一起结束
+        return process_isolation.run_command(
+            Path(argv[0]).stem.lower(),
+            argv,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT if merge_stderr else subprocess.PIPE,
+            text=True,
+            timeout=timeout
+        )
+    except subprocess.TimeoutExpired:
+        time_budget.mark_partial("command timed out")
+        return subprocess.CompletedProcess(argv, returncode=1, stdout="", stderr=f"Command timed out after {timeout} seconds")
+    except OSError as e:
+        return subprocess.CompletedProcess(argv, returncode=1, stdout="", stderr=str(e))
 
 def get_installed_programming_languages():
     """
@@ -22,7 +129,7 @@ def get_installed_programming_languages():
     
     # 检查Python
     try:
-        result = subprocess.run(["python", "--version"], capture_output=True, text=True)
+        result = run_probe(["python", "--version"])
         if result.returncode == 0:
             version = result.stdout.strip()
             languages["python"] = {
@@ -34,8 +141,7 @@ def get_installed_programming_languages():
             
             # 获取已安装的Python包
             try:
-                pip_result = subprocess.run([sys.executable, "-m", "pip", "list", "--format=json"], 
-                                           capture_output=True, text=True)
+                pip_result = run_probe([sys.executable, "-m", "pip", "list", "--format=json"])
                 if pip_result.returncode == 0:
                     packages = json.loads(pip_result.stdout)
                     languages["python"]["packages"] = packages
@@ -46,7 +152,7 @@ def get_installed_programming_languages():
     
     # 检查Java
     try:
-        result = subprocess.run(["java", "-version"], capture_output=True, text=True, stderr=subprocess.STDOUT)
+        result = run_probe(["java", "-version"], merge_stderr=True)
         if result.returncode == 0:
             version_text = result.stdout
             # 解析Java版本输出
@@ -67,14 +173,14 @@ def get_installed_programming_languages():
     
     # 检查Node.js
     try:
-        result = subprocess.run(["node", "--version"], capture_output=True, text=True)
+        result = run_probe(["node", "--version"])
         if result.returncode == 0:
             version = result.stdout.strip()
             npm_version = ""
             
             # 获取npm版本
             try:
-                npm_result = subprocess.run(["npm", "--version"], capture_output=True, text=True)
+                npm_result = run_probe(["npm", "--version"])
                 if npm_result.returncode == 0:
                     npm_version = npm_result.stdout.strip()
             except:
@@ -88,8 +194,7 @@ def get_installed_programming_languages():
             
             # 尝试获取全局安装的包
             try:
-                npm_list = subprocess.run(["npm", "list", "-g", "--json", "--depth=0"], 
-                                         capture_output=True, text=True)
+                npm_list = run_probe(["npm", "list", "-g", "--json", "--depth=0"])
                 if npm_list.returncode == 0:
                     packages = json.loads(npm_list.stdout)
                     if "dependencies" in packages:
@@ -101,7 +206,7 @@ def get_installed_programming_languages():
     
     # 检查Go
     try:
-        result = subprocess.run(["go", "version"], capture_output=True, text=True)
+        result = run_probe(["go", "version"])
         if result.returncode == 0:
             version = result.stdout.strip()
             languages["go"] = {
@@ -121,7 +226,7 @@ def get_installed_programming_languages():
     
     # 检查Ruby
     try:
-        result = subprocess.run(["ruby", "--version"], capture_output=True, text=True)
+        result = run_probe(["ruby", "--version"])
         if result.returncode == 0:
             version = result.stdout.strip()
             languages["ruby"] = {
@@ -131,7 +236,7 @@ def get_installed_programming_languages():
             
             # 获取已安装的gem
             try:
-                gem_result = subprocess.run(["gem", "list", "--local"], capture_output=True, text=True)
+                gem_result = run_probe(["gem", "list", "--local"])
                 if gem_result.returncode == 0:
                     gems = []
                     for line in gem_result.stdout.strip().split("\n"):
@@ -145,7 +250,7 @@ def get_installed_programming_languages():
     
     # 检查PHP
     try:
-        result = subprocess.run(["php", "--version"], capture_output=True, text=True)
+        result = run_probe(["php", "--version"])
         if result.returncode == 0:
             version_text = result.stdout.strip()
             match = re.search(r'PHP (\d+\.\d+\.\d+)', version_text)
@@ -160,7 +265,7 @@ def get_installed_programming_languages():
     
     # 检查.NET SDK
     try:
-        result = subprocess.run(["dotnet", "--list-sdks"], capture_output=True, text=True)
+        result = run_probe(["dotnet", "--list-sdks"])
         if result.returncode == 0:
             versions = []
             for line in result.stdout.strip().split("\n"):
@@ -179,8 +284,7 @@ def get_installed_programming_languages():
                 
                 # 获取已安装的.NET运行时
                 try:
-                    runtime_result = subprocess.run(["dotnet", "--list-runtimes"], 
-                                                   capture_output=True, text=True)
+                    runtime_result = run_probe(["dotnet", "--list-runtimes"])
                     if runtime_result.returncode == 0:
                         runtimes = []
                         for line in runtime_result.stdout.strip().split("\n"):
@@ -257,8 +361,7 @@ def get_development_tools():
                 version = "Unknown"
                 code_path = os.path.join(path, "bin", "code.cmd")
                 if os.path.exists(code_path):
-                    result = subprocess.run([code_path, "--version"], 
-                                          capture_output=True, text=True)
+                    result = run_probe([code_path, "--version"])
                     if result.returncode == 0:
                         version = result.stdout.strip().split("\n")[0]
                 
@@ -271,8 +374,7 @@ def get_development_tools():
                 
                 # 尝试获取已安装的扩展
                 try:
-                    extensions_result = subprocess.run([code_path, "--list-extensions"], 
-                                                     capture_output=True, text=True)
+                    extensions_result = run_probe([code_path, "--list-extensions"])
                     if extensions_result.returncode == 0:
                         extensions = extensions_result.stdout.strip().split("\n")
                         if extensions and extensions[0]:  # 确保不是空列表
@@ -339,14 +441,13 @@ def get_development_tools():
             vs_versions = []
             for key_path in vs_keys:
                 try:
-                    key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, key_path)
-                    install_dir, _ = winreg.QueryValueEx(key, "InstallDir")
+                    with registry_backend.open_key(registry_backend.HKEY_LOCAL_MACHINE, key_path) as key:
+                        install_dir, _ = key.query_value("InstallDir")
                     version = key_path.split("\\")[-1]
                     vs_versions.append({
                         "version": version,
                         "path": install_dir
                     })
-                    winreg.CloseKey(key)
                 except:
                     pass
             
@@ -480,7 +581,7 @@ def get_development_tools():
             docker_found = True
             # 尝试获取Docker版本
             try:
-                result = subprocess.run(["docker", "--version"], capture_output=True, text=True)
+                result = run_probe(["docker", "--version"])
                 if result.returncode == 0:
                     version = result.stdout.strip()
                     dev_tools["docker"] = {
@@ -506,7 +607,7 @@ def get_development_tools():
     if not docker_found:
         # 尝试通过命令检查Docker
         try:
-            result = subprocess.run(["docker", "--version"], capture_output=True, text=True)
+            result = run_probe(["docker", "--version"])
             if result.returncode == 0:
                 version = result.stdout.strip()
                 docker_found = True
@@ -591,8 +692,7 @@ def get_development_sdks():
         platform_tools_path = os.path.join(android_sdk_path, "platform-tools")
         if os.path.exists(platform_tools_path):
             try:
-                result = subprocess.run([os.path.join(platform_tools_path, "adb"), "--version"], 
-                                       capture_output=True, text=True)
+                result = run_probe([os.path.join(platform_tools_path, "adb"), "--version"])
                 if result.returncode == 0:
                     match = re.search(r'Android Debug Bridge version (\d+\.\d+\.\d+)', result.stdout)
                     if match:
@@ -638,8 +738,7 @@ def get_development_sdks():
                 platform_tools_path = os.path.join(path, "platform-tools")
                 if os.path.exists(platform_tools_path):
                     try:
-                        result = subprocess.run([os.path.join(platform_tools_path, "adb"), "--version"], 
-                                              capture_output=True, text=True)
+                        result = run_probe([os.path.join(platform_tools_path, "adb"), "--version"])
                         if result.returncode == 0:
                             match = re.search(r'Android Debug Bridge version (\d+\.\d+\.\d+)', result.stdout)
                             if match:
@@ -667,8 +766,7 @@ def get_development_sdks():
         # 获取版本
         java_version = "Unknown"
         try:
-            result = subprocess.run([os.path.join(java_home, "bin", "java"), "-version"], 
-                                   capture_output=True, text=True, stderr=subprocess.STDOUT)
+            result = run_probe([os.path.join(java_home, "bin", "java"), "-version"], merge_stderr=True)
             if result.returncode == 0:
                 match = re.search(r'version "([^"]+)"', result.stdout)
                 if match:
@@ -689,7 +787,7 @@ def get_development_sdks():
     # .NET SDK (已在get_installed_programming_languages中收集)
     dotnet_info = {}
     try:
-        result = subprocess.run(["dotnet", "--info"], capture_output=True, text=True)
+        result = run_probe(["dotnet", "--info"])
         if result.returncode == 0:
             dotnet_info = {
                 "installed": True,
@@ -743,14 +841,13 @@ def get_git_config():
     
     try:
         # 检查Git是否安装
-        version_result = subprocess.run(["git", "--version"], capture_output=True, text=True)
+        version_result = run_probe(["git", "--version"])
         if version_result.returncode == 0:
             git_info["installed"] = True
             git_info["version"] = version_result.stdout.strip()
             
             # 获取全局配置
-            config_result = subprocess.run(["git", "config", "--global", "--list"], 
-                                          capture_output=True, text=True)
+            config_result = run_probe(["git", "config", "--global", "--list"])
             if config_result.returncode == 0:
                 config = {}
                 for line in config_result.stdout.strip().split("\n"):
@@ -775,15 +872,14 @@ def get_docker_info():
     
     try:
         # 检查Docker是否安装
-        version_result = subprocess.run(["docker", "--version"], capture_output=True, text=True)
+        version_result = run_probe(["docker", "--version"])
         if version_result.returncode == 0:
             docker_info["installed"] = True
             docker_info["version"] = version_result.stdout.strip()
             
             # 获取系统信息
             try:
-                info_result = subprocess.run(["docker", "info", "--format", "{{json .}}"], 
-                                            capture_output=True, text=True)
+                info_result = run_probe(["docker", "info", "--format", "{{json .}}"])
                 if info_result.returncode == 0:
                     info = json.loads(info_result.stdout)
                     # 提取关键信息
@@ -806,14 +902,19 @@ def collect_all_dev_environment_info():
     """
     收集所有开发环境信息
     """
-    dev_info = {
-        "languages": get_installed_programming_languages(),
-        "development_tools": get_development_tools(),
-        "sdks": get_development_sdks(),
-        "environment_variables": get_dev_environment_variables(),
-        "git": get_git_config(),
-        "docker": get_docker_info()
-    }
+    # 并发预取所有版本探测命令，耗时约等于最慢的一条而不是全部之和
+    prefetch_probes()
+    try:
+        dev_info = {
+            "languages": get_installed_programming_languages(),
+            "development_tools": get_development_tools(),
+            "sdks": get_development_sdks(),
+            "environment_variables": get_dev_environment_variables(),
+            "git": get_git_config(),
+            "docker": get_docker_info()
+        }
+    finally:
+        clear_probe_results()
     
     return dev_info
 
@@ -836,8 +937,8 @@ def save_dev_environment_info(output_dir, filename="dev_environment.json"):
         os.makedirs(output_dir, exist_ok=True)
         output_file = output_dir / filename
         
-        # 收集信息
-        dev_info = collect_all_dev_environment_info()
+        # 收集信息，启用增量采集且指纹未变时复用上次的结果
+        dev_info = incremental.reuse_or_collect("dev_environment", collect_all_dev_environment_info)
         
         # 保存到JSON文件
         with open(output_file, 'w', encoding='utf-8') as f:
@@ -1,6 +1,9 @@
 import subprocess
 import os
 from pathlib import Path
+from .. import time_budget
+from .. import process_isolation
+from .tabular_parser import parse_list_blocks, iter_rows
 
 def backup_drivers(output_dir):
     """
@@ -12,11 +15,11 @@ def backup_drivers(output_dir):
     # 确保输出目录存在
     os.makedirs(drivers_dir, exist_ok=True)
     
-    # 使用DISM工具导出所有驱动程序
+    # 使用DISM工具导出所有驱动程序，设置了运行时间预算时不超过分到的时间
     try:
-        result = subprocess.run(
-            ["dism", "/online", "/export-driver", f"/destination:{drivers_dir}"],
-            capture_output=True, text=True, check=True
+        result = process_isolation.run_command(
+            "dism", ["dism", "/online", "/export-driver", f"/destination:{drivers_dir}"],
+            capture_output=True, text=True, check=True, timeout=time_budget.clamp_timeout(None)
         )
         return {
             "success": True,
@@ -30,19 +33,29 @@ def backup_drivers(output_dir):
             "error": str(e),
             "details": e.stderr
         }
+    except subprocess.TimeoutExpired as e:
+        time_budget.mark_partial("dism timed out")
+        return {
+            "success": False,
+            "partial": True,
+            "message": f"驱动程序备份超出时间预算，{drivers_dir} 中可能只有部分驱动",
+            "error": str(e)
+        }
 
 def list_drivers():
     """
     列出系统中所有已安装的驱动程序
     """
     try:
-        result = subprocess.run(
-            ["pnputil", "/enum-drivers"],
+        result = process_isolation.run_command(
+            "pnputil", ["pnputil", "/enum-drivers"],
             capture_output=True, text=True, check=True
         )
+        # pnputil按"键: 值"块输出，每块一个驱动包
         return {
             "success": True,
-            "drivers": result.stdout
+            "drivers": result.stdout,
+            "records": list(iter_rows(parse_list_blocks(result.stdout, ":")))
         }
     except subprocess.CalledProcessError as e:
         return {
@@ -50,6 +63,12 @@ def list_drivers():
             "error": str(e),
             "details": e.stderr
         }
+    except subprocess.TimeoutExpired as e:
+        return {
+            "success": False,
+            "partial": True,
+            "error": str(e)
+        }
 
 def get_driver_details():
     """
@@ -57,13 +76,14 @@ def get_driver_details():
     """
     try:
         # 获取设备列表
-        result = subprocess.run(
-            ["driverquery", "/v", "/fo", "list"],
+        result = process_isolation.run_command(
+            "driverquery", ["driverquery", "/v", "/fo", "list"],
             capture_output=True, text=True, check=True
         )
         return {
             "success": True,
-            "device_list": result.stdout
+            "device_list": result.stdout,
+            "records": list(iter_rows(parse_list_blocks(result.stdout, ":")))
         }
     except subprocess.CalledProcessError as e:
         return {
@@ -71,6 +91,12 @@ def get_driver_details():
             "error": str(e),
             "details": e.stderr
         }
+    except subprocess.TimeoutExpired as e:
+        return {
+            "success": False,
+            "partial": True,
+            "error": str(e)
+        }
         
 def restore_drivers(drivers_path):
     """
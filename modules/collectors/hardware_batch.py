@@ -0,0 +1,213 @@
+import json
+import re
+import logging
+from datetime import datetime, timezone
+
+# 批量硬件查询涉及的WMI类及属性，按报告中的硬件分区命名
+HARDWARE_QUERIES = {
+    "cpu": ("Win32_Processor", ["Name", "NumberOfCores", "NumberOfLogicalProcessors", "MaxClockSpeed", "L2CacheSize", "L3CacheSize"]),
+    "memory": ("Win32_PhysicalMemory", ["Capacity", "Speed", "Manufacturer", "PartNumber", "DeviceLocator"]),
+    "graphics": ("Win32_VideoController", ["Name", "AdapterRAM", "DriverVersion", "VideoProcessor"]),
+    "motherboard": ("Win32_BaseBoard", ["Manufacturer", "Product", "SerialNumber", "Version"]),
+    "bios": ("Win32_BIOS", ["Manufacturer", "Name", "SMBIOSBIOSVersion", "ReleaseDate"]),
+}
+
+def build_hardware_batch_script(sections=None, use_cim=None):
+    """
+    构建一次查询所有硬件WMI类的PowerShell脚本
+
+    参数:
+    - sections: 要查询的分区名列表，默认查询HARDWARE_QUERIES中的全部分区
+    - use_cim: True使用Get-CimInstance，False使用Get-WmiObject，None时由脚本在运行时检测
+
+    返回:
+    - PowerShell脚本字符串，输出一个以分区名为键的JSON文档，每个分区形如 {"data": [...], "error": null}
+    """
+    sections = sections or list(HARDWARE_QUERIES)
+    query_items = []
+    for section in sections:
+        wmi_class, properties = HARDWARE_QUERIES[section]
+        prop_list = ",".join(f"'{p}'" for p in properties)
+        query_items.append(f"@{{s='{section}';c='{wmi_class}';p=@({prop_list})}}")
+
+    if use_cim is None:
+        use_cim_expr = "[bool](Get-Command Get-CimInstance -ErrorAction SilentlyContinue)"
+    else:
+        use_cim_expr = "$true" if use_cim else "$false"
+
+    return (
+        "$ProgressPreference = 'SilentlyContinue'; "
+        "[System.Threading.Thread]::CurrentThread.CurrentCulture = 'en-US'; "
+        "[System.Threading.Thread]::CurrentThread.CurrentUICulture = 'en-US'; "
+        f"$useCim = {use_cim_expr}; "
+        "$result = [ordered]@{}; "
+        f"foreach ($q in @({','.join(query_items)})) {{ "
+        "try { "
+        "if ($useCim) { $items = Get-CimInstance -ClassName $q.c -ErrorAction Stop } "
+        "else { $items = Get-WmiObject -Class $q.c -ErrorAction Stop }; "
+        "$result[$q.s] = @{ data = @($items | Select-Object -Property $q.p); error = $null } "
+        "} catch { "
+        "$result[$q.s] = @{ data = @(); error = $_.Exception.Message } "
+        "} "
+        "}; "
+        "$result | ConvertTo-Json -Depth 4 -Compress"
+    )
+
+def parse_hardware_batch_output(output, sections=None):
+    """
+    解析批量硬件查询的JSON输出
+
+    参数:
+    - output: PowerShell脚本的标准输出
+    - sections: 期望的分区名列表，默认HARDWARE_QUERIES中的全部分区
+
+    返回:
+    - 分区名到记录列表的字典；某个WMI类查询失败时对应值为空列表，便于各分区走自己的WMIC备用方案
+    """
+    sections = sections or list(HARDWARE_QUERIES)
+    document = json.loads(output)
+    if not isinstance(document, dict):
+        raise ValueError("Hardware batch output is not a JSON object")
+
+    results = {}
+    for section in sections:
+        entry = document.get(section)
+        if not isinstance(entry, dict):
+            logging.warning(f"Hardware batch output is missing section '{section}'")
+            results[section] = []
+            continue
+
+        if entry.get("error"):
+            logging.warning(f"Hardware batch query for {section} failed: {entry['error']}")
+            results[section] = []
+            continue
+
+        records = entry.get("data") or []
+        if isinstance(records, dict):
+            records = [records]
+        results[section] = [r for r in records if isinstance(r, dict)]
+
+    return results
+
+def parse_cpu_records(records):
+    """
+    规范化Win32_Processor记录
+
+    参数:
+    - records: 记录列表或单个记录字典
+
+    返回:
+    - CPU信息列表，附带MaxClockSpeedGHz；返回新的字典，不修改传入的记录，重复解析结果相同
+    """
+    cpu_info = [dict(cpu) for cpu in (records if isinstance(records, list) else [records])]
+
+    # 将时钟速度转换为GHz
+    for cpu in cpu_info:
+        if "MaxClockSpeed" in cpu and cpu["MaxClockSpeed"]:
+            cpu["MaxClockSpeedGHz"] = round(cpu["MaxClockSpeed"] / 1000, 2)
+
+    return cpu_info
+
+def parse_memory_module_records(records):
+    """
+    规范化Win32_PhysicalMemory记录
+
+    参数:
+    - records: 记录列表或单个记录字典
+
+    返回:
+    - 内存模块列表，容量转换为GB字符串；返回新的字典，不修改传入的记录，重复解析结果相同
+    """
+    memory_modules = [dict(module) for module in (records if isinstance(records, list) else [records])]
+
+    # 转换容量为GB
+    for module in memory_modules:
+        if "Capacity" in module and module["Capacity"]:
+            try:
+                capacity_bytes = int(module["Capacity"])
+                capacity_gb = round(capacity_bytes / (1024**3), 2)
+                module["Capacity"] = f"{capacity_gb} GB"
+            except (ValueError, TypeError):
+                module["Capacity"] = "Unknown"
+
+    return memory_modules
+
+def parse_graphics_records(records):
+    """
+    规范化Win32_VideoController记录
+
+    参数:
+    - records: 记录列表或单个记录字典
+
+    返回:
+    - 显卡列表，附带VideoRAM_GB；返回新的字典，不修改传入的记录
+    """
+    gpu_data = [dict(gpu) for gpu in (records if isinstance(records, list) else [records])]
+
+    # 转换显存大小为GB
+    for gpu in gpu_data:
+        if "AdapterRAM" in gpu and gpu["AdapterRAM"]:
+            try:
+                ram_bytes = int(gpu["AdapterRAM"])
+                gpu["VideoRAM_GB"] = round(ram_bytes / (1024**3), 2)
+            except (ValueError, TypeError):
+                gpu["VideoRAM_GB"] = "Unknown"
+
+    return gpu_data
+
+def parse_motherboard_records(records):
+    """
+    规范化Win32_BaseBoard记录
+
+    参数:
+    - records: 记录列表或单个记录字典
+
+    返回:
+    - 主板信息字典（取第一块主板）
+    """
+    if isinstance(records, list):
+        return records[0] if records else {}
+    return records or {}
+
+def format_bios_release_date(release_date):
+    """
+    将BIOS日期统一为YYYY-MM-DD格式，无法识别时原样返回
+
+    支持WMI的 YYYYMMDDHHMMSS.MMMMMM+MMM、CIM序列化出的 /Date(毫秒)/ 和ISO日期
+    """
+    if not isinstance(release_date, str) or len(release_date) < 8:
+        return release_date
+
+    date_part = release_date[:8]
+    if date_part.isdigit():
+        return f"{date_part[0:4]}-{date_part[4:6]}-{date_part[6:8]}"
+
+    match = re.search(r'/Date\((-?\d+)', release_date)
+    if match:
+        return datetime.fromtimestamp(int(match.group(1)) / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
+
+    match = re.match(r'(\d{4}-\d{2}-\d{2})', release_date)
+    if match:
+        return match.group(1)
+
+    return release_date
+
+def parse_bios_records(records):
+    """
+    规范化Win32_BIOS记录
+
+    参数:
+    - records: 记录列表或单个记录字典
+
+    返回:
+    - BIOS信息字典，ReleaseDate格式化为YYYY-MM-DD；返回新的字典，不修改传入的记录
+    """
+    if isinstance(records, list):
+        bios_info = dict(records[0]) if records else {}
+    else:
+        bios_info = dict(records or {})
+
+    if bios_info.get("ReleaseDate"):
+        bios_info["ReleaseDate"] = format_bios_release_date(bios_info["ReleaseDate"])
+
+    return bios_info
@@ -4,6 +4,7 @@ import json
 from datetime import datetime
 import xml.etree.ElementTree as ET
 from .system_info_collector import run_powershell_command
+from ..async_runner import run_commands_async, run_async
 
 def get_wifi_profiles():
     """
@@ -22,18 +23,15 @@ def get_wifi_profiles():
             lines = result.stdout.splitlines()
             profile_lines = [line for line in lines if "所有用户配置文件" in line or "All User Profile" in line]
             
-            for line in profile_lines:
-                # 提取配置文件名称
+            # 提取配置文件名称
+            profile_names = [line.split(":", 1)[1].strip() for line in profile_lines if ":" in line]
+            
+            # 并发获取每个WiFi配置文件的详细信息，包括密码
+            detail_cmds = [["netsh", "wlan", "show", "profile", f"name={name}", "key=clear"] for name in profile_names]
+            detail_results = run_async(run_commands_async(detail_cmds, encoding='gb2312'))
+            
+            for profile_name, detail_result in zip(profile_names, detail_results):
                 try:
-                    if "所有用户配置文件" in line:
-                        profile_name = line.split(":", 1)[1].strip()
-                    else:
-                        profile_name = line.split(":", 1)[1].strip()
-                    
-                    # 获取特定WiFi配置文件的详细信息，包括密码
-                    detail_cmd = ["netsh", "wlan", "show", "profile", f"name={profile_name}", "key=clear"]
-                    detail_result = subprocess.run(detail_cmd, capture_output=True, text=True, encoding='gb2312')
-                    
                     if detail_result.returncode == 0:
                         profile_info = {
                             "name": profile_name,
@@ -88,18 +86,15 @@ def get_wifi_profiles_xml():
             lines = result.stdout.splitlines()
             profile_lines = [line for line in lines if "所有用户配置文件" in line or "All User Profile" in line]
             
-            for line in profile_lines:
-                # 提取配置文件名称
+            # 提取配置文件名称
+            profile_names = [line.split(":", 1)[1].strip() for line in profile_lines if ":" in line]
+            
+            # 并发导出WiFi配置文件为XML
+            export_cmds = [["netsh", "wlan", "export", "profile", f"name={name}", "folder=%TEMP%", "key=clear"] for name in profile_names]
+            export_results = run_async(run_commands_async(export_cmds, encoding='gb2312'))
+            
+            for profile_name, export_result in zip(profile_names, export_results):
                 try:
-                    if "所有用户配置文件" in line:
-                        profile_name = line.split(":", 1)[1].strip()
-                    else:
-                        profile_name = line.split(":", 1)[1].strip()
-                    
-                    # 导出WiFi配置文件为XML
-                    export_cmd = ["netsh", "wlan", "export", "profile", f"name={profile_name}", "folder=%TEMP%", "key=clear"]
-                    export_result = subprocess.run(export_cmd, capture_output=True, text=True, encoding='gb2312')
-                    
                     if export_result.returncode == 0:
                         # 找到生成的XML文件路径
                         temp_dir = os.environ.get('TEMP', '')
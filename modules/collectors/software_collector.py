@@ -1,95 +1,57 @@
 import os
 import subprocess
 import json
-import winreg
 from datetime import datetime
-from .system_info_collector import run_powershell_command
+from .. import registry_backend
+from .system_info_collector import run_powershell_command, stream_powershell_command
+from .uninstall_enumerator import iter_uninstall_entries, iter_hive_entries, list_software_hives
 import logging
 
-def get_installed_software_from_registry(registry_key, flag=0):
+# 从卸载项读取的值，及除DisplayName和InstallDate外各值在软件信息中的字段名
+SOFTWARE_FIELDS = ("DisplayName", "DisplayVersion", "Publisher", "InstallLocation", "UninstallString", "InstallDate")
+SOFTWARE_OPTIONAL_FIELDS = ("version", "publisher", "install_location", "uninstall_string")
+# HKLM各视图的记录中的architecture；用户配置中的软件不区分视图
+HIVE_ARCHITECTURES = {"HKLM\\64": "64-bit", "HKLM\\32": "32-bit"}
+
+def software_from_entry(entry):
+    """
+    由卸载项记录生成软件信息
+
+    参数:
+    - entry: iter_uninstall_entries以SOFTWARE_FIELDS读出的UninstallEntry
+
+    返回:
+    - 软件信息字典
+    """
+    display_name, *optional, install_date = entry.values
+    software_info = {
+        "name": display_name,
+        "registry_path": f"{entry.location[1]}\\{entry.subkey}"
+    }
+    
+    # 版本、发布者、安装位置和卸载字符串（如果存在）
+    for field, value in zip(SOFTWARE_OPTIONAL_FIELDS, optional):
+        if value is not None:
+            software_info[field] = value
+    
+    if isinstance(install_date, str) and len(install_date) == 8:
+        # 将YYYYMMDD格式转换为标准日期格式
+        software_info["install_date"] = f"{install_date[0:4]}-{install_date[4:6]}-{install_date[6:8]}"
+    return software_info
+
+def get_installed_software_from_registry(registry_key, view=None):
     """
     从注册表获取已安装软件列表
     
     参数:
-    - registry_key: 注册表路径
-    - flag: 32位或64位，0=默认，KEY_WOW64_32KEY=0x0200, KEY_WOW64_64KEY=0x0100
+    - registry_key: HKEY_LOCAL_MACHINE下的注册表路径
+    - view: 注册表视图，"64"、"32"或None（默认）
     
     返回:
     - 软件列表，每个软件包含名称、版本、发布者、安装日期等信息
     """
-    software_list = []
-    
-    try:
-        # 打开注册表
-        with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, registry_key, 0, winreg.KEY_READ | flag) as key:
-            # 计算子项的数量
-            subkey_count = winreg.QueryInfoKey(key)[0]
-            
-            # 遍历子项
-            for i in range(subkey_count):
-                try:
-                    # 获取子项名称
-                    software_name = winreg.EnumKey(key, i)
-                    # 打开子项
-                    with winreg.OpenKey(key, software_name) as subkey:
-                        try:
-                            # 获取软件信息
-                            display_name = winreg.QueryValueEx(subkey, "DisplayName")[0]
-                            
-                            # 获取其他属性（如果存在）
-                            software_info = {
-                                "name": display_name,
-                                "registry_path": f"{registry_key}\\{software_name}"
-                            }
-                            
-                            # 尝试获取版本
-                            try:
-                                software_info["version"] = winreg.QueryValueEx(subkey, "DisplayVersion")[0]
-                            except:
-                                pass
-                                
-                            # 尝试获取发布者
-                            try:
-                                software_info["publisher"] = winreg.QueryValueEx(subkey, "Publisher")[0]
-                            except:
-                                pass
-                                
-                            # 尝试获取安装位置
-                            try:
-                                software_info["install_location"] = winreg.QueryValueEx(subkey, "InstallLocation")[0]
-                            except:
-                                pass
-                                
-                            # 尝试获取卸载字符串
-                            try:
-                                software_info["uninstall_string"] = winreg.QueryValueEx(subkey, "UninstallString")[0]
-                            except:
-                                pass
-                                
-                            # 尝试获取安装日期
-                            try:
-                                install_date = winreg.QueryValueEx(subkey, "InstallDate")[0]
-                                if isinstance(install_date, str) and len(install_date) == 8:
-                                    # 将YYYYMMDD格式转换为标准日期格式
-                                    year = install_date[0:4]
-                                    month = install_date[4:6]
-                                    day = install_date[6:8]
-                                    software_info["install_date"] = f"{year}-{month}-{day}"
-                            except:
-                                pass
-                                
-                            # 将信息添加到列表
-                            software_list.append(software_info)
-                                
-                        except (FileNotFoundError, WindowsError):
-                            # 如果无法获取DisplayName，则跳过
-                            continue
-                except (FileNotFoundError, WindowsError):
-                    continue
-    except (FileNotFoundError, WindowsError) as e:
-        print(f"Error accessing registry key {registry_key}: {e}")
-        
-    return software_list
+    location = (registry_backend.HKEY_LOCAL_MACHINE, registry_key, view)
+    return [software_from_entry(entry) for entry in iter_uninstall_entries([location], SOFTWARE_FIELDS)]
 
 def get_installed_software_from_powershell():
     """
@@ -163,10 +125,9 @@ def get_uwp_apps():
         
         # 检查Windows版本
         try:
-            import winreg
-            key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Microsoft\Windows NT\CurrentVersion")
-            build_number, _ = winreg.QueryValueEx(key, "CurrentBuildNumber")
-            winreg.CloseKey(key)
+            with registry_backend.open_key(registry_backend.HKEY_LOCAL_MACHINE,
+                                           r"SOFTWARE\Microsoft\Windows NT\CurrentVersion") as key:
+                build_number, _ = key.query_value("CurrentBuildNumber")
             
             if int(build_number) < 10240:  # Windows 10的最低版本
                 logging.debug(f"UWP apps require Windows 10+, current build: {build_number}")
@@ -177,39 +138,27 @@ def get_uwp_apps():
         # PowerShell命令获取UWP应用
         ps_command = "Get-AppxPackage | Select-Object Name, PackageFullName, Version, Publisher | ConvertTo-Json"
         
-        # 执行PowerShell命令
-        result = run_powershell_command(ps_command, timeout=25)
+        # 流式执行PowerShell命令，应用记录边到达边处理
+        stream = stream_powershell_command(ps_command, timeout=25)
+        for item in stream:
+            app_info = {
+                "name": item.get("Name", ""),
+                "full_name": item.get("PackageFullName", ""),
+                "version": item.get("Version", ""),
+                "publisher": item.get("Publisher", ""),
+                "type": "UWP"
+            }
+            
+            uwp_apps.append(app_info)
         
-        if result.returncode == 0 and result.stdout.strip():
-            # 解析JSON结果
-            try:
-                ps_result = json.loads(result.stdout)
-                
-                # 确保结果是列表
-                if not isinstance(ps_result, list):
-                    ps_result = [ps_result]
-                
-                # 处理结果
-                for item in ps_result:
-                    app_info = {
-                        "name": item.get("Name", ""),
-                        "full_name": item.get("PackageFullName", ""),
-                        "version": item.get("Version", ""),
-                        "publisher": item.get("Publisher", ""),
-                        "type": "UWP"
-                    }
-                    
-                    uwp_apps.append(app_info)
-                    
-                logging.debug(f"Successfully retrieved {len(uwp_apps)} UWP applications")
-            except json.JSONDecodeError as e:
-                logging.warning(f"Error parsing UWP apps output: {e}")
+        if stream.returncode == 0:
+            logging.debug(f"Successfully retrieved {len(uwp_apps)} UWP applications")
         else:
             # 检查是否是由于不支持造成的失败
-            if "not supported on this platform" in result.stderr or "could not be loaded" in result.stderr:
+            if "not supported on this platform" in stream.stderr or "could not be loaded" in stream.stderr:
                 logging.info("UWP apps are not supported on this platform or PowerShell version")
             else:
-                logging.warning(f"PowerShell command for UWP apps failed: {result.stderr}")
+                logging.warning(f"PowerShell command for UWP apps failed: {stream.stderr}")
     except Exception as e:
         logging.warning(f"Error running PowerShell command for UWP apps: {e}")
     
@@ -226,42 +175,34 @@ def get_startup_items():
     
     # 注册表中的自启动项路径
     startup_paths = [
-        (winreg.HKEY_CURRENT_USER, "Software\\Microsoft\\Windows\\CurrentVersion\\Run"),
-        (winreg.HKEY_LOCAL_MACHINE, "Software\\Microsoft\\Windows\\CurrentVersion\\Run"),
-        (winreg.HKEY_CURRENT_USER, "Software\\Microsoft\\Windows\\CurrentVersion\\RunOnce"),
-        (winreg.HKEY_LOCAL_MACHINE, "Software\\Microsoft\\Windows\\CurrentVersion\\RunOnce")
+        (registry_backend.HKEY_CURRENT_USER, "Software\\Microsoft\\Windows\\CurrentVersion\\Run"),
+        (registry_backend.HKEY_LOCAL_MACHINE, "Software\\Microsoft\\Windows\\CurrentVersion\\Run"),
+        (registry_backend.HKEY_CURRENT_USER, "Software\\Microsoft\\Windows\\CurrentVersion\\RunOnce"),
+        (registry_backend.HKEY_LOCAL_MACHINE, "Software\\Microsoft\\Windows\\CurrentVersion\\RunOnce")
     ]
     
     # 获取注册表中的自启动项
     for hkey, path in startup_paths:
         try:
-            with winreg.OpenKey(hkey, path) as key:
-                # 获取值的数量
-                value_count = winreg.QueryInfoKey(key)[1]
-                
+            with registry_backend.open_key(hkey, path) as key:
                 # 遍历所有值
-                for i in range(value_count):
-                    try:
-                        name, value, _ = winreg.EnumValue(key, i)
-                        
-                        registry_location = "HKCU" if hkey == winreg.HKEY_CURRENT_USER else "HKLM"
-                        registry_path = f"{registry_location}\\{path}"
-                        
-                        startup_items.append({
-                            "name": name,
-                            "command": value,
-                            "location": registry_path,
-                            "type": "Registry"
-                        })
-                    except WindowsError:
-                        continue
-        except WindowsError:
+                for name, value, _ in key.enum_values():
+                    registry_location = "HKCU" if hkey == registry_backend.HKEY_CURRENT_USER else "HKLM"
+                    registry_path = f"{registry_location}\\{path}"
+                    
+                    startup_items.append({
+                        "name": name,
+                        "command": value,
+                        "location": registry_path,
+                        "type": "Registry"
+                    })
+        except (OSError, ImportError):
             continue
     
     # 获取启动文件夹中的项目
     startup_folders = [
-        os.path.join(os.environ["APPDATA"], "Microsoft\\Windows\\Start Menu\\Programs\\Startup"),
-        os.path.join(os.environ["PROGRAMDATA"], "Microsoft\\Windows\\Start Menu\\Programs\\Startup")
+        os.path.join(os.environ.get("APPDATA", ""), "Microsoft\\Windows\\Start Menu\\Programs\\Startup"),
+        os.path.join(os.environ.get("PROGRAMDATA", ""), "Microsoft\\Windows\\Start Menu\\Programs\\Startup")
     ]
     
     for folder in startup_folders:
@@ -278,42 +219,26 @@ def get_startup_items():
     
     return startup_items
 
-def get_all_installed_software():
+def get_all_installed_software(include_powershell=True):
     """
     获取所有已安装的软件列表，合并来自不同来源的结果
     
+    参数:
+    - include_powershell: 为False时只读卸载注册表项，不运行PowerShell备用查询、不列出UWP应用
+    
     返回:
     - 综合的软件列表
     """
-    all_software = []
-    
-    # 获取64位软件
-    software_64bit = get_installed_software_from_registry(
-        "SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Uninstall", 
-        winreg.KEY_WOW64_64KEY
-    )
-    for software in software_64bit:
-        software["architecture"] = "64-bit"
-        # 确保使用通用字段名，与HTML报告中的期望匹配
-        if "name" in software and "DisplayName" not in software:
-            software["DisplayName"] = software["name"]
-        if "version" in software and "DisplayVersion" not in software:
-            software["DisplayVersion"] = software["version"]
-        if "publisher" in software and "Publisher" not in software:
-            software["Publisher"] = software["publisher"]
-        if "install_date" in software and "InstallDate" not in software:
-            software["InstallDate"] = software["install_date"]
-        if "install_location" in software and "InstallLocation" not in software:
-            software["InstallLocation"] = software["install_location"]
-        all_software.append(software)
-    
-    # 获取32位软件
-    software_32bit = get_installed_software_from_registry(
-        "SOFTWARE\\Wow6432Node\\Microsoft\\Windows\\CurrentVersion\\Uninstall", 
-        winreg.KEY_WOW64_32KEY
-    )
-    for software in software_32bit:
-        software["architecture"] = "32-bit"
+    # 并发读取HKLM两个视图、HKCU和每个已加载用户配置（HKEY_USERS\<SID>）的卸载项，记录边到达边合并；
+    # 名称和版本相同的软件保留位置列表中靠前的来源，结果与各位置的完成顺序无关
+    hives = list_software_hives()
+    hive_rank = {hive.hive: rank for rank, hive in enumerate(hives)}
+    merged = {}
+    for entry in iter_hive_entries(hives, SOFTWARE_FIELDS):
+        software = software_from_entry(entry)
+        software["source_hive"] = entry.location.hive
+        if entry.location.hive in HIVE_ARCHITECTURES:
+            software["architecture"] = HIVE_ARCHITECTURES[entry.location.hive]
         # 确保使用通用字段名，与HTML报告中的期望匹配
         if "name" in software and "DisplayName" not in software:
             software["DisplayName"] = software["name"]
@@ -325,10 +250,14 @@ def get_all_installed_software():
             software["InstallDate"] = software["install_date"]
         if "install_location" in software and "InstallLocation" not in software:
             software["InstallLocation"] = software["install_location"]
-        all_software.append(software)
+        key = (software["DisplayName"], software.get("DisplayVersion", ""))
+        current = merged.get(key)
+        if current is None or hive_rank[software["source_hive"]] < hive_rank[current["source_hive"]]:
+            merged[key] = software
+    all_software = sorted(merged.values(), key=lambda software: hive_rank[software["source_hive"]])
     
     # 获取PowerShell结果作为备份方法
-    if not all_software:
+    if not all_software and include_powershell:
         try:
             ps_software = get_installed_software_from_powershell()
             for software in ps_software:
@@ -347,7 +276,7 @@ def get_all_installed_software():
     
     # 获取UWP应用
     try:
-        uwp_apps = get_uwp_apps()
+        uwp_apps = get_uwp_apps() if include_powershell else []
         for app in uwp_apps:
             app_info = {
                 "DisplayName": app.get("name", ""),
@@ -399,6 +328,15 @@ def get_all_installed_software():
     
     return unique_software
 
+def get_registry_installed_software():
+    """
+    只从卸载注册表项获取已安装的软件（fast配置中的software分区）
+    
+    返回:
+    - 软件列表，不含UWP应用
+    """
+    return get_all_installed_software(include_powershell=False)
+
 def save_software_list(output_dir, filename="installed_apps.json"):
     """
     保存软件列表到JSON文件
@@ -2,7 +2,6 @@ import subprocess
 import os
 import platform
 import json
-import winreg
 from pathlib import Path
 import socket
 import psutil
@@ -10,60 +9,98 @@ from datetime import datetime
 import uuid
 import re
 import ctypes
+import ipaddress
 import logging
 import shutil
+import locale
+import asyncio
+import itertools
+
+from ..config import POWERSHELL_POOL_ENABLED, POWERSHELL_POOL_SIZE, POWERSHELL_POOL_MAX_COMMANDS, HARDWARE_BATCH_QUERY
+from ..powershell_pool import get_powershell_pool
+from ..async_runner import run_command_async, run_async
+from .. import command_cache
+from .. import time_budget
+from .. import resource_accounting
+from .. import process_isolation
+from .. import command_trace
+from .. import replay
+from .. import probe_registry
+from .. import incremental
+from .. import registry_backend
+from .uninstall_enumerator import iter_uninstall_entries, DEFAULT_FIELDS
+from .. import collector_registry
+from ..json_refs import dump_json
+from ..json_stream import JsonLineStream, to_ndjson_command
+from .tabular_parser import parse_csv_table, parse_fixed_width_table, parse_list_blocks, iter_rows
+from ..powershell_capabilities import get_powershell_capabilities, rewrite_wmi_command, build_powershell_argv
+from .hardware_batch import (
+    HARDWARE_QUERIES,
+    build_hardware_batch_script,
+    parse_hardware_batch_output,
+    parse_cpu_records,
+    parse_memory_module_records,
+    parse_graphics_records,
+    parse_motherboard_records,
+    parse_bios_records,
+    format_bios_release_date
+)
 
 def get_powershell_path():
     """
-    获取PowerShell的绝对路径
+    获取PowerShell的绝对路径（进程内缓存，可执行文件变化时重新探测）
     
     返回:
     - PowerShell执行文件的绝对路径
     """
-    try:
-        # 常见的PowerShell路径列表
-        possible_paths = [
-            # PowerShell 7+ (cross-platform)
-            r"C:\Program Files\PowerShell\7\pwsh.exe",
-            r"C:\Program Files\PowerShell\7-preview\pwsh.exe", 
-            # Windows PowerShell 5.1
-            r"C:\Windows\System32\WindowsPowerShell\v1.0\powershell.exe",
-            r"C:\Windows\SysWOW64\WindowsPowerShell\v1.0\powershell.exe",
-        ]
-        
-        # 检查每个可能的路径
-        for path in possible_paths:
-            if os.path.exists(path):
-                logging.debug(f"Found PowerShell at: {path}")
-                return path
-        
-        # 如果找不到，尝试使用where命令查找
-        try:
-            result = subprocess.run(['where', 'powershell'], capture_output=True, text=True, timeout=5)
-            if result.returncode == 0 and result.stdout.strip():
-                path = result.stdout.strip().split('\n')[0]
-                logging.debug(f"Found PowerShell via 'where' command: {path}")
-                return path
-        except (subprocess.TimeoutExpired, Exception) as e:
-            logging.warning(f"Error finding PowerShell with 'where' command: {e}")
-        
-        # 尝试查找pwsh
+    return get_powershell_capabilities()["path"]
+
+def _execute_powershell_command(command, capabilities, timeout):
+    """
+    执行已改写的PowerShell命令：优先使用常驻宿主池，不可用时启动一次性进程
+    
+    参数:
+    - command: PowerShell命令字符串
+    - capabilities: get_powershell_capabilities的结果
+    - timeout: 超时时间（秒）
+    
+    返回:
+    - subprocess.CompletedProcess对象；超时时抛出subprocess.TimeoutExpired
+    """
+    powershell_path = capabilities["path"]
+    
+    # 优先使用常驻PowerShell宿主池，避免每条命令都启动新进程；录制和回放时逐条使用独立进程，以便按命令匹配
+    if POWERSHELL_POOL_ENABLED and not replay.is_active():
         try:
-            result = subprocess.run(['where', 'pwsh'], capture_output=True, text=True, timeout=5)
-            if result.returncode == 0 and result.stdout.strip():
-                path = result.stdout.strip().split('\n')[0]
-                logging.debug(f"Found pwsh via 'where' command: {path}")
-                return path
-        except (subprocess.TimeoutExpired, Exception) as e:
-            logging.warning(f"Error finding pwsh with 'where' command: {e}")
-        
-        # 最后尝试默认路径
-        logging.warning("Could not find PowerShell absolute path, using 'powershell' as fallback")
-        return "powershell"
-        
-    except Exception as e:
-        logging.error(f"Error getting PowerShell path: {e}")
-        return "powershell"
+            pool = get_powershell_pool(
+                powershell_path,
+                size=POWERSHELL_POOL_SIZE,
+                max_commands_per_host=POWERSHELL_POOL_MAX_COMMANDS
+            )
+            logging.debug(f"Executing pooled PowerShell command with timeout {timeout}s: {command[:100]}...")
+            result = pool.run(command, timeout=timeout)
+            result.args = [powershell_path, '-Command', command]
+            return result
+        except subprocess.TimeoutExpired:
+            raise
+        except Exception as e:
+            logging.warning(f"PowerShell pool unavailable ({e}), falling back to one-shot process")
+    
+    # 构建完整命令，输出编码不是UTF-8时在命令内部设置编码
+    full_cmd = build_powershell_argv(command, capabilities)
+    
+    logging.debug(f"Executing PowerShell command with timeout {timeout}s: {command[:100]}...")
+    
+    # 执行命令，带超时，使用UTF-8编码并禁用错误处理
+    return subprocess.run(
+        full_cmd, 
+        capture_output=True, 
+        text=True, 
+        shell=False,  # 使用绝对路径，不需要shell=True
+        encoding='utf-8',
+        errors='ignore',  # 忽略编码错误，防止崩溃
+        timeout=timeout
+    )
 
 def run_powershell_command(command, timeout=30):
     """
@@ -77,57 +114,88 @@ def run_powershell_command(command, timeout=30):
     - subprocess.CompletedProcess对象
     """
     try:
-        powershell_path = get_powershell_path()
-        
-        # 检测PowerShell版本并调整命令
-        is_pwsh7 = powershell_path.endswith('pwsh.exe')
+        # 进程内缓存的PowerShell能力信息（路径、版本、CIM支持、输出编码）
+        capabilities = get_powershell_capabilities()
+        powershell_path = capabilities["path"]
         
-        # 对于PowerShell 7+，将Get-WmiObject替换为Get-CimInstance
-        if is_pwsh7 and 'Get-WmiObject' in command:
-            logging.debug("Converting Get-WmiObject to Get-CimInstance for PowerShell 7+")
-            # 替换常见的WMI命令
-            command = command.replace('Get-WmiObject -Class Win32_Processor', 'Get-CimInstance -ClassName Win32_Processor')
-            command = command.replace('Get-WmiObject -Class Win32_PhysicalMemory', 'Get-CimInstance -ClassName Win32_PhysicalMemory')
-            command = command.replace('Get-WmiObject -Class Win32_VideoController', 'Get-CimInstance -ClassName Win32_VideoController')
-            command = command.replace('Get-WmiObject Win32_BaseBoard', 'Get-CimInstance -ClassName Win32_BaseBoard')
-            command = command.replace('Get-WmiObject Win32_BIOS', 'Get-CimInstance -ClassName Win32_BIOS')
-            command = command.replace('Get-WmiObject Win32_PnPSignedDriver', 'Get-CimInstance -ClassName Win32_PnPSignedDriver')
+        # 对于不提供Get-WmiObject的PowerShell 7+，将其替换为Get-CimInstance
+        command = rewrite_wmi_command(command, capabilities)
         
-        # 构建完整命令，确保使用UTF-8编码
-        if is_pwsh7:
-            # PowerShell 7+ 支持更好的Unicode
-            full_cmd = [powershell_path, '-Command', command]
-        else:
-            # Windows PowerShell 5.1 - 在命令内部设置编码
-            encoded_cmd = f"[Console]::OutputEncoding = [System.Text.Encoding]::UTF8; $OutputEncoding = [System.Text.Encoding]::UTF8; {command}"
-            full_cmd = [powershell_path, '-Command', encoded_cmd]
+        # 很少变化的硬件查询优先使用磁盘缓存
+        cached = command_cache.lookup("powershell", command)
+        if cached is not None:
+            logging.debug(f"Serving PowerShell command from cache: {command[:100]}...")
+            return cached
         
-        logging.debug(f"Executing PowerShell command with timeout {timeout}s: {command[:100]}...")
+        # 超时不超过当前分区在运行时间预算中剩余的时间
+        timeout = time_budget.clamp_timeout(timeout)
+        if timeout <= 0:
+            logging.warning(f"Time budget exhausted, skipping PowerShell command: {command[:100]}")
+            return subprocess.CompletedProcess([], returncode=1, stdout="", stderr="Time budget exhausted")
         
-        # 执行命令，带超时，使用UTF-8编码并禁用错误处理
-        result = subprocess.run(
-            full_cmd, 
-            capture_output=True, 
-            text=True, 
-            shell=False,  # 使用绝对路径，不需要shell=True
-            encoding='utf-8',
-            errors='ignore',  # 忽略编码错误，防止崩溃
-            timeout=timeout
-        )
+        with command_trace.trace_command("powershell", [powershell_path, '-Command', command]) as trace:
+            result = _execute_powershell_command(command, capabilities, timeout)
+            if trace is not None:
+                trace.set_result(result)
         
         if result.returncode != 0:
             logging.warning(f"PowerShell command failed with return code {result.returncode}: {result.stderr[:200]}")
         
+        command_cache.store("powershell", command, result)
         return result
         
     except subprocess.TimeoutExpired as e:
         logging.error(f"PowerShell command timed out after {timeout} seconds: {command[:100]}")
+        time_budget.mark_partial("command timed out")
         # 返回一个模拟的失败结果
-        return subprocess.CompletedProcess([], returncode=1, stdout="", stderr=f"Command timed out after {timeout} seconds")
+        result = subprocess.CompletedProcess([], returncode=1, stdout="", stderr=f"Command timed out after {timeout} seconds")
+        command_cache.store("powershell", command, result)
+        return result
     except Exception as e:
         logging.error(f"Error executing PowerShell command: {e}")
         return subprocess.CompletedProcess([], returncode=1, stdout="", stderr=str(e))
 
+def build_wmic_argv(wmi_class, properties=None):
+    """
+    构建以CSV格式输出的WMIC查询命令行
+    
+    参数:
+    - wmi_class: WMI类名，如 'Win32_Processor'
+    - properties: 要查询的属性列表，如果为None则查询所有
+    
+    返回:
+    - 命令行参数列表
+    """
+    wmic_path = r"C:\Windows\System32\wbem\wmic.exe"
+    
+    # 检查WMIC是否存在
+    if not os.path.exists(wmic_path):
+        logging.warning("WMIC tool not found, trying alternative path")
+        wmic_path = "wmic"  # 使用PATH中的版本
+    
+    if properties:
+        prop_list = ",".join(properties)
+        return [wmic_path, wmi_class, "get", prop_list, "/format:csv"]
+    return [wmic_path, wmi_class, "get", "/format:csv"]
+
+def stream_powershell_command(command, timeout=30):
+    """
+    以流式方式执行以ConvertTo-Json结尾的PowerShell命令，适用于输出数MB的查询
+    
+    命令被改写为每行输出一个压缩JSON对象，Python边读边解析，不再同时持有完整的输出文本和解析结果
+    
+    参数:
+    - command: 以 "| ConvertTo-Json ..." 结尾的PowerShell命令字符串
+    - timeout: 超时时间（秒），超时前已产出的记录仍然有效
+    
+    返回:
+    - JsonLineStream对象，迭代得到记录，迭代结束后可读取returncode和stderr
+    """
+    capabilities = get_powershell_capabilities()
+    command = to_ndjson_command(rewrite_wmi_command(command, capabilities))
+    logging.debug(f"Streaming PowerShell command with timeout {timeout}s: {command[:100]}...")
+    return JsonLineStream(build_powershell_argv(command, capabilities), timeout=timeout)
+
 def run_wmic_command(wmi_class, properties=None, timeout=30):
     """
     使用原生WMIC工具执行WMI查询，作为PowerShell的备用方案
@@ -141,44 +209,172 @@ def run_wmic_command(wmi_class, properties=None, timeout=30):
     - subprocess.CompletedProcess对象
     """
     try:
-        # 构建WMIC命令
-        wmic_path = r"C:\Windows\System32\wbem\wmic.exe"
+        cmd = build_wmic_argv(wmi_class, properties)
         
-        # 检查WMIC是否存在
-        if not os.path.exists(wmic_path):
-            logging.warning("WMIC tool not found, trying alternative path")
-            wmic_path = "wmic"  # 使用PATH中的版本
+        cached = command_cache.lookup("wmic", cmd)
+        if cached is not None:
+            logging.debug(f"Serving WMIC command from cache: {' '.join(cmd)}")
+            return cached
         
-        if properties:
-            prop_list = ",".join(properties)
-            cmd = [wmic_path, wmi_class, "get", prop_list, "/format:csv"]
-        else:
-            cmd = [wmic_path, wmi_class, "get", "/format:csv"]
+        timeout = time_budget.clamp_timeout(timeout)
+        if timeout <= 0:
+            logging.warning(f"Time budget exhausted, skipping WMIC command: {' '.join(cmd)}")
+            return subprocess.CompletedProcess([], returncode=1, stdout="", stderr="Time budget exhausted")
         
         logging.debug(f"Executing WMIC command: {' '.join(cmd)}")
         
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            shell=False,
-            encoding='gbk',  # WMIC输出通常是GBK编码
-            errors='ignore',
-            timeout=timeout
-        )
+        with command_trace.trace_command("wmic", cmd) as trace:
+            result = subprocess.run(
+                cmd,
+                capture_output=True,
+                text=True,
+                shell=False,
+                encoding='gbk',  # WMIC输出通常是GBK编码
+                errors='ignore',
+                timeout=timeout
+            )
+            if trace is not None:
+                trace.set_result(result)
         
         if result.returncode != 0:
             logging.warning(f"WMIC command failed with return code {result.returncode}: {result.stderr[:200]}")
         
+        command_cache.store("wmic", cmd, result)
         return result
         
     except subprocess.TimeoutExpired as e:
         logging.error(f"WMIC command timed out after {timeout} seconds")
+        time_budget.mark_partial("command timed out")
         return subprocess.CompletedProcess([], returncode=1, stdout="", stderr=f"Command timed out after {timeout} seconds")
     except Exception as e:
         logging.error(f"Error executing WMIC command: {e}")
         return subprocess.CompletedProcess([], returncode=1, stdout="", stderr=str(e))
 
+async def run_powershell_command_async(command, timeout=30):
+    """
+    run_powershell_command的异步版本，每条命令使用独立进程，便于多条命令并发执行
+    
+    参数:
+    - command: PowerShell命令字符串
+    - timeout: 超时时间（秒），默认30秒
+    
+    返回:
+    - subprocess.CompletedProcess对象
+    """
+    # 首次调用时能力探测会启动一次PowerShell，放到线程池中避免阻塞事件循环
+    loop = asyncio.get_running_loop()
+    capabilities = await loop.run_in_executor(None, get_powershell_capabilities)
+    command = rewrite_wmi_command(command, capabilities)
+    
+    cached = command_cache.lookup("powershell", command)
+    if cached is not None:
+        return cached
+    
+    logging.debug(f"Executing async PowerShell command with timeout {timeout}s: {command[:100]}...")
+    result = await run_command_async(build_powershell_argv(command, capabilities), timeout=timeout)
+    
+    if result.returncode != 0:
+        logging.warning(f"PowerShell command failed with return code {result.returncode}: {result.stderr[:200]}")
+    
+    command_cache.store("powershell", command, result)
+    return result
+
+async def run_powershell_commands_async(commands, timeout=30):
+    """
+    并发执行多条PowerShell命令
+    
+    参数:
+    - commands: PowerShell命令字符串列表
+    - timeout: 每条命令的超时时间（秒）
+    
+    返回:
+    - 与commands顺序一致的subprocess.CompletedProcess列表
+    """
+    return await asyncio.gather(*(run_powershell_command_async(command, timeout=timeout) for command in commands))
+
+async def run_wmic_command_async(wmi_class, properties=None, timeout=30):
+    """
+    run_wmic_command的异步版本
+    
+    参数:
+    - wmi_class: WMI类名，如 'Win32_Processor'
+    - properties: 要查询的属性列表，如果为None则查询所有
+    - timeout: 超时时间（秒）
+    
+    返回:
+    - subprocess.CompletedProcess对象
+    """
+    cmd = build_wmic_argv(wmi_class, properties)
+    
+    cached = command_cache.lookup("wmic", cmd)
+    if cached is not None:
+        return cached
+    
+    logging.debug(f"Executing async WMIC command: {' '.join(cmd)}")
+    
+    # WMIC输出通常是GBK编码
+    result = await run_command_async(cmd, timeout=timeout, encoding='gbk')
+    
+    if result.returncode != 0:
+        logging.warning(f"WMIC command failed with return code {result.returncode}: {result.stderr[:200]}")
+    
+    command_cache.store("wmic", cmd, result)
+    return result
+
+def get_hardware_batch(timeout=30, sections=None):
+    """
+    用一个PowerShell脚本批量查询CPU、内存、显卡、主板和BIOS的WMI类
+    
+    参数:
+    - timeout: 超时时间（秒）
+    - sections: 要查询的分区名列表，默认查询HARDWARE_QUERIES中的全部分区
+    
+    返回:
+    - 分区名到记录列表的字典，可直接传给get_cpu_info等函数的prefetched参数；
+      单个WMI类失败时对应值为空列表（各分区走WMIC备用方案），整个批量查询失败时返回空字典（各分区单独查询）
+    """
+    if not HARDWARE_BATCH_QUERY or platform.system() != "Windows":
+        return {}
+    
+    try:
+        sections = sections or list(HARDWARE_QUERIES)
+        logging.debug(f"Running batched hardware query for {', '.join(sections)}")
+        use_cim = get_powershell_capabilities()["supports_cim"]
+        with command_cache.cache_section(*sections):
+            result = run_powershell_command(build_hardware_batch_script(sections, use_cim=use_cim), timeout=timeout)
+        
+        if result.returncode == 0 and result.stdout.strip():
+            batch = parse_hardware_batch_output(result.stdout, sections)
+            logging.debug(f"Batched hardware query returned {sum(len(v) for v in batch.values())} records")
+            return batch
+        
+        logging.warning(f"Batched hardware query failed: {result.stderr[:200]}")
+    except (ValueError, json.JSONDecodeError) as e:
+        logging.warning(f"Error parsing batched hardware query output: {e}")
+    except Exception as e:
+        logging.warning(f"Error running batched hardware query: {e}")
+    
+    return {}
+
+def _resolve_host_ip_address():
+    """解析本机主机名得到的IP地址（DNS不可用时可能长时间挂起）"""
+    return socket.gethostbyname(socket.gethostname())
+
+def get_host_ip_address():
+    """
+    获取本机IP地址，启用进程隔离时在工作进程中按期限解析；fast配置中不解析主机名，取psutil列出的第一个非回环IPv4地址
+    
+    返回:
+    - IP地址字符串，解析超时时返回None
+    """
+    if collector_registry.get_profile() != "full":
+        return next((address.address for addresses in psutil.net_if_addrs().values() for address in addresses
+                     if address.family == socket.AF_INET and not address.address.startswith("127.")), None)
+    try:
+        return process_isolation.run_isolated("gethostbyname", _resolve_host_ip_address)
+    except process_isolation.ProbeTimeout:
+        return None
+
 def get_system_info():
     """
     获取系统基本信息
@@ -194,16 +390,19 @@ def get_system_info():
         "architecture": platform.machine(),
         "processor": platform.processor(),
         "hostname": socket.gethostname(),
-        "ip_address": socket.gethostbyname(socket.gethostname()),
+        "ip_address": get_host_ip_address(),
         "mac_address": ':'.join(re.findall('..', '%012x' % uuid.getnode()))
     }
     
     return system_info
 
-def get_cpu_info():
+def get_cpu_info(prefetched=None):
     """
     获取CPU详细信息
     
+    参数:
+    - prefetched: 批量硬件查询得到的Win32_Processor记录；为None时单独执行PowerShell查询
+    
     返回:
     - CPU信息字典
     """
@@ -211,33 +410,27 @@ def get_cpu_info():
     
     try:
         if platform.system() == "Windows":
-            # 使用PowerShell获取CPU信息
-            logging.debug("Getting CPU information")
-            cmd = "$PSDefaultParameterValues['Out-File:Encoding'] = 'utf8'; [System.Threading.Thread]::CurrentThread.CurrentCulture = 'en-US'; [System.Threading.Thread]::CurrentThread.CurrentUICulture = 'en-US'; Get-WmiObject -Class Win32_Processor | Select-Object Name, NumberOfCores, NumberOfLogicalProcessors, MaxClockSpeed, L2CacheSize, L3CacheSize | ConvertTo-Json"
-            result = run_powershell_command(cmd, timeout=20)
-            
-            if result.returncode == 0 and result.stdout.strip():
-                try:
-                    cpu_data = json.loads(result.stdout)
-                    
-                    # 处理单CPU和多CPU的情况
-                    if isinstance(cpu_data, list):
-                        cpu_info = cpu_data
-                    else:
-                        cpu_info = [cpu_data]
-                    
-                    # 将时钟速度转换为GHz
-                    for cpu in cpu_info:
-                        if "MaxClockSpeed" in cpu:
-                            cpu["MaxClockSpeedGHz"] = round(cpu["MaxClockSpeed"] / 1000, 2)
-                    
-                    logging.debug(f"Successfully retrieved CPU information for {len(cpu_info)} processors")
-                except json.JSONDecodeError as e:
-                    logging.warning(f"Error parsing CPU JSON: {e}, output: {result.stdout[:100]}")
-                    cpu_info = []  # 重置以便尝试备用方案
+            if prefetched is not None:
+                # 使用批量查询的结果，该WMI类查询失败时直接走WMIC备用方案
+                cpu_info = parse_cpu_records(prefetched) if prefetched else []
+                logging.debug(f"Using batched CPU information for {len(cpu_info)} processors")
             else:
-                logging.warning(f"PowerShell command failed: {result.stderr}")
-                cpu_info = []  # 重置以便尝试备用方案
+                # 使用PowerShell获取CPU信息
+                logging.debug("Getting CPU information")
+                cmd = "$PSDefaultParameterValues['Out-File:Encoding'] = 'utf8'; [System.Threading.Thread]::CurrentThread.CurrentCulture = 'en-US'; [System.Threading.Thread]::CurrentThread.CurrentUICulture = 'en-US'; Get-WmiObject -Class Win32_Processor | Select-Object Name, NumberOfCores, NumberOfLogicalProcessors, MaxClockSpeed, L2CacheSize, L3CacheSize | ConvertTo-Json"
+                result = run_powershell_command(cmd, timeout=20)
+                
+                if result.returncode == 0 and result.stdout.strip():
+                    try:
+                        # 处理单CPU和多CPU的情况，并将时钟速度转换为GHz
+                        cpu_info = parse_cpu_records(json.loads(result.stdout))
+                        logging.debug(f"Successfully retrieved CPU information for {len(cpu_info)} processors")
+                    except json.JSONDecodeError as e:
+                        logging.warning(f"Error parsing CPU JSON: {e}, output: {result.stdout[:100]}")
+                        cpu_info = []  # 重置以便尝试备用方案
+                else:
+                    logging.warning(f"PowerShell command failed: {result.stderr}")
+                    cpu_info = []  # 重置以便尝试备用方案
             
             # 如果PowerShell失败，尝试使用WMIC
             if not cpu_info:
@@ -246,32 +439,24 @@ def get_cpu_info():
                 
                 if wmic_result.returncode == 0 and wmic_result.stdout.strip():
                     try:
-                        # 解析WMIC CSV输出
-                        lines = wmic_result.stdout.strip().split('\n')
-                        if len(lines) > 1:  # 跳过标题行
-                            for line in lines[1:]:
-                                if line.strip() and not line.startswith('Node,'):
-                                    fields = line.split(',')
-                                    if len(fields) >= 5:  # Node, MaxClockSpeed, Name, NumberOfCores, NumberOfLogicalProcessors
-                                        try:
-                                            cpu_item = {
-                                                "Name": fields[2].strip() if len(fields) > 2 else "",
-                                                "NumberOfCores": int(fields[3]) if fields[3].strip().isdigit() else None,
-                                                "NumberOfLogicalProcessors": int(fields[4]) if fields[4].strip().isdigit() else None,
-                                                "MaxClockSpeed": int(fields[1]) if fields[1].strip().isdigit() else None
-                                            }
-                                            
-                                            # 转换时钟速度为GHz
-                                            if cpu_item["MaxClockSpeed"]:
-                                                cpu_item["MaxClockSpeedGHz"] = round(cpu_item["MaxClockSpeed"] / 1000, 2)
-                                            
-                                            if not cpu_info:
-                                                cpu_info = []
-                                            cpu_info.append(cpu_item)
-                                            
-                                        except (ValueError, IndexError) as e:
-                                            logging.debug(f"Error parsing WMIC CPU line: {e}")
-                                            continue
+                        # 按标题映射解析WMIC CSV输出
+                        cpu_info = []
+                        for row in iter_rows(parse_csv_table(wmic_result.stdout)):
+                            cores = row.get("NumberOfCores", "")
+                            logical = row.get("NumberOfLogicalProcessors", "")
+                            clock = row.get("MaxClockSpeed", "")
+                            cpu_item = {
+                                "Name": row.get("Name", ""),
+                                "NumberOfCores": int(cores) if cores.isdigit() else None,
+                                "NumberOfLogicalProcessors": int(logical) if logical.isdigit() else None,
+                                "MaxClockSpeed": int(clock) if clock.isdigit() else None
+                            }
+                            
+                            # 转换时钟速度为GHz
+                            if cpu_item["MaxClockSpeed"]:
+                                cpu_item["MaxClockSpeedGHz"] = round(cpu_item["MaxClockSpeed"] / 1000, 2)
+                            
+                            cpu_info.append(cpu_item)
                         
                         if cpu_info:
                             logging.debug(f"Successfully retrieved CPU information via WMIC for {len(cpu_info)} processors")
@@ -307,10 +492,38 @@ def get_cpu_info():
     
     return cpu_info
 
-def get_memory_info():
+def get_memory_usage():
+    """
+    只用psutil获取内存容量和使用情况（fast配置中的memory分区），不查询内存模块
+    
+    返回:
+    - 内存信息字典
+    """
+    logging.debug("Getting memory information using psutil")
+    svmem = psutil.virtual_memory()
+    return {
+        "total_bytes": svmem.total,
+        "total_gb": round(svmem.total / (1024**3), 2),
+        "available_bytes": svmem.available,
+        "available_gb": round(svmem.available / (1024**3), 2),
+        "used_bytes": svmem.used,
+        "used_gb": round(svmem.used / (1024**3), 2),
+        "percent": svmem.percent,
+        "current_usage": {
+            "total_mb": round(svmem.total / (1024**2), 2),
+            "used_mb": round(svmem.used / (1024**2), 2),
+            "free_mb": round(svmem.available / (1024**2), 2),
+            "usage_percent": svmem.percent
+        }
+    }
+
+def get_memory_info(prefetched=None):
     """
     获取内存信息
     
+    参数:
+    - prefetched: 批量硬件查询得到的Win32_PhysicalMemory记录；为None时单独执行PowerShell查询
+    
     返回:
     - 内存信息字典
     """
@@ -319,55 +532,32 @@ def get_memory_info():
     try:
         if platform.system() == "Windows":
             # 首先尝试从psutil获取内存信息（更可靠）
-            logging.debug("Getting memory information using psutil")
-            svmem = psutil.virtual_memory()
-            memory_info["total_bytes"] = svmem.total
-            memory_info["total_gb"] = round(svmem.total / (1024**3), 2)
-            memory_info["available_bytes"] = svmem.available
-            memory_info["available_gb"] = round(svmem.available / (1024**3), 2)
-            memory_info["used_bytes"] = svmem.used
-            memory_info["used_gb"] = round(svmem.used / (1024**3), 2)
-            memory_info["percent"] = svmem.percent
-            
-            memory_info["current_usage"] = {
-                "total_mb": round(svmem.total / (1024**2), 2),
-                "used_mb": round(svmem.used / (1024**2), 2),
-                "free_mb": round(svmem.available / (1024**2), 2),
-                "usage_percent": svmem.percent
-            }
+            memory_info.update(get_memory_usage())
             
             # 尝试获取内存模块详细信息
-            logging.debug("Attempting to get memory module details via PowerShell")
-            try:
-                ps_cmd = "$PSDefaultParameterValues['Out-File:Encoding'] = 'utf8'; [System.Threading.Thread]::CurrentThread.CurrentCulture = 'en-US'; [System.Threading.Thread]::CurrentThread.CurrentUICulture = 'en-US'; Get-WmiObject -Class Win32_PhysicalMemory | Select-Object Capacity, Speed, Manufacturer, PartNumber, DeviceLocator | ConvertTo-Json"
-                result = run_powershell_command(ps_cmd, timeout=15)
-                
-                if result.returncode == 0 and result.stdout.strip():
-                    try:
-                        memory_modules = json.loads(result.stdout)
-                        
-                        # 处理单个模块的情况
-                        if isinstance(memory_modules, dict):
-                            memory_modules = [memory_modules]
-                        
-                        # 转换容量为GB
-                        for module in memory_modules:
-                            if "Capacity" in module and module["Capacity"]:
-                                try:
-                                    capacity_bytes = int(module["Capacity"])
-                                    capacity_gb = round(capacity_bytes / (1024**3), 2)
-                                    module["Capacity"] = f"{capacity_gb} GB"
-                                except (ValueError, TypeError):
-                                    module["Capacity"] = "Unknown"
-                        
-                        memory_info["modules"] = memory_modules
-                        logging.debug(f"Found {len(memory_modules)} memory modules")
-                    except json.JSONDecodeError as e:
-                        logging.warning(f"Error parsing memory modules JSON: {e}")
-                else:
-                    logging.warning(f"Failed to get memory module details: {result.stderr}")
-            except Exception as e:
-                logging.warning(f"Error getting memory module details: {e}")
+            if prefetched is not None:
+                # 使用批量查询的结果，该WMI类查询失败时直接走WMIC备用方案
+                if prefetched:
+                    memory_info["modules"] = parse_memory_module_records(prefetched)
+                    logging.debug(f"Using batched information for {len(memory_info['modules'])} memory modules")
+            else:
+                logging.debug("Attempting to get memory module details via PowerShell")
+                try:
+                    ps_cmd = "$PSDefaultParameterValues['Out-File:Encoding'] = 'utf8'; [System.Threading.Thread]::CurrentThread.CurrentCulture = 'en-US'; [System.Threading.Thread]::CurrentThread.CurrentUICulture = 'en-US'; Get-WmiObject -Class Win32_PhysicalMemory | Select-Object Capacity, Speed, Manufacturer, PartNumber, DeviceLocator | ConvertTo-Json"
+                    result = run_powershell_command(ps_cmd, timeout=15)
+                    
+                    if result.returncode == 0 and result.stdout.strip():
+                        try:
+                            # 处理单个模块的情况，并转换容量为GB
+                            memory_modules = parse_memory_module_records(json.loads(result.stdout))
+                            memory_info["modules"] = memory_modules
+                            logging.debug(f"Found {len(memory_modules)} memory modules")
+                        except json.JSONDecodeError as e:
+                            logging.warning(f"Error parsing memory modules JSON: {e}")
+                    else:
+                        logging.warning(f"Failed to get memory module details: {result.stderr}")
+                except Exception as e:
+                    logging.warning(f"Error getting memory module details: {e}")
             
             # 如果PowerShell失败，尝试使用WMIC获取内存模块信息
             if "modules" not in memory_info or not memory_info["modules"]:
@@ -376,39 +566,25 @@ def get_memory_info():
                 
                 if wmic_result.returncode == 0 and wmic_result.stdout.strip():
                     try:
-                        # 解析WMIC CSV输出
-                        lines = wmic_result.stdout.strip().split('\n')
+                        # 按标题映射解析WMIC CSV输出
                         memory_modules = []
-                        
-                        if len(lines) > 1:  # 跳过标题行
-                            for line in lines[1:]:
-                                if line.strip() and not line.startswith('Node,'):
-                                    fields = line.split(',')
-                                    if len(fields) >= 6:  # Node, Capacity, DeviceLocator, Manufacturer, PartNumber, Speed
-                                        try:
-                                            capacity_str = fields[1].strip() if len(fields) > 1 else ""
-                                            
-                                            # 转换容量为GB
-                                            if capacity_str and capacity_str.isdigit():
-                                                capacity_bytes = int(capacity_str)
-                                                capacity_gb = round(capacity_bytes / (1024**3), 2)
-                                                capacity_display = f"{capacity_gb} GB"
-                                            else:
-                                                capacity_display = "Unknown"
-                                            
-                                            module_item = {
-                                                "Capacity": capacity_display,
-                                                "DeviceLocator": fields[2].strip() if len(fields) > 2 else "",
-                                                "Manufacturer": fields[3].strip() if len(fields) > 3 else "",
-                                                "PartNumber": fields[4].strip() if len(fields) > 4 else "",
-                                                "Speed": fields[5].strip() if len(fields) > 5 else ""
-                                            }
-                                            
-                                            memory_modules.append(module_item)
-                                            
-                                        except (ValueError, IndexError) as e:
-                                            logging.debug(f"Error parsing WMIC memory line: {e}")
-                                            continue
+                        for row in iter_rows(parse_csv_table(wmic_result.stdout)):
+                            capacity_str = row.get("Capacity", "")
+                            
+                            # 转换容量为GB
+                            if capacity_str.isdigit():
+                                capacity_gb = round(int(capacity_str) / (1024**3), 2)
+                                capacity_display = f"{capacity_gb} GB"
+                            else:
+                                capacity_display = "Unknown"
+                            
+                            memory_modules.append({
+                                "Capacity": capacity_display,
+                                "DeviceLocator": row.get("DeviceLocator", ""),
+                                "Manufacturer": row.get("Manufacturer", ""),
+                                "PartNumber": row.get("PartNumber", ""),
+                                "Speed": row.get("Speed", "")
+                            })
                         
                         if memory_modules:
                             memory_info["modules"] = memory_modules
@@ -425,10 +601,13 @@ def get_memory_info():
     
     return memory_info
 
-def get_disk_info():
+def get_disk_info(detailed=True):
     """
     获取磁盘信息
     
+    参数:
+    - detailed: 为False时只用psutil获取分区和用量，不通过PowerShell查询物理磁盘详情
+    
     返回:
     - 磁盘信息字典
     """
@@ -446,7 +625,8 @@ def get_disk_info():
             
             for partition in partitions:
                 try:
-                    usage = psutil.disk_usage(partition.mountpoint)
+                    # 断开的网络驱动器上可能无限期挂起
+                    usage = process_isolation.run_isolated("disk_usage", psutil.disk_usage, (partition.mountpoint,))
                     
                     # 构建分区信息
                     volume_info = {
@@ -492,28 +672,29 @@ def get_disk_info():
             disk_info["physical_disks"] = physical_disks
             disk_info["volumes"] = volumes
             
-            # 尝试使用PowerShell命令获取更详细的信息（备选方法）
-            try:
-                logging.debug("Attempting to get additional disk info via PowerShell")
-                # 使用英文区域设置执行PowerShell命令
-                cmd = "$PSDefaultParameterValues['Out-File:Encoding'] = 'utf8'; [System.Threading.Thread]::CurrentThread.CurrentCulture = 'en-US'; [System.Threading.Thread]::CurrentThread.CurrentUICulture = 'en-US'; Get-PhysicalDisk | Select-Object DeviceId, FriendlyName, MediaType, Size, HealthStatus | ConvertTo-Json"
-                result = run_powershell_command(cmd, timeout=20)
+            # 尝试使用PowerShell命令获取更详细的信息（备选方法），fast配置中不查询
+            if detailed:
+                try:
+                    logging.debug("Attempting to get additional disk info via PowerShell")
+                    # 使用英文区域设置执行PowerShell命令
+                    cmd = "$PSDefaultParameterValues['Out-File:Encoding'] = 'utf8'; [System.Threading.Thread]::CurrentThread.CurrentCulture = 'en-US'; [System.Threading.Thread]::CurrentThread.CurrentUICulture = 'en-US'; Get-PhysicalDisk | Select-Object DeviceId, FriendlyName, MediaType, Size, HealthStatus | ConvertTo-Json"
+                    result = run_powershell_command(cmd, timeout=20)
                 
-                if result.returncode == 0 and result.stdout.strip():
-                    additional_disks = json.loads(result.stdout)
+                    if result.returncode == 0 and result.stdout.strip():
+                        additional_disks = json.loads(result.stdout)
                     
-                    # 处理单磁盘和多磁盘的情况
-                    if isinstance(additional_disks, dict):
-                        additional_disks = [additional_disks]
+                        # 处理单磁盘和多磁盘的情况
+                        if isinstance(additional_disks, dict):
+                            additional_disks = [additional_disks]
                     
-                    # 只有在成功获取到更详细信息时才更新physical_disks
-                    if additional_disks and len(additional_disks) > 0:
-                        disk_info["physical_disks_detailed"] = additional_disks
-                        logging.debug(f"Successfully retrieved additional disk details via PowerShell")
-                else:
-                    logging.warning(f"PowerShell command failed: {result.stderr}")
-            except Exception as e:
-                logging.warning(f"Failed to get additional disk info via PowerShell: {e}")
+                        # 只有在成功获取到更详细信息时才更新physical_disks
+                        if additional_disks and len(additional_disks) > 0:
+                            disk_info["physical_disks_detailed"] = additional_disks
+                            logging.debug(f"Successfully retrieved additional disk details via PowerShell")
+                    else:
+                        logging.warning(f"PowerShell command failed: {result.stderr}")
+                except Exception as e:
+                    logging.warning(f"Failed to get additional disk info via PowerShell: {e}")
         else:
             # Linux系统
             disk_info = {"platform_not_supported": True}
@@ -530,7 +711,7 @@ def get_disk_info():
                 drive = f"{letter}:"
                 if os.path.exists(drive):
                     try:
-                        total, used, free = shutil.disk_usage(drive)
+                        total, used, free = process_isolation.run_isolated("disk_usage", shutil.disk_usage, (drive,))
                         disk_info["basic_disk_info"].append({
                             "device": drive,
                             "size": total,
@@ -547,10 +728,13 @@ def get_disk_info():
     
     return disk_info
 
-def get_graphics_info():
+def get_graphics_info(prefetched=None):
     """
     获取显卡信息
     
+    参数:
+    - prefetched: 批量硬件查询得到的Win32_VideoController记录；为None时单独执行PowerShell查询
+    
     返回:
     - 显卡信息字典
     """
@@ -558,36 +742,27 @@ def get_graphics_info():
     
     try:
         if platform.system() == "Windows":
-            # 使用PowerShell获取显卡信息
-            logging.debug("Getting graphics card information")
-            cmd = "$PSDefaultParameterValues['Out-File:Encoding'] = 'utf8'; [System.Threading.Thread]::CurrentThread.CurrentCulture = 'en-US'; [System.Threading.Thread]::CurrentThread.CurrentUICulture = 'en-US'; Get-WmiObject -Class Win32_VideoController | Select-Object Name, AdapterRAM, DriverVersion, VideoProcessor | ConvertTo-Json"
-            result = run_powershell_command(cmd, timeout=15)
-            
-            if result.returncode == 0 and result.stdout.strip():
-                try:
-                    gpu_data = json.loads(result.stdout)
-                    
-                    # 处理单显卡和多显卡的情况
-                    if isinstance(gpu_data, dict):
-                        gpu_data = [gpu_data]
-                    
-                    # 转换显存大小为MB/GB
-                    for gpu in gpu_data:
-                        if "AdapterRAM" in gpu and gpu["AdapterRAM"]:
-                            try:
-                                ram_bytes = int(gpu["AdapterRAM"])
-                                gpu["VideoRAM_GB"] = round(ram_bytes / (1024**3), 2)
-                            except (ValueError, TypeError):
-                                gpu["VideoRAM_GB"] = "Unknown"
-                    
-                    graphics_info["adapters"] = gpu_data
-                    logging.debug(f"Found {len(gpu_data)} graphics adapters")
-                except json.JSONDecodeError as e:
-                    logging.warning(f"Error parsing graphics card JSON: {e}, output: {result.stdout[:100]}")
-                    gpu_data = []
+            if prefetched is not None:
+                # 使用批量查询的结果，该WMI类查询失败时直接走WMIC备用方案
+                if prefetched:
+                    graphics_info["adapters"] = parse_graphics_records(prefetched)
+                    logging.debug(f"Using batched information for {len(graphics_info['adapters'])} graphics adapters")
             else:
-                logging.warning(f"Failed to get graphics information: {result.stderr}")
-                gpu_data = []
+                # 使用PowerShell获取显卡信息
+                logging.debug("Getting graphics card information")
+                cmd = "$PSDefaultParameterValues['Out-File:Encoding'] = 'utf8'; [System.Threading.Thread]::CurrentThread.CurrentCulture = 'en-US'; [System.Threading.Thread]::CurrentThread.CurrentUICulture = 'en-US'; Get-WmiObject -Class Win32_VideoController | Select-Object Name, AdapterRAM, DriverVersion, VideoProcessor | ConvertTo-Json"
+                result = run_powershell_command(cmd, timeout=15)
+                
+                if result.returncode == 0 and result.stdout.strip():
+                    try:
+                        # 处理单显卡和多显卡的情况，并转换显存大小为GB
+                        gpu_data = parse_graphics_records(json.loads(result.stdout))
+                        graphics_info["adapters"] = gpu_data
+                        logging.debug(f"Found {len(gpu_data)} graphics adapters")
+                    except json.JSONDecodeError as e:
+                        logging.warning(f"Error parsing graphics card JSON: {e}, output: {result.stdout[:100]}")
+                else:
+                    logging.warning(f"Failed to get graphics information: {result.stderr}")
             
             # 如果PowerShell失败，尝试使用WMIC
             if "adapters" not in graphics_info or not graphics_info["adapters"]:
@@ -596,38 +771,23 @@ def get_graphics_info():
                 
                 if wmic_result.returncode == 0 and wmic_result.stdout.strip():
                     try:
-                        # 解析WMIC CSV输出
-                        lines = wmic_result.stdout.strip().split('\n')
+                        # 按标题映射解析WMIC CSV输出
                         gpu_data = []
-                        
-                        if len(lines) > 1:  # 跳过标题行
-                            for line in lines[1:]:
-                                if line.strip() and not line.startswith('Node,'):
-                                    fields = line.split(',')
-                                    if len(fields) >= 5:  # Node, AdapterRAM, DriverVersion, Name, VideoProcessor
-                                        try:
-                                            gpu_item = {
-                                                "Name": fields[3].strip() if len(fields) > 3 else "",
-                                                "AdapterRAM": fields[1].strip() if len(fields) > 1 else "",
-                                                "DriverVersion": fields[2].strip() if len(fields) > 2 else "",
-                                                "VideoProcessor": fields[4].strip() if len(fields) > 4 else ""
-                                            }
-                                            
-                                            # 转换显存大小
-                                            if gpu_item["AdapterRAM"] and gpu_item["AdapterRAM"].isdigit():
-                                                try:
-                                                    ram_bytes = int(gpu_item["AdapterRAM"])
-                                                    gpu_item["VideoRAM_GB"] = round(ram_bytes / (1024**3), 2)
-                                                except (ValueError, TypeError):
-                                                    gpu_item["VideoRAM_GB"] = "Unknown"
-                                            else:
-                                                gpu_item["VideoRAM_GB"] = "Unknown"
-                                            
-                                            gpu_data.append(gpu_item)
-                                            
-                                        except (ValueError, IndexError) as e:
-                                            logging.debug(f"Error parsing WMIC graphics line: {e}")
-                                            continue
+                        for row in iter_rows(parse_csv_table(wmic_result.stdout)):
+                            gpu_item = {
+                                "Name": row.get("Name", ""),
+                                "AdapterRAM": row.get("AdapterRAM", ""),
+                                "DriverVersion": row.get("DriverVersion", ""),
+                                "VideoProcessor": row.get("VideoProcessor", "")
+                            }
+                            
+                            # 转换显存大小
+                            if gpu_item["AdapterRAM"].isdigit():
+                                gpu_item["VideoRAM_GB"] = round(int(gpu_item["AdapterRAM"]) / (1024**3), 2)
+                            else:
+                                gpu_item["VideoRAM_GB"] = "Unknown"
+                            
+                            gpu_data.append(gpu_item)
                         
                         if gpu_data:
                             graphics_info["adapters"] = gpu_data
@@ -673,12 +833,16 @@ def get_network_adapters():
                 
                 network_adapters = adapters
                 
-                # 获取每个适配器的IP配置
-                for adapter in network_adapters:
+                # 并发获取每个适配器的IP配置
+                ip_commands = [
+                    f"Get-NetIPAddress -InterfaceAlias '{adapter.get('Name', '')}' | Select-Object IPAddress, PrefixLength, AddressFamily | ConvertTo-Json"
+                    for adapter in network_adapters
+                ]
+                ip_results = run_async(run_powershell_commands_async(ip_commands, timeout=10))
+                
+                for adapter, result in zip(network_adapters, ip_results):
                     try:
                         name = adapter.get("Name", "")
-                        cmd = f"Get-NetIPAddress -InterfaceAlias '{name}' | Select-Object IPAddress, PrefixLength, AddressFamily | ConvertTo-Json"
-                        result = run_powershell_command(cmd, timeout=10)
                         
                         if result.returncode == 0 and result.stdout.strip():
                             ip_data = json.loads(result.stdout)
@@ -743,17 +907,9 @@ def get_installed_drivers():
     try:
         if platform.system() == "Windows":
             # 使用PowerShell获取驱动程序信息
+            # 驱动数量可达数千个，逐行流式解析
             cmd = "Get-WmiObject Win32_PnPSignedDriver | Where-Object {$_.DeviceName} | Select-Object DeviceName, DriverVersion, Manufacturer | ConvertTo-Json -Depth 1"
-            result = run_powershell_command(cmd, timeout=25)
-            
-            if result.returncode == 0 and result.stdout.strip():
-                driver_data = json.loads(result.stdout)
-                
-                # 处理单驱动和多驱动的情况
-                if isinstance(driver_data, dict):
-                    driver_data = [driver_data]
-                
-                drivers = driver_data
+            drivers = list(stream_powershell_command(cmd, timeout=25))
         else:
             # Linux系统
             drivers = [{"platform_not_supported": True}]
@@ -808,17 +964,9 @@ def get_scheduled_tasks():
         if platform.system() == "Windows":
             # 使用PowerShell获取计划任务
             cmd = "Get-ScheduledTask | Where-Object {$_.State -ne 'Disabled'} | Select-Object TaskName, TaskPath, State | ConvertTo-Json"
-            result = run_powershell_command(cmd, timeout=20)
             
-            if result.returncode == 0 and result.stdout.strip():
-                tasks = json.loads(result.stdout)
-                
-                # 处理单任务和多任务的情况
-                if isinstance(tasks, dict):
-                    tasks = [tasks]
-                
-                # 只获取前100个任务，避免数据过大
-                scheduled_tasks = tasks[:100]
+            # 只获取前100个任务，避免数据过大；流式读取到第100个任务后即终止PowerShell
+            scheduled_tasks = list(itertools.islice(stream_powershell_command(cmd, timeout=20), 100))
         else:
             # Linux系统
             scheduled_tasks = [{"platform_not_supported": True}]
@@ -848,13 +996,265 @@ def get_environment_variables():
     
     return env_vars
 
-def collect_all_system_info():
+# fast配置（--profile fast）中的实现：只读注册表、psutil和文件元数据，不启动PowerShell、WMIC或其他外部命令，
+# 结果的形状与对应的完整实现相同，但字段更少
+
+def _read_registry_values(path, root=registry_backend.HKEY_LOCAL_MACHINE):
+    """
+    读取一个注册表键下的全部值
+
+    返回:
+    - 值名到值的字典，键不存在或无法读取时为空字典
+    """
+    return registry_backend.read_values(root, path)
+
+def get_cpu_info_fast():
+    """
+    从注册表的处理器描述和psutil获取CPU信息
+    
+    返回:
+    - CPU信息列表
+    """
+    processor = _read_registry_values(r"HARDWARE\DESCRIPTION\System\CentralProcessor\0")
+    clock = processor.get("~MHz")
+    cpu_item = {
+        "Name": (processor.get("ProcessorNameString") or platform.processor()).strip(),
+        "NumberOfCores": psutil.cpu_count(logical=False),
+        "NumberOfLogicalProcessors": psutil.cpu_count(logical=True),
+        "MaxClockSpeed": clock
+    }
+    if clock:
+        cpu_item["MaxClockSpeedGHz"] = round(clock / 1000, 2)
+    return [cpu_item]
+
+def get_disk_volumes():
+    """
+    只用psutil获取分区和用量，不查询物理磁盘详情
+    
+    返回:
+    - 磁盘信息字典
+    """
+    return get_disk_info(detailed=False)
+
+# 显示适配器设备类，每个子键（0000、0001……）是一个显卡驱动实例
+DISPLAY_CLASS_KEY = r"SYSTEM\CurrentControlSet\Control\Class\{4d36e968-e325-11ce-bfc1-08002be10318}"
+
+def get_graphics_info_fast():
+    """
+    从显示适配器设备类的注册表项获取显卡名称、驱动版本和显存
+    
+    返回:
+    - 显卡列表
+    """
+    graphics = []
+    try:
+        with registry_backend.open_key(registry_backend.HKEY_LOCAL_MACHINE, DISPLAY_CLASS_KEY) as key:
+            subkeys = key.subkey_names()
+    except (OSError, ImportError):
+        return graphics
+    
+    for subkey in subkeys:
+        if not subkey.isdigit():
+            continue
+        values = _read_registry_values(f"{DISPLAY_CLASS_KEY}\\{subkey}")
+        if not values.get("DriverDesc"):
+            continue
+        memory = values.get("HardwareInformation.qwMemorySize", values.get("HardwareInformation.MemorySize"))
+        if isinstance(memory, bytes):
+            memory = int.from_bytes(memory, "little")
+        graphics.append({
+            "Name": values["DriverDesc"],
+            "AdapterRAM": memory,
+            "DriverVersion": values.get("DriverVersion", ""),
+            "VideoProcessor": values.get("HardwareInformation.ChipType", "")
+        })
+    return parse_graphics_records(graphics)
+
+# 固件在启动时写入的SMBIOS摘要
+BIOS_KEY = r"HARDWARE\DESCRIPTION\System\BIOS"
+
+def get_motherboard_info_fast():
+    """
+    从注册表的SMBIOS摘要获取主板信息（没有序列号）
+    
+    返回:
+    - 主板信息字典
+    """
+    values = _read_registry_values(BIOS_KEY)
+    return {
+        "Manufacturer": values.get("BaseBoardManufacturer", ""),
+        "Product": values.get("BaseBoardProduct", ""),
+        "Version": values.get("BaseBoardVersion", "")
+    }
+
+def get_bios_info_fast():
+    """
+    从注册表的SMBIOS摘要获取BIOS信息
+    
+    返回:
+    - BIOS信息字典，ReleaseDate格式化为YYYY-MM-DD
+    """
+    values = _read_registry_values(BIOS_KEY)
+    release_date = values.get("BIOSReleaseDate", "")
+    # 注册表中的日期为MM/DD/YYYY
+    match = re.match(r'(\d{2})/(\d{2})/(\d{4})$', release_date)
+    if match:
+        release_date = f"{match.group(3)}-{match.group(1)}-{match.group(2)}"
+    return {
+        "Manufacturer": values.get("BIOSVendor", ""),
+        "Name": values.get("BIOSVersion", ""),
+        "SMBIOSBIOSVersion": values.get("BIOSVersion", ""),
+        "ReleaseDate": format_bios_release_date(release_date)
+    }
+
+def _prefix_length(netmask):
+    """子网掩码对应的前缀长度，无法识别时返回None"""
+    try:
+        return bin(int(ipaddress.ip_address(netmask))).count("1")
+    except ValueError:
+        return None
+
+def get_network_adapters_fast():
+    """
+    用psutil获取网络适配器的状态、MAC地址、链路速度和IP地址
+    
+    返回:
+    - 网络适配器信息列表
+    """
+    stats = psutil.net_if_stats()
+    network_adapters = []
+    for name, addresses in psutil.net_if_addrs().items():
+        stat = stats.get(name)
+        adapter = {
+            "Name": name,
+            "Status": "Up" if stat is not None and stat.isup else "Down",
+            "MacAddress": next((address.address for address in addresses if address.family == psutil.AF_LINK), ""),
+            "LinkSpeed": f"{stat.speed} Mbps" if stat is not None and stat.speed else "",
+            "IPConfigurations": [{
+                "IPAddress": address.address.split("%")[0],
+                "PrefixLength": _prefix_length(address.netmask) if address.netmask else None,
+                "AddressFamily": "IPv4" if address.family == socket.AF_INET else "IPv6"
+            } for address in addresses if address.family in (socket.AF_INET, socket.AF_INET6)]
+        }
+        network_adapters.append(adapter)
+    return network_adapters
+
+# 注册表中的自启动位置，与Win32_StartupCommand一致
+STARTUP_REGISTRY_KEYS = [
+    (registry_backend.HKEY_LOCAL_MACHINE, "HKLM", r"SOFTWARE\Microsoft\Windows\CurrentVersion\Run"),
+    (registry_backend.HKEY_LOCAL_MACHINE, "HKLM", r"SOFTWARE\Microsoft\Windows\CurrentVersion\RunOnce"),
+    (registry_backend.HKEY_CURRENT_USER, "HKCU", r"SOFTWARE\Microsoft\Windows\CurrentVersion\Run"),
+    (registry_backend.HKEY_CURRENT_USER, "HKCU", r"SOFTWARE\Microsoft\Windows\CurrentVersion\RunOnce")
+]
+
+def get_startup_items_fast():
+    """
+    从注册表的Run/RunOnce键和启动文件夹获取开机启动项
+    
+    返回:
+    - 启动项信息列表
+    """
+    user = os.environ.get("USERNAME", "")
+    startup_items = []
+    for root, root_name, path in STARTUP_REGISTRY_KEYS:
+        for name, command in _read_registry_values(path, root).items():
+            startup_items.append({
+                "Name": name,
+                "Command": command,
+                "Location": f"{root_name}\\{path}",
+                "User": "Public" if root_name == "HKLM" else user
+            })
+    
+    folders = [("Public", os.environ.get("PROGRAMDATA")), (user, os.environ.get("APPDATA"))]
+    for owner, base in folders:
+        if not base:
+            continue
+        folder = os.path.join(base, "Microsoft", "Windows", "Start Menu", "Programs", "Startup")
+        try:
+            entries = list(os.scandir(folder))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_file() and entry.name.lower() != "desktop.ini":
+                startup_items.append({"Name": entry.name, "Command": entry.path, "Location": "Startup", "User": owner})
+    return startup_items
+
+def get_scheduled_tasks_fast():
     """
-    收集所有系统信息
+    从任务计划程序的任务定义文件夹列出计划任务（只看文件，不解析任务状态，已禁用的任务也会列出）
+    
+    返回:
+    - 计划任务信息列表（最多100个）
+    """
+    tasks_dir = os.path.join(os.environ.get("windir", r"C:\Windows"), "System32", "Tasks")
+    scheduled_tasks = []
+    for root, dirs, files in os.walk(tasks_dir):
+        dirs.sort()
+        relative = os.path.relpath(root, tasks_dir)
+        task_path = "\\" if relative == "." else "\\" + relative.replace(os.sep, "\\") + "\\"
+        for name in sorted(files):
+            scheduled_tasks.append({"TaskName": name, "TaskPath": task_path})
+            if len(scheduled_tasks) >= 100:
+                return scheduled_tasks
+    return scheduled_tasks
+
+def collect_section(name, func, *args):
+    """
+    在运行时间预算分到的时间内采集一个分区，并把其中命令的缓存命中情况和资源使用记录到该分区
+    同一次运行内同名分区只采集一次，之后的调用返回同一个结果对象；启用增量采集时指纹未变的分区复用上次运行的结果
+    
+    参数:
+    - name: 分区名
+    - func: 采集函数
+    - args: 传给采集函数的参数
+    
+    返回:
+    - 采集函数的返回值；因时间预算不足被跳过时返回 {"partial": True, "reason": ...}
+    """
+    def collect_live():
+        with command_cache.cache_section(name):
+            return func(*args)
+    
+    def collect():
+        with resource_accounting.account(name), time_budget.budget_section(name) as allowed:
+            if not allowed:
+                return time_budget.partial_marker(name)
+            # 启用增量采集且分区指纹未变时复用上次运行的结果
+            return incremental.reuse_or_collect(name, collect_live)
+    
+    return probe_registry.run_probe(name, collect)
+
+def collect_all_system_info(sections=None):
+    """
+    按采集器登记表（system_info组）收集所有系统信息
+    
+    参数:
+    - sections: 要采集的分区名列表，默认采集全部；未选中的分区不出现在结果中，
+      选中任一使用批量硬件查询的分区时自动运行批量查询
     
     返回:
     - 包含所有系统信息的字典
     """
+    entries = [entry for entry in collector_registry.list_collectors("system_info", available_only=True)
+               if sections is None or entry["name"] in sections or entry["name"] == "hardware_batch"]
+    # fast配置中批量硬件查询（PowerShell）不运行，各分区使用不需要它的实现
+    batch_sections = [entry["name"] for entry in entries if entry["batch"]]
+    if not batch_sections or not collector_registry.is_collected(collector_registry.get_collector("hardware_batch")):
+        batch_sections = []
+        entries = [entry for entry in entries if entry["name"] != "hardware_batch"]
+    time_budget.plan_sections([entry["name"] for entry in entries if collector_registry.is_collected(entry)])
+    
+    # 每个分区只采集一次，basic_info.hardware和顶层的cpu、memory、disk、graphics共享同一个结果
+    probe_registry.start_probe_run()
+    
+    # 一次查询选中的硬件WMI类，结果分发给各分区的解析函数
+    hardware_batch = {}
+    if batch_sections:
+        all_batch = [entry["name"] for entry in collector_registry.list_collectors("system_info") if entry["batch"]]
+        get_batch = collector_registry.resolve(collector_registry.get_collector("hardware_batch"))
+        hardware_batch = collect_section("hardware_batch", get_batch, 30,
+                                         None if batch_sections == all_batch else batch_sections)
+    
     # 获取基本系统信息
     basic_info = {
         "platform": platform.platform(),
@@ -864,34 +1264,37 @@ def collect_all_system_info():
         "architecture": platform.machine(),
         "processor": platform.processor(),
         "hostname": socket.gethostname(),
-        "ip_address": socket.gethostbyname(socket.gethostname()),
+        "ip_address": get_host_ip_address(),
         "mac_address": ':'.join(re.findall('..', '%012x' % uuid.getnode())),
-        "os": get_os_info(),
-        "hardware": {
-            "cpu": get_cpu_info(),
-            "memory": get_memory_info(),
-            "disks": get_disk_info(),
-            "graphics": get_graphics_info(),
-            "motherboard": get_motherboard_info(),
-            "bios": get_bios_info()
-        }
+        "os": get_os_info()
     }
     
+    def placed(location):
+        """按登记顺序采集位置在location（hardware或top）的分区，出现在两处的分区第二次直接复用"""
+        collected = {}
+        for entry in entries:
+            if location in entry["placement"] and not collector_registry.is_collected(entry):
+                collected[entry["placement"][location]] = collector_registry.not_collected_marker(entry["name"])
+            elif location in entry["placement"]:
+                args = (hardware_batch.get(entry["name"]),) if entry["batch"] and batch_sections else ()
+                collected[entry["placement"][location]] = collect_section(entry["name"], collector_registry.resolve(entry), *args)
+        return collected
+    
+    basic_info["hardware"] = placed("hardware")
     system_info = {
         "collection_time": datetime.now().isoformat(),
         "basic_info": basic_info,
-        "cpu": get_cpu_info(),
-        "memory": get_memory_info(),
-        "disk": get_disk_info(),
-        "graphics": get_graphics_info(),
-        "network_adapters": get_network_adapters(),
-        "user_accounts": get_user_accounts(),
-        "drivers": get_installed_drivers(),
-        "startup_items": get_startup_items(),
-        "scheduled_tasks": get_scheduled_tasks(),
-        "environment_variables": get_environment_variables()
+        **placed("top")
     }
     
+    # 在时间预算内被截断或跳过的分区
+    budget = time_budget.get_budget_summary()
+    if budget is not None:
+        names = collector_registry.collector_names("system_info")
+        system_info["partial_sections"] = {
+            name: reason for name, reason in budget["partial_sections"].items() if name in names
+        }
+    
     return system_info
 
 def save_system_info(output_dir, filename="system_info.json"):
@@ -913,9 +1316,10 @@ def save_system_info(output_dir, filename="system_info.json"):
         system_info = collect_all_system_info()
         
         # 保存系统信息
+        # 共享的分区结果只写一次，其余位置写为 {"$ref": "#/..."}
         output_file = os.path.join(output_dir, filename)
         with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(system_info, f, indent=2, ensure_ascii=False)
+            dump_json(system_info, f, indent=2, ensure_ascii=False)
         
         return {
             "success": True,
@@ -961,9 +1365,9 @@ def get_windows_install_date():
     - 安装日期字符串
     """
     try:
-        with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, 
-                           r"SOFTWARE\Microsoft\Windows NT\CurrentVersion") as key:
-            install_date = winreg.QueryValueEx(key, "InstallDate")[0]
+        with registry_backend.open_key(registry_backend.HKEY_LOCAL_MACHINE,
+                                       r"SOFTWARE\Microsoft\Windows NT\CurrentVersion") as key:
+            install_date = key.query_value("InstallDate")[0]
             return datetime.fromtimestamp(install_date).isoformat()
     except Exception as e:
         return f"Error getting install date: {str(e)}"
@@ -975,42 +1379,52 @@ def get_hardware_info():
     返回:
     - 硬件信息字典
     """
+    # 一次查询所有硬件WMI类，结果分发给各分区的解析函数
+    hardware_batch = get_hardware_batch()
+    
     hardware_info = {
-        "cpu": get_cpu_info(),
-        "memory": get_memory_info(),
+        "cpu": get_cpu_info(hardware_batch.get("cpu")),
+        "memory": get_memory_info(hardware_batch.get("memory")),
         "disks": get_disk_info(),
-        "graphics": get_graphics_info(),
-        "motherboard": get_motherboard_info(),
-        "bios": get_bios_info()
+        "graphics": get_graphics_info(hardware_batch.get("graphics")),
+        "motherboard": get_motherboard_info(hardware_batch.get("motherboard")),
+        "bios": get_bios_info(hardware_batch.get("bios"))
     }
     
     return hardware_info
 
-def get_motherboard_info():
+def get_motherboard_info(prefetched=None):
     """
     获取主板信息
     
+    参数:
+    - prefetched: 批量硬件查询得到的Win32_BaseBoard记录；为None时单独执行PowerShell查询
+    
     返回:
     - 主板信息字典
     """
     motherboard_info = {}
     
     try:
-        # 使用PowerShell代替WMI直接调用
-        logging.debug("Getting motherboard information")
-        ps_cmd = "$PSDefaultParameterValues['Out-File:Encoding'] = 'utf8'; [System.Threading.Thread]::CurrentThread.CurrentCulture = 'en-US'; [System.Threading.Thread]::CurrentThread.CurrentUICulture = 'en-US'; Get-WmiObject Win32_BaseBoard | Select-Object Manufacturer, Product, SerialNumber, Version | ConvertTo-Json"
-        result = run_powershell_command(ps_cmd, timeout=15)
-        
-        if result.returncode == 0 and result.stdout.strip():
-            try:
-                mb_data = json.loads(result.stdout)
-                motherboard_info = mb_data
-                logging.debug("Successfully retrieved motherboard information")
-            except json.JSONDecodeError as e:
-                logging.warning(f"Error parsing motherboard JSON: {e}, output: {result.stdout[:100]}")
+        if prefetched is not None:
+            # 使用批量查询的结果，该WMI类查询失败时直接走WMIC备用方案
+            motherboard_info = parse_motherboard_records(prefetched)
+            logging.debug("Using batched motherboard information")
         else:
-            # 尝试使用备用方法
-            logging.warning(f"Failed to get motherboard info: {result.stderr}")
+            # 使用PowerShell代替WMI直接调用
+            logging.debug("Getting motherboard information")
+            ps_cmd = "$PSDefaultParameterValues['Out-File:Encoding'] = 'utf8'; [System.Threading.Thread]::CurrentThread.CurrentCulture = 'en-US'; [System.Threading.Thread]::CurrentThread.CurrentUICulture = 'en-US'; Get-WmiObject Win32_BaseBoard | Select-Object Manufacturer, Product, SerialNumber, Version | ConvertTo-Json"
+            result = run_powershell_command(ps_cmd, timeout=15)
+            
+            if result.returncode == 0 and result.stdout.strip():
+                try:
+                    motherboard_info = parse_motherboard_records(json.loads(result.stdout))
+                    logging.debug("Successfully retrieved motherboard information")
+                except json.JSONDecodeError as e:
+                    logging.warning(f"Error parsing motherboard JSON: {e}, output: {result.stdout[:100]}")
+            else:
+                # 尝试使用备用方法
+                logging.warning(f"Failed to get motherboard info: {result.stderr}")
         
         # 如果PowerShell失败，尝试使用WMIC
         if not motherboard_info:
@@ -1019,22 +1433,16 @@ def get_motherboard_info():
             
             if wmic_result.returncode == 0 and wmic_result.stdout.strip():
                 try:
-                    # 解析WMIC CSV输出
-                    lines = wmic_result.stdout.strip().split('\n')
-                    
-                    if len(lines) > 1:  # 跳过标题行
-                        for line in lines[1:]:
-                            if line.strip() and not line.startswith('Node,'):
-                                fields = line.split(',')
-                                if len(fields) >= 5:  # Node, Manufacturer, Product, SerialNumber, Version
-                                    motherboard_info = {
-                                        "Manufacturer": fields[1].strip() if len(fields) > 1 else "",
-                                        "Product": fields[2].strip() if len(fields) > 2 else "",
-                                        "SerialNumber": fields[3].strip() if len(fields) > 3 else "",
-                                        "Version": fields[4].strip() if len(fields) > 4 else ""
-                                    }
-                                    logging.debug("Successfully retrieved motherboard information via WMIC")
-                                    break
+                    # 按标题映射解析WMIC CSV输出，取第一块主板
+                    for row in iter_rows(parse_csv_table(wmic_result.stdout)):
+                        motherboard_info = {
+                            "Manufacturer": row.get("Manufacturer", ""),
+                            "Product": row.get("Product", ""),
+                            "SerialNumber": row.get("SerialNumber", ""),
+                            "Version": row.get("Version", "")
+                        }
+                        logging.debug("Successfully retrieved motherboard information via WMIC")
+                        break
                 except Exception as e:
                     logging.warning(f"Error parsing WMIC motherboard output: {e}")
         
@@ -1066,46 +1474,39 @@ def get_motherboard_info():
     
     return motherboard_info
 
-def get_bios_info():
+def get_bios_info(prefetched=None):
     """
     获取BIOS信息
     
+    参数:
+    - prefetched: 批量硬件查询得到的Win32_BIOS记录；为None时单独执行PowerShell查询
+    
     返回:
     - BIOS信息字典
     """
     bios_info = {}
     
     try:
-        # 使用PowerShell代替WMI直接调用
-        logging.debug("Getting BIOS information")
-        ps_cmd = "$PSDefaultParameterValues['Out-File:Encoding'] = 'utf8'; [System.Threading.Thread]::CurrentThread.CurrentCulture = 'en-US'; [System.Threading.Thread]::CurrentThread.CurrentUICulture = 'en-US'; Get-WmiObject Win32_BIOS | Select-Object Manufacturer, Name, SMBIOSBIOSVersion, ReleaseDate | ConvertTo-Json"
-        result = run_powershell_command(ps_cmd, timeout=15)
-        
-        if result.returncode == 0 and result.stdout.strip():
-            try:
-                bios_data = json.loads(result.stdout)
-                bios_info = bios_data
-                
-                # 处理BIOS日期格式
-                if "ReleaseDate" in bios_info and bios_info["ReleaseDate"]:
-                    # WMI返回的日期格式通常是 YYYYMMDDHHMMSS.MMMMMM+MMM
-                    release_date = bios_info["ReleaseDate"]
-                    try:
-                        if len(release_date) >= 8:
-                            # 确保前8个字符都是数字
-                            date_part = release_date[:8]
-                            if date_part.isdigit():
-                                formatted_date = f"{date_part[0:4]}-{date_part[4:6]}-{date_part[6:8]}"
-                                bios_info["ReleaseDate"] = formatted_date
-                    except:
-                        pass  # 保持原格式
-                
-                logging.debug("Successfully retrieved BIOS information")
-            except json.JSONDecodeError as e:
-                logging.warning(f"Error parsing BIOS JSON: {e}, output: {result.stdout[:100]}")
+        if prefetched is not None:
+            # 使用批量查询的结果，该WMI类查询失败时直接走WMIC备用方案
+            bios_info = parse_bios_records(prefetched)
+            logging.debug("Using batched BIOS information")
         else:
-            # 尝试使用备用方法
-            logging.warning(f"Failed to get BIOS info: {result.stderr}")
+            # 使用PowerShell代替WMI直接调用
+            logging.debug("Getting BIOS information")
+            ps_cmd = "$PSDefaultParameterValues['Out-File:Encoding'] = 'utf8'; [System.Threading.Thread]::CurrentThread.CurrentCulture = 'en-US'; [System.Threading.Thread]::CurrentThread.CurrentUICulture = 'en-US'; Get-WmiObject Win32_BIOS | Select-Object Manufacturer, Name, SMBIOSBIOSVersion, ReleaseDate | ConvertTo-Json"
+            result = run_powershell_command(ps_cmd, timeout=15)
+            
+            if result.returncode == 0 and result.stdout.strip():
+                try:
+                    # WMI返回的日期格式通常是 YYYYMMDDHHMMSS.MMMMMM+MMM，统一为YYYY-MM-DD
+                    bios_info = parse_bios_records(json.loads(result.stdout))
+                    logging.debug("Successfully retrieved BIOS information")
+                except json.JSONDecodeError as e:
+                    logging.warning(f"Error parsing BIOS JSON: {e}, output: {result.stdout[:100]}")
+            else:
+                # 尝试使用备用方法
+                logging.warning(f"Failed to get BIOS info: {result.stderr}")
         
         # 如果PowerShell失败，尝试使用WMIC
         if not bios_info:
@@ -1114,35 +1515,16 @@ def get_bios_info():
             
             if wmic_result.returncode == 0 and wmic_result.stdout.strip():
                 try:
-                    # 解析WMIC CSV输出
-                    lines = wmic_result.stdout.strip().split('\n')
-                    
-                    if len(lines) > 1:  # 跳过标题行
-                        for line in lines[1:]:
-                            if line.strip() and not line.startswith('Node,'):
-                                fields = line.split(',')
-                                if len(fields) >= 5:  # Node, Manufacturer, Name, ReleaseDate, SMBIOSBIOSVersion
-                                    bios_info = {
-                                        "Manufacturer": fields[1].strip() if len(fields) > 1 else "",
-                                        "Name": fields[2].strip() if len(fields) > 2 else "",
-                                        "ReleaseDate": fields[3].strip() if len(fields) > 3 else "",
-                                        "SMBIOSBIOSVersion": fields[4].strip() if len(fields) > 4 else ""
-                                    }
-                                    
-                                    # 处理BIOS日期格式
-                                    if bios_info["ReleaseDate"] and len(bios_info["ReleaseDate"]) >= 8:
-                                        try:
-                                            release_date = bios_info["ReleaseDate"]
-                                            # 确保前8个字符都是数字
-                                            date_part = release_date[:8]
-                                            if date_part.isdigit():
-                                                formatted_date = f"{date_part[0:4]}-{date_part[4:6]}-{date_part[6:8]}"
-                                                bios_info["ReleaseDate"] = formatted_date
-                                        except:
-                                            pass  # 保持原格式
-                                    
-                                    logging.debug("Successfully retrieved BIOS information via WMIC")
-                                    break
+                    # 按标题映射解析WMIC CSV输出，取第一条记录
+                    for row in iter_rows(parse_csv_table(wmic_result.stdout)):
+                        bios_info = {
+                            "Manufacturer": row.get("Manufacturer", ""),
+                            "Name": row.get("Name", ""),
+                            "ReleaseDate": format_bios_release_date(row.get("ReleaseDate", "")),
+                            "SMBIOSBIOSVersion": row.get("SMBIOSBIOSVersion", "")
+                        }
+                        logging.debug("Successfully retrieved BIOS information via WMIC")
+                        break
                 except Exception as e:
                     logging.warning(f"Error parsing WMIC BIOS output: {e}")
         
@@ -1201,7 +1583,7 @@ def get_network_interfaces():
     
     try:
         # 使用ipconfig命令获取网络接口信息
-        result = subprocess.check_output('ipconfig /all', shell=True, text=True, encoding='gbk')
+        result = process_isolation.check_output("ipconfig", 'ipconfig /all', shell=True, text=True, encoding='gbk')
         
         # 解析ipconfig输出
         sections = re.split(r'\r?\n\r?\n', result)
@@ -1238,7 +1620,7 @@ def get_dns_servers():
     
     try:
         # 使用ipconfig命令获取DNS服务器信息
-        result = subprocess.check_output('ipconfig /all', shell=True, text=True, encoding='gbk')
+        result = process_isolation.check_output("ipconfig", 'ipconfig /all', shell=True, text=True, encoding='gbk')
         
         # 查找DNS服务器条目
         dns_lines = re.findall(r'DNS Servers[\.\s]+: (.*)', result)
@@ -1266,7 +1648,7 @@ def get_ip_config():
     
     try:
         # 执行ipconfig命令
-        result = subprocess.check_output('ipconfig /all', shell=True, text=True, encoding='gbk')
+        result = process_isolation.check_output("ipconfig", 'ipconfig /all', shell=True, text=True, encoding='gbk')
         ip_config["raw_output"] = result
         
         # 提取主要信息
@@ -1297,31 +1679,25 @@ def get_shared_folders():
     
     try:
         # 使用net share命令获取共享文件夹
-        result = subprocess.check_output('net share', shell=True, text=True, encoding='gbk')
+        result = process_isolation.check_output("net", 'net share', shell=True, text=True, encoding='gbk')
         
-        # 解析共享文件夹列表
-        lines = result.split('\n')
-        capture = False
+        # 去掉结尾的"命令成功完成"提示行，它比第一列宽，会被切到后面的列中
+        result = "\n".join(line for line in result.split('\n')
+                           if "命令成功完成" not in line and "command completed successfully" not in line.lower())
         
-        for i, line in enumerate(lines):
-            if '----------' in line:
-                capture = True
-                continue
-            
-            if capture and line.strip():
-                parts = re.split(r'\s{2,}', line.strip())
-                if len(parts) >= 2:
-                    share_name = parts[0].strip()
-                    share_path = parts[1].strip()
-                    
-                    # 跳过系统默认共享
-                    if share_name in ['C$', 'D$', 'E$', 'F$', 'ADMIN$', 'IPC$'] or '$' in share_name:
-                        continue
-                    
-                    shared_folders.append({
-                        "name": share_name,
-                        "path": share_path
-                    })
+        # 解析共享文件夹列表；标题随系统语言变化，按位置取前两列
+        columns = parse_fixed_width_table(result)
+        names = list(columns)
+        if len(names) >= 2:
+            for share_name, share_path in zip(columns[names[0]], columns[names[1]]):
+                # 跳过系统默认共享
+                if not share_name or '$' in share_name or not share_path:
+                    continue
+                
+                shared_folders.append({
+                    "name": share_name,
+                    "path": share_path
+                })
     except Exception as e:
         shared_folders = [{"error": str(e)}]
     
@@ -1338,7 +1714,7 @@ def get_services():
     
     try:
         # 使用net start命令获取运行中的服务
-        result = subprocess.check_output('net start', shell=True, text=True, encoding='gbk')
+        result = process_isolation.check_output("net", 'net start', shell=True, text=True, encoding='gbk')
         
         # 解析服务列表
         lines = result.split('\n')
@@ -1359,29 +1735,62 @@ def get_services():
         
         # 使用wmic获取所有服务的详细信息
         wmic_cmd = 'wmic service get Caption, DisplayName, Name, PathName, StartMode, State /format:list'
-        result = subprocess.check_output(wmic_cmd, shell=True, text=True)
+        # 以字节读取：文本模式会把WMIC的\r\r\n转换成两个换行，使每个键各成一块
+        output = process_isolation.check_output("wmic", wmic_cmd, shell=True)
+        result = output.decode(locale.getpreferredencoding(False), errors='ignore')
         
         # 解析服务详细信息
-        service_sections = result.split('\n\n')
-        for section in service_sections:
-            if not section.strip():
-                continue
-                
-            service = {}
-            for line in section.split('\n'):
-                if '=' in line:
-                    key, value = line.split('=', 1)
-                    service[key.strip()] = value.strip()
-            
-            if service:
-                service["running"] = service.get("State") == "Running"
-                service["auto_start"] = service.get("StartMode") == "Auto"
-                services.append(service)
+        for service in iter_rows(parse_list_blocks(result, "=")):
+            service["running"] = service.get("State") == "Running"
+            service["auto_start"] = service.get("StartMode") == "Auto"
+            services.append(service)
     except Exception as e:
         services = [{"error": str(e)}]
     
     return services
 
+SERVICES_KEY = r"SYSTEM\CurrentControlSet\Services"
+# 服务键的Start值，与Win32_Service.StartMode一致
+SERVICE_START_MODES = {0: "Boot", 1: "System", 2: "Auto", 3: "Manual", 4: "Disabled"}
+# Type中的Win32服务位（独立进程、共享进程），其余为驱动程序等，wmic service不列出
+SERVICE_TYPE_WIN32 = 0x10 | 0x20
+
+def get_services_fast():
+    """
+    从注册表的服务键读取Win32服务，字段与get_services相同；注册表中没有运行状态，因此不含State和running，
+    可用于离线hive（SYSTEM）。逐个子键读取，不经过卸载项枚举器，服务不写入注册表快照
+
+    返回:
+    - 系统服务信息列表
+    """
+    services = []
+    fields = ("DisplayName", "ImagePath", "Start", "Type")
+    wanted = {name.lower(): index for index, name in enumerate(fields)}
+    try:
+        key = registry_backend.open_key(registry_backend.HKEY_LOCAL_MACHINE, SERVICES_KEY)
+    except (OSError, ImportError) as e:
+        logging.debug(f"Cannot open registry key {SERVICES_KEY}: {e}")
+        return services
+    with key:
+        for name in key.subkey_names():
+            try:
+                with key.open(name) as subkey:
+                    display_name, image_path, start, service_type = subkey.project_values(wanted, len(fields))
+            except OSError:
+                continue
+            if not isinstance(service_type, int) or not service_type & SERVICE_TYPE_WIN32:
+                continue
+            start_mode = SERVICE_START_MODES.get(start, "")
+            services.append({
+                "Caption": display_name or name,
+                "DisplayName": display_name or name,
+                "Name": name,
+                "PathName": image_path or "",
+                "StartMode": start_mode,
+                "auto_start": start_mode == "Auto"
+            })
+    return services
+
 def get_installed_software():
     """
     获取已安装软件信息
@@ -1394,113 +1803,16 @@ def get_installed_software():
     try:
         # 从注册表读取已安装软件信息
         registry_locations = [
-            (winreg.HKEY_LOCAL_MACHINE, r"Software\Microsoft\Windows\CurrentVersion\Uninstall"),
-            (winreg.HKEY_LOCAL_MACHINE, r"Software\WOW6432Node\Microsoft\Windows\CurrentVersion\Uninstall"),
-            (winreg.HKEY_CURRENT_USER, r"Software\Microsoft\Windows\CurrentVersion\Uninstall")
+            (registry_backend.HKEY_LOCAL_MACHINE, r"Software\Microsoft\Windows\CurrentVersion\Uninstall", None),
+            (registry_backend.HKEY_LOCAL_MACHINE, r"Software\WOW6432Node\Microsoft\Windows\CurrentVersion\Uninstall", None),
+            (registry_backend.HKEY_CURRENT_USER, r"Software\Microsoft\Windows\CurrentVersion\Uninstall", None)
         ]
+        fields = ["name", "version", "publisher", "install_date", "install_location", "uninstall_string"]
         
-        for hkey, key_path in registry_locations:
-            try:
-                with winreg.OpenKey(hkey, key_path) as key:
-                    # 获取子键数量
-                    subkey_count = winreg.QueryInfoKey(key)[0]
-                    
-                    for i in range(subkey_count):
-                        try:
-                            subkey_name = winreg.EnumKey(key, i)
-                            with winreg.OpenKey(key, subkey_name) as subkey:
-                                software = {}
-                                
-                                # 读取软件信息
-                                try:
-                                    software["name"] = winreg.QueryValueEx(subkey, "DisplayName")[0]
-                                except:
-                                    # 没有显示名称的条目跳过
-                                    continue
-                                
-                                try:
-                                    software["version"] = winreg.QueryValueEx(subkey, "DisplayVersion")[0]
-                                except:
-                                    software["version"] = ""
-                                
-                                try:
-                                    software["publisher"] = winreg.QueryValueEx(subkey, "Publisher")[0]
-                                except:
-                                    software["publisher"] = ""
-                                
-                                try:
-                                    software["install_date"] = winreg.QueryValueEx(subkey, "InstallDate")[0]
-                                except:
-                                    software["install_date"] = ""
-                                
-                                try:
-                                    software["install_location"] = winreg.QueryValueEx(subkey, "InstallLocation")[0]
-                                except:
-                                    software["install_location"] = ""
-                                
-                                try:
-                                    software["uninstall_string"] = winreg.QueryValueEx(subkey, "UninstallString")[0]
-                                except:
-                                    software["uninstall_string"] = ""
-                                
-                                software_list.append(software)
-                        except Exception as e:
-                            continue
-            except Exception as e:
-                continue
+        # 没有显示名称的条目跳过，其他缺少的值记为空字符串
+        for entry in iter_uninstall_entries(registry_locations, DEFAULT_FIELDS):
+            software_list.append({field: "" if value is None else value for field, value in zip(fields, entry.values)})
     except Exception as e:
         software_list = [{"error": str(e)}]
     
     return software_list
-
-def get_system_info():
-    """
-    获取系统全面信息
-    
-    返回:
-    - 系统信息字典
-    """
-    system_info = {
-        "collection_time": datetime.now().isoformat(),
-        "os": get_os_info(),
-        "hardware": get_hardware_info(),
-        "network": get_network_info(),
-        "user_accounts": get_user_accounts(),
-        "startup_items": get_startup_items(),
-        "installed_drivers": get_installed_drivers(),
-        "environment_variables": get_environment_variables(),
-        "shared_folders": get_shared_folders(),
-        "scheduled_tasks": get_scheduled_tasks(),
-        "services": get_services(),
-        "installed_software": get_installed_software()
-    }
-    
-    return system_info
-
-def save_system_info(output_dir, filename="system_info.json"):
-    """
-    保存系统信息到JSON文件
-    
-    参数:
-    - output_dir: 输出目录
-    - filename: 输出文件名
-    
-    返回:
-    - 保存文件的路径
-    """
-    try:
-        # 确保输出目录存在
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # 收集系统信息
-        system_info = get_system_info()
-        
-        # 保存到JSON文件
-        output_file = os.path.join(output_dir, filename)
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(system_info, f, ensure_ascii=False, indent=2)
-        
-        return output_file
-    except Exception as e:
-        print(f"保存系统信息时出错: {e}")
-        return None 
\ No newline at end of file
@@ -0,0 +1,196 @@
+import re
+import csv
+import unicodedata
+
+# 输出中可能包含逗号的自由文本列，CSV行字段数多于标题时多出的部分并入第一个存在的此类列
+FREE_TEXT_COLUMNS = ("Name", "Caption", "Description", "DisplayName", "PathName", "Product", "Vendor", "Manufacturer")
+
+_HEADER_FIELD = re.compile(r'\S+(?: \S+)*')
+_SEPARATOR_LINE = re.compile(r'^[\s=-]+$')
+
+def _lines(text):
+    """按行拆分并去掉WMIC输出中常见的多余回车（WMIC以\\r\\r\\n结束每行，不能用splitlines）"""
+    return [line.rstrip('\r') for line in text.split('\n')]
+
+def parse_csv_table(text, skip_columns=("Node",), free_text_columns=FREE_TEXT_COLUMNS):
+    """
+    解析带标题行的CSV输出（如 wmic ... /format:csv），一次遍历得到列数组
+
+    参数:
+    - text: 命令输出
+    - skip_columns: 不需要的列，如WMIC附带的Node列
+    - free_text_columns: 字段数多于标题时吸收多出字段的候选列
+
+    返回:
+    - 列名到值列表的字典，各列长度相同
+    """
+    lines = [line for line in _lines(text) if line.strip()]
+    if not lines:
+        return {}
+
+    reader = csv.reader(lines)
+    header = [name.strip() for name in next(reader)]
+    width = len(header)
+    columns = {name: [] for name in header}
+    targets = [columns[name] for name in header]
+
+    # 值中带逗号时多出的字段并入的列
+    overflow_index = next((header.index(name) for name in free_text_columns if name in columns), width - 1)
+
+    for fields in reader:
+        if fields == header:
+            # 多个WMIC结果拼接时会重复出现标题行
+            continue
+        if len(fields) > width:
+            extra = len(fields) - width
+            fields = (fields[:overflow_index]
+                      + [",".join(fields[overflow_index:overflow_index + extra + 1])]
+                      + fields[overflow_index + extra + 1:])
+        elif len(fields) < width:
+            fields = fields + [""] * (width - len(fields))
+        for target, value in zip(targets, fields):
+            target.append(value.strip())
+
+    for name in skip_columns:
+        columns.pop(name, None)
+    return columns
+
+def _display_width(char):
+    """字符在控制台中占用的列数，中日韩全角字符占两列"""
+    return 2 if unicodedata.east_asian_width(char) in ("W", "F") else 1
+
+def _cell_offsets(line):
+    """每个字符起始处的控制台列号，末尾附加整行宽度"""
+    offsets = [0]
+    for char in line:
+        offsets.append(offsets[-1] + _display_width(char))
+    return offsets
+
+def _slice_cells(line, starts):
+    """按控制台列号切分一行；纯ASCII行直接按字符切分"""
+    if line.isascii():
+        return [line[start:end].strip() for start, end in zip(starts, starts[1:] + [None])]
+
+    offsets = _cell_offsets(line)
+    values = []
+    char_index = 0
+    for i, start in enumerate(starts):
+        while char_index < len(line) and offsets[char_index] < start:
+            char_index += 1
+        begin = char_index
+        if i + 1 < len(starts):
+            end = begin
+            while end < len(line) and offsets[end] < starts[i + 1]:
+                end += 1
+            values.append(line[begin:end].strip())
+            char_index = end
+        else:
+            values.append(line[begin:].strip())
+    return values
+
+def parse_fixed_width_table(text, header=None):
+    """
+    解析按列对齐的表格输出（如 wmic ... get、net share、driverquery /fo table），一次遍历得到列数组
+
+    列边界取自标题中各列名的起始位置（列名内部只允许单个空格），标题下方由多段 - 或 = 组成的分隔行
+    会优先用于确定边界；位置按控制台列计算，因此标题或值中的中文不会造成错位
+
+    参数:
+    - text: 命令输出
+    - header: 标题行的前缀，为None时使用第一个非空行
+
+    返回:
+    - 列名到值列表的字典，各列长度相同
+    """
+    lines = _lines(text)
+    header_index = None
+    for i, line in enumerate(lines):
+        if not line.strip():
+            continue
+        if header is None or line.lstrip().startswith(header):
+            header_index = i
+            break
+    if header_index is None:
+        return {}
+
+    header_line = lines[header_index]
+    header_offsets = _cell_offsets(header_line)
+    fields = [(header_offsets[m.start()], m.group()) for m in _HEADER_FIELD.finditer(header_line)]
+    starts = [start for start, _ in fields]
+    names = [name for _, name in fields]
+
+    body = lines[header_index + 1:]
+    # 分隔行（可能与标题之间隔一个空行）
+    for i, line in enumerate(body[:2]):
+        if line.strip() and _SEPARATOR_LINE.match(line):
+            segments = [m.start() for m in re.finditer(r'[=-]+', line)]
+            if len(segments) == len(names):
+                starts = segments
+            body = body[i + 1:]
+            break
+
+    columns = {name: [] for name in names}
+    targets = [columns[name] for name in names]
+    for line in body:
+        if not line.strip():
+            continue
+        for target, value in zip(targets, _slice_cells(line, starts)):
+            target.append(value)
+    return columns
+
+def parse_list_blocks(text, separator="="):
+    """
+    解析由空行分隔的"键=值"块（如 wmic ... /format:list、driverquery /fo list 的"键: 值"），一次遍历得到列数组
+
+    参数:
+    - text: 命令输出
+    - separator: 键与值之间的分隔符，按第一次出现的位置切分
+
+    返回:
+    - 列名到值列表的字典，各列长度相同；某块缺少的键对应值为None
+    """
+    columns = {}
+    count = 0
+    in_block = False
+
+    for line in _lines(text):
+        if not line.strip():
+            if in_block:
+                count += 1
+                in_block = False
+            continue
+        if separator not in line:
+            continue
+        key, value = line.split(separator, 1)
+        in_block = True
+        column = columns.setdefault(key.strip(), [])
+        if len(column) > count:
+            # 同一块中重复的键，保留第一次出现的值
+            continue
+        # 补齐前面的块中缺少此键的位置
+        column.extend([None] * (count - len(column)))
+        column.append(value.strip())
+
+    if in_block:
+        count += 1
+    for column in columns.values():
+        column.extend([None] * (count - len(column)))
+    return columns
+
+def iter_rows(columns):
+    """
+    把列数组逐行转换为字典
+
+    参数:
+    - columns: parse_* 函数返回的列名到值列表的字典
+
+    返回:
+    - 生成器，逐个产出 {列名: 值} 字典
+    """
+    names = list(columns)
+    for values in zip(*(columns[name] for name in names)):
+        yield dict(zip(names, values))
+
+def row_count(columns):
+    """列数组中的行数"""
+    return len(next(iter(columns.values()))) if columns else 0
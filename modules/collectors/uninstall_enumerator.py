@@ -0,0 +1,151 @@
+import queue
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .. import registry_backend
+from .. import registry_snapshot
+from .. import resource_accounting
+from ..config import SOFTWARE_HIVE_WORKERS
+
+UNINSTALL_PATH = r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall"
+UNINSTALL_PATH_32 = r"SOFTWARE\WOW6432Node\Microsoft\Windows\CurrentVersion\Uninstall"
+
+# 软件采集器使用的卸载项字段
+DEFAULT_FIELDS = ("DisplayName", "DisplayVersion", "Publisher", "InstallDate", "InstallLocation", "UninstallString")
+
+# 一个卸载项：location为 (根键名, 路径, 视图)，同一位置的所有卸载项共用一个元组；
+# values按请求的字段顺序排列，不存在的值为None
+UninstallEntry = namedtuple("UninstallEntry", ["location", "subkey", "values"])
+
+# 一个带名称的卸载项位置，可以代替 (根键名, 路径, 视图) 传给iter_uninstall_entries；
+# hive为记录在软件信息中的来源，如 HKLM\64、HKCU、HKU\S-1-5-21-...
+SoftwareHive = namedtuple("SoftwareHive", ["root", "path", "view", "hive"])
+
+def iter_uninstall_entries(locations, fields=DEFAULT_FIELDS, require="DisplayName"):
+    """
+    逐个返回卸载注册表项，每个子键只打开一次、只做一次值枚举，不存在的值不经过异常处理；
+    启用注册表快照缓存时，最后写入时间与上次运行相同的子键直接使用快照中的值，不再枚举
+
+    参数:
+    - locations: (根键名, 路径, 视图) 的列表，视图为"64"、"32"或None
+    - fields: 要读取的值名
+    - require: 必须存在的字段（须在fields中），缺少该值的子键被跳过；None时不跳过
+
+    返回:
+    - UninstallEntry的生成器；无法打开的位置和子键被跳过
+    """
+    wanted = {name.lower(): index for index, name in enumerate(fields)}
+    required = wanted[require.lower()] if require else None
+    for location in locations:
+        root, path, view = location[:3]
+        try:
+            key = registry_backend.open_key(root, path, view)
+        except (OSError, ImportError) as e:
+            logging.debug(f"Cannot open registry key {root}\\{path}: {e}")
+            continue
+        backend = registry_backend.get_registry_backend()
+        # 离线hive等文件后端：键中还包括提供该位置的文件，不同镜像中的同一路径不共用记录
+        location_identity = getattr(backend, "location_identity", None)
+        source = location_identity(root, path, view) if location_identity is not None else ""
+        snapshot = registry_snapshot.get_location_snapshot(
+            registry_snapshot.location_key(getattr(backend, "name", ""), root, path, view, fields, source))
+        complete = False
+        try:
+            with key:
+                for subkey_name in key.subkey_names():
+                    try:
+                        with key.open(subkey_name) as subkey:
+                            if snapshot is None:
+                                values = subkey.project_values(wanted, len(fields))
+                            else:
+                                _, value_count, last_write = subkey.info()
+                                values = snapshot.lookup(subkey_name, last_write)
+                                if values is None:
+                                    values = subkey.project_values(wanted, len(fields), value_count)
+                                    snapshot.store(subkey_name, last_write, values)
+                    except OSError:
+                        continue
+                    if required is not None and values[required] is None:
+                        continue
+                    yield UninstallEntry(location, subkey_name, values)
+            complete = True
+        finally:
+            if snapshot is not None:
+                snapshot.finish(complete)
+
+def list_software_hives():
+    """
+    列出要读取的卸载项位置：HKLM的64位和32位视图、HKCU，以及HKEY_USERS下每个已加载的用户配置（SID）
+
+    返回:
+    - SoftwareHive列表；无法列出HKEY_USERS时只包含前三项
+    """
+    hives = [
+        SoftwareHive(registry_backend.HKEY_LOCAL_MACHINE, UNINSTALL_PATH, "64", "HKLM\\64"),
+        SoftwareHive(registry_backend.HKEY_LOCAL_MACHINE, UNINSTALL_PATH_32, "32", "HKLM\\32"),
+        SoftwareHive(registry_backend.HKEY_CURRENT_USER, UNINSTALL_PATH, None, "HKCU"),
+    ]
+    try:
+        with registry_backend.open_key(registry_backend.HKEY_USERS, "") as users:
+            sids = users.subkey_names()
+    except (OSError, ImportError) as e:
+        logging.debug(f"Cannot list loaded user profiles: {e}")
+        return hives
+    for sid in sids:
+        # SID_Classes是用户的类注册表，不含Software\Microsoft
+        if sid.lower().endswith("_classes"):
+            continue
+        hives.append(SoftwareHive(registry_backend.HKEY_USERS, f"{sid}\\{UNINSTALL_PATH}", None, f"HKU\\{sid}"))
+    return hives
+
+def iter_hive_entries(hives, fields=DEFAULT_FIELDS, require="DisplayName", max_workers=SOFTWARE_HIVE_WORKERS):
+    """
+    在线程池中并发读取各位置的卸载项，读到的记录立即交给调用方
+
+    同一位置的记录按枚举顺序返回，不同位置的记录交错到达；调用方提前结束迭代时剩余的读取随之停止
+
+    参数:
+    - hives: SoftwareHive或 (根键名, 路径, 视图) 的列表
+    - fields: 要读取的值名
+    - require: 同iter_uninstall_entries
+    - max_workers: 同时读取的位置数上限
+
+    返回:
+    - UninstallEntry的生成器，entry.location为所在的位置
+    """
+    if max_workers <= 1 or len(hives) <= 1:
+        yield from iter_uninstall_entries(hives, fields, require)
+        return
+
+    results = queue.Queue()
+    stopped = threading.Event()
+    done = object()
+
+    def read_hive(hive):
+        try:
+            for entry in iter_uninstall_entries([hive], fields, require):
+                if stopped.is_set():
+                    break
+                results.put(entry)
+        except Exception as e:
+            logging.warning(f"Error reading installed software from {hive[:2]}: {e}")
+        finally:
+            results.put(done)
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(hives)), thread_name_prefix="software-hive")
+    try:
+        for hive in hives:
+            # 工作线程的CPU时间计入software等调用方采集器
+            executor.submit(resource_accounting.bind_worker(read_hive), hive)
+        remaining = len(hives)
+        while remaining:
+            entry = results.get()
+            if entry is done:
+                remaining -= 1
+            else:
+                yield entry
+    finally:
+        stopped.set()
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -1,5 +1,7 @@
 import subprocess
 
+from .tabular_parser import parse_fixed_width_table, iter_rows
+
 def get_software_from_wmic():
     """Get installed software using WMIC command"""
     try:
@@ -8,28 +10,19 @@ def get_software_from_wmic():
             capture_output=True, text=True, check=True
         )
         
-        lines = result.stdout.strip().split('\n')
-        if len(lines) <= 1:  # Only header or empty
-            return []
-        
-        # Parse header
-        header = lines[0].strip().split()
-        
+        # WMIC按列名字母顺序输出，并按最长的值对齐各列，按标题位置切分
         software_list = []
-        for line in lines[1:]:
-            if line.strip():
-                parts = line.strip().split('  ')
-                parts = [p for p in parts if p]
-                
-                if len(parts) >= 3:
-                    software_info = {
-                        "DisplayName": parts[0],
-                        "DisplayVersion": parts[1] if len(parts) > 1 else "",
-                        "Publisher": parts[2] if len(parts) > 2 else "",
-                        "InstallDate": parts[3] if len(parts) > 3 else "",
-                        "InstallLocation": ""
-                    }
-                    software_list.append(software_info)
+        for row in iter_rows(parse_fixed_width_table(result.stdout)):
+            if not row.get("Name"):
+                continue
+            software_info = {
+                "DisplayName": row["Name"],
+                "DisplayVersion": row.get("Version", ""),
+                "Publisher": row.get("Vendor", ""),
+                "InstallDate": row.get("InstallDate", ""),
+                "InstallLocation": ""
+            }
+            software_list.append(software_info)
         
         return software_list
     except Exception as e:
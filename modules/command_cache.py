@@ -0,0 +1,270 @@
+import os
+import atexit
+import re
+import json
+import time
+import uuid
+import socket
+import hashlib
+import logging
+import threading
+import subprocess
+import contextlib
+import contextvars
+from collections import OrderedDict
+
+from .config import COMMAND_CACHE_ENABLED, COMMAND_CACHE_DIR, COMMAND_CACHE_MAX_ENTRIES, COMMAND_CACHE_TTLS
+
+CACHE_FILENAME = "command_cache.json"
+CACHE_VERSION = 1
+
+_WMI_CLASS_PATTERN = re.compile(r'Win32_\w+', re.IGNORECASE)
+_TTLS = {name.lower(): ttl for name, ttl in COMMAND_CACHE_TTLS.items()}
+
+_lock = threading.Lock()
+_entries = None
+_dirty = False
+_options = {
+    "enabled": COMMAND_CACHE_ENABLED,
+    "bypass": False,
+    "refresh": False,
+    "cache_dir": COMMAND_CACHE_DIR,
+    "max_entries": COMMAND_CACHE_MAX_ENTRIES
+}
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+_section_sources = {}
+_current_sections = contextvars.ContextVar("command_cache_sections", default=())
+
+def configure_command_cache(enabled=None, bypass=None, refresh=None, cache_dir=None, max_entries=None):
+    """
+    设置命令缓存选项，未传入的选项保持不变
+
+    参数:
+    - enabled: 是否启用缓存
+    - bypass: 为True时既不读取也不写入缓存
+    - refresh: 为True时不读取缓存，但用实时结果更新缓存
+    - cache_dir: 缓存文件所在目录
+    - max_entries: 缓存条目上限，超出时淘汰最久未使用的条目
+    """
+    global _entries, _dirty
+    with _lock:
+        for key, value in (("enabled", enabled), ("bypass", bypass), ("refresh", refresh),
+                           ("cache_dir", cache_dir), ("max_entries", max_entries)):
+            if value is not None:
+                _options[key] = value
+        if cache_dir is not None:
+            _entries = None
+            _dirty = False
+
+def get_host_identity():
+    """获取主机标识（主机名和网卡地址），避免不同机器共用缓存目录时串用结果"""
+    return f"{socket.gethostname().lower()}|{uuid.getnode():012x}"
+
+def normalize_command(command):
+    """
+    规范化命令文本：合并空白；参数列表形式的命令只保留可执行文件名
+
+    参数:
+    - command: PowerShell命令字符串或命令行参数列表
+
+    返回:
+    - 规范化后的字符串
+    """
+    if isinstance(command, (list, tuple)):
+        parts = [os.path.basename(str(command[0])).lower()] + [str(p) for p in command[1:]]
+        return " ".join(parts)
+    return " ".join(command.split())
+
+def get_command_ttl(command):
+    """
+    根据命令涉及的WMI类确定缓存有效期
+
+    参数:
+    - command: PowerShell命令字符串或命令行参数列表
+
+    返回:
+    - 有效期（秒），0表示不缓存
+    """
+    text = normalize_command(command)
+    classes = {name.lower() for name in _WMI_CLASS_PATTERN.findall(text)}
+    if not classes or any(name not in _TTLS for name in classes):
+        return 0
+    return min(_TTLS[name] for name in classes)
+
+def _make_key(kind, command):
+    """由命令类型、主机标识和规范化命令生成缓存键"""
+    raw = f"{kind}\n{get_host_identity()}\n{normalize_command(command)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _cache_path():
+    return os.path.join(_options["cache_dir"], CACHE_FILENAME)
+
+def _load_entries():
+    """按最近使用时间从旧到新加载缓存条目，调用方需持有锁"""
+    global _entries
+    if _entries is not None:
+        return _entries
+
+    _entries = OrderedDict()
+    try:
+        with open(_cache_path(), 'r', encoding='utf-8') as f:
+            document = json.load(f)
+        if document.get("version") == CACHE_VERSION:
+            for key, entry in sorted(document.get("entries", {}).items(), key=lambda item: item[1].get("last_used", 0)):
+                _entries[key] = entry
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, AttributeError) as e:
+        logging.warning(f"Ignoring unreadable command cache {_cache_path()}: {e}")
+    return _entries
+
+def _save_entries():
+    """原子地写回缓存文件，调用方需持有锁"""
+    global _dirty
+    if _entries is None or not _dirty:
+        return
+    try:
+        os.makedirs(_options["cache_dir"], exist_ok=True)
+        path = _cache_path()
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": CACHE_VERSION, "entries": dict(_entries)}, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+        _dirty = False
+    except OSError as e:
+        logging.warning(f"Could not write command cache {_cache_path()}: {e}")
+
+def _record_source(from_cache):
+    """记录当前分区的数据来源，分区内任意一条命令实时执行即视为live"""
+    for section in _current_sections.get():
+        if _section_sources.get(section) != "live":
+            _section_sources[section] = "cache" if from_cache else "live"
+
+@contextlib.contextmanager
+def cache_section(*sections):
+    """
+    标记当前正在采集的分区，其中执行的命令的缓存命中情况计入这些分区
+
+    参数:
+    - sections: 分区名
+    """
+    token = _current_sections.set(_current_sections.get() + sections)
+    try:
+        yield
+    finally:
+        _current_sections.reset(token)
+        with _lock:
+            # 没有执行任何命令的分区（如只用psutil）视为实时采集
+            for section in sections:
+                _section_sources.setdefault(section, "live")
+
+def current_sections():
+    """当前正在采集的分区名，由外到内"""
+    return _current_sections.get()
+
+def lookup(kind, command):
+    """
+    查找未过期的缓存结果
+
+    参数:
+    - kind: 命令类型，如 "powershell" 或 "wmic"
+    - command: PowerShell命令字符串或命令行参数列表
+
+    返回:
+    - 命中时返回subprocess.CompletedProcess对象（from_cache属性为True），否则返回None
+    """
+    global _dirty
+    ttl = get_command_ttl(command)
+    if not _options["enabled"] or _options["bypass"] or _options["refresh"] or ttl <= 0:
+        return None
+
+    key = _make_key(kind, command)
+    now = time.time()
+    with _lock:
+        entries = _load_entries()
+        entry = entries.get(key)
+        if entry is not None and now - entry["created"] < min(ttl, entry["ttl"]):
+            entries.move_to_end(key)
+            entry["last_used"] = now
+            _dirty = True
+            _stats["hits"] += 1
+            _record_source(True)
+            result = subprocess.CompletedProcess(entry["args"], returncode=0, stdout=entry["stdout"], stderr=entry["stderr"])
+            result.from_cache = True
+            return result
+
+        if entry is not None:
+            del entries[key]
+            _dirty = True
+        _stats["misses"] += 1
+        return None
+
+def store(kind, command, result):
+    """
+    保存实时执行的结果；只缓存成功且有输出、并且配置了有效期的命令
+
+    参数:
+    - kind: 命令类型，如 "powershell" 或 "wmic"
+    - command: PowerShell命令字符串或命令行参数列表
+    - result: subprocess.CompletedProcess对象
+    """
+    global _dirty
+    with _lock:
+        _record_source(False)
+
+    ttl = get_command_ttl(command)
+    if (not _options["enabled"] or _options["bypass"] or ttl <= 0
+            or result.returncode != 0 or not (result.stdout or "").strip()):
+        return
+
+    key = _make_key(kind, command)
+    now = time.time()
+    with _lock:
+        entries = _load_entries()
+        entries[key] = {
+            "kind": kind,
+            "command": normalize_command(command)[:200],
+            "args": list(result.args) if isinstance(result.args, (list, tuple)) else result.args,
+            "stdout": result.stdout,
+            "stderr": result.stderr or "",
+            "ttl": ttl,
+            "created": now,
+            "last_used": now
+        }
+        entries.move_to_end(key)
+        _stats["stores"] += 1
+        while len(entries) > _options["max_entries"]:
+            entries.popitem(last=False)
+            _stats["evictions"] += 1
+        _dirty = True
+        _save_entries()
+
+def flush():
+    """把内存中更新过的最近使用时间写回磁盘"""
+    with _lock:
+        _save_entries()
+
+def get_cache_summary():
+    """
+    获取本次运行的缓存统计
+
+    返回:
+    - 字典，包含缓存模式、命中/未命中/写入/淘汰次数，以及各分区的数据来源（cache或live）
+    """
+    with _lock:
+        mode = "bypass" if _options["bypass"] else "refresh" if _options["refresh"] else "normal"
+        return {
+            "enabled": _options["enabled"],
+            "mode": mode,
+            **_stats,
+            "sections": dict(_section_sources)
+        }
+
+def reset_command_cache_stats():
+    """清除本次运行的统计和分区来源记录"""
+    with _lock:
+        for key in _stats:
+            _stats[key] = 0
+        _section_sources.clear()
+
+atexit.register(flush)
@@ -0,0 +1,526 @@
+import os
+import re
+import sys
+import json
+import time
+import atexit
+import logging
+import threading
+import subprocess
+import contextlib
+import contextvars
+
+from .config import COMMAND_TRACE_SUMMARY_LIMIT
+from . import command_cache
+from . import resource_accounting
+
+TRACE_FILENAME = "trace.jsonl"
+SUMMARY_FILENAME = "trace_summary.json"
+
+# 调用方定位时跳过的通用执行函数（不是具体的采集函数）
+_RUNNER_PREFIXES = ("run_", "stream_", "_", "<")
+
+# 值需要脱敏的参数名，如 -Password xxx、key=xxx、/p:xxx
+_SECRET_NAME = re.compile(r'(password|passwd|pwd|secret|token|credential|apikey|api_key)', re.IGNORECASE)
+_SECRET_ASSIGNMENT = re.compile(r'((?:password|passwd|pwd|secret|token|credential|apikey|api_key)\s*[=:]\s*)("[^"]*"|\'[^\']*\'|\S+)',
+                                re.IGNORECASE)
+_ENCODED_FLAGS = ("-encodedcommand", "-enc", "-e", "-ec")
+MAX_ARG_LENGTH = 200
+
+_lock = threading.Lock()
+_original_popen = subprocess.Popen
+_state = {"file": None, "path": None, "records": []}
+_current_record = contextvars.ContextVar("command_trace_record", default=None)
+
+def is_tracing():
+    """当前是否在记录命令跟踪"""
+    return _state["file"] is not None
+
+def redact_argv(argv):
+    """
+    对命令行脱敏后用于跟踪文件
+
+    密码、令牌之类参数的值替换为***，-EncodedCommand的负载和过长的参数被截断，用户目录替换为~
+
+    参数:
+    - argv: 命令行参数列表或shell命令字符串
+
+    返回:
+    - 脱敏后的参数列表
+    """
+    if isinstance(argv, (str, bytes)):
+        argv = [os.fsdecode(argv)]
+    home = os.path.expanduser("~")
+    executable = os.path.basename(str(argv[0]).replace("\\", "/")).lower() if argv else ""
+    is_powershell = executable.startswith(("powershell", "pwsh"))
+    redacted = []
+    hide_next = False
+    for arg in argv:
+        arg = os.fsdecode(arg) if isinstance(arg, (bytes, os.PathLike)) else str(arg)
+        if hide_next:
+            redacted.append(f"<{len(arg)} chars>" if hide_next == "encoded" else "***")
+            hide_next = False
+            continue
+        lowered = arg.lower()
+        if is_powershell and lowered in _ENCODED_FLAGS:
+            hide_next = "encoded"
+        elif arg.startswith(("-", "/")) and _SECRET_NAME.search(arg) and not re.search(r'[=:]', arg):
+            hide_next = "secret"
+        arg = _SECRET_ASSIGNMENT.sub(lambda m: m.group(1) + "***", arg)
+        if home and home != "~":
+            arg = arg.replace(home, "~")
+        if len(arg) > MAX_ARG_LENGTH:
+            arg = arg[:MAX_ARG_LENGTH] + f"...<{len(arg)} chars>"
+        redacted.append(arg)
+    return redacted
+
+def _find_collector():
+    """从调用栈中找到发起命令的采集函数，找不到时使用当前采集分区名"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        function = frame.f_code.co_name
+        parts = module.split(".")
+        if len(parts) >= 2 and parts[-2] == "collectors" and not function.startswith(_RUNNER_PREFIXES):
+            return f"{parts[-1]}.{function}"
+        frame = frame.f_back
+    sections = command_cache.current_sections()
+    return sections[-1] if sections else None
+
+def _output_size(value):
+    """标准输出/错误的字节数"""
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value.encode('utf-8', errors='ignore'))
+    return len(value)
+
+def process_cpu_seconds(pid):
+    """
+    进程已使用的CPU时间（用户态+内核态），进程不存在或无权限时返回None
+
+    参数:
+    - pid: 进程ID，在POSIX系统上已退出但尚未回收的子进程也可以读取
+    """
+    # 只在跟踪或资源统计时才用到，避免每次导入都加载psutil
+    import psutil
+    try:
+        times = psutil.Process(pid).cpu_times()
+        return times.user + times.system
+    except (psutil.Error, OSError):
+        return None
+
+def _windows_handle_cpu_seconds(handle):
+    """通过进程句柄读取已退出子进程的CPU时间（Windows）"""
+    import ctypes
+    from ctypes import wintypes
+    creation, exit_time, kernel, user = (wintypes.FILETIME() for _ in range(4))
+    ok = ctypes.windll.kernel32.GetProcessTimes(
+        wintypes.HANDLE(int(handle)), ctypes.byref(creation), ctypes.byref(exit_time),
+        ctypes.byref(kernel), ctypes.byref(user)
+    )
+    if not ok:
+        return None
+    to_seconds = lambda ft: ((ft.dwHighDateTime << 32) + ft.dwLowDateTime) / 1e7
+    return to_seconds(kernel) + to_seconds(user)
+
+class CommandRecord:
+    """一次外部命令调用的跟踪记录"""
+
+    def __init__(self, kind, argv, collector=None):
+        """
+        初始化记录
+
+        参数:
+        - kind: 命令类型，如 "powershell"、"wmic"、"subprocess"
+        - argv: 命令行参数列表（写入前脱敏）
+        - collector: 发起命令的采集函数，None时从调用栈推断
+        """
+        self.kind = kind
+        self.argv = redact_argv(argv)
+        self.collector = collector or _find_collector()
+        self.started = time.perf_counter()
+        self.wall_seconds = None
+        self.cpu_seconds = None
+        self.stdout_bytes = 0
+        self.stderr_bytes = 0
+        self.returncode = None
+        self.timed_out = False
+
+    def add_cpu(self, seconds):
+        """累加子进程CPU时间"""
+        if seconds is not None:
+            self.cpu_seconds = (self.cpu_seconds or 0) + seconds
+
+    def set_result(self, result):
+        """
+        从subprocess.CompletedProcess填充返回码和输出大小
+
+        参数:
+        - result: subprocess.CompletedProcess对象
+        """
+        self.returncode = result.returncode
+        self.stdout_bytes = _output_size(result.stdout)
+        self.stderr_bytes = _output_size(result.stderr)
+        if "timed out" in (result.stderr or "") and result.returncode != 0:
+            self.timed_out = True
+
+    def set_output(self, returncode, stdout=None, stderr=None):
+        """
+        填充返回码和输出大小，用于没有CompletedProcess的调用（如check_output的结果或CalledProcessError）
+
+        参数:
+        - returncode: 返回码，命令未能启动时为None
+        - stdout, stderr: 标准输出和错误（字符串或字节），None为未捕获
+        """
+        self.returncode = returncode
+        self.stdout_bytes = _output_size(stdout)
+        self.stderr_bytes = _output_size(stderr)
+
+    def merge(self, entry):
+        """
+        用另一个进程中测量的记录（to_dict的结果，如隔离工作进程中运行的命令）填充耗时、CPU时间、输出大小、返回码和超时
+
+        参数:
+        - entry: 记录字典
+        """
+        self.wall_seconds = entry["wall_seconds"]
+        self.add_cpu(entry["cpu_seconds"])
+        self.stdout_bytes = entry["stdout_bytes"]
+        self.stderr_bytes = entry["stderr_bytes"]
+        self.returncode = entry["returncode"]
+        self.timed_out = self.timed_out or entry["timed_out"]
+
+    def to_dict(self):
+        return {
+            "kind": self.kind,
+            "argv": self.argv,
+            "collector": self.collector,
+            "wall_seconds": round(self.wall_seconds, 4) if self.wall_seconds is not None else None,
+            "cpu_seconds": round(self.cpu_seconds, 4) if self.cpu_seconds is not None else None,
+            "stdout_bytes": self.stdout_bytes,
+            "stderr_bytes": self.stderr_bytes,
+            "returncode": self.returncode,
+            "timed_out": self.timed_out
+        }
+
+def _write(record):
+    """把完成的记录追加到跟踪文件"""
+    entry = record.to_dict()
+    with _lock:
+        trace_file = _state["file"]
+        if trace_file is None:
+            return
+        trace_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        trace_file.flush()
+        _state["records"].append(entry)
+
+def begin_command(kind, argv, collector=None):
+    """
+    开始一条跟踪记录，用于不能把整个调用包在with语句中的情况（如生成器）
+
+    参数:
+    - kind: 命令类型
+    - argv: 命令行参数列表
+    - collector: 发起命令的采集函数，None时从调用栈推断
+
+    返回:
+    - CommandRecord，未在跟踪或已在另一条记录范围内时返回None
+    """
+    if not is_tracing() or _current_record.get() is not None:
+        return None
+    return CommandRecord(kind, argv, collector)
+
+@contextlib.contextmanager
+def attach(record):
+    """
+    在范围内启动的子进程把CPU时间计入record，不再单独记录
+
+    参数:
+    - record: begin_command返回的记录，None时不做任何事
+    """
+    if record is None:
+        yield
+        return
+    token = _current_record.set(record)
+    try:
+        yield
+    finally:
+        _current_record.reset(token)
+
+def finish_command(record):
+    """
+    结束并写出begin_command开始的记录，耗时未由merge填充时取从开始到现在的时间
+
+    参数:
+    - record: begin_command返回的记录，None时不做任何事
+    """
+    if record is None:
+        return
+    if record.wall_seconds is None:
+        record.wall_seconds = time.perf_counter() - record.started
+    _write(record)
+
+@contextlib.contextmanager
+def trace_command(kind, argv, collector=None):
+    """
+    跟踪一次外部命令调用；其中启动的子进程的CPU时间计入这条记录，不再单独记录
+
+    参数:
+    - kind: 命令类型
+    - argv: 命令行参数列表
+    - collector: 发起命令的采集函数，None时从调用栈推断
+
+    返回:
+    - 上下文管理器，as得到CommandRecord（未在跟踪时为None），调用方用set_result填充结果
+    """
+    record = begin_command(kind, argv, collector)
+    try:
+        with attach(record):
+            yield record
+    except subprocess.TimeoutExpired:
+        if record is not None:
+            record.timed_out = True
+        raise
+    finally:
+        finish_command(record)
+
+def current_record():
+    """当前trace_command范围内的记录，不在范围内时返回None"""
+    return _current_record.get()
+
+class TracedPopen(subprocess.Popen):
+    """
+    记录耗时、子进程CPU时间、输出大小和超时的Popen
+
+    跟踪期间替换subprocess.Popen，因此采集器中直接调用的subprocess.run/check_output也会被记录
+    """
+
+    def __init__(self, args, *posargs, **kwargs):
+        self._trace_outer = _current_record.get()
+        self._account = resource_accounting.current_account()
+        self._trace_record = None
+        self._trace_written = False
+        self._trace_communicating = False
+        if self._trace_outer is None and is_tracing():
+            self._trace_record = CommandRecord("subprocess", args)
+        super().__init__(args, *posargs, **kwargs)
+        if self._account is not None:
+            self._account.add_child_process()
+
+    def communicate(self, input=None, timeout=None):
+        # communicate内部会调用wait，输出大小统计完之后才写出记录
+        self._trace_communicating = True
+        try:
+            stdout, stderr = super().communicate(input, timeout)
+        except subprocess.TimeoutExpired:
+            if self._trace_record is not None:
+                self._trace_record.timed_out = True
+            raise
+        finally:
+            self._trace_communicating = False
+        if self._trace_record is not None:
+            self._trace_record.stdout_bytes += _output_size(stdout)
+            self._trace_record.stderr_bytes += _output_size(stderr)
+            self._write_trace()
+        return stdout, stderr
+
+    def _write_trace(self):
+        """子进程已退出时写出自身的记录（只写一次）"""
+        if self._trace_record is None or self._trace_written or self.returncode is None:
+            return
+        self._trace_written = True
+        self._trace_record.returncode = self.returncode
+        self._trace_record.wall_seconds = time.perf_counter() - self._trace_record.started
+        _write(self._trace_record)
+
+    def _wait_for_exit(self, timeout):
+        """等待子进程退出但不回收（POSIX），以便读取僵尸进程的CPU时间；超时返回False"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        delay = 0.0005
+        while True:
+            flags = os.WEXITED | os.WNOWAIT | (os.WNOHANG if deadline is not None else 0)
+            try:
+                if os.waitid(os.P_PID, self.pid, flags) is not None:
+                    return True
+            except ChildProcessError:
+                return False
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.05)
+
+    def wait(self, timeout=None):
+        target = self._trace_record or self._trace_outer
+        if (target is None and self._account is None) or self.returncode is not None:
+            return super().wait(timeout)
+
+        cpu = None
+        if sys.platform != "win32" and hasattr(os, "waitid"):
+            if self._wait_for_exit(timeout):
+                cpu = process_cpu_seconds(self.pid)
+        returncode = super().wait(timeout)
+        if sys.platform == "win32":
+            try:
+                cpu = _windows_handle_cpu_seconds(self._handle)
+            except (AttributeError, OSError):
+                cpu = None
+
+        if target is not None:
+            target.add_cpu(cpu)
+        if self._account is not None:
+            self._account.add_child_cpu(cpu)
+        if not self._trace_communicating:
+            self._write_trace()
+        return returncode
+
+def start_trace(logs_dir):
+    """
+    开始记录外部命令跟踪，写入 logs_dir/trace.jsonl
+
+    参数:
+    - logs_dir: 日志目录，如 Report/<时间戳>/logs
+
+    返回:
+    - 跟踪文件路径
+    """
+    stop_trace()
+    os.makedirs(logs_dir, exist_ok=True)
+    path = os.path.join(logs_dir, TRACE_FILENAME)
+    with _lock:
+        _state["file"] = open(path, 'w', encoding='utf-8')
+        _state["path"] = path
+        _state["records"] = []
+    install_popen_hook()
+    logging.debug(f"Tracing external commands to {path}")
+    return path
+
+def install_popen_hook():
+    """
+    用TracedPopen替换subprocess.Popen（已替换时不做任何事），跟踪和资源统计都通过它记录子进程；
+    已被替换的Popen（如回放模式）在这一层之下继续生效
+    """
+    base = subprocess.Popen
+    if isinstance(base, type) and issubclass(base, TracedPopen):
+        return
+    subprocess.Popen = TracedPopen if base is _original_popen else type("TracedPopen", (TracedPopen, base), {})
+
+def stop_trace():
+    """
+    停止跟踪，恢复subprocess.Popen，并在跟踪文件旁写出按耗时排序的汇总
+
+    返回:
+    - get_trace_summary的结果，未在跟踪时返回None
+    """
+    if isinstance(subprocess.Popen, type) and issubclass(subprocess.Popen, TracedPopen):
+        # 恢复当前钩子包装的那一层，而不是某次安装时记下的Popen（那可能是已经结束的回放替身）
+        subprocess.Popen = subprocess.Popen.__bases__[-1]
+    with _lock:
+        trace_file = _state["file"]
+        if trace_file is None:
+            return None
+        trace_file.close()
+        _state["file"] = None
+
+    summary = get_trace_summary()
+    summary_path = os.path.join(os.path.dirname(_state["path"]), SUMMARY_FILENAME)
+    try:
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+    except OSError as e:
+        logging.warning(f"Could not write command trace summary {summary_path}: {e}")
+    return summary
+
+atexit.register(stop_trace)
+
+def _command_label(entry):
+    """汇总时用于归并同一条命令的标签：可执行文件名加上去掉空白差异的参数"""
+    argv = entry["argv"]
+    if not argv:
+        return entry["kind"]
+    executable = os.path.basename(argv[0].replace("\\", "/"))
+    label = " ".join([executable] + argv[1:])
+    return " ".join(label.split())[:120]
+
+def get_trace_summary(records=None, limit=COMMAND_TRACE_SUMMARY_LIMIT):
+    """
+    按命令汇总跟踪记录，按总耗时从高到低排序
+
+    参数:
+    - records: 记录字典列表，None时使用本次运行的记录
+    - limit: 汇总表最多保留的命令数
+
+    返回:
+    - 字典，包含总调用数、总耗时、总CPU时间、超时次数，以及每条命令的调用次数、耗时、CPU、输出大小和调用方
+    """
+    if records is None:
+        with _lock:
+            records = list(_state["records"])
+
+    commands = {}
+    for entry in records:
+        label = _command_label(entry)
+        item = commands.setdefault(label, {
+            "command": label,
+            "kind": entry["kind"],
+            "calls": 0,
+            "wall_seconds": 0.0,
+            "max_wall_seconds": 0.0,
+            "cpu_seconds": 0.0,
+            "stdout_bytes": 0,
+            "stderr_bytes": 0,
+            "failures": 0,
+            "timeouts": 0,
+            "collectors": []
+        })
+        wall = entry.get("wall_seconds") or 0.0
+        item["calls"] += 1
+        item["wall_seconds"] += wall
+        item["max_wall_seconds"] = max(item["max_wall_seconds"], wall)
+        item["cpu_seconds"] += entry.get("cpu_seconds") or 0.0
+        item["stdout_bytes"] += entry.get("stdout_bytes") or 0
+        item["stderr_bytes"] += entry.get("stderr_bytes") or 0
+        item["failures"] += 1 if entry.get("returncode") not in (0, None) else 0
+        item["timeouts"] += 1 if entry.get("timed_out") else 0
+        if entry.get("collector") and entry["collector"] not in item["collectors"]:
+            item["collectors"].append(entry["collector"])
+
+    ranked = sorted(commands.values(), key=lambda item: item["wall_seconds"], reverse=True)
+    for item in ranked:
+        for key in ("wall_seconds", "max_wall_seconds", "cpu_seconds"):
+            item[key] = round(item[key], 3)
+
+    return {
+        "trace_file": _state["path"],
+        "calls": len(records),
+        "wall_seconds": round(sum(entry.get("wall_seconds") or 0.0 for entry in records), 3),
+        "cpu_seconds": round(sum(entry.get("cpu_seconds") or 0.0 for entry in records), 3),
+        "timeouts": sum(1 for entry in records if entry.get("timed_out")),
+        "distinct_commands": len(ranked),
+        "top_commands": ranked[:limit]
+    }
+
+def format_trace_summary(summary):
+    """
+    把汇总格式化为按耗时排序的文本表格，用于日志和控制台
+
+    参数:
+    - summary: get_trace_summary的结果
+
+    返回:
+    - 多行字符串
+    """
+    lines = [
+        f"External commands: {summary['calls']} calls, {summary['wall_seconds']}s wall, "
+        f"{summary['cpu_seconds']}s child CPU, {summary['timeouts']} timeouts",
+        f"{'wall s':>8} {'cpu s':>8} {'calls':>5} {'out KiB':>8} {'t/o':>3}  command (collector)"
+    ]
+    for item in summary["top_commands"]:
+        collectors = ", ".join(item["collectors"][:3])
+        lines.append(
+            f"{item['wall_seconds']:>8.3f} {item['cpu_seconds']:>8.3f} {item['calls']:>5} "
+            f"{item['stdout_bytes'] / 1024:>8.1f} {item['timeouts']:>3}  {item['command'][:80]}"
+            + (f" ({collectors})" if collectors else "")
+        )
+    return "\n".join(lines)
@@ -1,3 +1,4 @@
+import os
 import datetime
 from pathlib import Path
 
@@ -23,4 +24,179 @@ COLUMN_DISPLAY_NAMES = {
     "Publisher": "Publisher",
     "InstallDate": "Install Date",
     "InstallLocation": "Install Location"
-} 
\ No newline at end of file
+} 
+# 常驻PowerShell宿主池配置
+POWERSHELL_POOL_ENABLED = True
+POWERSHELL_POOL_SIZE = 2
+POWERSHELL_POOL_MAX_COMMANDS = 200
+
+# 用一个PowerShell脚本批量查询所有硬件WMI类
+HARDWARE_BATCH_QUERY = True
+
+# 异步执行接口同时运行的子进程数量上限
+ASYNC_MAX_CONCURRENCY = 8
+
+# 命令结果磁盘缓存
+COMMAND_CACHE_ENABLED = True
+COMMAND_CACHE_DIR = os.path.join(
+    os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "PyWindowsSoftwareList"
+)
+COMMAND_CACHE_MAX_ENTRIES = 200
+
+# 各WMI类查询结果的缓存有效期（秒），命令涉及的类取最短值，涉及未列出的类时不缓存
+COMMAND_CACHE_TTLS = {
+    "Win32_BIOS": 30 * 24 * 3600,
+    "Win32_BaseBoard": 30 * 24 * 3600,
+    "Win32_Processor": 7 * 24 * 3600,
+    "Win32_PhysicalMemory": 7 * 24 * 3600,
+    "Win32_VideoController": 24 * 3600
+}
+
+# 运行时间预算（--time-budget）：各分区优先级，1最高；剩余时间按优先级权重分配
+SECTION_PRIORITIES = {
+    "software": 1,
+    "hardware_batch": 1,
+    "cpu": 1,
+    "memory": 1,
+    "disks": 1,
+    "graphics": 2,
+    "motherboard": 2,
+    "bios": 2,
+    "network_adapters": 2,
+    "user_accounts": 2,
+    "startup_items": 2,
+    "environment_variables": 1,
+    "network_configs": 2,
+    "dev_environment": 2,
+    "html_report": 1,
+    "drivers": 3,
+    "scheduled_tasks": 3,
+    "driver_backup": 3
+}
+DEFAULT_SECTION_PRIORITY = 2
+PRIORITY_WEIGHTS = {1: 4, 2: 2, 3: 1}
+
+# 低优先级分区分到的时间少于此值（秒）时直接跳过并标记为部分完成
+LOW_PRIORITY = 3
+LOW_PRIORITY_MIN_SECONDS = 5
+
+# 外部命令跟踪：每次运行写入 Report/<时间戳>/logs/trace.jsonl，结束时汇总表保留的命令数
+COMMAND_TRACE_ENABLED = True
+COMMAND_TRACE_SUMMARY_LIMIT = 15
+
+# 采集任务调度：同时运行的采集任务数上限，以及按耗时等级决定的启动顺序（数值小的先启动）
+COLLECTOR_MAX_WORKERS = 4
+COLLECTOR_COST_ORDER = {"slow": 0, "medium": 1, "fast": 2}
+
+# 第三方采集器：导入时用modules.collector_registry.register_collector登记采集器的模块，
+# 以及已安装包声明采集器的入口点组
+COLLECTOR_PLUGINS = []
+COLLECTOR_ENTRY_POINT_GROUP = "pywindowssoftwarelist.collectors"
+
+# main.py可以选择的导出格式
+EXPORT_FORMATS = ["json", "html", "markdown", "excel", "report"]
+
+# 增量采集（--incremental）：分区指纹与上次运行相同时直接复用上次的结果，状态文件与命令缓存放在同一目录
+INCREMENTAL_ENABLED = False
+INCREMENTAL_STATE_DIR = COMMAND_CACHE_DIR
+# 超过此时间（秒）的结果即使指纹未变也重新采集
+INCREMENTAL_MAX_AGE = 7 * 24 * 3600
+
+# 各分区指纹的来源，没有列出的分区每次都重新采集：
+# - ("registry", 键路径, 视图): 键及其各子键的最后写入时间和值数量
+# - ("directory", 路径): 目录及其直接子项的名称和修改时间，路径中的环境变量会被展开
+# - ("tree", 路径): 目录下所有文件的相对路径、大小和修改时间
+# - ("environment", 变量名...): 环境变量的值，不指定变量名时为全部环境变量
+# - ("path_directories",): PATH中每个目录的直接子项
+# - ("user_hives",): 软件采集器读取的每个HKEY_USERS\<SID>卸载项，与registry相同，用户配置加载或卸载时也会改变
+INCREMENTAL_FINGERPRINTS = {
+    "software": [
+        ("registry", "HKEY_LOCAL_MACHINE\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Uninstall", "64"),
+        ("registry", "HKEY_LOCAL_MACHINE\\SOFTWARE\\Wow6432Node\\Microsoft\\Windows\\CurrentVersion\\Uninstall", "32"),
+        ("registry", "HKEY_CURRENT_USER\\Software\\Microsoft\\Windows\\CurrentVersion\\Uninstall", ""),
+        # HKEY_USERS下每个已加载用户配置的卸载项
+        ("user_hives",),
+        # UWP应用
+        ("registry", "HKEY_CURRENT_USER\\Software\\Classes\\Local Settings\\Software\\Microsoft\\Windows\\CurrentVersion\\AppModel\\Repository\\Packages", "")
+    ],
+    "drivers": [
+        ("directory", "%SystemRoot%\\System32\\DriverStore\\FileRepository"),
+        ("registry", "HKEY_LOCAL_MACHINE\\SYSTEM\\CurrentControlSet\\Services", "64")
+    ],
+    "startup_items": [
+        ("registry", "HKEY_LOCAL_MACHINE\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Run", "64"),
+        ("registry", "HKEY_LOCAL_MACHINE\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Run", "32"),
+        ("registry", "HKEY_CURRENT_USER\\Software\\Microsoft\\Windows\\CurrentVersion\\Run", ""),
+        ("directory", "%APPDATA%\\Microsoft\\Windows\\Start Menu\\Programs\\Startup"),
+        ("directory", "%ProgramData%\\Microsoft\\Windows\\Start Menu\\Programs\\StartUp")
+    ],
+    "scheduled_tasks": [
+        ("tree", "%SystemRoot%\\System32\\Tasks")
+    ],
+    "dev_environment": [
+        ("environment",),
+        ("path_directories",),
+        ("directory", "%USERPROFILE%\\.vscode\\extensions"),
+        ("directory", "%APPDATA%\\npm\\node_modules")
+    ]
+}
+
+# 守护进程模式（--daemon）：采集器、命令缓存和PowerShell进程常驻内存，各分区按自己的间隔刷新，
+# 最新结果通过本机端点提供。地址为 "主机:端口"（HTTP），或 "unix:套接字路径"（支持AF_UNIX的平台）
+DAEMON_ADDRESS = "127.0.0.1:8765"
+# 每次启动生成的访问令牌写入此文件（只有当前用户可读），每个请求须带 "Authorization: Bearer <令牌>"；
+# 请求的Host头还必须是localhost、127.0.0.1、[::1]或监听地址，防止网页通过DNS重绑定读取清单
+DAEMON_TOKEN_FILE = os.path.join(COMMAND_CACHE_DIR, "daemon_token")
+# 各分区的刷新间隔（秒），没有列出的分区使用DAEMON_DEFAULT_INTERVAL
+DAEMON_REFRESH_INTERVALS = {
+    "software": 15 * 60,
+    "system_info": 60 * 60,
+    "dev_environment": 60 * 60
+}
+DAEMON_DEFAULT_INTERVAL = 30 * 60
+# 刷新限速：两次刷新之间至少间隔的秒数，刷新耗时占总时间的比例上限，
+# 以及系统CPU占用率超过此值时推迟刷新；守护进程及其启动的PowerShell进程以低优先级运行
+DAEMON_MIN_REFRESH_GAP = 30
+DAEMON_MAX_DUTY_CYCLE = 0.05
+DAEMON_CPU_BUSY_PERCENT = 70
+DAEMON_LOW_PRIORITY = True
+
+# 采集器资源统计：每个采集器的墙钟时间、CPU时间、常驻内存峰值增量、子进程数和写出的字节数，
+# 写入backup_summary.json和run_metrics.json；常驻内存按此间隔（秒）采样
+RESOURCE_ACCOUNTING_ENABLED = True
+RESOURCE_SAMPLE_INTERVAL = 0.05
+
+# 进程隔离（--isolate）：可能无限期挂起的探测（主机名解析、网络驱动器的磁盘用量、ipconfig/net、驱动和开发环境命令）
+# 在工作进程池中按硬期限运行，超过期限的工作进程连同其子进程被结束并替换，所在分区记录为超时。
+# 采集器在线程中运行，fork出的子进程可能继承被其他线程持有的锁，因此使用spawn启动工作进程
+PROBE_ISOLATION_ENABLED = False
+PROBE_ISOLATION_WORKERS = 2
+PROBE_ISOLATION_START_METHOD = "spawn"
+# 各类探测的期限（秒），没有列出的使用default
+PROBE_TIMEOUTS = {
+    "gethostbyname": 5,
+    "disk_usage": 10,
+    "ipconfig": 30,
+    "net": 30,
+    "wmic": 60,
+    "pnputil": 120,
+    "driverquery": 120,
+    "dism": 3600,
+    "default": 60
+}
+
+# 采集配置（--profile）：full运行全部探测；fast只使用直接的注册表读取、psutil和文件元数据，
+# 不启动PowerShell、WMIC或其他外部命令，用于登录脚本和全网批量清点。
+# 需要慢速探测的分区在结果中标记为 "not collected in fast profile"
+COLLECTION_PROFILES = ("full", "fast")
+DEFAULT_COLLECTION_PROFILE = "full"
+# fast配置的延迟目标（秒）：采集全部分区并写出JSON，benchmark.py在回放中检查不超过此值
+FAST_PROFILE_TARGET_SECONDS = 2.0
+
+# 已安装软件：并发读取卸载注册表项的线程数（HKLM两个视图、HKCU和HKEY_USERS下的每个已加载用户配置各为一个位置）
+SOFTWARE_HIVE_WORKERS = 8
+
+# 注册表快照缓存：卸载项每个子键的最后写入时间和读出的值保存在此目录，最后写入时间未变的子键下次直接使用快照
+REGISTRY_SNAPSHOT_ENABLED = True
+REGISTRY_SNAPSHOT_DIR = COMMAND_CACHE_DIR
@@ -0,0 +1,444 @@
+import io
+import os
+import sys
+import json
+import hmac
+import time
+import socket
+import secrets
+import ipaddress
+import logging
+import datetime
+import threading
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, unquote
+
+import psutil
+
+from .config import (DAEMON_ADDRESS, DAEMON_TOKEN_FILE, DAEMON_REFRESH_INTERVALS, DAEMON_DEFAULT_INTERVAL, DAEMON_MIN_REFRESH_GAP,
+                     DAEMON_MAX_DUTY_CYCLE, DAEMON_CPU_BUSY_PERCENT, DAEMON_LOW_PRIORITY)
+from .json_refs import dump_json
+from .command_cache import flush as flush_command_cache
+from . import collector_registry
+
+def _encode(document):
+    """用引用代替重复对象序列化为UTF-8字节，每次刷新只序列化一次，请求时直接发送"""
+    buffer = io.StringIO()
+    dump_json(document, buffer, ensure_ascii=False)
+    return buffer.getvalue().encode("utf-8")
+
+def lower_process_priority():
+    """把当前进程（及之后启动的PowerShell等子进程）降为低优先级，刷新时不与生产负载争抢CPU"""
+    try:
+        process = psutil.Process()
+        process.nice(psutil.BELOW_NORMAL_PRIORITY_CLASS if sys.platform == "win32" else 10)
+        logging.debug(f"Daemon process priority lowered to {process.nice()}")
+    except (psutil.Error, OSError) as e:
+        logging.warning(f"Could not lower daemon process priority: {e}")
+
+class InventoryDaemon:
+    """常驻内存的清单：按各分区的间隔在后台限速刷新，最新结果预先序列化，请求时只需发送字节"""
+
+    def __init__(self, sections, options=None, intervals=None, min_gap=DAEMON_MIN_REFRESH_GAP,
+                 max_duty_cycle=DAEMON_MAX_DUTY_CYCLE, busy_percent=DAEMON_CPU_BUSY_PERCENT):
+        """
+        参数:
+        - sections: 要刷新的采集器名（见collector_registry），依赖的采集器必须也在其中
+        - options: 采集器名到额外关键字参数的字典，如 {"system_info": {"sections": [...]}}
+        - intervals: 采集器名到刷新间隔（秒）的字典，默认为DAEMON_REFRESH_INTERVALS
+        - min_gap: 两次刷新之间至少间隔的秒数
+        - max_duty_cycle: 刷新耗时占总时间的比例上限，一次刷新耗时d秒后至少等待 d*(1/max_duty_cycle-1) 秒
+        - busy_percent: 系统CPU占用率超过此值时推迟刷新
+        """
+        self.sections = list(sections)
+        for name in self.sections:
+            missing = [dep for dep in collector_registry.get_collector(name)["deps"] if dep not in self.sections]
+            if missing:
+                raise ValueError(f"Collector {name} needs {', '.join(missing)}, which is not selected")
+        self.options = options or {}
+        intervals = DAEMON_REFRESH_INTERVALS if intervals is None else intervals
+        self.intervals = {name: intervals.get(name, DAEMON_DEFAULT_INTERVAL) for name in self.sections}
+        self.min_gap = min_gap
+        self.max_duty_cycle = max_duty_cycle
+        self.busy_percent = busy_percent
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._results = {}
+        self._documents = {}
+        self._snapshot = _encode({"timestamp": None, "collected_at": {}})
+        self._requested = set()
+        self._next_allowed = 0.0
+        self._state = {name: {"collected_at": None, "due": 0.0, "seconds": None, "refreshes": 0, "error": None}
+                       for name in self.sections}
+        self._stats = {"refreshes": 0, "refresh_seconds": 0.0, "deferred_busy": 0, "requests": 0}
+        self._started = time.monotonic()
+
+    def _next_section(self, now):
+        """
+        选出下一个要刷新的分区
+
+        返回:
+        - (分区名, 还需等待的秒数)；没有分区可以刷新时分区名为None
+        """
+        best = None
+        with self._lock:
+            for name in self.sections:
+                state = self._state[name]
+                deps = collector_registry.get_collector(name)["deps"]
+                # 依赖的分区还没有结果时先等依赖刷新
+                if any(self._state[dep]["collected_at"] is None for dep in deps):
+                    continue
+                due = now if name in self._requested else state["due"]
+                if best is None or due < best[1]:
+                    best = (name, due)
+            if best is None:
+                return None, self.min_gap
+            return best[0], max(best[1], self._next_allowed) - now
+
+    def _system_busy(self):
+        """系统CPU占用率（自上次调用以来）是否超过busy_percent"""
+        return psutil.cpu_percent(interval=None) > self.busy_percent
+
+    def refresh(self, name):
+        """
+        立即刷新一个分区，依赖分区使用当前快照中的结果；失败时保留上次的结果并记录错误
+
+        返回:
+        - 刷新耗时（秒）
+        """
+        entry = collector_registry.get_collector(name)
+        with self._lock:
+            deps = {dep: self._results[dep] for dep in entry["deps"]}
+            self._requested.discard(name)
+        start = time.monotonic()
+        try:
+            result = collector_registry.run_collector(name, **deps, **self.options.get(name, {}))
+            document = _encode(result)
+            error = None
+        except Exception as e:
+            logging.error(f"Daemon refresh of {name} failed: {e}", exc_info=True)
+            error = str(e)
+        seconds = time.monotonic() - start
+        flush_command_cache()
+
+        with self._lock:
+            state = self._state[name]
+            state["seconds"] = round(seconds, 3)
+            state["refreshes"] += 1
+            state["error"] = error
+            state["due"] = time.monotonic() + self.intervals[name]
+            if error is None:
+                state["collected_at"] = datetime.datetime.now().isoformat()
+                self._results[name] = result
+                self._documents[name] = document
+                self._snapshot = _encode({
+                    "timestamp": state["collected_at"],
+                    "collected_at": {section: self._state[section]["collected_at"] for section in self.sections
+                                     if section in self._results},
+                    **{collector_registry.get_collector(section)["report_key"]: self._results[section]
+                       for section in self.sections if section in self._results}
+                })
+            self._stats["refreshes"] += 1
+            self._stats["refresh_seconds"] += seconds
+            # 限速：刷新耗时越长，下一次刷新前等待越久
+            self._next_allowed = time.monotonic() + max(self.min_gap, seconds * (1 / self.max_duty_cycle - 1))
+        logging.info(f"Daemon refreshed {name} in {seconds:.2f}s" + (f" (failed: {error})" if error else ""))
+        # 重新开始计算CPU占用率，下一次判断不包含本次刷新自身的负载
+        psutil.cpu_percent(interval=None)
+        return seconds
+
+    def run_pending(self):
+        """
+        在限速允许时刷新一个到期的分区
+
+        返回:
+        - 刷新的分区名，没有刷新时返回None
+        """
+        name, wait = self._next_section(time.monotonic())
+        if name is None or wait > 0:
+            return None
+        if self._system_busy():
+            with self._lock:
+                self._stats["deferred_busy"] += 1
+                self._next_allowed = time.monotonic() + self.min_gap
+            logging.debug(f"Daemon refresh of {name} deferred: system CPU above {self.busy_percent}%")
+            return None
+        self.refresh(name)
+        return name
+
+    def _loop(self):
+        """后台刷新线程：一次只刷新一个分区，其余时间休眠"""
+        psutil.cpu_percent(interval=None)
+        while not self._stopping.is_set():
+            if self.run_pending() is None:
+                _, wait = self._next_section(time.monotonic())
+                self._wake.wait(max(0.05, min(wait, self.min_gap)))
+                self._wake.clear()
+
+    def start(self):
+        """启动后台刷新线程"""
+        self._thread = threading.Thread(target=self._loop, name="inventory-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """停止后台刷新线程，正在进行的刷新会先完成"""
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def request_refresh(self, name=None):
+        """
+        请求尽快刷新分区，仍然受限速约束
+
+        参数:
+        - name: 分区名，None为全部分区
+
+        返回:
+        - 是否为已知分区
+        """
+        if name is not None and name not in self._state:
+            return False
+        with self._lock:
+            self._requested.update(self.sections if name is None else [name])
+        self._wake.set()
+        return True
+
+    def snapshot(self):
+        """最新的完整清单（与complete_report_data.json结构相同，另有各分区的采集时间），UTF-8 JSON字节"""
+        with self._lock:
+            self._stats["requests"] += 1
+            return self._snapshot
+
+    def section_document(self, name):
+        """
+        一个分区的最新结果
+
+        返回:
+        - UTF-8 JSON字节；分区未知或还没有结果时返回None
+        """
+        with self._lock:
+            self._stats["requests"] += 1
+            return self._documents.get(name)
+
+    def status(self):
+        """
+        各分区的采集时间、距离下次刷新的秒数、耗时和错误，以及刷新和限速统计
+
+        返回:
+        - 状态字典
+        """
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "uptime_seconds": round(now - self._started, 3),
+                "pid": os.getpid(),
+                "sections": {name: {
+                    "collected_at": state["collected_at"],
+                    "next_refresh_seconds": round(max(0.0, state["due"] - now), 3),
+                    "interval_seconds": self.intervals[name],
+                    "last_seconds": state["seconds"],
+                    "refreshes": state["refreshes"],
+                    "error": state["error"],
+                    "requested": name in self._requested
+                } for name, state in self._state.items()},
+                "rate_limit": {
+                    "min_gap_seconds": self.min_gap,
+                    "max_duty_cycle": self.max_duty_cycle,
+                    "busy_percent": self.busy_percent,
+                    "next_allowed_seconds": round(max(0.0, self._next_allowed - now), 3)
+                },
+                **{key: round(value, 3) if isinstance(value, float) else value for key, value in self._stats.items()}
+            }
+
+# 总是接受的Host头（不含端口），监听地址另外加入
+LOCAL_HOST_NAMES = ("localhost", "127.0.0.1", "[::1]")
+
+def write_token_file(path):
+    """
+    生成随机访问令牌，写入只有当前用户可读写的新文件（Windows上文件位于用户自己的LOCALAPPDATA下）
+
+    参数:
+    - path: 令牌文件路径，已存在的文件先删除，不沿用其权限
+
+    返回:
+    - 令牌字符串
+    """
+    token = secrets.token_urlsafe(32)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if os.path.lexists(path):
+        os.unlink(path)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        f.write(token)
+    return token
+
+def _host_name(host):
+    """去掉Host头中的端口，IPv6地址保留方括号"""
+    host = host.strip().lower()
+    if host.startswith("["):
+        return host[:host.find("]") + 1]
+    return host.rpartition(":")[0] if ":" in host else host
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """
+    GET /inventory 完整清单，GET /sections/<名称> 单个分区，GET /status 刷新状态，
+    POST /refresh 或 /refresh/<名称> 请求尽快刷新；每个请求都检查Host头和访问令牌
+    """
+    server_version = "PyWindowsSoftwareList"
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _error(self, status, message):
+        self._send(status, json.dumps({"error": message}).encode("utf-8"))
+
+    def _parts(self):
+        return [unquote(part) for part in urlsplit(self.path).path.split("/") if part]
+
+    def _authorized(self):
+        """Host头不是本机名称时返回403，令牌缺失或不符时返回401"""
+        host = self.headers.get("Host", "")
+        if _host_name(host) not in self.server.allowed_hosts:
+            self._error(403, f"host {host!r} is not allowed")
+            return False
+        expected = f"Bearer {self.server.token}".encode("utf-8")
+        if not hmac.compare_digest(self.headers.get("Authorization", "").encode("utf-8", "surrogateescape"), expected):
+            self._error(401, "missing or invalid token")
+            return False
+        return True
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        inventory = self.server.inventory
+        parts = self._parts()
+        if parts in ([], ["inventory"]):
+            self._send(200, inventory.snapshot())
+        elif parts == ["status"]:
+            self._send(200, json.dumps(inventory.status(), ensure_ascii=False).encode("utf-8"))
+        elif len(parts) == 2 and parts[0] == "sections":
+            if parts[1] not in inventory.sections:
+                self._error(404, f"unknown section {parts[1]}")
+                return
+            document = inventory.section_document(parts[1])
+            if document is None:
+                self._error(503, f"section {parts[1]} has not been collected yet")
+            else:
+                self._send(200, document)
+        else:
+            self._error(404, f"unknown path {self.path}")
+
+    do_HEAD = do_GET
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        parts = self._parts()
+        if parts and parts[0] == "refresh" and len(parts) <= 2:
+            name = parts[1] if len(parts) == 2 else None
+            if self.server.inventory.request_refresh(name):
+                self._send(202, json.dumps({"requested": name or "all"}).encode("utf-8"))
+            else:
+                self._error(404, f"unknown section {name}")
+        else:
+            self._error(404, f"unknown path {self.path}")
+
+    def log_message(self, format, *args):
+        # Unix套接字没有客户端地址，不使用默认的address_string
+        logging.debug("Daemon request: " + format % args)
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """在Unix套接字上提供与HTTP端点相同的请求处理（Windows命名管道的替代）"""
+    daemon_threads = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        super().server_bind()
+        self.server_name = "localhost"
+        self.server_port = 0
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+def create_server(inventory, address=DAEMON_ADDRESS, token_file=DAEMON_TOKEN_FILE):
+    """
+    创建提供清单的本机服务器并生成访问令牌，调用方负责serve_forever和server_close
+
+    参数:
+    - inventory: InventoryDaemon
+    - address: "主机:端口" 或 "unix:套接字路径"；端口为0时由系统分配
+    - token_file: 写入访问令牌的文件
+
+    返回:
+    - 服务器对象，server.address为实际监听的地址字符串，server.token为访问令牌
+    """
+    allowed_hosts = set(LOCAL_HOST_NAMES)
+    if address.startswith("unix:"):
+        if not hasattr(socket, "AF_UNIX"):
+            raise ValueError(f"Unix sockets are not supported on this platform: {address}")
+        server = _UnixHTTPServer(address[len("unix:"):], _RequestHandler)
+        server.address = address
+    else:
+        host, _, port = address.rpartition(":")
+        server = ThreadingHTTPServer((host or "127.0.0.1", int(port)), _RequestHandler)
+        server.address = f"{server.server_address[0]}:{server.server_address[1]}"
+        bound = ipaddress.ip_address(server.server_address[0])
+        allowed_hosts.add(f"[{bound}]" if bound.version == 6 else str(bound))
+        if not bound.is_loopback:
+            logging.warning(f"Daemon endpoint {server.address} is reachable from other hosts")
+    server.inventory = inventory
+    server.allowed_hosts = allowed_hosts
+    server.token = write_token_file(token_file)
+    server.token_file = token_file
+    return server
+
+def run_daemon(sections, options=None, address=DAEMON_ADDRESS, low_priority=DAEMON_LOW_PRIORITY,
+               token_file=DAEMON_TOKEN_FILE):
+    """
+    以守护进程模式运行：后台刷新清单，在本机端点上提供最新结果，直到收到Ctrl+C
+
+    参数:
+    - sections: 要刷新的采集器名
+    - options: 采集器名到额外关键字参数的字典
+    - address: 监听地址，见create_server
+    - low_priority: 是否降低进程优先级
+    - token_file: 写入访问令牌的文件，退出时删除
+
+    返回:
+    - 退出码
+    """
+    if low_priority:
+        lower_process_priority()
+    inventory = InventoryDaemon(sections, options)
+    server = create_server(inventory, address, token_file)
+    inventory.start()
+    logging.info(f"Daemon serving {', '.join(sections)} on {server.address} "
+                 f"(GET /inventory, /sections/<name>, /status; POST /refresh); access token in {token_file}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("Daemon stopping...")
+    finally:
+        server.server_close()
+        inventory.stop()
+        try:
+            os.unlink(token_file)
+        except OSError:
+            pass
+    return 0
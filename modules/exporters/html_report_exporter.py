@@ -3,6 +3,8 @@ import json
 import os
 from pathlib import Path
 
+from ..json_refs import resolve_references
+
 def generate_html_report(data, output_path):
     """
     根据收集的系统信息生成HTML报告
@@ -156,7 +158,7 @@ def load_json_data(json_dir):
     system_info_path = json_dir / "system_info.json"
     if system_info_path.exists():
         with open(system_info_path, 'r', encoding='utf-8') as f:
-            data["system_info"] = json.load(f)
+            data["system_info"] = resolve_references(json.load(f))
     
     # 加载已安装应用程序列表
     apps_path = json_dir / "installed_apps.json"
@@ -0,0 +1,296 @@
+import os
+import json
+import time
+import atexit
+import ntpath
+import hashlib
+import logging
+import threading
+
+from .config import INCREMENTAL_ENABLED, INCREMENTAL_STATE_DIR, INCREMENTAL_MAX_AGE, INCREMENTAL_FINGERPRINTS
+from .command_cache import get_host_identity
+from . import collector_registry
+from . import registry_backend
+from .collectors.uninstall_enumerator import list_software_hives
+
+STATE_FILENAME = "incremental_state.json"
+STATE_VERSION = 1
+
+_lock = threading.Lock()
+_sections = None
+_dirty = False
+_options = {
+    "enabled": INCREMENTAL_ENABLED,
+    "state_dir": INCREMENTAL_STATE_DIR,
+    "max_age": INCREMENTAL_MAX_AGE
+}
+_stats = {"reused": {}, "collected": {}, "fingerprint_seconds": 0.0}
+
+def configure_incremental(enabled=None, state_dir=None, max_age=None):
+    """
+    设置增量采集选项，未传入的选项保持不变
+
+    参数:
+    - enabled: 是否在分区指纹未变时复用上次运行的结果
+    - state_dir: 状态文件所在目录
+    - max_age: 结果的最长复用时间（秒）
+    """
+    global _sections, _dirty
+    with _lock:
+        for key, value in (("enabled", enabled), ("state_dir", state_dir), ("max_age", max_age)):
+            if value is not None:
+                _options[key] = value
+        if state_dir is not None:
+            _sections = None
+            _dirty = False
+
+def _expand(path):
+    """展开路径中的 %变量%，存在未定义的变量时返回None"""
+    expanded = ntpath.expandvars(path)
+    return None if "%" in expanded else expanded
+
+def _registry_fingerprint(path, view):
+    """键的值数量和最后写入时间，以及每个子键的名称、值数量和最后写入时间；键不存在时返回None"""
+    root, _, sub_key = path.partition("\\")
+    try:
+        with registry_backend.open_key(root, sub_key, view) as key:
+            subkey_count, value_count, modified = key.info()
+            subkeys = []
+            for name in key.subkey_names():
+                try:
+                    with key.open(name) as subkey:
+                        info = subkey.info()
+                    subkeys.append([name, info[1], info[2]])
+                except OSError:
+                    subkeys.append([name, None, None])
+            return [value_count, modified, subkeys]
+    except OSError:
+        return None
+
+def _directory_fingerprint(path):
+    """目录及其直接子项的名称和修改时间；目录不存在时返回None"""
+    path = _expand(path)
+    if path is None:
+        return None
+    try:
+        with os.scandir(path) as entries:
+            items = sorted([entry.name, entry.stat(follow_symlinks=False).st_mtime_ns] for entry in entries)
+        return [os.stat(path).st_mtime_ns, items]
+    except OSError:
+        return None
+
+def _tree_fingerprint(path):
+    """目录下所有文件的相对路径、大小和修改时间；目录不存在时返回None"""
+    path = _expand(path)
+    if path is None or not os.path.isdir(path):
+        return None
+    files = []
+    for root, _, names in os.walk(path):
+        for name in names:
+            full_path = os.path.join(root, name)
+            try:
+                stat = os.stat(full_path)
+            except OSError:
+                continue
+            files.append([os.path.relpath(full_path, path), stat.st_size, stat.st_mtime_ns])
+    return sorted(files)
+
+def _environment_fingerprint(*names):
+    """指定环境变量的值，不指定时为全部环境变量"""
+    if names:
+        return {name: os.environ.get(name) for name in names}
+    return dict(sorted(os.environ.items()))
+
+def _path_directories_fingerprint():
+    """PATH中每个目录的直接子项"""
+    return [[directory, _directory_fingerprint(directory)]
+            for directory in os.environ.get("PATH", "").split(os.pathsep) if directory]
+
+def _user_hives_fingerprint():
+    """软件采集器读取的每个HKEY_USERS\\<SID>卸载项的指纹，位置列表与list_software_hives相同"""
+    return [[hive.hive, _registry_fingerprint(f"{hive.root}\\{hive.path}", hive.view)]
+            for hive in list_software_hives() if hive.root == registry_backend.HKEY_USERS]
+
+_SOURCES = {
+    "registry": _registry_fingerprint,
+    "directory": _directory_fingerprint,
+    "tree": _tree_fingerprint,
+    "environment": _environment_fingerprint,
+    "path_directories": _path_directories_fingerprint,
+    "user_hives": _user_hives_fingerprint
+}
+
+def _fingerprint_sources(section):
+    """分区的指纹来源：采集器登记时声明的优先，否则使用INCREMENTAL_FINGERPRINTS"""
+    entry = collector_registry.get_collector(section)
+    if entry is not None and entry["fingerprint"]:
+        return entry["fingerprint"]
+    return INCREMENTAL_FINGERPRINTS.get(section)
+
+def _max_age(section):
+    """结果的最长复用时间：采集器声明的TTL与配置的上限取较小值"""
+    entry = collector_registry.get_collector(section)
+    if entry is not None and entry["ttl"] is not None:
+        return min(entry["ttl"], _options["max_age"])
+    return _options["max_age"]
+
+def _schema_version(section):
+    entry = collector_registry.get_collector(section)
+    return entry["schema_version"] if entry is not None else 1
+
+def compute_fingerprint(section):
+    """
+    按采集器登记的或INCREMENTAL_FINGERPRINTS中的来源计算分区的指纹
+
+    参数:
+    - section: 分区名
+
+    返回:
+    - 指纹（十六进制SHA-256）；分区没有配置指纹来源或无法读取注册表时返回None
+    """
+    sources = _fingerprint_sources(section)
+    if not sources:
+        return None
+    try:
+        parts = [[kind, *args, _SOURCES[kind](*args)] for kind, *args in sources]
+    except ImportError:
+        # 非Windows系统上没有winreg（使用默认的注册表后端时）
+        return None
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _state_path():
+    return os.path.join(_options["state_dir"], STATE_FILENAME)
+
+def _load_sections():
+    """加载上次运行保存的分区记录，调用方需持有锁"""
+    global _sections
+    if _sections is not None:
+        return _sections
+
+    _sections = {}
+    try:
+        with open(_state_path(), 'r', encoding='utf-8') as f:
+            document = json.load(f)
+        if document.get("version") == STATE_VERSION and document.get("host") == get_host_identity():
+            _sections = document.get("sections", {})
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, AttributeError) as e:
+        logging.warning(f"Ignoring unreadable incremental state {_state_path()}: {e}")
+    return _sections
+
+def _is_complete(result):
+    """结果中没有部分完成标记或错误项时才保存，避免把失败的结果复用到下一次运行"""
+    if isinstance(result, dict):
+        return not result.get("partial") and "error" not in result
+    if isinstance(result, list):
+        return not any(isinstance(item, dict) and "error" in item for item in result)
+    return result is not None
+
+def reuse_or_collect(section, func, *args, **kwargs):
+    """
+    分区指纹与上次运行相同时返回上次保存的结果，否则执行采集并保存结果和指纹
+
+    参数:
+    - section: 分区名
+    - func: 采集函数
+    - args, kwargs: 传给采集函数的参数
+
+    返回:
+    - 采集函数的返回值或上次运行保存的结果
+    """
+    global _dirty
+    # fast配置的结果字段较少，不与完整采集的结果互相复用
+    if not _options["enabled"] or collector_registry.get_profile() != "full" or not _fingerprint_sources(section):
+        return func(*args, **kwargs)
+
+    # 指纹在采集之前计算，采集期间发生的变化会在下一次运行时被发现
+    started = time.perf_counter()
+    try:
+        fingerprint = compute_fingerprint(section)
+    except Exception as e:
+        logging.warning(f"Could not fingerprint section {section}: {e}")
+        fingerprint = None
+    fingerprint_seconds = time.perf_counter() - started
+
+    now = time.time()
+    with _lock:
+        _stats["fingerprint_seconds"] += fingerprint_seconds
+        entry = _load_sections().get(section)
+        if fingerprint is None:
+            reason = "no_fingerprint"
+        elif entry is None:
+            reason = "new"
+        elif entry.get("schema_version", 1) != _schema_version(section):
+            reason = "schema_changed"
+        elif entry.get("fingerprint") != fingerprint:
+            reason = "changed"
+        elif now - entry.get("collected_at", 0) >= _max_age(section):
+            reason = "expired"
+        else:
+            _stats["reused"][section] = entry.get("seconds", 0)
+            logging.debug(f"Section {section} unchanged since {time.ctime(entry['collected_at'])}, reusing previous result")
+            return entry["data"]
+
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    seconds = round(time.perf_counter() - started, 3)
+
+    with _lock:
+        _stats["collected"][section] = reason
+        if fingerprint is not None and _is_complete(result):
+            _load_sections()[section] = {
+                "fingerprint": fingerprint,
+                "schema_version": _schema_version(section),
+                "collected_at": now,
+                "seconds": seconds,
+                "data": result
+            }
+            _dirty = True
+    return result
+
+def flush():
+    """把本次运行更新的分区结果原子地写回状态文件"""
+    global _dirty
+    with _lock:
+        if _sections is None or not _dirty:
+            return
+        try:
+            os.makedirs(_options["state_dir"], exist_ok=True)
+            path = _state_path()
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": STATE_VERSION, "host": get_host_identity(), "sections": _sections},
+                          f, ensure_ascii=False, default=str)
+            os.replace(temp_path, path)
+            _dirty = False
+        except (OSError, TypeError, ValueError) as e:
+            logging.warning(f"Could not write incremental state {_state_path()}: {e}")
+
+def get_incremental_summary():
+    """
+    获取本次运行的增量采集统计
+
+    返回:
+    - 字典，包含复用的分区、重新采集的分区及原因（new、schema_changed、changed、expired、no_fingerprint）、
+      复用省下的采集时间和计算指纹的耗时；未启用增量采集时返回None
+    """
+    if not _options["enabled"]:
+        return None
+    with _lock:
+        return {
+            "reused": sorted(_stats["reused"]),
+            "collected": dict(_stats["collected"]),
+            "seconds_saved": round(sum(_stats["reused"].values()), 3),
+            "fingerprint_seconds": round(_stats["fingerprint_seconds"], 3)
+        }
+
+def reset_incremental_stats():
+    """清除本次运行的统计"""
+    with _lock:
+        _stats["reused"].clear()
+        _stats["collected"].clear()
+        _stats["fingerprint_seconds"] = 0.0
+
+atexit.register(flush)
@@ -0,0 +1,114 @@
+import json
+
+REF_KEY = "$ref"
+
+def escape_token(token):
+    """JSON Pointer中的键转义：~ 写作 ~0，/ 写作 ~1"""
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+def _unescape(token):
+    return token.replace("~1", "/").replace("~0", "~")
+
+def _is_ref(value):
+    return isinstance(value, dict) and len(value) == 1 and isinstance(value.get(REF_KEY), str) \
+        and value[REF_KEY].startswith("#/")
+
+def dedupe_references(document):
+    """
+    把文档中被多处共享的同一个对象（按对象身份而不是按值）在第一次出现之后替换为 {"$ref": "#/路径"}，
+    比引用还短的对象保持原样
+
+    参数:
+    - document: 可序列化为JSON的对象
+
+    返回:
+    - (新文档, 替换的引用数)；原文档不被修改
+    """
+    seen = {}
+    count = 0
+
+    def visit(value, pointer):
+        nonlocal count
+        if not isinstance(value, (dict, list)) or not value:
+            return value
+        if id(value) in seen:
+            ref = {REF_KEY: "#" + seen[id(value)]}
+            # 很小的对象直接重复写出比引用更短
+            if len(json.dumps(value, ensure_ascii=False)) > len(json.dumps(ref, ensure_ascii=False)):
+                count += 1
+                return ref
+            return visit_children(value, pointer)
+        seen[id(value)] = pointer
+        return visit_children(value, pointer)
+
+    def visit_children(value, pointer):
+        if isinstance(value, dict):
+            return {key: visit(item, f"{pointer}/{escape_token(key)}") for key, item in value.items()}
+        return [visit(item, f"{pointer}/{index}") for index, item in enumerate(value)]
+
+    return visit(document, ""), count
+
+def resolve_references(document):
+    """
+    把dedupe_references写出的 {"$ref": "#/路径"} 还原为路径处的对象（共享同一个对象）
+
+    参数:
+    - document: json.load得到的文档，原地修改
+
+    返回:
+    - 还原后的文档
+    """
+    def target(ref):
+        value = document
+        for token in ref[2:].split("/"):
+            value = value[int(token)] if isinstance(value, list) else value[_unescape(token)]
+        return value
+
+    def visit(value):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                value[key] = target(item[REF_KEY]) if _is_ref(item) else visit(item)
+        elif isinstance(value, list):
+            for index, item in enumerate(value):
+                value[index] = target(item[REF_KEY]) if _is_ref(item) else visit(item)
+        return value
+
+    return visit(document)
+
+def measure_savings(document, **kwargs):
+    """
+    计算使用引用后JSON文本省下的字节数
+
+    参数:
+    - document: 要写出的对象
+    - kwargs: 传给json.dumps的参数
+
+    返回:
+    - 省下的字节数
+    """
+    deduped, refs = dedupe_references(document)
+    if not refs:
+        return 0
+    return len(json.dumps(document, **kwargs).encode("utf-8")) - len(json.dumps(deduped, **kwargs).encode("utf-8"))
+
+def dump_json(document, f, measure=False, **kwargs):
+    """
+    用引用代替重复对象写出JSON
+
+    参数:
+    - document: 要写出的对象
+    - f: 文本文件对象
+    - measure: 为True时另外按不使用引用的方式序列化一次，计算省下的字节数
+    - kwargs: 传给json.dumps的参数，如indent、ensure_ascii
+
+    返回:
+    - {"refs": 引用数, "bytes": 写出的字节数, "bytes_saved": 省下的字节数（measure为False时为None）}
+    """
+    deduped, refs = dedupe_references(document)
+    text = json.dumps(deduped, **kwargs)
+    f.write(text)
+    written = len(text.encode("utf-8"))
+    saved = None
+    if measure:
+        saved = len(json.dumps(document, **kwargs).encode("utf-8")) - written if refs else 0
+    return {"refs": refs, "bytes": written, "bytes_saved": saved}
@@ -0,0 +1,179 @@
+import re
+import json
+import logging
+import threading
+import subprocess
+
+from . import time_budget
+from . import command_trace
+from . import resource_accounting
+
+_CONVERT_TO_JSON = re.compile(r'\|\s*ConvertTo-Json\b(?P<args>[^|]*)$', re.IGNORECASE)
+_COMPRESS_ARG = re.compile(r'\s*-Compress\b', re.IGNORECASE)
+
+# 最多保留的标准错误字符数，超出的部分照常读出后丢弃
+STDERR_LIMIT = 65536
+# 每次从标准错误读取的字符数
+STDERR_CHUNK = 4096
+
+def to_ndjson_command(command):
+    """
+    把以ConvertTo-Json结尾的PowerShell管道改写为每行输出一个压缩JSON对象
+
+    参数:
+    - command: 以 "| ConvertTo-Json ..." 结尾的PowerShell命令字符串
+
+    返回:
+    - 改写后的命令字符串，ConvertTo-Json的其他参数（如-Depth）保持不变
+    """
+    command = command.strip()
+    match = _CONVERT_TO_JSON.search(command)
+    if not match:
+        raise ValueError("Streaming PowerShell commands must end with ConvertTo-Json")
+
+    args = _COMPRESS_ARG.sub("", match.group("args")).strip()
+    pipeline = command[:match.start()].rstrip()
+    return f"{pipeline} | ForEach-Object {{ $_ | ConvertTo-Json -Compress{' ' + args if args else ''} }}"
+
+def iter_json_lines(lines):
+    """
+    逐行解析JSON对象，跳过空行和非JSON行（如PowerShell警告）
+
+    参数:
+    - lines: 可迭代的文本行
+
+    返回:
+    - 生成器，逐个产出解析后的对象
+    """
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line[0] not in "{[":
+            logging.debug(f"Skipping non-JSON line in streamed output: {line[:100]}")
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            logging.debug(f"Skipping malformed JSON line in streamed output: {e}")
+
+class JsonLineStream:
+    """
+    以流式方式运行一个每行输出一个JSON对象的进程，记录边到达边解析
+
+    迭代结束后可以读取returncode、stderr和timed_out；提前停止迭代（如只取前100条）时进程被终止
+    """
+
+    def __init__(self, argv, timeout=30, encoding='utf-8'):
+        """
+        初始化流
+
+        参数:
+        - argv: 命令行参数列表
+        - timeout: 超时时间（秒），超时后终止进程，已产出的记录仍然有效
+        - encoding: 输出编码
+        """
+        self.argv = list(argv)
+        self.timeout = timeout
+        self.encoding = encoding
+        self.returncode = None
+        self.stderr = ""
+        self.timed_out = False
+        self.stopped_early = False
+        self.records = 0
+
+    def __iter__(self):
+        timeout = time_budget.clamp_timeout(self.timeout)
+        if timeout is not None and timeout <= 0:
+            logging.warning(f"Time budget exhausted, skipping streamed command: {' '.join(self.argv)[:100]}")
+            self.returncode = 1
+            self.stderr = "Time budget exhausted"
+            return
+
+        # 生成器在两次产出之间把控制权交还调用方，不能用with包住整个迭代
+        trace = command_trace.begin_command("stream", self.argv)
+        try:
+            with command_trace.attach(trace):
+                process = subprocess.Popen(
+                    self.argv,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True,
+                    encoding=self.encoding,
+                    errors='ignore'
+                )
+        except OSError as e:
+            logging.error(f"Error starting streamed command: {e}")
+            self.returncode = 1
+            self.stderr = str(e)
+            if trace is not None:
+                trace.returncode = 1
+                command_trace.finish_command(trace)
+            return
+
+        # 并行读取标准错误直到结束，避免管道写满后进程阻塞；只保留前STDERR_LIMIT个字符
+        stderr_chunks = []
+        stderr_chars = [0]
+
+        def drain_stderr():
+            while True:
+                chunk = process.stderr.read(STDERR_CHUNK)
+                if not chunk:
+                    break
+                kept = STDERR_LIMIT - stderr_chars[0]
+                if kept > 0:
+                    stderr_chunks.append(chunk[:kept])
+                stderr_chars[0] += len(chunk)
+
+        drain = threading.Thread(target=resource_accounting.bind_worker(drain_stderr), daemon=True)
+        drain.start()
+
+        expired = threading.Event()
+
+        def expire():
+            expired.set()
+            process.kill()
+
+        timer = threading.Timer(timeout, expire) if timeout is not None else None
+        if timer:
+            timer.daemon = True
+            timer.start()
+
+        stdout_chars = [0]
+
+        def counted(stream):
+            for line in stream:
+                stdout_chars[0] += len(line)
+                yield line
+
+        try:
+            for record in iter_json_lines(counted(process.stdout)):
+                self.records += 1
+                yield record
+        finally:
+            if timer:
+                timer.cancel()
+            if process.poll() is None and not expired.is_set():
+                # 调用方提前停止迭代
+                self.stopped_early = True
+                process.kill()
+            process.wait()
+            drain.join(timeout=1)
+            process.stdout.close()
+            process.stderr.close()
+
+            self.returncode = process.returncode
+            self.stderr = "".join(stderr_chunks)
+            self.timed_out = expired.is_set()
+            if trace is not None:
+                trace.returncode = self.returncode
+                trace.stdout_bytes = stdout_chars[0]
+                trace.stderr_bytes = stderr_chars[0]
+                trace.timed_out = self.timed_out
+                command_trace.finish_command(trace)
+            if self.timed_out:
+                logging.error(f"Streamed command timed out after {timeout} seconds with {self.records} records: {' '.join(self.argv)[:100]}")
+                time_budget.mark_partial("command timed out")
+            elif self.returncode != 0 and not self.stopped_early:
+                logging.warning(f"Streamed command failed with return code {self.returncode}: {self.stderr[:200]}")
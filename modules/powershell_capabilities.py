@@ -0,0 +1,203 @@
+import os
+import re
+import logging
+import threading
+import subprocess
+
+# 常见的PowerShell路径列表
+POWERSHELL_CANDIDATE_PATHS = [
+    # PowerShell 7+ (cross-platform)
+    r"C:\Program Files\PowerShell\7\pwsh.exe",
+    r"C:\Program Files\PowerShell\7-preview\pwsh.exe",
+    # Windows PowerShell 5.1
+    r"C:\Windows\System32\WindowsPowerShell\v1.0\powershell.exe",
+    r"C:\Windows\SysWOW64\WindowsPowerShell\v1.0\powershell.exe",
+]
+
+# 探测脚本：输出 key=value 行
+PROBE_SCRIPT = (
+    "$e = if ($PSVersionTable.PSEdition) { $PSVersionTable.PSEdition } else { 'Desktop' }; "
+    "Write-Output \"edition=$e\"; "
+    "Write-Output \"version=$($PSVersionTable.PSVersion.ToString())\"; "
+    "Write-Output \"cim=$([bool](Get-Command Get-CimInstance -ErrorAction SilentlyContinue))\"; "
+    "Write-Output \"wmi=$([bool](Get-Command Get-WmiObject -ErrorAction SilentlyContinue))\"; "
+    "Write-Output \"encoding=$([Console]::OutputEncoding.WebName)\""
+)
+
+UTF8_PREFIX = "[Console]::OutputEncoding = [System.Text.Encoding]::UTF8; $OutputEncoding = [System.Text.Encoding]::UTF8; "
+
+_WMI_PATTERN = re.compile(r'Get-WmiObject\s+(?:-Class\s+)?(Win32_\w+)', re.IGNORECASE)
+
+_lock = threading.Lock()
+_capabilities = None
+_stats = {"probes": 0, "cache_hits": 0}
+
+def find_powershell_path():
+    """
+    查找PowerShell的绝对路径
+
+    返回:
+    - PowerShell执行文件的绝对路径，找不到时返回"powershell"
+    """
+    try:
+        # 检查每个可能的路径
+        for path in POWERSHELL_CANDIDATE_PATHS:
+            if os.path.exists(path):
+                logging.debug(f"Found PowerShell at: {path}")
+                return path
+
+        # 如果找不到，尝试使用where命令查找powershell和pwsh
+        for name in ("powershell", "pwsh"):
+            try:
+                result = subprocess.run(['where', name], capture_output=True, text=True, timeout=5)
+                if result.returncode == 0 and result.stdout.strip():
+                    path = result.stdout.strip().split('\n')[0].strip()
+                    logging.debug(f"Found {name} via 'where' command: {path}")
+                    return path
+            except (subprocess.TimeoutExpired, Exception) as e:
+                logging.warning(f"Error finding {name} with 'where' command: {e}")
+
+        # 最后尝试默认路径
+        logging.warning("Could not find PowerShell absolute path, using 'powershell' as fallback")
+        return "powershell"
+
+    except Exception as e:
+        logging.error(f"Error getting PowerShell path: {e}")
+        return "powershell"
+
+def _get_mtime(path):
+    """获取可执行文件的修改时间，无法获取时返回None"""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def probe_powershell(path, timeout=10):
+    """
+    启动一次PowerShell，探测版本、CIM支持和输出编码
+
+    参数:
+    - path: PowerShell执行文件路径
+    - timeout: 超时时间（秒）
+
+    返回:
+    - 能力字典，包含path, edition, version, is_core, supports_cim, supports_wmi, output_encoding, needs_utf8_prefix, mtime
+    """
+    # 探测失败时按文件名推断
+    is_core = os.path.basename(path).lower().startswith("pwsh")
+    capabilities = {
+        "path": path,
+        "edition": "Core" if is_core else "Desktop",
+        "version": "",
+        "is_core": is_core,
+        "supports_cim": True,
+        "supports_wmi": not is_core,
+        "output_encoding": "utf-8" if is_core else "",
+        "needs_utf8_prefix": not is_core,
+        "mtime": _get_mtime(path),
+        "probed": False
+    }
+
+    try:
+        result = subprocess.run(
+            [path, '-NoLogo', '-NoProfile', '-NonInteractive', '-Command', PROBE_SCRIPT],
+            capture_output=True,
+            text=True,
+            encoding='utf-8',
+            errors='ignore',
+            timeout=timeout
+        )
+        if result.returncode == 0:
+            values = {}
+            for line in result.stdout.splitlines():
+                if '=' in line:
+                    key, value = line.split('=', 1)
+                    values[key.strip()] = value.strip()
+
+            if "edition" in values:
+                capabilities["edition"] = values["edition"]
+                capabilities["is_core"] = values["edition"].lower() == "core"
+            capabilities["version"] = values.get("version", "")
+            if "cim" in values:
+                capabilities["supports_cim"] = values["cim"].lower() == "true"
+            if "wmi" in values:
+                capabilities["supports_wmi"] = values["wmi"].lower() == "true"
+            if "encoding" in values:
+                capabilities["output_encoding"] = values["encoding"].lower()
+                capabilities["needs_utf8_prefix"] = capabilities["output_encoding"] != "utf-8"
+            capabilities["probed"] = True
+        else:
+            logging.warning(f"PowerShell capability probe failed: {result.stderr[:200]}")
+    except (subprocess.TimeoutExpired, Exception) as e:
+        logging.warning(f"PowerShell capability probe failed: {e}")
+
+    logging.debug(f"PowerShell capabilities: {capabilities}")
+    return capabilities
+
+def get_powershell_capabilities():
+    """
+    获取进程级缓存的PowerShell能力信息，可执行文件的修改时间变化时重新探测
+
+    返回:
+    - 能力字典，见probe_powershell
+    """
+    global _capabilities
+    with _lock:
+        if _capabilities is not None:
+            path = _capabilities["path"]
+            # 非绝对路径（回退的"powershell"）无法比较修改时间，直接沿用缓存
+            if not os.path.isabs(path) or _get_mtime(path) == _capabilities["mtime"]:
+                _stats["cache_hits"] += 1
+                return _capabilities
+            logging.debug(f"PowerShell executable changed, re-probing: {path}")
+
+        _capabilities = probe_powershell(find_powershell_path())
+        _stats["probes"] += 1
+        return _capabilities
+
+def reset_powershell_capabilities():
+    """清除缓存的能力信息，下次调用时重新探测"""
+    global _capabilities
+    with _lock:
+        _capabilities = None
+
+def get_probe_stats():
+    """
+    获取能力探测的统计信息
+
+    返回:
+    - 字典，probes为实际探测次数，cache_hits为缓存省下的探测次数
+    """
+    with _lock:
+        return dict(_stats)
+
+def rewrite_wmi_command(command, capabilities):
+    """
+    当前PowerShell不提供Get-WmiObject时，将其改写为Get-CimInstance
+
+    参数:
+    - command: PowerShell命令字符串
+    - capabilities: get_powershell_capabilities返回的能力字典
+
+    返回:
+    - 改写后的命令字符串
+    """
+    if capabilities["supports_wmi"] or not capabilities["supports_cim"] or 'Get-WmiObject' not in command:
+        return command
+    logging.debug("Converting Get-WmiObject to Get-CimInstance")
+    return _WMI_PATTERN.sub(r'Get-CimInstance -ClassName \1', command)
+
+def build_powershell_argv(command, capabilities):
+    """
+    构建一次性执行PowerShell命令的命令行，输出编码不是UTF-8时在命令内部设置编码
+
+    参数:
+    - command: PowerShell命令字符串
+    - capabilities: get_powershell_capabilities返回的能力字典
+
+    返回:
+    - 命令行参数列表
+    """
+    if capabilities["needs_utf8_prefix"]:
+        command = UTF8_PREFIX + command
+    return [capabilities["path"], '-Command', command]
@@ -0,0 +1,389 @@
+import atexit
+import base64
+import itertools
+import logging
+import queue
+import subprocess
+import threading
+import time
+
+from . import command_trace
+from . import resource_accounting
+
+# 帧协议的哨兵行
+# 请求: "<id> <base64(utf-8脚本)>\n"
+# 响应: "__PSPOOL_BEGIN__ <id>" / base64(stdout) / base64(stderr) / "__PSPOOL_END__ <id> <returncode>"
+FRAME_BEGIN = "__PSPOOL_BEGIN__"
+FRAME_END = "__PSPOOL_END__"
+
+# 常驻PowerShell宿主执行的循环脚本，从stdin逐行读取请求并按帧协议回写结果
+HOST_LOOP_SCRIPT = r"""
+$ErrorActionPreference = 'Continue'
+$ProgressPreference = 'SilentlyContinue'
+$utf8 = New-Object System.Text.UTF8Encoding $false
+[Console]::OutputEncoding = $utf8
+$OutputEncoding = $utf8
+while ($true) {
+    $line = [Console]::In.ReadLine()
+    if ($null -eq $line) { break }
+    $parts = $line.Split(' ', 2)
+    if ($parts.Length -lt 2) { continue }
+    $id = $parts[0]
+    $rc = 0
+    $err = ''
+    $out = ''
+    try {
+        $script = $utf8.GetString([Convert]::FromBase64String($parts[1]))
+        $global:LASTEXITCODE = 0
+        $out = & ([scriptblock]::Create($script)) 2>&1 | ForEach-Object {
+            if ($_ -is [System.Management.Automation.ErrorRecord]) {
+                $err += ($_ | Out-String)
+                $rc = 1
+            } else {
+                $_
+            }
+        } | Out-String -Width 4096
+        if ($global:LASTEXITCODE -and $rc -eq 0) { $rc = $global:LASTEXITCODE }
+    } catch {
+        $err += ($_ | Out-String)
+        $rc = 1
+    }
+    if ($null -eq $out) { $out = '' }
+    [Console]::Out.WriteLine("__PSPOOL_BEGIN__ $id")
+    [Console]::Out.WriteLine([Convert]::ToBase64String($utf8.GetBytes($out)))
+    [Console]::Out.WriteLine([Convert]::ToBase64String($utf8.GetBytes($err)))
+    [Console]::Out.WriteLine("__PSPOOL_END__ $id $rc")
+    [Console]::Out.Flush()
+}
+"""
+
+def build_host_argv(powershell_path):
+    """
+    构建启动常驻PowerShell宿主的命令行
+
+    参数:
+    - powershell_path: powershell.exe或pwsh.exe的路径
+
+    返回:
+    - 命令行参数列表
+    """
+    encoded = base64.b64encode(HOST_LOOP_SCRIPT.encode('utf-16-le')).decode('ascii')
+    return [
+        powershell_path,
+        '-NoLogo',
+        '-NoProfile',
+        '-NonInteractive',
+        '-ExecutionPolicy', 'Bypass',
+        '-EncodedCommand', encoded
+    ]
+
+def _decode_payload(line):
+    """解码base64负载行，失败时返回空字符串"""
+    try:
+        return base64.b64decode(line.strip()).decode('utf-8', errors='ignore')
+    except Exception:
+        return ""
+
+class PowerShellHost:
+    """单个常驻PowerShell宿主进程，通过stdin/stdout按帧协议执行命令"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, argv):
+        """
+        初始化宿主
+
+        参数:
+        - argv: 启动宿主进程的命令行参数列表
+        """
+        self.argv = list(argv)
+        self.process = None
+        self.lines = None
+        self.reader_cpu = [0.0]
+        self.commands_run = 0
+
+    def start(self):
+        """启动宿主进程和stdout读取线程"""
+        self.process = subprocess.Popen(
+            self.argv,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding='utf-8',
+            errors='ignore',
+            bufsize=1
+        )
+        self.lines = queue.Queue()
+        self.reader_cpu = [0.0]
+        self.commands_run = 0
+        reader = threading.Thread(
+            target=self._read_stdout,
+            args=(self.process.stdout, self.lines, self.reader_cpu),
+            daemon=True
+        )
+        reader.start()
+        logging.debug(f"Started PowerShell host pid={self.process.pid}")
+
+    @staticmethod
+    def _read_stdout(stream, lines, cpu):
+        """后台读取宿主stdout，EOF时放入None作为结束标记；cpu[0]为读取线程已消耗的CPU时间"""
+        try:
+            for line in stream:
+                cpu[0] = time.thread_time()
+                lines.put(line.rstrip('\r\n'))
+        except Exception:
+            pass
+        finally:
+            lines.put(None)
+
+    def is_alive(self):
+        """宿主进程是否仍在运行"""
+        return self.process is not None and self.process.poll() is None
+
+    def close(self):
+        """关闭宿主进程"""
+        if self.process is None:
+            return
+        try:
+            if self.process.poll() is None:
+                try:
+                    self.process.stdin.close()
+                    self.process.wait(timeout=2)
+                except Exception:
+                    self.process.kill()
+                    self.process.wait(timeout=2)
+        except Exception as e:
+            logging.debug(f"Error closing PowerShell host: {e}")
+        finally:
+            self.process = None
+
+    def kill(self):
+        """强制结束宿主进程（用于超时挂起的情况）"""
+        if self.process is None:
+            return
+        try:
+            self.process.kill()
+            self.process.wait(timeout=2)
+        except Exception as e:
+            logging.debug(f"Error killing PowerShell host: {e}")
+        finally:
+            self.process = None
+
+    def execute(self, command, timeout=30):
+        """
+        在宿主中执行一条命令
+
+        参数:
+        - command: PowerShell命令字符串
+        - timeout: 超时时间（秒）
+
+        返回:
+        - subprocess.CompletedProcess对象；宿主挂起或崩溃时抛出TimeoutExpired或RuntimeError
+        """
+        if not self.is_alive():
+            raise RuntimeError("PowerShell host is not running")
+
+        # 跟踪或资源统计期间用宿主进程的CPU时间增量作为这条命令的CPU时间，
+        # 读取线程解析这条命令输出的CPU时间计入当前采集器
+        trace = command_trace.current_record()
+        account = resource_accounting.current_account()
+        measured = trace is not None or account is not None
+        cpu_before = command_trace.process_cpu_seconds(self.process.pid) if measured else None
+        reader_cpu = self.reader_cpu
+        reader_before = reader_cpu[0]
+        try:
+            return self._execute(command, timeout)
+        finally:
+            if account is not None:
+                account.add_worker_cpu(reader_cpu[0] - reader_before)
+            if cpu_before is not None:
+                cpu_after = command_trace.process_cpu_seconds(self.process.pid) if self.process is not None else None
+                if cpu_after is not None:
+                    if trace is not None:
+                        trace.add_cpu(cpu_after - cpu_before)
+                    if account is not None:
+                        account.add_child_cpu(cpu_after - cpu_before)
+
+    def _execute(self, command, timeout):
+        """按帧协议发送命令并等待响应，见execute"""
+        request_id = str(next(self._ids))
+        payload = base64.b64encode(command.encode('utf-8')).decode('ascii')
+        self.process.stdin.write(f"{request_id} {payload}\n")
+        self.process.stdin.flush()
+        self.commands_run += 1
+
+        deadline = time.monotonic() + timeout
+        frame = None
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise subprocess.TimeoutExpired(self.argv, timeout)
+            try:
+                line = self.lines.get(timeout=remaining)
+            except queue.Empty:
+                raise subprocess.TimeoutExpired(self.argv, timeout)
+
+            if line is None:
+                raise RuntimeError("PowerShell host exited while running a command")
+
+            if frame is None:
+                # 跳过帧外的杂散输出
+                if line == f"{FRAME_BEGIN} {request_id}":
+                    frame = []
+                continue
+
+            if line.startswith(FRAME_END):
+                parts = line.split()
+                if len(parts) == 3 and parts[1] == request_id and len(frame) == 2:
+                    try:
+                        returncode = int(parts[2])
+                    except ValueError:
+                        returncode = 1
+                    return subprocess.CompletedProcess(
+                        [command],
+                        returncode=returncode,
+                        stdout=_decode_payload(frame[0]),
+                        stderr=_decode_payload(frame[1])
+                    )
+                raise RuntimeError(f"Malformed response frame from PowerShell host: {line[:100]}")
+
+            frame.append(line)
+
+class PowerShellPool:
+    """常驻PowerShell宿主池，宿主挂起或崩溃时自动重启"""
+
+    def __init__(self, host_argv, size=2, max_commands_per_host=200):
+        """
+        初始化宿主池
+
+        参数:
+        - host_argv: 启动宿主进程的命令行参数列表
+        - size: 宿主数量上限
+        - max_commands_per_host: 单个宿主执行多少条命令后回收重建，防止内存膨胀
+        """
+        self.host_argv = list(host_argv)
+        self.size = max(1, size)
+        self.max_commands_per_host = max_commands_per_host
+        self._idle = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        self.restarts = 0
+
+    def _acquire(self):
+        """取出一个空闲宿主，必要时新建；池满时阻塞等待"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return PowerShellHost(self.host_argv)
+
+        return self._idle.get()
+
+    def _release(self, host):
+        """归还宿主，已关闭的池直接关闭宿主"""
+        if self._closed:
+            host.close()
+            return
+        self._idle.put(host)
+
+    def _ensure_started(self, host):
+        """确保宿主进程在运行，并在达到命令上限时回收重建"""
+        if host.is_alive() and host.commands_run >= self.max_commands_per_host:
+            logging.debug("Recycling PowerShell host after reaching command limit")
+            host.close()
+        if not host.is_alive():
+            if host.process is not None:
+                self.restarts += 1
+                host.kill()
+            host.start()
+
+    def run(self, command, timeout=30):
+        """
+        在池中执行PowerShell命令
+
+        参数:
+        - command: PowerShell命令字符串
+        - timeout: 超时时间（秒）
+
+        返回:
+        - subprocess.CompletedProcess对象，超时或宿主崩溃时抛出与subprocess.run一致的异常
+        """
+        if self._closed:
+            raise RuntimeError("PowerShell pool is closed")
+
+        host = self._acquire()
+        try:
+            try:
+                self._ensure_started(host)
+            except Exception:
+                # 启动失败时释放名额，便于后续重试
+                with self._lock:
+                    self._created -= 1
+                host = None
+                raise
+
+            try:
+                return host.execute(command, timeout=timeout)
+            except subprocess.TimeoutExpired:
+                logging.warning(f"PowerShell host hung for {timeout}s, restarting it")
+                host.kill()
+                self.restarts += 1
+                raise
+            except (RuntimeError, OSError) as e:
+                logging.warning(f"PowerShell host crashed ({e}), restarting it")
+                host.kill()
+                self.restarts += 1
+                raise RuntimeError(str(e))
+        finally:
+            if host is not None:
+                self._release(host)
+
+    def close(self):
+        """关闭池中所有宿主"""
+        self._closed = True
+        while True:
+            try:
+                host = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            host.close()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_powershell_pool(powershell_path, size=2, max_commands_per_host=200):
+    """
+    获取进程级共享的PowerShell宿主池，PowerShell路径变化时重建
+
+    参数:
+    - powershell_path: powershell.exe或pwsh.exe的路径
+    - size: 宿主数量上限
+    - max_commands_per_host: 单个宿主的命令数上限
+
+    返回:
+    - PowerShellPool对象
+    """
+    global _pool
+    host_argv = build_host_argv(powershell_path)
+    with _pool_lock:
+        if _pool is None or _pool._closed or _pool.host_argv != host_argv:
+            if _pool is not None:
+                _pool.close()
+            _pool = PowerShellPool(host_argv, size=size, max_commands_per_host=max_commands_per_host)
+        return _pool
+
+def shutdown_powershell_pool():
+    """关闭共享的PowerShell宿主池"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+atexit.register(shutdown_powershell_pool)
@@ -0,0 +1,110 @@
+import time
+import threading
+
+_active_registry = None
+
+class ProbeRegistry:
+    """一次运行内的探测登记表：每个探测最多执行一次，之后的调用共享同一个结果对象"""
+
+    def __init__(self):
+        self.results = {}
+        self.seconds = {}
+        self.reuses = {}
+        self._running = {}
+        self._lock = threading.Lock()
+
+    def run(self, name, func, *args):
+        """
+        执行探测，同名探测已执行过时直接返回之前的结果（同一个对象）
+
+        参数:
+        - name: 探测名，同一次运行内同名探测视为相同
+        - func: 采集函数
+        - args: 传给采集函数的参数
+
+        返回:
+        - 采集函数的返回值
+        """
+        with self._lock:
+            if name in self.results:
+                self.reuses[name] = self.reuses.get(name, 0) + 1
+                return self.results[name]
+            event = self._running.get(name)
+            if event is None:
+                event = self._running[name] = threading.Event()
+                owner = True
+            else:
+                owner = False
+
+        # 其他线程正在执行同名探测时等待其结果
+        if not owner:
+            event.wait()
+            with self._lock:
+                if name in self.results:
+                    self.reuses[name] = self.reuses.get(name, 0) + 1
+                    return self.results[name]
+            return self.run(name, func, *args)
+
+        started = time.perf_counter()
+        try:
+            result = func(*args)
+        except BaseException:
+            with self._lock:
+                self._running.pop(name, None)
+            event.set()
+            raise
+        with self._lock:
+            self.results[name] = result
+            self.seconds[name] = time.perf_counter() - started
+            self._running.pop(name, None)
+        event.set()
+        return result
+
+    def summary(self):
+        """执行次数、复用次数和复用省下的时间"""
+        with self._lock:
+            return {
+                "probes": len(self.results),
+                "reused": sum(self.reuses.values()),
+                "seconds_saved": round(sum(self.seconds[name] * count for name, count in self.reuses.items()), 3),
+                "reused_probes": dict(self.reuses)
+            }
+
+def start_probe_run():
+    """
+    开始新一次运行的探测登记表，之前运行的结果不再复用
+
+    返回:
+    - ProbeRegistry对象
+    """
+    global _active_registry
+    _active_registry = ProbeRegistry()
+    return _active_registry
+
+def run_probe(name, func, *args):
+    """
+    在当前运行的登记表中执行探测；没有登记表时直接执行
+
+    参数:
+    - name: 探测名
+    - func: 采集函数
+    - args: 传给采集函数的参数
+
+    返回:
+    - 采集函数的返回值
+    """
+    registry = _active_registry
+    if registry is None:
+        return func(*args)
+    return registry.run(name, func, *args)
+
+def get_probe_summary():
+    """
+    获取当前运行的探测复用统计
+
+    返回:
+    - 统计字典，没有登记表时返回None
+    """
+    if _active_registry is None:
+        return None
+    return _active_registry.summary()
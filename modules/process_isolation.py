@@ -0,0 +1,374 @@
+import time
+import atexit
+import logging
+import threading
+import subprocess
+import multiprocessing
+
+from .config import (PROBE_ISOLATION_ENABLED, PROBE_ISOLATION_WORKERS, PROBE_ISOLATION_START_METHOD,
+                     PROBE_TIMEOUTS)
+from . import command_cache
+from . import command_trace
+from . import time_budget
+from . import replay
+from . import resource_accounting
+
+_lock = threading.Lock()
+_pool = None
+_options = {
+    "enabled": PROBE_ISOLATION_ENABLED,
+    "workers": PROBE_ISOLATION_WORKERS,
+    "start_method": PROBE_ISOLATION_START_METHOD
+}
+_stats = {"calls": 0, "crashes": 0, "workers_started": 0, "workers_killed": 0, "timeouts": []}
+
+class ProbeTimeout(subprocess.TimeoutExpired):
+    """隔离运行的探测超过期限，工作进程已被结束；继承TimeoutExpired，原有的超时处理无需修改"""
+
+def configure_isolation(enabled=None, workers=None, start_method=None):
+    """
+    设置进程隔离选项，未传入的选项保持不变；修改工作进程数或启动方式时关闭现有的进程池
+
+    参数:
+    - enabled: 是否在工作进程中运行可能挂起的探测
+    - workers: 工作进程数
+    - start_method: multiprocessing启动方式，默认"spawn"（采集器在线程中运行，fork不安全）
+    """
+    restart = False
+    with _lock:
+        for key, value in (("enabled", enabled), ("workers", workers), ("start_method", start_method)):
+            if value is not None:
+                restart = restart or (key != "enabled" and value != _options[key])
+                _options[key] = value
+    if restart:
+        shutdown_isolation_pool()
+
+def _worker_main(conn):
+    """工作进程：循环接收 (函数, 参数, 关键字参数)，返回 ("ok", 结果) 或 ("error", 异常)"""
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            return
+        if request is None:
+            return
+        func, args, kwargs = request
+        try:
+            response = ("ok", func(*args, **kwargs))
+        except BaseException as e:
+            response = ("error", e)
+        try:
+            conn.send(response)
+        except Exception as e:
+            # 结果或异常无法序列化
+            conn.send(("error", RuntimeError(f"{type(e).__name__}: {e}")))
+
+def kill_process_tree(pid):
+    """结束进程及其所有子进程（如挂起的ipconfig），进程已退出时不做任何事"""
+    import psutil
+    try:
+        process = psutil.Process(pid)
+        processes = process.children(recursive=True) + [process]
+    except psutil.Error:
+        return
+    for item in processes:
+        try:
+            item.kill()
+        except psutil.Error:
+            pass
+    psutil.wait_procs(processes, timeout=5)
+
+class _Worker:
+    """一个工作进程和与之通信的管道"""
+
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), name="probe-worker", daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        kill_process_tree(self.process.pid)
+        self.process.join(5)
+        self.conn.close()
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(2)
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.conn.close()
+
+class ProcessIsolationPool:
+    """工作进程池：每次调用占用一个空闲工作进程，超过期限时结束该进程（连同其子进程），下一次调用时启动新的进程替换"""
+
+    def __init__(self, size=PROBE_ISOLATION_WORKERS, start_method=PROBE_ISOLATION_START_METHOD):
+        """
+        参数:
+        - size: 工作进程数上限，工作进程在第一次需要时才启动
+        - start_method: multiprocessing启动方式
+        """
+        self.size = size
+        self._context = multiprocessing.get_context(start_method)
+        self._slots = threading.Semaphore(size)
+        self._idle = []
+        self._workers = set()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _acquire(self):
+        self._slots.acquire()
+        with self._lock:
+            if self._closed:
+                self._slots.release()
+                raise RuntimeError("Process isolation pool is closed")
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.process.is_alive():
+                    return worker
+                self._workers.discard(worker)
+        try:
+            worker = _Worker(self._context)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._workers.add(worker)
+        with _lock:
+            _stats["workers_started"] += 1
+        return worker
+
+    def _release(self, worker, healthy):
+        with self._lock:
+            if healthy and not self._closed:
+                self._idle.append(worker)
+            else:
+                self._workers.discard(worker)
+        if not healthy:
+            worker.kill()
+            with _lock:
+                _stats["workers_killed"] += 1
+        self._slots.release()
+
+    def call(self, func, args=(), kwargs=None, timeout=None, name=None):
+        """
+        在工作进程中调用func(*args, **kwargs)
+
+        参数:
+        - func: 模块级函数（需要能被pickle，如 subprocess.run、psutil.disk_usage）
+        - args, kwargs: 参数，需要能被pickle
+        - timeout: 硬期限（秒），None为不限时
+        - name: 超时异常中的探测名
+
+        返回:
+        - func的返回值；func抛出的异常原样抛出，超过期限时抛出ProbeTimeout，工作进程崩溃时抛出RuntimeError
+        """
+        worker = self._acquire()
+        healthy = False
+        label = name or getattr(func, "__name__", repr(func))
+        try:
+            try:
+                worker.conn.send((func, tuple(args), kwargs or {}))
+                finished = worker.conn.poll(timeout)
+                if finished:
+                    status, value = worker.conn.recv()
+            except (EOFError, OSError) as e:
+                with _lock:
+                    _stats["crashes"] += 1
+                raise RuntimeError(f"Isolated probe {label} crashed (exit code {worker.process.exitcode})") from e
+            if not finished:
+                raise ProbeTimeout(label, timeout)
+            healthy = True
+        finally:
+            self._release(worker, healthy)
+        if status == "error":
+            raise value
+        return value
+
+    def close(self):
+        """关闭所有工作进程"""
+        with self._lock:
+            self._closed = True
+            workers = list(self._workers)
+            self._workers.clear()
+            self._idle.clear()
+        for worker in workers:
+            worker.close()
+
+def get_isolation_pool():
+    """获取全局进程池，第一次调用时创建"""
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ProcessIsolationPool(_options["workers"], _options["start_method"])
+        return _pool
+
+def shutdown_isolation_pool():
+    """关闭全局进程池"""
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+
+atexit.register(shutdown_isolation_pool)
+
+def is_isolating():
+    """可能挂起的探测当前是否在工作进程中运行；录制或回放时替换的命令和注册表只在本进程中有效，因此不隔离"""
+    return _options["enabled"] and not replay.is_active()
+
+def _current_section():
+    """正在运行的分区名：资源统计中的当前采集器、时间预算中的当前分区，或命令缓存记录的当前分区"""
+    account = resource_accounting.current_account()
+    if account is not None:
+        return account.name
+    if time_budget.current_section() is not None:
+        return time_budget.current_section()
+    sections = command_cache.current_sections()
+    return sections[-1] if sections else None
+
+def run_isolated(name, func, args=(), kwargs=None, timeout=None):
+    """
+    运行一个可能无限期挂起的探测：启用隔离时在工作进程中按硬期限运行，否则直接调用
+
+    超过期限时结束工作进程，把探测和所在分区记录为超时，并把分区标记为部分完成
+
+    参数:
+    - name: 探测名，未指定timeout时按名称从PROBE_TIMEOUTS取期限
+    - func: 模块级函数
+    - args, kwargs: 参数
+    - timeout: 期限（秒），同时受运行时间预算限制
+
+    返回:
+    - func的返回值；超过期限时抛出ProbeTimeout（subprocess.TimeoutExpired的子类）
+    """
+    if not is_isolating():
+        return func(*args, **(kwargs or {}))
+
+    if timeout is None:
+        timeout = PROBE_TIMEOUTS.get(name, PROBE_TIMEOUTS["default"])
+    timeout = time_budget.clamp_timeout(timeout)
+    section = _current_section()
+    with _lock:
+        _stats["calls"] += 1
+    started = time.monotonic()
+    try:
+        return get_isolation_pool().call(func, args, kwargs, timeout=timeout, name=name)
+    except ProbeTimeout:
+        with _lock:
+            _stats["timeouts"].append({"probe": name, "section": section, "timeout_seconds": round(timeout, 3)})
+        time_budget.mark_partial(f"{name} timed out")
+        logging.warning(f"Probe {name} did not finish within {timeout:.1f}s; its worker process was killed"
+                        + (f" (section {section})" if section else ""))
+        raise
+    finally:
+        logging.debug(f"Isolated probe {name} took {time.monotonic() - started:.3f}s")
+
+def _measured_call(func, command, kwargs):
+    """
+    在工作进程中运行subprocess.run或check_output，并测量命令本身：子进程的CPU时间经TracedPopen计入一条记录
+
+    参数:
+    - func: subprocess.run或subprocess.check_output
+    - command: 命令行参数列表或shell命令字符串
+    - kwargs: 传给func的参数
+
+    返回:
+    - (结果, 异常, 记录字典)；异常（如CalledProcessError）不在工作进程中抛出，由调用方记录测量结果后再抛出
+    """
+    command_trace.install_popen_hook()
+    record = command_trace.CommandRecord("subprocess", command, collector="isolated")
+    result = error = None
+    with command_trace.attach(record):
+        try:
+            result = func(command, **kwargs)
+        except Exception as e:
+            error = e
+    record.wall_seconds = time.perf_counter() - record.started
+    if isinstance(result, subprocess.CompletedProcess):
+        record.set_result(result)
+    elif isinstance(error, subprocess.CalledProcessError):
+        record.set_output(error.returncode, error.output, error.stderr)
+    elif error is None:
+        record.set_output(0, result)
+    return result, error, record.to_dict()
+
+def _run_command_isolated(name, func, command, kwargs, timeout):
+    """
+    在工作进程中运行命令，把工作进程测得的耗时、CPU时间、输出大小、返回码和超时写入命令跟踪，
+    并把子进程及其CPU时间计入当前采集器的资源统计，与本进程中经TracedPopen运行时相同
+    """
+    record = command_trace.begin_command("subprocess", command)
+    target = record or command_trace.current_record()
+    account = resource_accounting.current_account()
+    if account is not None:
+        account.add_child_process()
+    measured = None
+    try:
+        result, error, measured = run_isolated(name, _measured_call, (func, command, kwargs), timeout=timeout)
+    except subprocess.TimeoutExpired:
+        if record is not None:
+            record.timed_out = True
+        raise
+    finally:
+        if measured is not None:
+            if record is not None:
+                record.merge(measured)
+            elif target is not None:
+                target.add_cpu(measured["cpu_seconds"])
+            if account is not None:
+                account.add_child_cpu(measured["cpu_seconds"])
+        command_trace.finish_command(record)
+    if error is not None:
+        raise error
+    return result
+
+def run_command(name, argv, timeout=None, **kwargs):
+    """
+    subprocess.run的隔离版本：启用隔离时命令在工作进程中运行，超时时连同其子进程一起结束，
+    命令跟踪和资源统计使用工作进程测得的结果；未启用时等同于 subprocess.run(argv, timeout=timeout, **kwargs)
+
+    参数:
+    - name: 探测名，用于PROBE_TIMEOUTS和超时记录
+    - argv: 命令行参数列表或shell命令字符串
+    - timeout: 期限（秒），None时隔离模式下使用PROBE_TIMEOUTS中的期限
+    - kwargs: 传给subprocess.run的参数
+
+    返回:
+    - subprocess.CompletedProcess对象；超时时抛出subprocess.TimeoutExpired
+    """
+    if not is_isolating():
+        return subprocess.run(argv, timeout=timeout, **kwargs)
+    return _run_command_isolated(name, subprocess.run, argv, kwargs, timeout)
+
+def check_output(name, command, timeout=None, **kwargs):
+    """subprocess.check_output的隔离版本，参数同run_command"""
+    if not is_isolating():
+        return subprocess.check_output(command, timeout=timeout, **kwargs)
+    return _run_command_isolated(name, subprocess.check_output, command, kwargs, timeout)
+
+def get_isolation_summary():
+    """
+    本次运行的进程隔离统计
+
+    返回:
+    - {"calls", "crashes", "workers_started", "workers_killed", "timeouts": [{"probe", "section", "timeout_seconds"}],
+      "timed_out_sections"}，没有探测在工作进程中运行时返回None
+    """
+    with _lock:
+        if not _stats["calls"]:
+            return None
+        timeouts = [dict(item) for item in _stats["timeouts"]]
+        summary = {key: value for key, value in _stats.items() if key != "timeouts"}
+    summary["timeouts"] = timeouts
+    summary["timed_out_sections"] = sorted({item["section"] for item in timeouts if item["section"]})
+    return summary
+
+def reset_isolation_stats():
+    """清除统计（用于测试）"""
+    with _lock:
+        _stats.update({"calls": 0, "crashes": 0, "workers_started": 0, "workers_killed": 0, "timeouts": []})
@@ -0,0 +1,555 @@
+import re
+import codecs
+import locale
+import contextlib
+
+# 注册表值类型，与winreg的REG_*常量相同
+REG_NONE = 0
+REG_SZ = 1
+REG_EXPAND_SZ = 2
+REG_BINARY = 3
+REG_DWORD = 4
+REG_DWORD_BIG_ENDIAN = 5
+REG_MULTI_SZ = 7
+REG_QWORD = 11
+
+HKEY_CLASSES_ROOT = "HKEY_CLASSES_ROOT"
+HKEY_CURRENT_USER = "HKEY_CURRENT_USER"
+HKEY_LOCAL_MACHINE = "HKEY_LOCAL_MACHINE"
+HKEY_USERS = "HKEY_USERS"
+HKEY_CURRENT_CONFIG = "HKEY_CURRENT_CONFIG"
+ROOT_KEYS = (HKEY_CLASSES_ROOT, HKEY_CURRENT_USER, HKEY_LOCAL_MACHINE, HKEY_USERS, HKEY_CURRENT_CONFIG)
+ROOT_ALIASES = {"HKCR": HKEY_CLASSES_ROOT, "HKCU": HKEY_CURRENT_USER, "HKLM": HKEY_LOCAL_MACHINE,
+                "HKU": HKEY_USERS, "HKCC": HKEY_CURRENT_CONFIG}
+
+def split_path(path):
+    """
+    把完整路径拆成根键和子路径，接受HKLM等缩写
+
+    参数:
+    - path: 如 HKEY_LOCAL_MACHINE\\SOFTWARE\\Microsoft 或 HKLM\\SOFTWARE
+
+    返回:
+    - (根键名, 子路径)；根键无法识别时抛出ValueError
+    """
+    root, _, sub_key = path.strip("\\").partition("\\")
+    root = ROOT_ALIASES.get(root.upper(), root.upper())
+    if root not in ROOT_KEYS:
+        raise ValueError(f"Unknown registry root: {path}")
+    return root, sub_key.strip("\\")
+
+def redirect_view(root, path, view):
+    """
+    32位视图下HKLM\\SOFTWARE重定向到SOFTWARE\\WOW6432Node，与Windows的注册表重定向一致
+
+    返回:
+    - 实际的子路径
+    """
+    if view != "32" or root != HKEY_LOCAL_MACHINE:
+        return path
+    parts = path.split("\\")
+    if parts[0].lower() != "software" or (len(parts) > 1 and parts[1].lower() == "wow6432node"):
+        return path
+    return "\\".join([parts[0], "WOW6432Node", *parts[1:]])
+
+class RegistryKey:
+    """一个打开的注册表键；各后端实现相同的方法，可用作上下文管理器"""
+
+    path = ""
+
+    def info(self):
+        """返回 (子键数, 值数, 最后写入时间)，时间为FILETIME（1601年起的100纳秒数）"""
+        raise NotImplementedError
+
+    def subkey_names(self):
+        """按枚举顺序返回子键名列表"""
+        raise NotImplementedError
+
+    def open(self, name):
+        """打开子键，不存在时抛出FileNotFoundError"""
+        raise NotImplementedError
+
+    def query_value(self, name):
+        """返回 (数据, 类型)，值不存在时抛出FileNotFoundError；空字符串为默认值"""
+        raise NotImplementedError
+
+    def enum_values(self):
+        """按枚举顺序逐个返回 (值名, 数据, 类型)"""
+        raise NotImplementedError
+
+    def get_value(self, name, default=None):
+        """值的数据，不存在时返回default"""
+        try:
+            return self.query_value(name)[0]
+        except OSError:
+            return default
+
+    def values(self):
+        """值名到数据的字典"""
+        return {name: data for name, data, _ in self.enum_values()}
+
+    def project_values(self, wanted, count, value_count=None):
+        """
+        一次值枚举读取请求的字段，不存在的值不经过异常处理
+
+        参数:
+        - wanted: 小写值名到字段下标的字典
+        - count: 字段数
+        - value_count: 已经由info()得到的值数量，避免再查询一次
+
+        返回:
+        - 按字段顺序排列的值元组，不存在的值为None
+        """
+        values = [None] * count
+        for name, data, _ in self.enum_values():
+            index = wanted.get(name.lower())
+            if index is not None:
+                values[index] = data
+        return tuple(values)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+class WinregKey(RegistryKey):
+    """winreg打开的键，每个方法对应一次winreg调用"""
+
+    def __init__(self, winreg, handle, path):
+        self._winreg = winreg
+        self._handle = handle
+        self.path = path
+
+    def info(self):
+        return tuple(self._winreg.QueryInfoKey(self._handle))
+
+    def subkey_names(self):
+        names = []
+        for index in range(self.info()[0]):
+            try:
+                names.append(self._winreg.EnumKey(self._handle, index))
+            except OSError:
+                break
+        return names
+
+    def open(self, name):
+        return WinregKey(self._winreg, self._winreg.OpenKey(self._handle, name), f"{self.path}\\{name}")
+
+    def query_value(self, name):
+        return tuple(self._winreg.QueryValueEx(self._handle, name))
+
+    def enum_values(self):
+        for index in range(self.info()[1]):
+            try:
+                yield tuple(self._winreg.EnumValue(self._handle, index))
+            except OSError:
+                return
+
+    def project_values(self, wanted, count, value_count=None):
+        # 一次QueryInfoKey加每个值一次EnumValue，请求的字段都找到后停止；不存在的值不产生异常
+        values = [None] * count
+        handle = self._handle
+        if value_count is None:
+            value_count = self._winreg.QueryInfoKey(handle)[1]
+        enum_value = self._winreg.EnumValue
+        remaining = len(wanted)
+        for position in range(value_count):
+            try:
+                name, data, _ = enum_value(handle, position)
+            except OSError:
+                break
+            field = wanted.get(name.lower())
+            if field is not None:
+                values[field] = data
+                remaining -= 1
+                if not remaining:
+                    break
+        return tuple(values)
+
+    def close(self):
+        self._winreg.CloseKey(self._handle)
+
+class WinregBackend:
+    """本机注册表；winreg在第一次打开键时才导入，因此模块在非Windows系统上也能导入（录制和回放时得到替换的winreg）"""
+
+    name = "winreg"
+
+    def open_key(self, root, path, view=None):
+        """
+        打开一个键
+
+        参数:
+        - root: 根键名，如 HKEY_LOCAL_MACHINE
+        - path: 子路径
+        - view: "64"、"32"或None（进程默认视图）
+
+        返回:
+        - WinregKey；键不存在时抛出FileNotFoundError，非Windows系统上抛出ImportError
+        """
+        import winreg
+        access = winreg.KEY_READ | {"64": winreg.KEY_WOW64_64KEY, "32": winreg.KEY_WOW64_32KEY}.get(view, 0)
+        handle = winreg.OpenKey(getattr(winreg, root), path, 0, access)
+        return WinregKey(winreg, handle, f"{root}\\{path}" if path else root)
+
+class _Node:
+    """内存注册表树中的一个键"""
+
+    __slots__ = ("name", "values", "subkeys", "last_write")
+
+    def __init__(self, name, last_write=0):
+        self.name = name
+        # 键名和值名不区分大小写：小写名称 -> 原名称和内容
+        self.values = {}
+        self.subkeys = {}
+        self.last_write = last_write
+
+class MemoryKey(RegistryKey):
+    """内存注册表树中打开的键"""
+
+    def __init__(self, node, path):
+        self._node = node
+        self.path = path
+
+    def info(self):
+        return len(self._node.subkeys), len(self._node.values), self._node.last_write
+
+    def subkey_names(self):
+        return [node.name for node in self._node.subkeys.values()]
+
+    def open(self, name):
+        node = self._node
+        for part in name.split("\\"):
+            node = node.subkeys.get(part.lower())
+            if node is None:
+                raise FileNotFoundError(2, "The system cannot find the file specified", f"{self.path}\\{name}")
+        return MemoryKey(node, f"{self.path}\\{name}")
+
+    def query_value(self, name):
+        item = self._node.values.get(name.lower())
+        if item is None:
+            raise FileNotFoundError(2, "The system cannot find the file specified", name)
+        return item[1], item[2]
+
+    def enum_values(self):
+        for item in list(self._node.values.values()):
+            yield item
+
+    def project_values(self, wanted, count, value_count=None):
+        # 值按小写名称存放，直接按字段查找
+        values = [None] * count
+        for name, index in wanted.items():
+            item = self._node.values.get(name)
+            if item is not None:
+                values[index] = item[1]
+        return tuple(values)
+
+class MemoryBackend:
+    """内存中的注册表树，用于测试、基准和 .reg 文件；32位视图按Windows的规则重定向"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._roots = {root: _Node(root) for root in ROOT_KEYS}
+
+    def _find(self, path, create=False):
+        root, sub_key = split_path(path)
+        node = self._roots[root]
+        for part in filter(None, sub_key.split("\\")):
+            child = node.subkeys.get(part.lower())
+            if child is None:
+                if not create:
+                    return None
+                child = node.subkeys[part.lower()] = _Node(part)
+            node = child
+        return node
+
+    def create_key(self, path, last_write=None):
+        """
+        创建键（包括不存在的上级键），已存在时返回原有的键
+
+        参数:
+        - path: 完整路径
+        - last_write: 最后写入时间（FILETIME），None时不修改
+        """
+        node = self._find(path, create=True)
+        if last_write is not None:
+            node.last_write = last_write
+        return MemoryKey(node, path)
+
+    def set_value(self, path, name, data, value_type=REG_SZ):
+        """设置值，键不存在时创建；name为空字符串时设置默认值"""
+        self._find(path, create=True).values[name.lower()] = (name, data, value_type)
+
+    def delete_value(self, path, name):
+        """删除值，不存在时不做任何事"""
+        node = self._find(path)
+        if node is not None:
+            node.values.pop(name.lower(), None)
+
+    def delete_key(self, path):
+        """删除键及其所有子键，不存在时不做任何事"""
+        parent_path, _, name = path.rstrip("\\").rpartition("\\")
+        parent = self._find(parent_path) if parent_path else None
+        if parent is not None:
+            parent.subkeys.pop(name.lower(), None)
+
+    def open_key(self, root, path, view=None):
+        """参数和返回值同WinregBackend.open_key，键不存在时抛出FileNotFoundError"""
+        path = redirect_view(root, path, view)
+        full_path = f"{root}\\{path}" if path else root
+        node = self._find(full_path)
+        if node is None:
+            raise FileNotFoundError(2, "The system cannot find the file specified", full_path)
+        return MemoryKey(node, full_path)
+
+    def iter_keys(self):
+        """按深度优先顺序逐个返回 (完整路径, 值列表)，值为 (值名, 数据, 类型)，用于导出"""
+        stack = [(root, self._roots[root]) for root in reversed(ROOT_KEYS)]
+        while stack:
+            path, node = stack.pop()
+            if path not in ROOT_KEYS:
+                yield path, list(node.values.values())
+            stack.extend((f"{path}\\{child.name}", child) for child in reversed(list(node.subkeys.values())))
+
+_REG_HEADERS = {"Windows Registry Editor Version 5.00": "utf-16-le", "REGEDIT4": None}
+_QUOTED = re.compile(r'"((?:[^"\\]|\\.)*)"')
+
+def _unescape(text):
+    return re.sub(r'\\(.)', r'\1', text) if "\\" in text else text
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace('"', '\\"')
+
+def _decode_reg_bytes(raw):
+    """.reg文件的文本：regedit导出的5.00格式为带BOM的UTF-16，REGEDIT4为ANSI"""
+    if raw.startswith(b"\xff\xfe"):
+        return raw[2:].decode("utf-16-le")
+    if raw.startswith(b"\xef\xbb\xbf"):
+        return raw[3:].decode("utf-8")
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return raw.decode(locale.getpreferredencoding(False), errors="replace")
+
+def _decode_string(raw, encoding):
+    # UTF-16LE直接调用解码函数，不经过按名称查找编解码器
+    if encoding == "utf-16-le":
+        return codecs.utf_16_le_decode(raw, "replace", True)[0]
+    return str(raw, encoding, "replace")
+
+def decode_value_data(raw, value_type, string_encoding="utf-16-le"):
+    """
+    把值的原始字节转换成winreg返回的数据：字符串截到第一个NUL，多字符串为列表，整数按类型的字节序
+
+    参数:
+    - raw: bytes或memoryview
+    - value_type: REG_*类型
+    - string_encoding: 字符串的编码，注册表中为UTF-16LE
+
+    返回:
+    - 数据；其他类型返回bytes
+    """
+    if value_type in (REG_SZ, REG_EXPAND_SZ):
+        return _decode_string(raw, string_encoding).partition("\x00")[0]
+    if value_type == REG_MULTI_SZ:
+        return [item for item in _decode_string(raw, string_encoding).split("\x00") if item]
+    if value_type in (REG_DWORD, REG_QWORD):
+        return int.from_bytes(raw, "little")
+    if value_type == REG_DWORD_BIG_ENDIAN:
+        return int.from_bytes(raw, "big")
+    return bytes(raw)
+
+def encode_value_data(data, value_type):
+    """decode_value_data的逆过程：把数据编码成注册表中的原始字节（字符串为UTF-16LE）"""
+    if value_type in (REG_SZ, REG_EXPAND_SZ):
+        return (str(data) + "\x00").encode("utf-16-le")
+    if value_type == REG_MULTI_SZ:
+        return "".join(item + "\x00" for item in data).encode("utf-16-le") + b"\x00\x00"
+    if value_type == REG_QWORD:
+        return int(data).to_bytes(8, "little")
+    if value_type == REG_DWORD:
+        return int(data).to_bytes(4, "little")
+    if value_type == REG_DWORD_BIG_ENDIAN:
+        return int(data).to_bytes(4, "big")
+    return bytes(data or b"")
+
+def _parse_data(text, string_encoding):
+    """
+    解析 .reg 中等号右边的数据
+
+    返回:
+    - (数据, 类型)；"-" 表示删除值时返回None
+    """
+    if text == "-":
+        return None
+    if text.startswith('"'):
+        match = _QUOTED.match(text)
+        if match is None:
+            raise ValueError(f"Unterminated string: {text}")
+        return _unescape(match.group(1)), REG_SZ
+    if text.lower().startswith("dword:"):
+        return int(text[6:], 16), REG_DWORD
+    match = re.match(r'hex(?:\(([0-9a-fA-F]+)\))?:(.*)$', text, re.S)
+    if match is None:
+        raise ValueError(f"Unsupported value data: {text[:40]}")
+    value_type = int(match.group(1), 16) if match.group(1) else REG_BINARY
+    raw = bytes.fromhex(match.group(2).replace(",", "").replace(" ", ""))
+    return decode_value_data(raw, value_type, string_encoding or locale.getpreferredencoding(False)), value_type
+
+def parse_reg_text(text, backend=None):
+    """
+    把 .reg 文件的内容应用到内存注册表：创建键、设置值，以及 [-键] 和 "值"=- 形式的删除
+
+    参数:
+    - text: 文件内容（已解码）
+    - backend: 目标MemoryBackend，None时新建
+
+    返回:
+    - MemoryBackend；文件头或数据无法识别时抛出ValueError
+    """
+    backend = backend or MemoryBackend()
+    lines = text.splitlines()
+    header = lines[0].strip() if lines else ""
+    if header not in _REG_HEADERS:
+        raise ValueError(f"Not a registry export: {header[:60]}")
+    string_encoding = _REG_HEADERS[header]
+
+    current = None
+    node = None
+    pending = ""
+    for line_number, line in enumerate(lines[1:], 2):
+        # 较长的十六进制数据以行尾的反斜杠续到下一行
+        line = pending + line.strip()
+        if line.endswith("\\") and not line.startswith("["):
+            pending = line[:-1]
+            continue
+        pending = ""
+        if not line or line.startswith(";"):
+            continue
+        if line.startswith("[") and line.endswith("]"):
+            path = line[1:-1]
+            if path.startswith("-"):
+                backend.delete_key(path[1:])
+                current = node = None
+            else:
+                current = path
+                node = backend._find(path, create=True)
+            continue
+        if current is None:
+            continue
+        if line.startswith("@="):
+            name, data = "", line[2:]
+        else:
+            match = _QUOTED.match(line)
+            if match is None or line[match.end():match.end() + 1] != "=":
+                raise ValueError(f"Line {line_number}: cannot parse value {line[:60]}")
+            name, data = _unescape(match.group(1)), line[match.end() + 1:]
+        try:
+            parsed = _parse_data(data.strip(), string_encoding)
+        except ValueError as e:
+            raise ValueError(f"Line {line_number}: {e}") from e
+        if parsed is None:
+            node.values.pop(name.lower(), None)
+        else:
+            node.values[name.lower()] = (name, *parsed)
+    return backend
+
+def load_reg_file(path, backend=None):
+    """
+    加载regedit导出的 .reg 文件（5.00格式或REGEDIT4）
+
+    参数:
+    - path: 文件路径
+    - backend: 合并到的MemoryBackend，None时新建
+
+    返回:
+    - MemoryBackend
+    """
+    with open(path, 'rb') as f:
+        return parse_reg_text(_decode_reg_bytes(f.read()), backend)
+
+def _format_data(data, value_type):
+    """把值格式化为 .reg 中等号右边的文本"""
+    if value_type == REG_SZ and isinstance(data, str):
+        return f'"{_escape(data)}"'
+    if value_type == REG_DWORD and isinstance(data, int):
+        return f"dword:{data:08x}"
+    raw = encode_value_data(data, value_type)
+    prefix = "hex:" if value_type == REG_BINARY else f"hex({value_type:x}):"
+    return prefix + ",".join(f"{byte:02x}" for byte in raw)
+
+def export_reg_file(backend, path):
+    """
+    把内存注册表写成regedit格式（5.00，带BOM的UTF-16）的 .reg 文件
+
+    参数:
+    - backend: MemoryBackend
+    - path: 输出路径
+    """
+    with open(path, 'w', encoding='utf-16-le', newline='\r\n') as f:
+        f.write("\ufeffWindows Registry Editor Version 5.00\n")
+        for key_path, values in backend.iter_keys():
+            f.write(f"\n[{key_path}]\n")
+            for name, data, value_type in values:
+                f.write(("@" if name == "" else f'"{_escape(name)}"') + "=" + _format_data(data, value_type) + "\n")
+
+_backend = WinregBackend()
+
+def configure_registry_backend(backend):
+    """
+    设置采集器读取注册表使用的后端
+
+    参数:
+    - backend: WinregBackend、MemoryBackend或实现open_key的其他对象
+
+    返回:
+    - 之前的后端
+    """
+    global _backend
+    previous, _backend = _backend, backend
+    return previous
+
+def get_registry_backend():
+    """当前的注册表后端"""
+    return _backend
+
+@contextlib.contextmanager
+def use_registry_backend(backend):
+    """在范围内临时使用另一个注册表后端（用于测试和基准）"""
+    previous = configure_registry_backend(backend)
+    try:
+        yield backend
+    finally:
+        configure_registry_backend(previous)
+
+def open_key(root, path, view=None):
+    """
+    用当前后端打开一个键
+
+    参数:
+    - root: 根键名，如 HKEY_LOCAL_MACHINE
+    - path: 子路径
+    - view: "64"、"32"或None
+
+    返回:
+    - RegistryKey，可用作上下文管理器；键不存在时抛出FileNotFoundError
+    """
+    return _backend.open_key(root, path, view)
+
+def read_values(root, path, view=None):
+    """
+    读取一个键下的全部值
+
+    返回:
+    - 值名到数据的字典，键不存在或无法读取（包括非Windows系统上使用winreg后端）时为空字典
+    """
+    try:
+        with open_key(root, path, view) as key:
+            return key.values()
+    except (OSError, ImportError):
+        return {}
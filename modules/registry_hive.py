@@ -0,0 +1,570 @@
+import os
+import mmap
+import codecs
+import struct
+import logging
+
+from .registry_backend import (RegistryKey, HKEY_LOCAL_MACHINE, HKEY_CURRENT_USER, HKEY_USERS, REG_DWORD,
+                               split_path, redirect_view, decode_value_data, encode_value_data)
+
+# REGF格式：4096字节的基本块之后是若干hbin，单元的偏移量都相对于第一个hbin
+REGF_SIGNATURE = b"regf"
+HBIN_START = 4096
+HBIN_ALIGNMENT = 4096
+# 超过此长度的值数据（hive版本1.4及以上）存放在db单元引用的多个分段中
+BIG_DATA_SEGMENT = 16344
+# 写入hive时每个lh列表的子键数上限，超过时用ri索引多个列表，与Windows一致
+LEAF_SIZE = 1012
+NO_CELL = 0xFFFFFFFF
+
+# 键名和值名为ASCII（Latin-1）而不是UTF-16LE的标志
+KEY_COMP_NAME = 0x20
+KEY_HIVE_ENTRY = 0x04
+KEY_NO_DELETE = 0x08
+VALUE_COMP_NAME = 0x01
+# 值数据长度的最高位：不超过4字节的数据直接放在数据偏移量字段中
+DATA_INLINE = 0x80000000
+
+# 签名、主序号、次序号、（时间戳）、主版本、次版本、类型、格式、根键单元、hbin总长度
+_BASE_BLOCK = struct.Struct("<4sII8xIIIIII")
+_HBIN_HEADER = struct.Struct("<4sII")
+_CELL_SIZE = struct.Struct("<i")
+# nk单元：签名、标志、最后写入时间、子键数、子键列表、值数、值列表、名称长度、类名长度
+_NK = struct.Struct("<2sHQ8xI4xI4xII28xHH")
+_NK_FULL = struct.Struct("<2sHQ15IHH")
+_NK_NAME = 76
+# vk单元：签名、名称长度、数据长度、数据偏移量、类型、标志
+_VK = struct.Struct("<2sHIIIH2x")
+_VK_NAME = 20
+_VK_DATA = 8
+_LIST_HEADER = struct.Struct("<2sH")
+_DB = struct.Struct("<2sHI")
+
+# 按hive文件名推断的挂载位置，与Windows加载这些文件的位置一致
+HIVE_MOUNT_POINTS = {
+    "software": f"{HKEY_LOCAL_MACHINE}\\SOFTWARE",
+    "system": f"{HKEY_LOCAL_MACHINE}\\SYSTEM",
+    "sam": f"{HKEY_LOCAL_MACHINE}\\SAM",
+    "security": f"{HKEY_LOCAL_MACHINE}\\SECURITY",
+    "default": f"{HKEY_USERS}\\.DEFAULT",
+    "ntuser.dat": HKEY_CURRENT_USER
+}
+
+def _decode_name(raw, compressed):
+    """键名和值名：压缩名称为Latin-1，否则为UTF-16LE"""
+    if compressed:
+        return codecs.latin_1_decode(raw)[0]
+    return codecs.utf_16_le_decode(raw, "replace", True)[0]
+
+def _not_found(path):
+    return FileNotFoundError(2, "The system cannot find the file specified", path)
+
+class HiveFile:
+    """
+    内存映射的REGF hive文件
+
+    单元通过mmap上的memoryview切片读取，不复制整个文件；只解析实际访问的键和值，值数据在读取时才解码。
+    不应用事务日志（.LOG1/.LOG2），文件未正常写回（主次序号不同）时记录警告后按现有内容读取
+    """
+
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        with open(self.path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:
+                raise ValueError(f"Not a registry hive: {self.path} ({e})") from e
+        self._view = memoryview(self._mmap)
+        # 文件的身份：绝对路径、大小和修改时间，读取基本块后再加上序号；注册表快照按它区分不同的镜像
+        self.identity = f"{os.path.abspath(self.path)}|{stat.st_size}|{stat.st_mtime_ns}"
+        # 子键表缓存：nk单元偏移量 -> {小写名称: (名称, 子键nk偏移量)}
+        self._children = {}
+        # 最近一次project_values请求的字段和字段名长度，长度不符的压缩值名不必解码
+        self._wanted_lengths = (None, frozenset())
+        try:
+            self._read_base_block()
+        except Exception:
+            self.close()
+            raise
+
+    def _read_base_block(self):
+        if len(self._mmap) < HBIN_START + _HBIN_HEADER.size:
+            raise ValueError(f"Not a registry hive: {self.path} (file too short)")
+        (signature, primary, secondary, major, minor, _, _,
+         self.root_offset, _) = _BASE_BLOCK.unpack_from(self._mmap, 0)
+        if signature != REGF_SIGNATURE:
+            raise ValueError(f"Not a registry hive: {self.path}")
+        if major != 1:
+            raise ValueError(f"Unsupported hive format version {major}.{minor}: {self.path}")
+        if _HBIN_HEADER.unpack_from(self._mmap, HBIN_START)[0] != b"hbin":
+            raise ValueError(f"Hive {self.path} has no hive bins")
+        self.minor_version = minor
+        self.identity += f"|{primary}"
+        if primary != secondary:
+            logging.warning(f"Hive {self.path} was not written back cleanly (sequence {primary} != {secondary}); "
+                            f"transaction logs are not applied")
+
+    def close(self):
+        """释放映射；已打开的键随之失效"""
+        self._children.clear()
+        self._view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def _cell(self, offset):
+        """单元数据在文件中的位置"""
+        position = HBIN_START + offset + 4
+        if offset == NO_CELL or position > len(self._mmap):
+            raise OSError(f"Corrupt hive {self.path}: cell offset {offset:#x} out of range")
+        return position
+
+    def key_header(self, offset):
+        """
+        解析nk单元
+
+        返回:
+        - (标志, 最后写入时间, 子键数, 子键列表偏移量, 值数, 值列表偏移量, 名称)
+        """
+        position = self._cell(offset)
+        signature, flags, last_write, subkey_count, subkey_list, value_count, value_list, name_length, _ = \
+            _NK.unpack_from(self._mmap, position)
+        if signature != b"nk":
+            raise OSError(f"Corrupt hive {self.path}: expected a key cell at {offset:#x}")
+        name = _decode_name(self._view[position + _NK_NAME:position + _NK_NAME + name_length], flags & KEY_COMP_NAME)
+        return flags, last_write, subkey_count, subkey_list, value_count, value_list, name
+
+    def _subkey_offsets(self, list_offset):
+        position = self._cell(list_offset)
+        signature, count = _LIST_HEADER.unpack_from(self._mmap, position)
+        if signature in (b"lf", b"lh"):
+            # 每项为子键偏移量加名称提示或散列
+            return struct.unpack_from(f"<{count * 2}I", self._mmap, position + 4)[::2]
+        if signature == b"li":
+            return struct.unpack_from(f"<{count}I", self._mmap, position + 4)
+        if signature == b"ri":
+            offsets = []
+            for leaf in struct.unpack_from(f"<{count}I", self._mmap, position + 4):
+                offsets.extend(self._subkey_offsets(leaf))
+            return offsets
+        raise OSError(f"Corrupt hive {self.path}: unknown subkey list {signature!r} at {list_offset:#x}")
+
+    def children(self, offset, subkey_count, subkey_list):
+        """一个键的子键表 {小写名称: (名称, nk偏移量)}，按hive中的顺序，第一次访问后缓存"""
+        children = self._children.get(offset)
+        if children is None:
+            children = {}
+            if subkey_count:
+                for child in self._subkey_offsets(subkey_list):
+                    name = self.key_header(child)[6]
+                    children[name.lower()] = (name, child)
+            self._children[offset] = children
+        return children
+
+    def value_offsets(self, value_count, value_list):
+        """值列表中各vk单元的偏移量"""
+        if not value_count:
+            return ()
+        return struct.unpack_from(f"<{value_count}I", self._mmap, self._cell(value_list))
+
+    def value_header(self, offset):
+        """
+        解析vk单元，不读取数据
+
+        返回:
+        - (值名, vk单元位置, 数据长度字段, 数据偏移量, 类型)
+        """
+        position = self._cell(offset)
+        signature, name_length, data_size, data_offset, value_type, flags = _VK.unpack_from(self._mmap, position)
+        if signature != b"vk":
+            raise OSError(f"Corrupt hive {self.path}: expected a value cell at {offset:#x}")
+        name = _decode_name(self._view[position + _VK_NAME:position + _VK_NAME + name_length], flags & VALUE_COMP_NAME)
+        return name, position, data_size, data_offset, value_type
+
+    def value_data(self, position, data_size, data_offset, value_type):
+        """按value_header返回的字段解码值数据"""
+        if data_size & DATA_INLINE:
+            start = position + _VK_DATA
+            return decode_value_data(self._view[start:start + min(data_size & ~DATA_INLINE, 4)], value_type)
+        start = self._cell(data_offset)
+        if data_size > BIG_DATA_SEGMENT and self.minor_version >= 4 and self._mmap[start:start + 2] == b"db":
+            _, count, segment_list = _DB.unpack_from(self._mmap, start)
+            segments = struct.unpack_from(f"<{count}I", self._mmap, self._cell(segment_list))
+            raw = bytearray()
+            for segment in segments:
+                segment_start = self._cell(segment)
+                raw += self._view[segment_start:segment_start + min(BIG_DATA_SEGMENT, data_size - len(raw))]
+            return decode_value_data(raw, value_type)
+        return decode_value_data(self._view[start:start + data_size], value_type)
+
+    def project_values(self, value_count, value_list, wanted, count):
+        """
+        HiveKey.project_values的实现：逐个解包vk单元，名称匹配请求的字段时才解码数据，
+        长度与所有字段都不同的值名不解码；读取卸载项时每个值都经过这里，因此不调用value_header和value_data
+        """
+        values = [None] * count
+        if not value_count:
+            return tuple(values)
+        cached = self._wanted_lengths
+        if cached[0] is not wanted:
+            cached = self._wanted_lengths = (wanted, frozenset(map(len, wanted)))
+        lengths = cached[1]
+        mapped = self._mmap
+        view = self._view
+        end = len(mapped) - _VK.size
+        unpack_value = _VK.unpack_from
+        for offset in struct.unpack_from(f"<{value_count}I", mapped, self._cell(value_list)):
+            position = HBIN_START + 4 + offset
+            if position > end:
+                raise OSError(f"Corrupt hive {self.path}: cell offset {offset:#x} out of range")
+            signature, name_length, data_size, data_offset, value_type, flags = unpack_value(mapped, position)
+            if signature != b"vk":
+                raise OSError(f"Corrupt hive {self.path}: expected a value cell at {offset:#x}")
+            start = position + _VK_NAME
+            if flags & VALUE_COMP_NAME:
+                if name_length not in lengths:
+                    continue
+                name = mapped[start:start + name_length].decode("latin-1")
+            else:
+                name = _decode_name(view[start:start + name_length], False)
+            index = wanted.get(name.lower())
+            if index is None:
+                continue
+            if data_size & DATA_INLINE:
+                start = position + _VK_DATA
+                values[index] = decode_value_data(view[start:start + min(data_size & ~DATA_INLINE, 4)], value_type)
+            elif data_size > BIG_DATA_SEGMENT:
+                values[index] = self.value_data(position, data_size, data_offset, value_type)
+            else:
+                start = HBIN_START + 4 + data_offset
+                values[index] = decode_value_data(view[start:start + data_size], value_type)
+        return tuple(values)
+
+    def open_path(self, path, full_path):
+        """
+        打开hive中的键
+
+        参数:
+        - path: 相对于hive根键的路径；SYSTEM hive中的CurrentControlSet按Select\\Current解析为ControlSet00n
+        - full_path: 记录在HiveKey上的完整路径
+
+        返回:
+        - HiveKey；键不存在时抛出FileNotFoundError
+        """
+        key = HiveKey(self, self.root_offset, full_path)
+        parts = [part for part in path.split("\\") if part]
+        if parts and parts[0].lower() == "currentcontrolset":
+            parts[0] = self.current_control_set() or parts[0]
+        return key._descend(parts, full_path) if parts else key
+
+    def current_control_set(self):
+        """SYSTEM hive中当前控制集的键名，如ControlSet001；不是SYSTEM hive时返回None"""
+        try:
+            with HiveKey(self, self.root_offset, "").open("Select") as select:
+                current, value_type = select.query_value("Current")
+        except OSError:
+            return None
+        return f"ControlSet{current:03d}" if value_type == REG_DWORD else None
+
+class HiveKey(RegistryKey):
+    """hive文件中打开的键；只读取访问到的单元"""
+
+    def __init__(self, hive, offset, path):
+        self._hive = hive
+        self._offset = offset
+        self.path = path
+        (_, self._last_write, self._subkey_count, self._subkey_list,
+         self._value_count, self._value_list, self.name) = hive.key_header(offset)
+
+    def info(self):
+        return self._subkey_count, self._value_count, self._last_write
+
+    def _children(self):
+        return self._hive.children(self._offset, self._subkey_count, self._subkey_list)
+
+    def subkey_names(self):
+        return [name for name, _ in self._children().values()]
+
+    def _descend(self, parts, path):
+        key = self
+        for part in parts:
+            item = key._children().get(part.lower())
+            if item is None:
+                raise _not_found(path)
+            key = HiveKey(self._hive, item[1], path)
+        return key
+
+    def open(self, name):
+        path = f"{self.path}\\{name}"
+        return self._descend([part for part in name.split("\\") if part], path)
+
+    def _value_headers(self):
+        hive = self._hive
+        for offset in hive.value_offsets(self._value_count, self._value_list):
+            yield hive.value_header(offset)
+
+    def query_value(self, name):
+        lower = name.lower()
+        for value_name, position, data_size, data_offset, value_type in self._value_headers():
+            if value_name.lower() == lower:
+                return self._hive.value_data(position, data_size, data_offset, value_type), value_type
+        raise _not_found(name)
+
+    def enum_values(self):
+        value_data = self._hive.value_data
+        for value_name, position, data_size, data_offset, value_type in self._value_headers():
+            yield value_name, value_data(position, data_size, data_offset, value_type), value_type
+
+    def project_values(self, wanted, count, value_count=None):
+        return self._hive.project_values(self._value_count, self._value_list, wanted, count)
+
+class _MountKey(RegistryKey):
+    """挂载点上层的虚拟键（如HKEY_LOCAL_MACHINE、HKEY_USERS），只包含通向挂载点的子键"""
+
+    def __init__(self, backend, root, sub_key, names):
+        self._backend = backend
+        self._root = root
+        self._sub_key = sub_key
+        self._names = names
+        self.path = f"{root}\\{sub_key}" if sub_key else root
+
+    def info(self):
+        return len(self._names), 0, 0
+
+    def subkey_names(self):
+        return list(self._names)
+
+    def open(self, name):
+        return self._backend.open_key(self._root, f"{self._sub_key}\\{name}" if self._sub_key else name)
+
+    def query_value(self, name):
+        raise _not_found(name)
+
+    def enum_values(self):
+        return iter(())
+
+class HiveBackend:
+    """
+    离线hive文件组成的注册表，每个文件挂载到一个键下（如SOFTWARE挂载到HKEY_LOCAL_MACHINE\\SOFTWARE），
+    用于读取未运行的系统（挂载的VHD、备份、取证副本）；可在任何平台上使用，32位视图按Windows的规则重定向
+    """
+
+    name = "hive"
+
+    def __init__(self):
+        # (根键名, 小写子路径) -> (子路径, HiveFile)
+        self._mounts = {}
+
+    def mount(self, key_path, hive):
+        """
+        把hive文件挂载到一个键下
+
+        参数:
+        - key_path: 挂载位置的完整路径，如 HKLM\\SOFTWARE、HKCU、HKU\\S-1-5-21-...
+        - hive: 文件路径或HiveFile
+
+        返回:
+        - HiveFile；文件不是hive时抛出ValueError
+        """
+        root, sub_key = split_path(key_path)
+        if not isinstance(hive, HiveFile):
+            hive = HiveFile(hive)
+        previous = self._mounts.pop((root, sub_key.lower()), None)
+        if previous is not None:
+            previous[1].close()
+        self._mounts[(root, sub_key.lower())] = (sub_key, hive)
+        return hive
+
+    def close(self):
+        """关闭所有挂载的文件"""
+        for _, hive in self._mounts.values():
+            hive.close()
+        self._mounts.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def _find_mount(self, root, lower):
+        """包含小写子路径lower的最深的挂载点，返回 (挂载点小写子路径, HiveFile)，不在任何挂载点下时返回None"""
+        mounted = None
+        for (mount_root, mount_path), (_, hive) in self._mounts.items():
+            if mount_root != root or not (not mount_path or lower == mount_path or lower.startswith(mount_path + "\\")):
+                continue
+            if mounted is None or len(mount_path) > len(mounted[0]):
+                mounted = (mount_path, hive)
+        return mounted
+
+    def location_identity(self, root, path, view=None):
+        """
+        提供一个位置的hive文件的身份，注册表快照把它加入位置的键，使不同镜像中的同一路径不共用记录
+
+        参数:
+        - root, path, view: 同open_key
+
+        返回:
+        - HiveFile.identity，位置不在任何挂载点下时为空字符串
+        """
+        mounted = self._find_mount(root, redirect_view(root, path, view).strip("\\").lower())
+        return mounted[1].identity if mounted is not None else ""
+
+    def open_key(self, root, path, view=None):
+        """参数和返回值同WinregBackend.open_key，键不存在时抛出FileNotFoundError"""
+        path = redirect_view(root, path, view).strip("\\")
+        full_path = f"{root}\\{path}" if path else root
+        lower = path.lower()
+
+        mounted = self._find_mount(root, lower)
+        if mounted is not None:
+            return mounted[1].open_path(path[len(mounted[0]):], full_path)
+
+        depth = len(lower.split("\\")) if lower else 0
+        names = {}
+        for (mount_root, mount_path), (sub_key, _) in self._mounts.items():
+            if mount_root == root and (not lower or mount_path.startswith(lower + "\\")):
+                name = sub_key.split("\\")[depth]
+                names.setdefault(name.lower(), name)
+        if not names and path:
+            raise _not_found(full_path)
+        return _MountKey(self, root, path, list(names.values()))
+
+def open_hive_backend(files):
+    """
+    打开一组hive文件
+
+    参数:
+    - files: 文件路径列表，按文件名（SOFTWARE、SYSTEM、NTUSER.DAT等）挂载到HIVE_MOUNT_POINTS中的位置；
+      或 挂载位置 -> 文件路径 的字典，如 {"HKU\\\\alice": ".../alice/NTUSER.DAT"}
+
+    返回:
+    - HiveBackend；文件名无法识别时抛出ValueError
+    """
+    backend = HiveBackend()
+    items = files.items() if isinstance(files, dict) else ((None, path) for path in files)
+    try:
+        for key_path, path in items:
+            if key_path is None:
+                key_path = HIVE_MOUNT_POINTS.get(os.path.basename(os.fspath(path)).lower())
+                if key_path is None:
+                    raise ValueError(f"Cannot tell where to mount {path}; pass {{key path: file}} instead")
+            backend.mount(key_path, path)
+    except Exception:
+        backend.close()
+        raise
+    return backend
+
+def _encode_name(name):
+    """键名和值名：能用Latin-1表示时按压缩名称存放"""
+    try:
+        return name.encode("latin-1"), True
+    except UnicodeEncodeError:
+        return name.encode("utf-16-le"), False
+
+def _lh_hash(name):
+    value = 0
+    for char in name.upper():
+        value = (value * 37 + ord(char)) & 0xFFFFFFFF
+    return value
+
+def export_hive_file(backend, key_path, path, last_write=0):
+    """
+    把内存注册表中一个键下的子树写成REGF hive文件，用于测试和基准
+
+    参数:
+    - backend: MemoryBackend
+    - key_path: 作为hive根键的完整路径，如 HKLM\\SOFTWARE
+    - path: 输出路径
+    - last_write: 没有最后写入时间的键使用的时间
+    """
+    root = backend._find(key_path)
+    if root is None:
+        raise _not_found(key_path)
+    cells = bytearray(_HBIN_HEADER.size)
+
+    def alloc(size):
+        size = (size + 4 + 7) & ~7
+        offset = len(cells)
+        cells.extend(_CELL_SIZE.pack(-size))
+        cells.extend(bytes(size - 4))
+        return offset
+
+    def put(offset, data):
+        cells[offset + 4:offset + 4 + len(data)] = data
+        return offset
+
+    def write_value(name, data, value_type):
+        encoded_name, compressed = _encode_name(name)
+        raw = encode_value_data(data, value_type)
+        offset = alloc(_VK_NAME + len(encoded_name))
+        if len(raw) <= 4:
+            data_size, data_offset = len(raw) | DATA_INLINE, int.from_bytes(raw.ljust(4, b"\x00"), "little")
+        elif len(raw) > BIG_DATA_SEGMENT:
+            chunks = [raw[start:start + BIG_DATA_SEGMENT] for start in range(0, len(raw), BIG_DATA_SEGMENT)]
+            segments = [put(alloc(len(chunk)), chunk) for chunk in chunks]
+            segment_list = put(alloc(4 * len(segments)), struct.pack(f"<{len(segments)}I", *segments))
+            data_size, data_offset = len(raw), put(alloc(_DB.size), _DB.pack(b"db", len(segments), segment_list))
+        else:
+            data_size, data_offset = len(raw), put(alloc(len(raw)), raw)
+        put(offset, _VK.pack(b"vk", len(encoded_name), data_size, data_offset, value_type,
+                             VALUE_COMP_NAME if compressed else 0) + encoded_name)
+        return offset, len(encoded_name), len(raw)
+
+    def write_leaf(children):
+        entries = []
+        for name, offset in children:
+            entries += (offset, _lh_hash(name))
+        return put(alloc(4 + 8 * len(children)),
+                   _LIST_HEADER.pack(b"lh", len(children)) + struct.pack(f"<{2 * len(children)}I", *entries))
+
+    def write_key(node, parent, flags):
+        encoded_name, compressed = _encode_name(node.name)
+        offset = alloc(_NK_NAME + len(encoded_name))
+        values = [write_value(*item) for item in node.values.values()]
+        value_list = put(alloc(4 * len(values)), struct.pack(f"<{len(values)}I", *(item[0] for item in values))) \
+            if values else NO_CELL
+        # Windows按大写名称排序子键列表
+        nodes = sorted(node.subkeys.values(), key=lambda child: child.name.upper())
+        children = [(child.name, write_key(child, offset, 0)) for child in nodes]
+        if not children:
+            subkey_list = NO_CELL
+        elif len(children) <= LEAF_SIZE:
+            subkey_list = write_leaf(children)
+        else:
+            leaves = [write_leaf(children[start:start + LEAF_SIZE]) for start in range(0, len(children), LEAF_SIZE)]
+            subkey_list = put(alloc(4 + 4 * len(leaves)),
+                              _LIST_HEADER.pack(b"ri", len(leaves)) + struct.pack(f"<{len(leaves)}I", *leaves))
+        put(offset, _NK_FULL.pack(
+            b"nk", flags | (KEY_COMP_NAME if compressed else 0), node.last_write or last_write, 0, parent,
+            len(children), 0, subkey_list, NO_CELL, len(values), value_list, NO_CELL, NO_CELL,
+            max((len(_encode_name(child.name)[0]) for child in nodes), default=0), 0,
+            max((item[1] for item in values), default=0), max((item[2] for item in values), default=0), 0,
+            len(encoded_name), 0) + encoded_name)
+        return offset
+
+    root_offset = write_key(root, NO_CELL, KEY_HIVE_ENTRY | KEY_NO_DELETE)
+    hbin_size = -(-len(cells) // HBIN_ALIGNMENT) * HBIN_ALIGNMENT
+    if hbin_size > len(cells):
+        # 剩余空间为一个空闲单元（正的长度）
+        cells.extend(_CELL_SIZE.pack(hbin_size - len(cells)))
+        cells.extend(bytes(hbin_size - len(cells)))
+    _HBIN_HEADER.pack_into(cells, 0, b"hbin", 0, hbin_size)
+
+    header = bytearray(HBIN_START)
+    header[:_BASE_BLOCK.size] = _BASE_BLOCK.pack(REGF_SIGNATURE, 1, 1, 1, 5, 0, 1, root_offset, hbin_size)
+    struct.pack_into("<I", header, 44, 1)
+    checksum = 0
+    for dword in struct.unpack_from("<127I", header, 0):
+        checksum ^= dword
+    struct.pack_into("<I", header, 508, {0: 1, 0xFFFFFFFF: 0xFFFFFFFE}.get(checksum, checksum))
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.write(cells)
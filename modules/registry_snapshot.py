@@ -0,0 +1,210 @@
+import os
+import json
+import atexit
+import logging
+import threading
+
+from .config import REGISTRY_SNAPSHOT_ENABLED, REGISTRY_SNAPSHOT_DIR
+from .command_cache import get_host_identity
+
+SNAPSHOT_FILENAME = "registry_snapshot.json"
+SNAPSHOT_VERSION = 1
+
+_lock = threading.Lock()
+_locations = None
+_dirty = False
+_options = {
+    "enabled": REGISTRY_SNAPSHOT_ENABLED,
+    "bypass": False,
+    "refresh": False,
+    "state_dir": REGISTRY_SNAPSHOT_DIR
+}
+_stats = {"hits": 0, "misses": 0, "uncacheable": 0}
+
+def configure_registry_snapshot(enabled=None, bypass=None, refresh=None, state_dir=None):
+    """
+    设置注册表快照缓存选项，未传入的选项保持不变
+
+    参数:
+    - enabled: 是否启用快照缓存
+    - bypass: 为True时既不读取也不写入快照
+    - refresh: 为True时不使用快照中的记录，但用实时读取的结果更新快照
+    - state_dir: 快照文件所在目录
+    """
+    global _locations, _dirty
+    with _lock:
+        for key, value in (("enabled", enabled), ("bypass", bypass), ("refresh", refresh), ("state_dir", state_dir)):
+            if value is not None:
+                _options[key] = value
+        if state_dir is not None:
+            _locations = None
+            _dirty = False
+
+def is_active():
+    """快照缓存是否参与本次读取"""
+    return _options["enabled"] and not _options["bypass"]
+
+def location_key(backend_name, root, path, view, fields, source=""):
+    """
+    快照中一个位置的键：后端、根键、路径、视图和读取的字段都相同时才共用记录
+
+    参数:
+    - backend_name: 注册表后端名
+    - root, path, view: 位置
+    - fields: 读取的值名
+    - source: 提供该位置的文件（如离线hive的路径、大小、修改时间和序号），本机注册表为空字符串
+
+    返回:
+    - 字符串
+    """
+    parts = [backend_name, root, path.lower(), view or "", ",".join(field.lower() for field in fields)]
+    return "|".join(parts + [source] if source else parts)
+
+def _snapshot_path():
+    return os.path.join(_options["state_dir"], SNAPSHOT_FILENAME)
+
+def _load_locations():
+    """读取快照文件（调用方持有_lock），版本或主机不符时视为空"""
+    global _locations
+    if _locations is not None:
+        return _locations
+
+    _locations = {}
+    try:
+        with open(_snapshot_path(), 'r', encoding='utf-8') as f:
+            document = json.load(f)
+        if document.get("version") == SNAPSHOT_VERSION and document.get("host") == get_host_identity():
+            _locations = document.get("locations", {})
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, AttributeError) as e:
+        logging.warning(f"Ignoring unreadable registry snapshot {_snapshot_path()}: {e}")
+    return _locations
+
+def _cacheable(values):
+    """只有能原样写入JSON的值（字符串、整数、字符串列表）才放入快照，REG_BINARY等读回后类型会变"""
+    for value in values:
+        if value is None or isinstance(value, (str, int)) and not isinstance(value, bool):
+            continue
+        if isinstance(value, list) and all(isinstance(item, str) for item in value):
+            continue
+        return False
+    return True
+
+class LocationSnapshot:
+    """
+    一个位置的子键快照：子键名 -> (最后写入时间, 投影后的值)
+
+    由get_location_snapshot创建；读取完一个位置后调用finish，用本次看到的子键替换快照中的记录（删除的子键随之移除）
+    """
+
+    def __init__(self, key, cached):
+        self._key = key
+        self._cached = cached
+        self._seen = {}
+        self._changed = False
+
+    def lookup(self, subkey, last_write):
+        """
+        最后写入时间与快照相同时返回快照中的值，否则返回None；最后写入时间未知（0）时总是返回None
+
+        参数:
+        - subkey: 子键名
+        - last_write: QueryInfoKey返回的最后写入时间
+
+        返回:
+        - 值元组或None
+        """
+        item = self._cached.get(subkey.lower()) if last_write and not _options["refresh"] else None
+        with _lock:
+            if item is not None and item[0] == last_write:
+                _stats["hits"] += 1
+                self._seen[subkey.lower()] = item
+                return tuple(item[1])
+            _stats["misses"] += 1
+        return None
+
+    def store(self, subkey, last_write, values):
+        """记录实时读取的子键；最后写入时间未知或值不能写入JSON时不记录"""
+        if not last_write or not _cacheable(values):
+            with _lock:
+                _stats["uncacheable"] += 1
+            return
+        self._seen[subkey.lower()] = [last_write, list(values)]
+        self._changed = True
+
+    def finish(self, complete=True):
+        """
+        把本次读取的结果写回快照
+
+        参数:
+        - complete: 为True时本次枚举了位置下的所有子键，快照中没有出现的子键被移除；否则只合并
+        """
+        global _dirty
+        # 全部命中且没有子键被删除时快照不变
+        if not self._changed and (not complete or len(self._seen) == len(self._cached)):
+            return
+        with _lock:
+            locations = _load_locations()
+            if complete:
+                locations[self._key] = self._seen
+            else:
+                locations.setdefault(self._key, {}).update(self._seen)
+            _dirty = True
+
+def get_location_snapshot(key):
+    """
+    获取一个位置的快照
+
+    参数:
+    - key: location_key返回的键
+
+    返回:
+    - LocationSnapshot；快照缓存未启用时返回None
+    """
+    if not is_active():
+        return None
+    with _lock:
+        cached = _load_locations().get(key, {})
+    return LocationSnapshot(key, cached)
+
+def flush():
+    """把本次运行更新的快照原子地写回文件"""
+    global _dirty
+    with _lock:
+        if _locations is None or not _dirty:
+            return
+        try:
+            os.makedirs(_options["state_dir"], exist_ok=True)
+            path = _snapshot_path()
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": SNAPSHOT_VERSION, "host": get_host_identity(), "locations": _locations},
+                          f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(temp_path, path)
+            _dirty = False
+        except (OSError, TypeError, ValueError) as e:
+            logging.warning(f"Could not write registry snapshot {_snapshot_path()}: {e}")
+
+def get_snapshot_summary():
+    """
+    获取本次运行的快照缓存统计
+
+    返回:
+    - 字典，包含模式、命中（最后写入时间未变，直接使用快照）、未命中（新的或修改过的子键，重新读取）、
+      无法缓存的子键数和命中率；未启用，或本次读取的子键都无法缓存（如回放夹具中没有最后写入时间）时返回None
+    """
+    with _lock:
+        looked_up = _stats["hits"] + _stats["misses"]
+        if not _options["enabled"] or looked_up == _stats["uncacheable"]:
+            return None
+        mode = "bypass" if _options["bypass"] else "refresh" if _options["refresh"] else "normal"
+        return {"mode": mode, **_stats, "hit_rate": round(_stats["hits"] / looked_up, 3)}
+
+def reset_snapshot_stats():
+    """清除本次运行的统计"""
+    with _lock:
+        for key in _stats:
+            _stats[key] = 0
+
+atexit.register(flush)
@@ -0,0 +1,849 @@
+import io
+import os
+import sys
+import json
+import time
+import types
+import base64
+import asyncio
+import builtins
+import locale
+import logging
+import platform
+import re
+import datetime
+import threading
+import itertools
+import subprocess
+import contextlib
+import contextvars
+from collections import deque
+
+BUNDLE_VERSION = 1
+MANIFEST_FILENAME = "manifest.json"
+COMMANDS_FILENAME = "commands.jsonl"
+REGISTRY_FILENAME = "registry.json"
+
+# 录制到清单中、回放时原样返回的platform函数
+PLATFORM_FUNCTIONS = ("system", "release", "version", "machine", "node", "processor", "platform", "architecture", "win32_ver", "win32_edition")
+
+# Windows注册表根键和访问标志的取值（与winreg模块一致）
+REGISTRY_ROOTS = {
+    0x80000000: "HKEY_CLASSES_ROOT",
+    0x80000001: "HKEY_CURRENT_USER",
+    0x80000002: "HKEY_LOCAL_MACHINE",
+    0x80000003: "HKEY_USERS",
+    0x80000004: "HKEY_PERFORMANCE_DATA",
+    0x80000005: "HKEY_CURRENT_CONFIG",
+    0x80000006: "HKEY_DYN_DATA",
+}
+REGISTRY_CONSTANTS = {
+    **{name: value for value, name in REGISTRY_ROOTS.items()},
+    "KEY_QUERY_VALUE": 0x0001, "KEY_SET_VALUE": 0x0002, "KEY_CREATE_SUB_KEY": 0x0004,
+    "KEY_ENUMERATE_SUB_KEYS": 0x0008, "KEY_NOTIFY": 0x0010, "KEY_CREATE_LINK": 0x0020,
+    "KEY_WOW64_64KEY": 0x0100, "KEY_WOW64_32KEY": 0x0200,
+    "KEY_READ": 0x20019, "KEY_EXECUTE": 0x20019, "KEY_WRITE": 0x20006, "KEY_ALL_ACCESS": 0xF003F,
+    "REG_NONE": 0, "REG_SZ": 1, "REG_EXPAND_SZ": 2, "REG_BINARY": 3, "REG_DWORD": 4,
+    "REG_DWORD_LITTLE_ENDIAN": 4, "REG_DWORD_BIG_ENDIAN": 5, "REG_LINK": 6, "REG_MULTI_SZ": 7,
+    "REG_RESOURCE_LIST": 8, "REG_FULL_RESOURCE_DESCRIPTOR": 9, "REG_RESOURCE_REQUIREMENTS_LIST": 10,
+    "REG_QWORD": 11, "REG_QWORD_LITTLE_ENDIAN": 11,
+}
+
+# 注册表中没有记录时各函数抛出的错误：键或值不存在，或枚举已到末尾
+_MISSING_ERRORS = {
+    "EnumKey": (OSError, 259, "No more data is available"),
+    "EnumValue": (OSError, 259, "No more data is available"),
+}
+_DEFAULT_MISSING_ERROR = (FileNotFoundError, 2, "The system cannot find the file specified")
+
+# 输出目录名中的时间戳（如 Report/20240101_120000），每次运行都不同，匹配时忽略
+_TIMESTAMP_PATTERN = re.compile(r"\d{8}_\d{6}")
+
+_lock = threading.Lock()
+_original_popen = subprocess.Popen
+_fake_pids = itertools.count(900000)
+_skip_popen = contextvars.ContextVar("replay_skip_popen", default=False)
+_state = {
+    "mode": None,
+    "bundle": None,
+    "commands": {},
+    "registry": {},
+    "latency": False,
+    "strict": False,
+    "commands_file": None,
+    "patched": [],
+    "stats": {}
+}
+
+def is_active():
+    """是否处于录制或回放模式"""
+    return _state["mode"] is not None
+
+def is_recording():
+    return _state["mode"] == "record"
+
+def is_replaying():
+    return _state["mode"] == "replay"
+
+def command_key(argv):
+    """
+    命令的匹配键：可执行文件只保留小写文件名（去掉.exe），不同机器上的安装路径和输出目录的时间戳不影响匹配
+
+    参数:
+    - argv: 命令行参数列表或shell命令字符串
+
+    返回:
+    - 字符串键
+    """
+    if isinstance(argv, (str, bytes, os.PathLike)):
+        return _TIMESTAMP_PATTERN.sub("<timestamp>", " ".join(os.fsdecode(argv).split()))
+    parts = [os.fsdecode(arg) if isinstance(arg, (bytes, os.PathLike)) else str(arg) for arg in argv]
+    if parts:
+        executable = parts[0].replace("\\", "/").rsplit("/", 1)[-1].lower()
+        parts[0] = executable[:-4] if executable.endswith(".exe") else executable
+    return _TIMESTAMP_PATTERN.sub("<timestamp>", json.dumps(parts, ensure_ascii=False))
+
+def _encode_output(value):
+    """命令输出或注册表值转换为可写入JSON的形式"""
+    if isinstance(value, (bytes, bytearray)):
+        return {"__bytes__": base64.b64encode(bytes(value)).decode("ascii")}
+    if isinstance(value, (list, tuple)):
+        return [_encode_output(item) for item in value]
+    return value
+
+def _decode_output(value):
+    if isinstance(value, dict) and "__bytes__" in value:
+        return base64.b64decode(value["__bytes__"])
+    if isinstance(value, list):
+        return [_decode_output(item) for item in value]
+    return value
+
+def _as_text(value, encoding, errors):
+    """把录制的输出转换为调用方要求的文本"""
+    if value is None:
+        return ""
+    if isinstance(value, bytes):
+        return value.decode(encoding, errors)
+    return value
+
+def _as_bytes(value):
+    """把录制的输出转换为调用方要求的字节串"""
+    if value is None:
+        return b""
+    if isinstance(value, str):
+        return value.encode("utf-8")
+    return value
+
+# ---------------------------------------------------------------------------
+# 录制
+# ---------------------------------------------------------------------------
+
+def record_command(argv, stdout="", stderr="", returncode=0, latency=0.0, timed_out=False, error=None):
+    """
+    把一次命令调用写入录制包
+
+    参数:
+    - argv: 命令行参数列表或shell命令字符串
+    - stdout, stderr: 调用方得到的输出（文本或字节）
+    - returncode: 返回码
+    - latency: 耗时（秒）
+    - timed_out: 是否超时
+    - error: 进程无法启动时的异常对象
+    """
+    if not is_recording():
+        return
+    entry = {
+        "key": command_key(argv),
+        "argv": argv if isinstance(argv, str) else [os.fsdecode(a) if isinstance(a, (bytes, os.PathLike)) else str(a) for a in argv],
+        "stdout": _encode_output(stdout),
+        "stderr": _encode_output(stderr),
+        "returncode": returncode,
+        "latency": round(latency, 4),
+        "timed_out": timed_out
+    }
+    if error is not None:
+        entry["error"] = {"type": type(error).__name__, "errno": error.errno, "message": str(error)}
+    with _lock:
+        commands_file = _state["commands_file"]
+        if commands_file is not None:
+            commands_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            commands_file.flush()
+            _state["stats"]["commands"] += 1
+
+def record_result(argv, result, latency):
+    """
+    录制一个subprocess.CompletedProcess结果（用于不经过Popen的异步命令）
+
+    参数:
+    - argv: 命令行参数列表
+    - result: subprocess.CompletedProcess对象
+    - latency: 耗时（秒）
+    """
+    timed_out = result.returncode != 0 and "timed out" in (result.stderr or "")
+    record_command(argv, result.stdout, result.stderr, result.returncode, latency, timed_out)
+
+@contextlib.contextmanager
+def skip_popen_recording():
+    """范围内启动的进程由调用方自行录制（如asyncio子进程），不在Popen层重复录制"""
+    token = _skip_popen.set(True)
+    try:
+        yield
+    finally:
+        _skip_popen.reset(token)
+
+class _TeeStream:
+    """包装子进程的输出管道，记录调用方直接读取（不经communicate）的内容"""
+
+    def __init__(self, stream, chunks):
+        self._stream = stream
+        self._chunks = chunks
+
+    def read(self, *args):
+        data = self._stream.read(*args)
+        self._chunks.append(data)
+        return data
+
+    def readline(self, *args):
+        data = self._stream.readline(*args)
+        self._chunks.append(data)
+        return data
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self._stream.readline()
+        if not line:
+            raise StopIteration
+        self._chunks.append(line)
+        return line
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+class RecordingPopen(subprocess.Popen):
+    """录制模式下替换subprocess.Popen，真实执行命令并把输出、返回码和耗时写入录制包"""
+
+    def __init__(self, args, *posargs, **kwargs):
+        self._record = not _skip_popen.get() and is_recording()
+        self._record_started = time.perf_counter()
+        self._record_written = False
+        self._record_communicating = False
+        self._record_output = None
+        self._record_timed_out = False
+        self._record_chunks = {"stdout": [], "stderr": []}
+        try:
+            super().__init__(args, *posargs, **kwargs)
+        except OSError as e:
+            if self._record:
+                record_command(args, latency=time.perf_counter() - self._record_started, returncode=None, error=e)
+            raise
+        if self._record:
+            if self.stdout is not None:
+                self.stdout = _TeeStream(self.stdout, self._record_chunks["stdout"])
+            if self.stderr is not None:
+                self.stderr = _TeeStream(self.stderr, self._record_chunks["stderr"])
+
+    def communicate(self, input=None, timeout=None):
+        self._record_communicating = True
+        try:
+            stdout, stderr = super().communicate(input, timeout)
+        except subprocess.TimeoutExpired:
+            self._record_timed_out = True
+            raise
+        finally:
+            self._record_communicating = False
+        self._record_output = (stdout, stderr)
+        self._write_record()
+        return stdout, stderr
+
+    def _write_record(self):
+        if not self._record or self._record_written or self.returncode is None:
+            return
+        self._record_written = True
+        if self._record_output is not None:
+            stdout, stderr = self._record_output
+        else:
+            stdout, stderr = ("".join(chunks) if chunks and isinstance(chunks[0], str) else b"".join(chunks)
+                              for chunks in (self._record_chunks["stdout"], self._record_chunks["stderr"]))
+        record_command(self.args, stdout, stderr, self.returncode,
+                       time.perf_counter() - self._record_started, self._record_timed_out)
+
+    def wait(self, timeout=None):
+        returncode = super().wait(timeout)
+        if not self._record_communicating:
+            self._write_record()
+        return returncode
+
+class _RecordedKey:
+    """录制模式下包装真实注册表句柄，附带键路径和视图"""
+
+    def __init__(self, handle, path, view):
+        self.handle = handle
+        self.path = path
+        self.view = view
+
+    def Close(self):
+        self.handle.Close()
+
+    def Detach(self):
+        return self.handle.Detach()
+
+    def __int__(self):
+        return int(self.handle)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.Close()
+        return False
+
+def _key_view(access):
+    """由访问标志得到注册表视图：64、32或空；打开子键时未指定视图则沿用父键的视图"""
+    if access & REGISTRY_CONSTANTS["KEY_WOW64_64KEY"]:
+        return "64"
+    if access & REGISTRY_CONSTANTS["KEY_WOW64_32KEY"]:
+        return "32"
+    return ""
+
+def _key_path(key):
+    """根键常量或已打开的键对应的路径"""
+    if isinstance(key, (_RecordedKey, ReplayKey)):
+        return key.path, key.view
+    return REGISTRY_ROOTS.get(int(key), f"HKEY_{int(key):#x}"), ""
+
+def _join_path(path, sub_key):
+    return f"{path}\\{sub_key}" if sub_key else path
+
+def registry_signature(function, path, view, *args):
+    """
+    注册表调用在录制包中的键，路径不区分大小写
+
+    参数:
+    - function: winreg函数名
+    - path: 键路径，如 HKEY_LOCAL_MACHINE\\SOFTWARE
+    - view: 视图（64、32或空）
+    - args: 其余参数，如值名或枚举序号
+    """
+    return "|".join([function, view, path.lower(), *(str(arg).lower() for arg in args)])
+
+def _record_registry(signature, result=None, error=None):
+    """写入一次注册表调用的结果或错误"""
+    if error is not None:
+        entry = {"error": {"type": type(error).__name__, "errno": getattr(error, "winerror", None) or error.errno,
+                           "message": str(error)}}
+    else:
+        entry = {"result": _encode_output(result)}
+    with _lock:
+        _state["registry"][signature] = entry
+
+def build_recording_winreg(real):
+    """
+    构建录制用的winreg替身：调用真实winreg，并把每次读取的结果写入录制包
+
+    参数:
+    - real: 真实的winreg模块
+
+    返回:
+    - 模块对象
+    """
+    module = types.ModuleType("winreg")
+    for name in dir(real):
+        if not name.startswith("_"):
+            setattr(module, name, getattr(real, name))
+
+    def unwrap(key):
+        return key.handle if isinstance(key, _RecordedKey) else key
+
+    def call(function, signature, *args):
+        try:
+            result = getattr(real, function)(*args)
+        except OSError as e:
+            _record_registry(signature, error=e)
+            raise
+        _record_registry(signature, result)
+        return result
+
+    def open_key(function):
+        def opener(key, sub_key, reserved=0, access=REGISTRY_CONSTANTS["KEY_READ"]):
+            path, parent_view = _key_path(key)
+            path = _join_path(path, sub_key)
+            view = _key_view(access) or parent_view
+            handle = call(function, registry_signature("OpenKey", path, view), unwrap(key), sub_key, reserved, access)
+            return _RecordedKey(handle, path, view)
+        return opener
+
+    module.OpenKey = open_key("OpenKey")
+    module.OpenKeyEx = open_key("OpenKeyEx")
+    module.CloseKey = lambda key: real.CloseKey(unwrap(key))
+
+    def connect_registry(computer_name, key):
+        if computer_name:
+            raise OSError(f"Remote registry is not recorded: {computer_name}")
+        handle = real.ConnectRegistry(None, key)
+        return _RecordedKey(handle, REGISTRY_ROOTS.get(int(key), str(key)), "")
+    module.ConnectRegistry = connect_registry
+
+    for function in ("QueryValueEx", "QueryValue", "EnumKey", "EnumValue"):
+        def reader(key, arg, _function=function):
+            path, view = _key_path(key)
+            result = call(_function, registry_signature(_function, path, view, arg), unwrap(key), arg)
+            return result
+        setattr(module, function, reader)
+
+    def query_info_key(key):
+        path, view = _key_path(key)
+        return call("QueryInfoKey", registry_signature("QueryInfoKey", path, view), unwrap(key))
+    module.QueryInfoKey = query_info_key
+
+    def expand(value):
+        result = real.ExpandEnvironmentStrings(value)
+        _record_registry(registry_signature("ExpandEnvironmentStrings", "", "", value), result)
+        return result
+    module.ExpandEnvironmentStrings = expand
+    return module
+
+# ---------------------------------------------------------------------------
+# 回放
+# ---------------------------------------------------------------------------
+
+def _load_bundle(bundle_dir):
+    """读取录制包：清单、按匹配键分组的命令队列和注册表调用结果"""
+    with open(os.path.join(bundle_dir, MANIFEST_FILENAME), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get("version") != BUNDLE_VERSION:
+        raise ValueError(f"Unsupported replay bundle version: {manifest.get('version')}")
+
+    commands = {}
+    commands_path = os.path.join(bundle_dir, COMMANDS_FILENAME)
+    if os.path.exists(commands_path):
+        with open(commands_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    commands.setdefault(entry["key"], deque()).append(entry)
+
+    registry = {}
+    registry_path = os.path.join(bundle_dir, REGISTRY_FILENAME)
+    if os.path.exists(registry_path):
+        with open(registry_path, 'r', encoding='utf-8') as f:
+            registry = json.load(f)
+    return manifest, commands, registry
+
+def _next_command(argv):
+    """
+    取出与命令匹配的下一条录制结果；同一命令按录制顺序依次返回，用完后重复最后一条
+
+    返回:
+    - 录制条目；没有匹配时严格模式抛出LookupError，否则抛出FileNotFoundError（如同命令不存在）
+    """
+    key = command_key(argv)
+    with _lock:
+        queue = _state["commands"].get(key)
+        if queue:
+            entry = queue.popleft() if len(queue) > 1 else queue[0]
+            _state["stats"]["served"] += 1
+            return entry
+        _state["stats"]["missing"] += 1
+        missing = _state["stats"]["missing_commands"]
+        if len(missing) < 50 and key not in missing:
+            missing.append(key)
+    if _state["strict"]:
+        raise LookupError(f"Command not in replay bundle: {key}")
+    raise FileNotFoundError(2, "Command not in replay bundle", str(argv[0] if isinstance(argv, (list, tuple)) and argv else argv))
+
+def _raise_recorded_error(error):
+    """重新抛出录制时进程启动失败或注册表读取失败的异常"""
+    error_type = {"FileNotFoundError": FileNotFoundError, "PermissionError": PermissionError}.get(error["type"], OSError)
+    exc = error_type(error.get("errno") or 0, error.get("message", ""))
+    exc.winerror = error.get("errno")
+    raise exc
+
+def _latency(entry):
+    return entry.get("latency", 0.0) if _state["latency"] else 0.0
+
+class ReplayPopen(subprocess.Popen):
+    """回放模式下替换subprocess.Popen，不启动进程，直接从录制包提供输出和返回码"""
+
+    def __init__(self, args, bufsize=-1, executable=None, stdin=None, stdout=None, stderr=None,
+                 *posargs, text=None, encoding=None, errors=None, universal_newlines=None, **kwargs):
+        self._child_created = False
+        self.args = args
+        self.returncode = None
+        self.pid = next(_fake_pids)
+        entry = _next_command(args)
+        if entry.get("error"):
+            _raise_recorded_error(entry["error"])
+
+        self._entry = entry
+        self._killed = False
+        self._ready_at = time.monotonic() + _latency(entry)
+        self.text_mode = bool(text or universal_newlines or encoding or errors)
+        encoding = encoding or locale.getpreferredencoding(False)
+        errors = errors or "strict"
+
+        def stream(value, requested):
+            if requested != subprocess.PIPE:
+                return None
+            value = _decode_output(value)
+            return io.StringIO(_as_text(value, encoding, errors)) if self.text_mode else io.BytesIO(_as_bytes(value))
+
+        self.stdout = stream(entry.get("stdout"), stdout)
+        self.stderr = stream(entry.get("stderr"), stderr)
+        self.stdin = (io.StringIO() if self.text_mode else io.BytesIO()) if stdin == subprocess.PIPE else None
+
+    def _finish(self, timeout):
+        """等到录制的耗时结束；录制时超时的命令在被终止前一直不结束"""
+        if self.returncode is not None:
+            return
+        if self._entry.get("timed_out") and not self._killed:
+            if timeout is not None:
+                time.sleep(min(timeout, _latency(self._entry)))
+            raise subprocess.TimeoutExpired(self.args, timeout)
+        remaining = self._ready_at - time.monotonic()
+        if remaining > 0:
+            if timeout is not None and timeout < remaining:
+                time.sleep(timeout)
+                raise subprocess.TimeoutExpired(self.args, timeout)
+            time.sleep(remaining)
+        self.returncode = self._entry.get("returncode") if self._entry.get("returncode") is not None else 1
+
+    def communicate(self, input=None, timeout=None):
+        self._finish(timeout)
+        stdout = self.stdout.read() if self.stdout is not None and not self.stdout.closed else None
+        stderr = self.stderr.read() if self.stderr is not None and not self.stderr.closed else None
+        return stdout, stderr
+
+    def wait(self, timeout=None):
+        self._finish(timeout)
+        return self.returncode
+
+    def poll(self):
+        if self.returncode is None and not (self._entry.get("timed_out") and not self._killed) \
+                and time.monotonic() >= self._ready_at:
+            self._finish(None)
+        return self.returncode
+
+    def send_signal(self, sig):
+        if self.returncode is None:
+            self._killed = True
+            self.returncode = -9 if sys.platform != "win32" else 1
+
+    def terminate(self):
+        self.send_signal(15)
+
+    def kill(self):
+        self.send_signal(9)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, value, traceback):
+        for stream in (self.stdout, self.stderr, self.stdin):
+            if stream is not None:
+                stream.close()
+        if self.returncode is None:
+            self.kill()
+
+    def __del__(self):
+        pass
+
+async def replay_async(argv, timeout, encoding='utf-8', errors='ignore'):
+    """
+    回放一条异步命令
+
+    参数:
+    - argv: 命令行参数列表
+    - timeout: 超时时间（秒）
+    - encoding, errors: 录制的输出为字节时使用的解码方式
+
+    返回:
+    - subprocess.CompletedProcess对象，与run_command_async的返回一致
+    """
+    try:
+        entry = _next_command(argv)
+        if entry.get("error"):
+            _raise_recorded_error(entry["error"])
+    except OSError as e:
+        return subprocess.CompletedProcess(list(argv), returncode=1, stdout="", stderr=str(e))
+
+    latency = _latency(entry)
+    if entry.get("timed_out") or (timeout is not None and latency > timeout):
+        await asyncio.sleep(min(latency, timeout) if timeout is not None else latency)
+        return subprocess.CompletedProcess(list(argv), returncode=1, stdout="", stderr=f"Command timed out after {timeout} seconds")
+    if latency:
+        await asyncio.sleep(latency)
+    return subprocess.CompletedProcess(
+        list(argv),
+        returncode=entry.get("returncode") if entry.get("returncode") is not None else 1,
+        stdout=_as_text(_decode_output(entry.get("stdout")), encoding, errors),
+        stderr=_as_text(_decode_output(entry.get("stderr")), encoding, errors)
+    )
+
+class ReplayKey:
+    """回放模式下的注册表键句柄"""
+
+    def __init__(self, path, view):
+        self.path = path
+        self.view = view
+        self.handle = self
+
+    def Close(self):
+        pass
+
+    def Detach(self):
+        return 0
+
+    def __int__(self):
+        return 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+def _registry_entry(signature, function):
+    """查找注册表调用的录制结果，没有记录时抛出与真实winreg相同类型的错误"""
+    entry = _state["registry"].get(signature)
+    with _lock:
+        _state["stats"]["registry_reads"] += 1
+    if entry is None:
+        error_type, errno, message = _MISSING_ERRORS.get(function, _DEFAULT_MISSING_ERROR)
+        exc = error_type(errno, message)
+        exc.winerror = errno
+        raise exc
+    if "error" in entry:
+        _raise_recorded_error(entry["error"])
+    return _decode_output(entry["result"])
+
+def build_replay_winreg():
+    """
+    构建回放用的winreg替身，从录制包读取注册表内容，在非Windows系统上也可以导入
+
+    返回:
+    - 模块对象
+    """
+    module = types.ModuleType("winreg")
+    for name, value in REGISTRY_CONSTANTS.items():
+        setattr(module, name, value)
+    module.HKEYType = ReplayKey
+    module.error = OSError
+
+    def open_key(key, sub_key, reserved=0, access=REGISTRY_CONSTANTS["KEY_READ"]):
+        path, parent_view = _key_path(key)
+        path = _join_path(path, sub_key)
+        view = _key_view(access) or parent_view
+        # 根键总是存在（如mimetypes打开HKEY_CLASSES_ROOT后枚举子键）
+        if sub_key or isinstance(key, ReplayKey):
+            _registry_entry(registry_signature("OpenKey", path, view), "OpenKey")
+        return ReplayKey(path, view)
+
+    module.OpenKey = open_key
+    module.OpenKeyEx = open_key
+    module.CloseKey = lambda key: None
+    module.ConnectRegistry = lambda computer_name, key: ReplayKey(REGISTRY_ROOTS.get(int(key), str(key)), "")
+
+    def reader(function, as_tuple):
+        def read(key, arg):
+            path, view = _key_path(key)
+            result = _registry_entry(registry_signature(function, path, view, arg), function)
+            return tuple(result) if as_tuple else result
+        return read
+
+    module.QueryValueEx = reader("QueryValueEx", True)
+    module.QueryValue = reader("QueryValue", False)
+    module.EnumKey = reader("EnumKey", False)
+    module.EnumValue = reader("EnumValue", True)
+
+    def query_info_key(key):
+        path, view = _key_path(key)
+        return tuple(_registry_entry(registry_signature("QueryInfoKey", path, view), "QueryInfoKey"))
+    module.QueryInfoKey = query_info_key
+
+    def expand(value):
+        try:
+            return _registry_entry(registry_signature("ExpandEnvironmentStrings", "", "", value), "ExpandEnvironmentStrings")
+        except OSError:
+            return value
+    module.ExpandEnvironmentStrings = expand
+    return module
+
+def build_registry_entries(key_path, tree, view=""):
+    """
+    由键树生成录制包中的注册表条目，用于构造回放夹具
+
+    参数:
+    - key_path: 键的完整路径，如 HKEY_LOCAL_MACHINE\\SOFTWARE\\...\\Uninstall
+    - tree: {"values": {值名: (数据, 类型)}, "subkeys": {子键名: 子树}}
+    - view: 视图（64、32或空）
+
+    返回:
+    - 注册表调用签名到录制结果的字典
+    """
+    entries = {}
+    values = tree.get("values", {})
+    subkeys = tree.get("subkeys", {})
+    entries[registry_signature("OpenKey", key_path, view)] = {"result": None}
+    entries[registry_signature("QueryInfoKey", key_path, view)] = {"result": [len(subkeys), len(values), 0]}
+    for index, (name, (data, value_type)) in enumerate(values.items()):
+        entries[registry_signature("QueryValueEx", key_path, view, name)] = {"result": _encode_output([data, value_type])}
+        entries[registry_signature("EnumValue", key_path, view, index)] = {"result": _encode_output([name, data, value_type])}
+    for index, (name, subtree) in enumerate(subkeys.items()):
+        entries[registry_signature("EnumKey", key_path, view, index)] = {"result": name}
+        entries.update(build_registry_entries(_join_path(key_path, name), subtree, view))
+    return entries
+
+def write_bundle(bundle_dir, commands=(), registry=None, platform_identity=None):
+    """
+    直接写出一个录制包，用于在没有Windows机器时构造回放夹具
+
+    参数:
+    - bundle_dir: 录制包目录
+    - commands: 命令条目列表，每项为 {"argv", "stdout", "stderr", "returncode", "latency", "timed_out"}，未给出的字段取默认值
+    - registry: 注册表调用签名到录制结果的字典，见build_registry_entries
+    - platform_identity: platform函数名到返回值的字典
+    """
+    os.makedirs(bundle_dir, exist_ok=True)
+    with open(os.path.join(bundle_dir, MANIFEST_FILENAME), 'w', encoding='utf-8') as f:
+        json.dump({
+            "version": BUNDLE_VERSION,
+            "created": datetime.datetime.now().isoformat(),
+            "python": sys.version,
+            "platform": platform_identity or {}
+        }, f, indent=2, ensure_ascii=False)
+    with open(os.path.join(bundle_dir, COMMANDS_FILENAME), 'w', encoding='utf-8') as f:
+        for command in commands:
+            entry = {
+                "key": command_key(command["argv"]),
+                "argv": command["argv"],
+                "stdout": _encode_output(command.get("stdout", "")),
+                "stderr": _encode_output(command.get("stderr", "")),
+                "returncode": command.get("returncode", 0),
+                "latency": command.get("latency", 0.0),
+                "timed_out": command.get("timed_out", False)
+            }
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    with open(os.path.join(bundle_dir, REGISTRY_FILENAME), 'w', encoding='utf-8') as f:
+        json.dump(registry or {}, f, ensure_ascii=False)
+
+# ---------------------------------------------------------------------------
+# 安装与卸载
+# ---------------------------------------------------------------------------
+
+def _patch(target, name, value):
+    """替换属性并记下原值，卸载时恢复"""
+    _state["patched"].append((target, name, getattr(target, name, None), hasattr(target, name)))
+    setattr(target, name, value)
+
+def _install_winreg(module):
+    """让之后的import winreg和已经导入winreg的模块都使用替身"""
+    real = sys.modules.get("winreg")
+    _state["patched"].append((sys.modules, "winreg", real, real is not None))
+    sys.modules["winreg"] = module
+    for loaded in list(sys.modules.values()):
+        if loaded is not None and real is not None and getattr(loaded, "winreg", None) is real:
+            _patch(loaded, "winreg", module)
+
+def _new_stats():
+    return {"commands": 0, "served": 0, "missing": 0, "missing_commands": [], "registry_reads": 0}
+
+def start_recording(bundle_dir):
+    """
+    开始录制：真实执行所有外部命令和注册表读取，并把结果写入录制包目录
+
+    应在导入采集器模块之前或之后调用均可；录制期间PowerShell命令不使用常驻宿主池，以便逐条录制
+
+    参数:
+    - bundle_dir: 录制包目录
+    """
+    stop()
+    os.makedirs(bundle_dir, exist_ok=True)
+    _state.update(mode="record", bundle=bundle_dir, registry={}, stats=_new_stats(), patched=[])
+    _state["commands_file"] = open(os.path.join(bundle_dir, COMMANDS_FILENAME), 'w', encoding='utf-8')
+
+    identity = {}
+    for name in PLATFORM_FUNCTIONS:
+        function = getattr(platform, name, None)
+        if function is not None:
+            try:
+                identity[name] = function()
+            except Exception:
+                pass
+    manifest = {
+        "version": BUNDLE_VERSION,
+        "created": datetime.datetime.now().isoformat(),
+        "python": sys.version,
+        "platform": identity
+    }
+    with open(os.path.join(bundle_dir, MANIFEST_FILENAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+    try:
+        import winreg
+        _install_winreg(build_recording_winreg(winreg))
+    except ImportError:
+        logging.warning("winreg is not available, registry reads will not be recorded")
+    _patch(subprocess, "Popen", RecordingPopen)
+    logging.info(f"Recording external commands and registry reads to {bundle_dir}")
+
+def start_replay(bundle_dir, latency=False, strict=False):
+    """
+    开始回放：外部命令、注册表读取和platform信息都由录制包提供，不启动任何进程
+
+    必须在导入采集器模块之前调用，非Windows系统上才能导入依赖winreg的模块
+
+    参数:
+    - bundle_dir: 录制包目录
+    - latency: 为True时按录制的耗时等待后再返回结果
+    - strict: 为True时遇到录制包中没有的命令抛出LookupError，否则视为命令不存在
+    """
+    stop()
+    manifest, commands, registry = _load_bundle(bundle_dir)
+    _state.update(mode="replay", bundle=bundle_dir, commands=commands, registry=registry,
+                  latency=latency, strict=strict, stats=_new_stats(), patched=[])
+
+    for name, value in manifest.get("platform", {}).items():
+        if hasattr(platform, name):
+            _patch(platform, name, (lambda value: lambda *args, **kwargs: tuple(value) if isinstance(value, list) else value)(value))
+    _install_winreg(build_replay_winreg())
+    # 采集器捕获的WindowsError在Windows上是OSError的别名
+    if not hasattr(builtins, "WindowsError"):
+        _patch(builtins, "WindowsError", OSError)
+    _patch(subprocess, "Popen", ReplayPopen)
+    logging.info(f"Replaying external commands and registry reads from {bundle_dir}")
+
+def stop():
+    """
+    停止录制或回放，恢复被替换的模块和函数
+
+    返回:
+    - 统计字典（录制的命令数，或回放命中/未命中的命令数和注册表读取次数），未启用时返回None
+    """
+    if not is_active():
+        return None
+    mode = _state["mode"]
+    for target, name, value, existed in reversed(_state["patched"]):
+        if target is sys.modules:
+            if existed:
+                sys.modules[name] = value
+            else:
+                sys.modules.pop(name, None)
+        elif existed:
+            setattr(target, name, value)
+        else:
+            delattr(target, name)
+    _state["patched"] = []
+
+    with _lock:
+        if _state["commands_file"] is not None:
+            _state["commands_file"].close()
+            _state["commands_file"] = None
+        if mode == "record":
+            path = os.path.join(_state["bundle"], REGISTRY_FILENAME)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(_state["registry"], f, ensure_ascii=False)
+            _state["stats"]["registry_reads"] = len(_state["registry"])
+        _state["mode"] = None
+    return {"mode": mode, "bundle": _state["bundle"], **_state["stats"]}
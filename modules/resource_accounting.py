@@ -0,0 +1,310 @@
+import os
+import json
+import time
+import platform
+import datetime
+import threading
+import contextlib
+import contextvars
+
+from .config import RESOURCE_ACCOUNTING_ENABLED, RESOURCE_SAMPLE_INTERVAL
+from .run_journal import write_atomic
+
+METRICS_FILENAME = "run_metrics.json"
+
+_lock = threading.Lock()
+_options = {
+    "enabled": RESOURCE_ACCOUNTING_ENABLED,
+    "sample_interval": RESOURCE_SAMPLE_INTERVAL
+}
+_accounts = {}
+_active = set()
+_stats = {"peak_rss_bytes": 0}
+_sampler = None
+_process = None
+_current = contextvars.ContextVar("resource_account", default=None)
+
+def configure_resource_accounting(enabled=None, sample_interval=None):
+    """
+    设置资源统计选项，未传入的选项保持不变
+
+    参数:
+    - enabled: 是否为每个采集器记录耗时、CPU时间、内存峰值、子进程和写出的字节数
+    - sample_interval: 采样进程常驻内存的间隔（秒）
+    """
+    with _lock:
+        for key, value in (("enabled", enabled), ("sample_interval", sample_interval)):
+            if value is not None:
+                _options[key] = value
+
+def _rss():
+    """当前进程的常驻内存字节数"""
+    # 只在资源统计启用时才加载psutil
+    global _process
+    import psutil
+    try:
+        if _process is None:
+            _process = psutil.Process()
+        rss = _process.memory_info().rss
+    except (psutil.Error, OSError):
+        return 0
+    if rss > _stats["peak_rss_bytes"]:
+        _stats["peak_rss_bytes"] = rss
+    return rss
+
+def _directory_size(path):
+    """目录下所有文件的总字节数，目录不存在时为0"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def _sample():
+    """采样线程：有采集器在运行时定期读取常驻内存，更新每个运行中采集器的峰值"""
+    global _sampler
+    while True:
+        time.sleep(_options["sample_interval"])
+        with _lock:
+            if not _active:
+                _sampler = None
+                return
+            rss = _rss()
+            for account in _active:
+                account.rss_peak = max(account.rss_peak, rss)
+
+class ResourceAccount:
+    """一个采集器运行期间的资源使用"""
+
+    def __init__(self, name, parent=None, watch_dirs=()):
+        """
+        参数:
+        - name: 采集器或步骤名
+        - parent: 外层采集器的记录，内层的子进程和写出字节数在结束时也计入外层
+        - watch_dirs: 以这些目录增加的字节数作为写出的字节数（如备份步骤的输出目录）
+        """
+        self.name = name
+        self.parent = parent
+        self.watch_dirs = list(watch_dirs)
+        self.child_processes = 0
+        self.child_cpu_seconds = 0.0
+        self.worker_cpu_seconds = 0.0
+        self.bytes_written = 0
+        self.started = time.perf_counter()
+        self.thread_cpu_started = time.thread_time()
+        self.rss_started = _rss()
+        self.rss_peak = self.rss_started
+        self.dir_size_started = sum(_directory_size(path) for path in self.watch_dirs)
+
+    def add_child_process(self):
+        """记录启动了一个子进程"""
+        with _lock:
+            self.child_processes += 1
+
+    def add_child_cpu(self, seconds):
+        """累加子进程（或常驻PowerShell宿主执行本采集器命令时）的CPU时间"""
+        if seconds is not None:
+            with _lock:
+                self.child_cpu_seconds += seconds
+
+    def add_worker_cpu(self, seconds):
+        """累加本采集器交给其他线程（线程池工作线程、PowerShell宿主的读取线程等）执行的工作的CPU时间"""
+        if seconds > 0:
+            with _lock:
+                self.worker_cpu_seconds += seconds
+
+    def finish(self, status):
+        """
+        结束统计
+
+        返回:
+        - 本采集器的指标字典
+        """
+        wall = time.perf_counter() - self.started
+        thread_cpu = time.thread_time() - self.thread_cpu_started
+        rss = _rss()
+        if self.watch_dirs:
+            self.bytes_written += max(0, sum(_directory_size(path) for path in self.watch_dirs) - self.dir_size_started)
+        with _lock:
+            self.rss_peak = max(self.rss_peak, rss)
+            metrics = {
+                "status": status,
+                "wall_seconds": round(wall, 3),
+                "cpu_seconds": round(thread_cpu + self.worker_cpu_seconds, 3),
+                "worker_cpu_seconds": round(self.worker_cpu_seconds, 3),
+                "child_cpu_seconds": round(self.child_cpu_seconds, 3),
+                "child_processes": self.child_processes,
+                "peak_rss_delta_bytes": self.rss_peak - self.rss_started,
+                "bytes_written": self.bytes_written
+            }
+            if self.parent is not None:
+                metrics["parent"] = self.parent.name
+                self.parent.child_processes += self.child_processes
+                self.parent.child_cpu_seconds += self.child_cpu_seconds
+                self.parent.worker_cpu_seconds += self.worker_cpu_seconds
+                self.parent.bytes_written += self.bytes_written
+        return metrics
+
+@contextlib.contextmanager
+def account(name, watch_dirs=()):
+    """
+    统计范围内一个采集器的墙钟时间、CPU时间（本线程加上经bind_worker交给工作线程的部分）、常驻内存峰值增量、启动的子进程数和CPU时间，以及写出的字节数；
+    同名采集器再次运行时覆盖上次的记录
+
+    常驻内存是整个进程的值，采集器并行运行时峰值增量可能包含同时运行的其他采集器
+
+    参数:
+    - name: 采集器或步骤名
+    - watch_dirs: 以这些目录增加的字节数作为写出的字节数
+
+    返回:
+    - 上下文管理器，as得到ResourceAccount（未启用时为None）
+    """
+    global _sampler
+    if not _options["enabled"]:
+        yield None
+        return
+    # 子进程在subprocess.Popen的钩子中计入当前采集器
+    from .command_trace import install_popen_hook
+    install_popen_hook()
+
+    record = ResourceAccount(name, _current.get(), watch_dirs)
+    token = _current.set(record)
+    with _lock:
+        _active.add(record)
+        if _sampler is None:
+            _sampler = threading.Thread(target=_sample, name="resource-sampler", daemon=True)
+            _sampler.start()
+    status = "ok"
+    try:
+        yield record
+    except BaseException:
+        status = "failed"
+        raise
+    finally:
+        _current.reset(token)
+        with _lock:
+            _active.discard(record)
+        metrics = record.finish(status)
+        with _lock:
+            _accounts.pop(name, None)
+            _accounts[name] = metrics
+
+def current_account():
+    """当前采集器的记录，不在account范围内时返回None"""
+    return _current.get()
+
+def bind_worker(func):
+    """
+    包装要交给其他线程执行的函数：在调用方的上下文副本中运行，并把它在工作线程中消耗的CPU时间计入调用方的采集器
+
+    线程池和新线程不继承上下文变量，每次提交前调用一次（同一个上下文副本不能被多个线程同时进入）
+
+    参数:
+    - func: 在工作线程中执行的函数
+
+    返回:
+    - 包装后的函数
+    """
+    context = contextvars.copy_context()
+    record = _current.get()
+
+    def run(*args, **kwargs):
+        started = time.thread_time()
+        try:
+            return context.run(func, *args, **kwargs)
+        finally:
+            if record is not None:
+                record.add_worker_cpu(time.thread_time() - started)
+    return run
+
+def record_bytes(name, nbytes):
+    """
+    把写出的字节数计入已结束的采集器（如main.py在采集器返回后写出分区文件）
+
+    参数:
+    - name: 采集器名
+    - nbytes: 字节数
+    """
+    with _lock:
+        if name in _accounts:
+            _accounts[name]["bytes_written"] += nbytes
+
+def get_resource_summary():
+    """
+    各采集器的资源使用，以及顶层采集器的合计
+
+    返回:
+    - {"collectors": {名称: 指标}, "totals": 合计, "peak_rss_bytes": 进程常驻内存峰值}，没有任何记录时返回None
+    """
+    with _lock:
+        if not _accounts:
+            return None
+        collectors = {name: dict(metrics) for name, metrics in _accounts.items()}
+    top_level = [metrics for metrics in collectors.values() if "parent" not in metrics]
+    totals = {key: round(sum(metrics[key] for metrics in top_level), 3)
+              for key in ("cpu_seconds", "child_cpu_seconds", "child_processes", "bytes_written")}
+    return {"collectors": collectors, "totals": totals, "peak_rss_bytes": _stats["peak_rss_bytes"]}
+
+def format_resource_summary(summary):
+    """
+    把资源使用格式化为按墙钟时间排序的文本表格，用于日志和控制台
+
+    参数:
+    - summary: get_resource_summary的结果
+
+    返回:
+    - 多行字符串
+    """
+    totals = summary["totals"]
+    lines = [
+        f"Resource usage: {totals['cpu_seconds']}s CPU, {totals['child_cpu_seconds']}s child CPU, "
+        f"{totals['child_processes']} child processes, {totals['bytes_written'] / 1024:.1f} KiB written, "
+        f"peak RSS {summary['peak_rss_bytes'] / 2 ** 20:.1f} MiB",
+        f"{'wall s':>8} {'cpu s':>8} {'child s':>8} {'procs':>5} {'rss MiB':>8} {'out KiB':>8}  collector"
+    ]
+    ranked = sorted(summary["collectors"].items(), key=lambda item: item[1]["wall_seconds"], reverse=True)
+    for name, metrics in ranked:
+        lines.append(
+            f"{metrics['wall_seconds']:>8.3f} {metrics['cpu_seconds']:>8.3f} {metrics['child_cpu_seconds']:>8.3f} "
+            f"{metrics['child_processes']:>5} {metrics['peak_rss_delta_bytes'] / 2 ** 20:>8.1f} "
+            f"{metrics['bytes_written'] / 1024:>8.1f}  {name}"
+            + (f" (in {metrics['parent']})" if "parent" in metrics else "")
+            + (" FAILED" if metrics["status"] != "ok" else "")
+        )
+    return "\n".join(lines)
+
+def write_run_metrics(logs_dir, extra=None):
+    """
+    把本次运行的资源使用原子地写到 logs_dir/run_metrics.json，便于比较多次运行找出性能回退
+
+    参数:
+    - logs_dir: 本次运行的日志目录
+    - extra: 一并写出的其他字段，如调度摘要
+
+    返回:
+    - 写出的路径，没有任何记录时返回None
+    """
+    summary = get_resource_summary()
+    if summary is None:
+        return None
+    document = {
+        "timestamp": datetime.datetime.now().isoformat(),
+        "host": platform.node(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        **summary,
+        **(extra or {})
+    }
+    path = os.path.join(logs_dir, METRICS_FILENAME)
+    write_atomic(path, lambda f: json.dump(document, f, indent=2, ensure_ascii=False))
+    return path
+
+def reset_resource_accounting():
+    """清除已记录的资源使用（用于测试或同一进程中的下一次运行）"""
+    with _lock:
+        _accounts.clear()
+        _stats["peak_rss_bytes"] = 0
@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+from pathlib import Path
+
+from .json_refs import dump_json, resolve_references, escape_token, REF_KEY
+
+EVENTS_FILENAME = "events.ndjson"
+PARTIAL_DIRNAME = ".partial"
+
+def write_atomic(path, write):
+    """
+    原子地写出文件：先写临时文件并同步到磁盘，再替换目标文件，中途崩溃不会留下半个文件
+
+    参数:
+    - path: 目标文件路径
+    - write: 以文本文件对象为参数的写入函数
+
+    返回:
+    - write的返回值
+    """
+    path = Path(path)
+    os.makedirs(path.parent, exist_ok=True)
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            result = write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if temp_path.exists():
+            temp_path.unlink()
+        raise
+    return result
+
+def read_events(path):
+    """
+    读取事件日志，跳过崩溃时写了一半的最后一行
+
+    参数:
+    - path: events.ndjson路径
+
+    返回:
+    - 事件字典列表，文件不存在时为空列表
+    """
+    events = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    logging.warning(f"Ignoring truncated event in {path}: {line[:80]!r}")
+    except FileNotFoundError:
+        pass
+    return events
+
+def find_resumable_run(base_dir="Report"):
+    """
+    查找最近一次没有正常结束的运行
+
+    参数:
+    - base_dir: 各次运行输出目录的上级目录
+
+    返回:
+    - 运行输出目录，没有可继续的运行时返回None
+    """
+    base_dir = Path(base_dir)
+    if not base_dir.is_dir():
+        return None
+    for run_dir in sorted((path for path in base_dir.iterdir() if path.is_dir()), reverse=True):
+        events = read_events(run_dir / "logs" / EVENTS_FILENAME)
+        if events and not any(event.get("event") == "run_finished" for event in events):
+            return run_dir
+    return None
+
+class RunJournal:
+    """一次运行的只追加事件日志：每个分区完成后立即原子地写出分区文件并记录事件，中断的运行可以从日志继续"""
+
+    def __init__(self, output_dir, resume=False):
+        """
+        参数:
+        - output_dir: 本次运行的输出目录
+        - resume: 为True时读取已有的事件日志，之前完成且文件仍然存在的分区视为已完成
+        """
+        self.output_dir = Path(output_dir)
+        self.events_path = self.output_dir / "logs" / EVENTS_FILENAME
+        self.partial_dir = self.output_dir / PARTIAL_DIRNAME
+        self.completed = {}
+        self.stats = {}
+        self._lock = threading.Lock()
+
+        if resume:
+            for event in read_events(self.events_path):
+                if event.get("event") == "section_completed":
+                    file = event.get("file")
+                    if file is None or (self.output_dir / file).exists():
+                        self.completed[event["section"]] = file
+
+        os.makedirs(self.events_path.parent, exist_ok=True)
+        self._file = open(self.events_path, 'a', encoding='utf-8')
+
+    def record(self, event, **fields):
+        """
+        追加一条事件并同步到磁盘
+
+        参数:
+        - event: 事件名，如 run_started、section_completed、section_failed、run_finished
+        - fields: 事件的其他字段
+        """
+        line = json.dumps({"event": event, "time": round(time.time(), 3), **fields}, ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def save_section(self, name, data, path=None):
+        """
+        原子地写出分区结果并记录section_completed事件，之后调用方可以释放该结果
+
+        参数:
+        - name: 分区名
+        - data: 分区结果
+        - path: 分区文件路径，默认为输出目录下的 .partial/<name>.json
+
+        返回:
+        - dump_json的统计（引用数、字节数、省下的字节数）
+        """
+        path = Path(path) if path is not None else self.partial_dir / f"{name}.json"
+        stats = write_atomic(path, lambda f: dump_json(data, f, measure=True, indent=2, ensure_ascii=False))
+        file = os.path.relpath(path, self.output_dir)
+        with self._lock:
+            self.completed[name] = file
+            self.stats[name] = stats
+        self.record("section_completed", section=name, file=file, bytes=stats["bytes"])
+        return stats
+
+    def mark_completed(self, name, **fields):
+        """记录一个没有输出文件的步骤（如导出）已完成"""
+        with self._lock:
+            self.completed[name] = None
+        self.record("section_completed", section=name, file=None, **fields)
+
+    def is_completed(self, name):
+        """分区在本次或被继续的运行中是否已完成"""
+        return name in self.completed
+
+    def section_path(self, name):
+        """已完成分区的文件路径，没有文件时返回None"""
+        file = self.completed.get(name)
+        return self.output_dir / file if file else None
+
+    def load_section(self, name):
+        """
+        从分区文件读回结果，{"$ref": ...}引用还原为共享对象
+
+        返回:
+        - 分区结果
+        """
+        with open(self.section_path(name), 'r', encoding='utf-8') as f:
+            return resolve_references(json.load(f))
+
+    def write_combined(self, path, fields):
+        """
+        把多个分区文件按顺序拼接为一个JSON对象，不需要把分区全部读入内存；
+        输出与对整个对象调用 dump_json(indent=2) 的结构相同，分区内的引用改为相对整个文档的路径
+
+        参数:
+        - path: 输出文件路径
+        - fields: (键, 值) 列表；值为 ("section", 分区名) 时从分区文件拷贝，否则直接序列化
+        """
+        def write(f):
+            f.write("{")
+            for index, (key, value) in enumerate(fields):
+                f.write(("," if index else "") + "\n  " + json.dumps(key, ensure_ascii=False) + ": ")
+                if isinstance(value, tuple) and len(value) == 2 and value[0] == "section":
+                    prefix = f'"{REF_KEY}": "#/{escape_token(key)}/'
+                    with open(self.section_path(value[1]), 'r', encoding='utf-8') as section:
+                        for line_number, line in enumerate(section):
+                            # JSON文本中未转义的 "$ref": "#/ 只能是引用本身，字符串值中的引号总是被转义
+                            line = line.replace(f'"{REF_KEY}": "#/', prefix)
+                            f.write(("  " if line_number else "") + line)
+                else:
+                    f.write(json.dumps(value, indent=2, ensure_ascii=False).replace("\n", "\n  "))
+            f.write("\n}" if fields else "}")
+
+        write_atomic(path, write)
+
+    def finish(self, keep_partial=False):
+        """
+        记录run_finished事件并关闭事件日志
+
+        参数:
+        - keep_partial: 为False时删除只为中断后继续而保留的 .partial 目录
+        """
+        self.record("run_finished", sections=sorted(self.completed))
+        self.close()
+        if not keep_partial and self.partial_dir.exists():
+            shutil.rmtree(self.partial_dir, ignore_errors=True)
+
+    def close(self):
+        """关闭事件日志文件"""
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
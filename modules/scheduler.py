@@ -0,0 +1,123 @@
+import time
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from .config import COLLECTOR_MAX_WORKERS, COLLECTOR_COST_ORDER
+
+_last_summary = None
+
+def _validate(tasks):
+    """
+    检查任务名唯一、依赖存在且没有循环依赖
+
+    返回:
+    - 按依赖排序的任务名列表，同一层内保持声明顺序
+    """
+    names = [task["name"] for task in tasks]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate collector task names: {names}")
+    by_name = {task["name"]: task for task in tasks}
+    for task in tasks:
+        for dep in task.get("deps", ()):
+            if dep not in by_name:
+                raise ValueError(f"Collector task {task['name']} depends on unknown task {dep}")
+        if task.get("cost", "medium") not in COLLECTOR_COST_ORDER:
+            raise ValueError(f"Unknown cost class for collector task {task['name']}: {task.get('cost')}")
+
+    order = []
+    done = set()
+    while len(order) < len(tasks):
+        ready = [name for name in names if name not in done and all(dep in done for dep in by_name[name].get("deps", ()))]
+        if not ready:
+            raise ValueError(f"Circular dependency between collector tasks: {[n for n in names if n not in done]}")
+        order.extend(ready)
+        done.update(ready)
+    return order
+
+def _call(task, results):
+    """执行一个任务，依赖任务的结果按任务名作为关键字参数传入"""
+    kwargs = {dep: results[dep] for dep in task.get("deps", ())}
+    return task["func"](**kwargs)
+
+def run_collectors(tasks, max_workers=COLLECTOR_MAX_WORKERS, serial=False):
+    """
+    按依赖关系运行采集任务，互不依赖的任务在线程池中同时运行
+
+    参数:
+    - tasks: 任务列表，每项为 {"name": 任务名, "func": 函数, "deps": 依赖的任务名, "cost": "slow"|"medium"|"fast"}；
+      func以依赖任务的结果作为同名关键字参数
+    - max_workers: 同时运行的任务数上限
+    - serial: 为True时在当前线程中按声明顺序（满足依赖）逐个运行，用于调试
+
+    返回:
+    - 任务名到结果的字典，顺序与tasks一致；任一任务抛出异常时不再启动新任务，等运行中的任务结束后重新抛出
+    """
+    global _last_summary
+    order = _validate(tasks)
+    by_name = {task["name"]: task for task in tasks}
+    results = {}
+    seconds = {}
+    started = time.perf_counter()
+    parallel = not serial and max_workers > 1 and len(tasks) > 1
+
+    def timed(task):
+        task_started = time.perf_counter()
+        try:
+            return _call(task, results)
+        finally:
+            seconds[task["name"]] = round(time.perf_counter() - task_started, 3)
+
+    if not parallel:
+        for name in order:
+            results[name] = timed(by_name[name])
+    else:
+        error = None
+        pending = list(order)
+        running = {}
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="collector") as executor:
+            while pending or running:
+                if error is None:
+                    # 依赖已完成的任务中耗时长的先启动
+                    ready = [name for name in pending if all(dep in results for dep in by_name[name].get("deps", ()))]
+                    ready.sort(key=lambda name: COLLECTOR_COST_ORDER[by_name[name].get("cost", "medium")])
+                    for name in ready[:max_workers - len(running)]:
+                        pending.remove(name)
+                        # 工作线程不继承上下文变量，复制当前上下文以保留时间预算和跟踪信息
+                        context = contextvars.copy_context()
+                        running[executor.submit(context.run, timed, by_name[name])] = name
+                        logging.debug(f"Started collector task {name}")
+                elif not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                        logging.debug(f"Collector task {name} finished in {seconds.get(name)}s")
+                    except Exception as e:
+                        logging.error(f"Collector task {name} failed: {e}")
+                        if error is None:
+                            error = e
+        if error is not None:
+            raise error
+
+    wall = round(time.perf_counter() - started, 3)
+    _last_summary = {
+        "mode": "parallel" if parallel else "serial",
+        "workers": max_workers if parallel else 1,
+        "wall_seconds": wall,
+        "task_seconds": {task["name"]: seconds.get(task["name"]) for task in tasks},
+        "sum_task_seconds": round(sum(seconds.values()), 3)
+    }
+    return {task["name"]: results[task["name"]] for task in tasks}
+
+def get_schedule_summary():
+    """
+    获取最近一次run_collectors的耗时统计
+
+    返回:
+    - 统计字典（模式、线程数、总耗时、各任务耗时及其总和），尚未运行时返回None
+    """
+    return _last_summary
@@ -0,0 +1,214 @@
+import time
+import logging
+import threading
+import contextlib
+import contextvars
+
+from .config import (
+    SECTION_PRIORITIES,
+    DEFAULT_SECTION_PRIORITY,
+    PRIORITY_WEIGHTS,
+    LOW_PRIORITY,
+    LOW_PRIORITY_MIN_SECONDS
+)
+
+# 当前分区：(分区名, 截止时间)
+_current_section = contextvars.ContextVar("time_budget_section", default=None)
+_active_budget = None
+
+def get_section_priority(name):
+    """获取分区优先级，1最高"""
+    return SECTION_PRIORITIES.get(name, DEFAULT_SECTION_PRIORITY)
+
+def _weight(name):
+    return PRIORITY_WEIGHTS.get(get_section_priority(name), 1)
+
+class TimeBudget:
+    """整个运行的时间预算，按优先级把剩余时间分给尚未开始的分区"""
+
+    def __init__(self, total_seconds, sections=()):
+        """
+        初始化时间预算
+
+        参数:
+        - total_seconds: 总预算（秒）
+        - sections: 计划采集的分区名，按执行顺序
+        """
+        self.total_seconds = float(total_seconds)
+        self.started = time.monotonic()
+        self.deadline = self.started + self.total_seconds
+        self.planned = []
+        self.started_sections = set()
+        self.allocations = {}
+        self.partial = {}
+        self._lock = threading.Lock()
+        self.plan(sections)
+
+    def remaining(self):
+        """剩余时间（秒）"""
+        return max(0.0, self.deadline - time.monotonic())
+
+    def plan(self, sections):
+        """追加计划采集的分区，已计划的分区忽略"""
+        with self._lock:
+            for name in sections:
+                if name not in self.planned:
+                    self.planned.append(name)
+
+    def allocate(self, name):
+        """
+        开始一个分区，按该分区与尚未开始的分区的优先级权重分配剩余时间
+
+        参数:
+        - name: 分区名
+
+        返回:
+        - 分给该分区的时间（秒）
+        """
+        with self._lock:
+            self.started_sections.add(name)
+            pending = [s for s in self.planned if s not in self.started_sections]
+            total_weight = _weight(name) + sum(_weight(s) for s in pending)
+            share = self.remaining() * _weight(name) / total_weight
+            self.allocations[name] = round(share, 2)
+            return share
+
+    def mark_partial(self, name, reason):
+        """标记分区为部分完成，保留第一次记录的原因"""
+        with self._lock:
+            self.partial.setdefault(name, reason)
+
+    def summary(self):
+        """
+        获取预算使用情况
+
+        返回:
+        - 字典，包含总预算、已用时间、剩余时间、各分区分到的时间和部分完成的分区
+        """
+        with self._lock:
+            return {
+                "total_seconds": self.total_seconds,
+                "elapsed_seconds": round(time.monotonic() - self.started, 2),
+                "remaining_seconds": round(self.remaining(), 2),
+                "allocations": dict(self.allocations),
+                "partial_sections": dict(self.partial)
+            }
+
+def start_time_budget(total_seconds, sections=()):
+    """
+    开始一次运行的时间预算
+
+    参数:
+    - total_seconds: 总预算（秒），None或0表示不限时
+    - sections: 计划采集的分区名，按执行顺序
+
+    返回:
+    - TimeBudget对象，不限时时返回None
+    """
+    global _active_budget
+    _active_budget = TimeBudget(total_seconds, sections) if total_seconds else None
+    if _active_budget:
+        logging.info(f"Time budget: {total_seconds}s for {len(_active_budget.planned)} sections")
+    return _active_budget
+
+def get_time_budget():
+    """获取当前运行的时间预算，不限时时返回None"""
+    return _active_budget
+
+def plan_sections(sections):
+    """向当前时间预算追加计划采集的分区，不限时时不做任何事"""
+    if _active_budget is not None:
+        _active_budget.plan(sections)
+
+@contextlib.contextmanager
+def budget_section(name):
+    """
+    在分到的时间内采集一个分区，其中的命令超时不会超过分区截止时间
+
+    低优先级分区分到的时间不足LOW_PRIORITY_MIN_SECONDS时不采集，直接标记为部分完成
+
+    参数:
+    - name: 分区名
+
+    返回:
+    - 上下文管理器，as得到的值为False时调用方应跳过该分区
+    """
+    budget = _active_budget
+    if budget is None:
+        yield True
+        return
+
+    share = budget.allocate(name)
+    if get_section_priority(name) >= LOW_PRIORITY and share < LOW_PRIORITY_MIN_SECONDS:
+        logging.warning(f"Skipping low-priority section '{name}': only {share:.1f}s of time budget left")
+        budget.mark_partial(name, "skipped: time budget exhausted")
+        yield False
+        return
+
+    deadline = time.monotonic() + share
+    outer = _current_section.get()
+    if outer is not None:
+        deadline = min(deadline, outer[1])
+    logging.debug(f"Section '{name}' gets {share:.1f}s of time budget")
+
+    token = _current_section.set((name, deadline))
+    try:
+        yield True
+    finally:
+        _current_section.reset(token)
+
+def current_section():
+    """当前在时间预算中运行的分区名，不限时或不在分区内时返回None"""
+    current = _current_section.get()
+    return current[0] if current is not None else None
+
+def mark_partial(reason):
+    """把当前分区标记为部分完成，不限时或不在分区内时不做任何事"""
+    current = _current_section.get()
+    if _active_budget is not None and current is not None:
+        _active_budget.mark_partial(current[0], reason)
+
+def clamp_timeout(timeout):
+    """
+    把单条命令的超时限制在当前分区和整个运行的截止时间之内
+
+    参数:
+    - timeout: 命令自身的超时时间（秒），None表示不限时
+
+    返回:
+    - 实际使用的超时时间；不限时时原样返回，预算已用完时返回0并把当前分区标记为部分完成
+    """
+    budget = _active_budget
+    if budget is None:
+        return timeout
+
+    current = _current_section.get()
+    deadline = budget.deadline if current is None else min(current[1], budget.deadline)
+    left = deadline - time.monotonic()
+    if left <= 0:
+        mark_partial("time budget exhausted")
+        return 0
+    return left if timeout is None else min(timeout, left)
+
+def is_partial(name):
+    """分区是否被标记为部分完成"""
+    return _active_budget is not None and name in _active_budget.partial
+
+def partial_marker(name):
+    """
+    被跳过的分区在报告中的占位值
+
+    返回:
+    - 形如 {"partial": True, "reason": ...} 的字典
+    """
+    reason = _active_budget.partial.get(name, "time budget exhausted") if _active_budget else "time budget exhausted"
+    return {"partial": True, "reason": reason}
+
+def get_budget_summary():
+    """
+    获取当前时间预算的使用情况
+
+    返回:
+    - 见TimeBudget.summary，不限时时返回None
+    """
+    return _active_budget.summary() if _active_budget is not None else None
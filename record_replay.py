@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+录制/回放整个采集流程
+在真实的Windows机器上录制所有外部命令和注册表读取，之后在任意平台上回放，
+用于确定性地测量Python侧解析、合并和导出的性能
+
+用法:
+  python record_replay.py record <录制包目录> [--target main|backup] [-- main.py参数]
+  python record_replay.py replay <录制包目录> [--target main|backup] [--latency] [--strict] [--repeat N] [--output-dir 目录] [-- main.py参数]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+from modules import replay
+from modules.command_cache import configure_command_cache
+from modules.powershell_capabilities import reset_powershell_capabilities
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="Record or replay a full collection run")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("bundle", help="Fixture bundle directory")
+    parser.add_argument("--target", choices=["main", "backup"], default="main",
+                        help="Run main.main() or BackupManager.backup_all()")
+    parser.add_argument("--latency", action="store_true", help="Replay with the recorded command latency")
+    parser.add_argument("--strict", action="store_true", help="Fail on commands that are not in the bundle")
+    parser.add_argument("--repeat", type=int, default=1, help="Number of replay runs to time")
+    parser.add_argument("--output-dir", help="Directory that receives the Report folder (default: a temporary directory for replay)")
+    argv = list(sys.argv[1:] if argv is None else argv)
+    # "--" 之后的参数原样交给main.py
+    main_args = []
+    if "--" in argv:
+        index = argv.index("--")
+        argv, main_args = argv[:index], argv[index + 1:]
+    args = parser.parse_args(argv)
+    args.main_args = main_args
+    return args
+
+def run_target(target, main_args):
+    """
+    运行一次完整流程，采集器模块在录制/回放启用之后才导入
+
+    返回:
+    - 退出码
+    """
+    if target == "backup":
+        from modules.backup_manager import BackupManager
+        result = BackupManager().backup_all()
+        return 0 if result["success"] else 1
+
+    import main
+    return main.main(main_args)
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    bundle = os.path.abspath(args.bundle)
+    # 磁盘缓存会让录制漏掉命令、让回放读到本机结果
+    configure_command_cache(enabled=False)
+
+    if args.mode == "record":
+        if args.output_dir:
+            os.chdir(args.output_dir)
+        replay.start_recording(bundle)
+        try:
+            exit_code = run_target(args.target, args.main_args)
+        finally:
+            stats = replay.stop()
+        print(json.dumps({"exit_code": exit_code, **stats}, ensure_ascii=False))
+        return exit_code
+
+    output_dir = args.output_dir or tempfile.mkdtemp(prefix="replay_")
+    os.makedirs(output_dir, exist_ok=True)
+    os.chdir(output_dir)
+
+    runs = []
+    exit_code = 0
+    stats = None
+    for _ in range(max(args.repeat, 1)):
+        # 每次运行都重新探测PowerShell，与独立运行main.py时的命令序列一致
+        reset_powershell_capabilities()
+        replay.start_replay(bundle, latency=args.latency, strict=args.strict)
+        started = time.perf_counter()
+        try:
+            exit_code = run_target(args.target, args.main_args) or exit_code
+        finally:
+            runs.append(round(time.perf_counter() - started, 3))
+            stats = replay.stop()
+
+    print(json.dumps({
+        "target": args.target,
+        "exit_code": exit_code,
+        "output_dir": output_dir,
+        "runs_seconds": runs,
+        "best_seconds": min(runs),
+        **stats
+    }, ensure_ascii=False))
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(main())
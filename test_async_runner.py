@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试异步命令执行接口的脚本
+在Linux上用sleep等标准命令验证并发、超时、取消和同步包装
+"""
+
+import sys
+import time
+import asyncio
+
+from modules.async_runner import run_command_async, run_commands_async, run_async
+
+def test_commands_run_concurrently():
+    """测试多条命令并发执行，总耗时约等于最慢的一条"""
+    started = time.monotonic()
+    results = run_async(run_commands_async([["sh", "-c", f"sleep 1; echo {i}"] for i in range(4)]))
+    elapsed = time.monotonic() - started
+
+    assert [r.stdout.strip() for r in results] == ["0", "1", "2", "3"]
+    assert all(r.returncode == 0 for r in results)
+    assert elapsed < 2.5, f"took {elapsed:.2f}s"
+
+def test_timeout_kills_process():
+    """测试超时后终止子进程并返回失败结果"""
+    started = time.monotonic()
+    result = run_async(run_command_async(["sleep", "30"], timeout=0.5))
+    assert time.monotonic() - started < 5
+    assert result.returncode == 1
+    assert "timed out" in result.stderr
+
+def test_missing_command():
+    """测试命令不存在时返回失败结果而不是抛出异常"""
+    result = run_async(run_command_async(["definitely-not-a-real-command-xyz"]))
+    assert result.returncode == 1
+    assert result.stderr
+
+def test_merge_stderr():
+    """测试标准错误合并到标准输出"""
+    result = run_async(run_command_async(["sh", "-c", "echo version 1.2 >&2"], merge_stderr=True))
+    assert result.stdout.strip() == "version 1.2"
+
+def test_cancellation_kills_process():
+    """测试任务被取消时子进程被终止"""
+    async def scenario():
+        task = asyncio.create_task(run_command_async(["sleep", "30"], timeout=None))
+        await asyncio.sleep(0.3)
+        task.cancel()
+        try:
+            await task
+            return False
+        except asyncio.CancelledError:
+            return True
+
+    started = time.monotonic()
+    assert run_async(scenario())
+    assert time.monotonic() - started < 5
+
+def test_run_async_inside_running_loop():
+    """测试在已有事件循环中调用同步包装"""
+    async def outer():
+        return run_async(run_command_async(["echo", "nested"])).stdout.strip()
+
+    assert asyncio.run(outer()) == "nested"
+
+def main():
+    """主函数"""
+    print("异步命令执行接口测试脚本")
+    tests = [
+        test_commands_run_concurrently,
+        test_timeout_kills_process,
+        test_missing_command,
+        test_merge_stderr,
+        test_cancellation_kills_process,
+        test_run_async_inside_running_loop
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"{test.__name__}: 通过")
+        except AssertionError as e:
+            failed += 1
+            print(f"{test.__name__}: 失败 {e}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试采集器登记表的脚本
+验证登记和重名检查、按需导入、平台过滤、依赖和耗时等级传给调度器、插件加载、
+结构版本变化时不复用增量结果，以及第三方采集器不修改main.py即可运行并写出结果
+"""
+
+import os
+import sys
+import glob
+import json
+import tempfile
+import subprocess
+
+from modules import collector_registry, incremental, replay
+from modules.scheduler import run_collectors
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def test_builtin_collectors():
+    """测试内置采集器按登记顺序列出，system_info组的顺序与输出顺序一致"""
+    assert collector_registry.collector_names("main") == ["software", "system_info", "dev_environment"]
+    names = collector_registry.collector_names("system_info")
+    assert names[:3] == ["hardware_batch", "cpu", "memory"] and names[-1] == "environment_variables"
+    assert collector_registry.get_collector("disks")["placement"] == {"hardware": "disks", "top": "disk"}
+    assert collector_registry.get_collector("system_info")["cost"] == "slow"
+
+def test_register_and_duplicates():
+    """测试重名登记被拒绝，replace=True时替换，装饰器登记后返回原函数"""
+    try:
+        @collector_registry.collector("demo_registry", cost="fast", deps=("software",))
+        def demo(software):
+            return len(software)
+
+        assert demo(["a"]) == 1
+        assert collector_registry.get_collector("demo_registry")["deps"] == ("software",)
+        try:
+            collector_registry.register_collector("demo_registry", demo)
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+        collector_registry.register_collector("demo_registry", demo, cost="slow", replace=True)
+        assert collector_registry.get_collector("demo_registry")["cost"] == "slow"
+        try:
+            collector_registry.register_collector("demo_bad_cost", demo, cost="glacial")
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+    finally:
+        collector_registry.unregister_collector("demo_registry")
+
+def test_lazy_resolve_and_platform():
+    """测试字符串形式的采集函数在解析时才导入，平台不符的采集器不可用"""
+    entry = collector_registry.register_collector("demo_lazy", "json:dumps", platform="NoSuchOS")
+    try:
+        assert collector_registry.resolve(entry) is json.dumps
+        assert not collector_registry.is_available(entry)
+        assert "demo_lazy" not in [e["name"] for e in collector_registry.list_collectors(available_only=True)]
+        assert [row for row in collector_registry.describe_collectors() if row["name"] == "demo_lazy"][0]["available"] is False
+    finally:
+        collector_registry.unregister_collector("demo_lazy")
+
+def test_build_tasks_orders_by_cost():
+    """测试由登记表生成的任务带有依赖和耗时等级，调度时耗时长的先启动，依赖结果作为关键字参数传入"""
+    order = []
+    collector_registry.register_collector("demo_fast", lambda: order.append("fast") or 1, cost="fast", budget=False)
+    collector_registry.register_collector("demo_slow", lambda: order.append("slow") or 2, cost="slow", budget=False)
+    collector_registry.register_collector("demo_sum", lambda demo_fast, demo_slow, scale: (demo_fast + demo_slow) * scale,
+                                          deps=("demo_fast", "demo_slow"), budget=False)
+    try:
+        tasks = collector_registry.build_tasks(["demo_fast", "demo_slow", "demo_sum"], {"demo_sum": {"scale": 10}})
+        results = run_collectors(tasks, max_workers=1)
+        assert order == ["fast", "slow"]
+        results = run_collectors(tasks, max_workers=2)
+        assert order[2] == "slow" and results["demo_sum"] == 30
+        try:
+            collector_registry.build_tasks(["demo_sum"])
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+    finally:
+        for name in ("demo_fast", "demo_slow", "demo_sum"):
+            collector_registry.unregister_collector(name)
+
+def test_load_plugin_module():
+    """测试从模块名加载插件，模块在导入时登记采集器，导入失败的插件只记录警告"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        with open(os.path.join(temp_dir, "demo_plugin_module.py"), 'w', encoding='utf-8') as f:
+            f.write("from modules.collector_registry import collector\n"
+                    "@collector('demo_plugin', cost='fast')\n"
+                    "def collect():\n"
+                    "    return {'ok': True}\n")
+        sys.path.insert(0, temp_dir)
+        try:
+            assert collector_registry.load_plugins(["demo_plugin_module", "no_such_plugin_module"]) == ["demo_plugin_module"]
+            assert collector_registry.run_collector("demo_plugin") == {"ok": True}
+        finally:
+            sys.path.remove(temp_dir)
+            collector_registry.unregister_collector("demo_plugin")
+
+def test_schema_version_invalidates_incremental_result():
+    """测试采集器的结构版本变化后不复用增量采集保存的结果"""
+    calls = []
+    original = dict(incremental._options)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        collector_registry.register_collector("demo_schema", lambda: calls.append(1) or len(calls),
+                                              fingerprint=[("directory", temp_dir)])
+        incremental.configure_incremental(enabled=True, state_dir=temp_dir, max_age=3600)
+        incremental.reset_incremental_stats()
+        try:
+            assert collector_registry.run_collector("demo_schema") == 1
+            assert collector_registry.run_collector("demo_schema") == 1
+            collector_registry.register_collector("demo_schema", lambda: calls.append(1) or len(calls),
+                                                  fingerprint=[("directory", temp_dir)], schema_version=2, replace=True)
+            assert collector_registry.run_collector("demo_schema") == 2
+            assert incremental.get_incremental_summary()["collected"]["demo_schema"] == "schema_changed"
+        finally:
+            collector_registry.unregister_collector("demo_schema")
+            incremental.configure_incremental(**original)
+
+def test_plugin_runs_through_main():
+    """测试在回放的录制包上，第三方采集器不修改main.py即可被--only选中、调度并写出JSON和报告数据"""
+    script = (
+        "import sys, record_replay\n"
+        "from modules.collector_registry import register_collector\n"
+        "register_collector('demo_inventory', lambda software: {'count': len(software)}, deps=('software',),\n"
+        "                   output='demo_inventory.json', report_key='demo')\n"
+        "sys.exit(record_replay.main(sys.argv[1:]))\n"
+    )
+    uninstall = "HKEY_LOCAL_MACHINE\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Uninstall"
+    registry = replay.build_registry_entries(uninstall, {"subkeys": {
+        f"App{i}": {"values": {"DisplayName": (f"App {i}", 1)}} for i in range(7)}}, "64")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        bundle = os.path.join(temp_dir, "bundle")
+        replay.write_bundle(bundle, [], registry, {"system": "Windows", "release": "10"})
+        output_dir = os.path.join(temp_dir, "output")
+        completed = subprocess.run([sys.executable, "-c", script, "replay", bundle, "--output-dir", output_dir, "--",
+                                    "--only", "software,demo_inventory", "--formats", "json"],
+                                   cwd=ROOT, env={**os.environ, "PYTHONPATH": ROOT},
+                                   capture_output=True, text=True, encoding='utf-8', errors='ignore', timeout=300)
+        assert completed.returncode == 0, completed.stderr[-2000:]
+        json_dir = glob.glob(os.path.join(output_dir, "Report", "*", "json"))[0]
+        with open(os.path.join(json_dir, "demo_inventory.json"), encoding='utf-8') as f:
+            assert json.load(f) == {"count": 7}
+        with open(os.path.join(json_dir, "complete_report_data.json"), encoding='utf-8') as f:
+            assert list(json.load(f)) == ["timestamp", "software_list", "demo"]
+
+def test_list_collectors_cli():
+    """测试main.py --list-collectors列出登记的采集器后直接退出"""
+    completed = subprocess.run([sys.executable, os.path.join(ROOT, "main.py"), "--list-collectors"], cwd=ROOT,
+                               capture_output=True, text=True, encoding='utf-8', errors='ignore', timeout=120)
+    assert completed.returncode == 0, completed.stderr[-2000:]
+    lines = completed.stdout.splitlines()
+    assert lines[0].split()[:4] == ["name", "group", "platform", "cost"]
+    assert any(line.split()[0] == "scheduled_tasks" for line in lines[1:])
+
+def main():
+    """主函数"""
+    print("采集器登记表测试脚本")
+    tests = [
+        test_builtin_collectors,
+        test_register_and_duplicates,
+        test_lazy_resolve_and_platform,
+        test_build_tasks_orders_by_cost,
+        test_load_plugin_module,
+        test_schema_version_invalidates_incremental_result,
+        test_plugin_runs_through_main,
+        test_list_collectors_cli
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"{test.__name__}: 通过")
+        except AssertionError as e:
+            failed += 1
+            print(f"{test.__name__}: 失败 {e}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
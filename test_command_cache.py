@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试命令结果磁盘缓存的脚本
+验证按WMI类的有效期、命中与过期、bypass/refresh、LRU淘汰和分区来源记录
+"""
+
+import sys
+import time
+import tempfile
+import subprocess
+
+from modules import command_cache
+
+BIOS_COMMAND = "Get-WmiObject Win32_BIOS | Select-Object Manufacturer | ConvertTo-Json"
+
+def fresh_cache(**options):
+    """使用临时目录的缓存并清空统计"""
+    command_cache.configure_command_cache(enabled=True, bypass=False, refresh=False, max_entries=200,
+                                          cache_dir=tempfile.mkdtemp())
+    command_cache.configure_command_cache(**options)
+    command_cache.reset_command_cache_stats()
+
+def ok(stdout):
+    return subprocess.CompletedProcess(["powershell"], returncode=0, stdout=stdout, stderr="")
+
+def test_ttl_by_wmi_class():
+    """测试有效期按命令涉及的WMI类取最短值，未列出的类不缓存"""
+    assert command_cache.get_command_ttl(BIOS_COMMAND) == 30 * 24 * 3600
+    assert command_cache.get_command_ttl("Get-CimInstance Win32_BIOS; Get-CimInstance Win32_VideoController") == 24 * 3600
+    assert command_cache.get_command_ttl(["C:\\Windows\\System32\\wbem\\WMIC.exe", "Win32_Processor", "get", "/format:csv"]) == 7 * 24 * 3600
+    assert command_cache.get_command_ttl("Get-NetAdapter | ConvertTo-Json") == 0
+    assert command_cache.get_command_ttl("Get-WmiObject Win32_BIOS; Get-WmiObject Win32_Service") == 0
+
+def test_hit_after_store_and_persistence():
+    """测试写入后命中，空白差异不影响命中，重新加载后仍可命中"""
+    fresh_cache()
+    assert command_cache.lookup("powershell", BIOS_COMMAND) is None
+    command_cache.store("powershell", BIOS_COMMAND, ok('{"Manufacturer": "AMI"}'))
+
+    hit = command_cache.lookup("powershell", "  " + BIOS_COMMAND.replace(" | ", "  |  "))
+    assert hit is not None and hit.from_cache
+    assert hit.stdout == '{"Manufacturer": "AMI"}'
+
+    # 模拟新进程：重新指向同一目录会重新读取磁盘
+    command_cache.configure_command_cache(cache_dir=command_cache._options["cache_dir"])
+    assert command_cache.lookup("powershell", BIOS_COMMAND).stdout == '{"Manufacturer": "AMI"}'
+    assert command_cache.lookup("wmic", BIOS_COMMAND) is None
+
+def test_failures_are_not_cached():
+    """测试失败或空输出的结果不缓存"""
+    fresh_cache()
+    command_cache.store("powershell", BIOS_COMMAND, subprocess.CompletedProcess([], returncode=1, stdout="", stderr="timed out"))
+    command_cache.store("powershell", BIOS_COMMAND, ok("   "))
+    assert command_cache.lookup("powershell", BIOS_COMMAND) is None
+
+def test_expired_entry_is_dropped():
+    """测试过期条目不再命中"""
+    fresh_cache()
+    command_cache.store("powershell", BIOS_COMMAND, ok("{}"))
+    entry = next(iter(command_cache._entries.values()))
+    entry["created"] = time.time() - 31 * 24 * 3600
+    assert command_cache.lookup("powershell", BIOS_COMMAND) is None
+    assert not command_cache._entries
+
+def test_bypass_and_refresh():
+    """测试bypass既不读也不写，refresh不读但写入"""
+    fresh_cache()
+    command_cache.store("powershell", BIOS_COMMAND, ok("old"))
+
+    command_cache.configure_command_cache(bypass=True)
+    assert command_cache.lookup("powershell", BIOS_COMMAND) is None
+    command_cache.store("powershell", BIOS_COMMAND, ok("ignored"))
+
+    command_cache.configure_command_cache(bypass=False, refresh=True)
+    assert command_cache.lookup("powershell", BIOS_COMMAND) is None
+    command_cache.store("powershell", BIOS_COMMAND, ok("new"))
+
+    command_cache.configure_command_cache(refresh=False)
+    assert command_cache.lookup("powershell", BIOS_COMMAND).stdout == "new"
+
+def test_lru_eviction():
+    """测试超过条目上限时淘汰最久未使用的条目"""
+    fresh_cache(max_entries=2)
+    commands = [f"Get-WmiObject Win32_BIOS | Select-Object Field{i}" for i in range(3)]
+    command_cache.store("powershell", commands[0], ok("0"))
+    command_cache.store("powershell", commands[1], ok("1"))
+    assert command_cache.lookup("powershell", commands[0]) is not None
+    command_cache.store("powershell", commands[2], ok("2"))
+
+    assert command_cache.lookup("powershell", commands[1]) is None
+    assert command_cache.lookup("powershell", commands[0]) is not None
+    assert command_cache.get_cache_summary()["evictions"] == 1
+
+def test_section_sources():
+    """测试分区来源：全部命中为cache，任一实时执行为live，无命令为live"""
+    fresh_cache()
+    command_cache.store("powershell", BIOS_COMMAND, ok("{}"))
+    command_cache.reset_command_cache_stats()
+
+    with command_cache.cache_section("bios"):
+        command_cache.lookup("powershell", BIOS_COMMAND)
+    with command_cache.cache_section("network_adapters"):
+        command_cache.lookup("powershell", "Get-NetAdapter")
+        command_cache.store("powershell", "Get-NetAdapter", ok("[]"))
+    with command_cache.cache_section("disks"):
+        pass
+
+    sections = command_cache.get_cache_summary()["sections"]
+    assert sections == {"bios": "cache", "network_adapters": "live", "disks": "live"}
+
+def main():
+    """主函数"""
+    print("命令结果缓存测试脚本")
+    tests = [
+        test_ttl_by_wmi_class,
+        test_hit_after_store_and_persistence,
+        test_failures_are_not_cached,
+        test_expired_entry_is_dropped,
+        test_bypass_and_refresh,
+        test_lru_eviction,
+        test_section_sources
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"{test.__name__}: 通过")
+        except AssertionError as e:
+            failed += 1
+            print(f"{test.__name__}: 失败 {e}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试外部命令跟踪的脚本
+用Python替身进程验证耗时、子进程CPU时间、输出大小、超时、调用方和脱敏的记录，以及按耗时排序的汇总
+"""
+
+import os
+import sys
+import json
+import tempfile
+import subprocess
+
+from modules import command_trace
+from modules.async_runner import run_command_async, run_async
+from modules.json_stream import JsonLineStream
+
+def python_argv(script):
+    """返回运行一段Python代码的替身进程命令行"""
+    return [sys.executable, "-c", script]
+
+def read_trace(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+# 模拟采集器模块中的函数，用于验证调用方推断
+FAKE_COLLECTOR = '''
+def get_fake_info(argv):
+    return subprocess.run(argv, capture_output=True, text=True)
+'''
+
+def test_redact_argv():
+    """测试密码参数、键值形式的密钥、编码命令和用户目录被脱敏"""
+    home = os.path.expanduser("~")
+    redacted = command_trace.redact_argv([
+        "powershell.exe", "-EncodedCommand", "QQBCAEMA", "-Password", "hunter2",
+        "token=abc123", os.path.join(home, "file.txt"), "x" * 300
+    ])
+    assert redacted[2] == "<8 chars>"
+    assert redacted[4] == "***"
+    assert redacted[5] == "token=***"
+    assert redacted[6].startswith("~") and home not in redacted[6]
+    assert redacted[7].endswith("...<300 chars>")
+    # 非PowerShell命令的 -e 不是编码命令
+    assert command_trace.redact_argv(["grep", "-e", "pattern"]) == ["grep", "-e", "pattern"]
+
+def test_raw_subprocess_traced():
+    """测试采集器中直接调用的subprocess.run被记录，包含CPU时间、输出大小、返回码和调用方"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = command_trace.start_trace(temp_dir)
+        try:
+            namespace = {"__name__": "modules.collectors.fake_collector", "subprocess": subprocess}
+            exec(FAKE_COLLECTOR, namespace)
+            result = namespace["get_fake_info"](python_argv(
+                "import sys\n"
+                "total = sum(i * i for i in range(3000000))\n"
+                "print('x' * 1000)\n"
+                "sys.exit(3)"
+            ))
+            assert result.returncode == 3
+        finally:
+            summary = command_trace.stop_trace()
+
+        assert subprocess.Popen is not command_trace.TracedPopen
+        records = read_trace(path)
+        assert len(records) == 1
+        record = records[0]
+        assert record["kind"] == "subprocess"
+        assert record["collector"] == "fake_collector.get_fake_info"
+        assert record["returncode"] == 3
+        assert record["stdout_bytes"] == 1001
+        assert record["wall_seconds"] > 0
+        if sys.platform.startswith("linux"):
+            assert record["cpu_seconds"] and record["cpu_seconds"] > 0.05
+        assert summary["calls"] == 1
+        assert os.path.exists(os.path.join(temp_dir, command_trace.SUMMARY_FILENAME))
+
+def test_timeout_recorded():
+    """测试超时的命令记录timed_out"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = command_trace.start_trace(temp_dir)
+        try:
+            try:
+                subprocess.run(python_argv("import time; time.sleep(30)"), capture_output=True, timeout=0.5)
+                assert False, "expected TimeoutExpired"
+            except subprocess.TimeoutExpired:
+                pass
+        finally:
+            summary = command_trace.stop_trace()
+        record = read_trace(path)[0]
+        assert record["timed_out"]
+        assert record["wall_seconds"] < 5
+        assert summary["timeouts"] == 1
+
+def test_nested_process_counted_once():
+    """测试trace_command范围内启动的子进程只计入外层记录"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = command_trace.start_trace(temp_dir)
+        try:
+            with command_trace.trace_command("wmic", ["wmic", "cpu", "get", "Name"]) as trace:
+                result = subprocess.run(python_argv("print('Name')"), capture_output=True, text=True)
+                trace.set_result(result)
+        finally:
+            command_trace.stop_trace()
+        records = read_trace(path)
+        assert len(records) == 1
+        assert records[0]["kind"] == "wmic" and records[0]["argv"][0] == "wmic"
+        assert records[0]["stdout_bytes"] == len("Name\n")
+
+def test_async_and_stream_traced():
+    """测试异步执行和流式JSON命令都被记录"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = command_trace.start_trace(temp_dir)
+        try:
+            run_async(run_command_async(python_argv("print('async')")))
+            stream = JsonLineStream(python_argv("for i in range(10): print('{\"i\": %d}' % i)"))
+            assert len(list(stream)) == 10
+        finally:
+            command_trace.stop_trace()
+        records = {record["kind"]: record for record in read_trace(path)}
+        assert set(records) == {"async", "stream"}
+        assert records["async"]["stdout_bytes"] == len("async\n")
+        assert records["stream"]["stdout_bytes"] == sum(len('{"i": %d}\n' % i) for i in range(10))
+        assert records["stream"]["returncode"] == 0
+
+def test_summary_ranked_by_cost():
+    """测试汇总按命令归并并按总耗时排序"""
+    records = [
+        {"kind": "wmic", "argv": ["C:\\Windows\\System32\\wbem\\wmic.exe", "cpu"], "collector": "a.get_cpu",
+         "wall_seconds": 1.0, "cpu_seconds": 0.5, "stdout_bytes": 10, "stderr_bytes": 0, "returncode": 0, "timed_out": False},
+        {"kind": "powershell", "argv": ["pwsh", "-Command", "Get-Service"], "collector": "a.get_services",
+         "wall_seconds": 2.0, "cpu_seconds": 1.0, "stdout_bytes": 100, "stderr_bytes": 0, "returncode": 0, "timed_out": False},
+        {"kind": "wmic", "argv": ["C:\\Windows\\System32\\wbem\\wmic.exe", "cpu"], "collector": "a.get_cpu",
+         "wall_seconds": 1.5, "cpu_seconds": None, "stdout_bytes": 10, "stderr_bytes": 0, "returncode": 1, "timed_out": True},
+    ]
+    summary = command_trace.get_trace_summary(records)
+    assert summary["calls"] == 3 and summary["distinct_commands"] == 2
+    top = summary["top_commands"][0]
+    assert top["command"] == "wmic.exe cpu"
+    assert top["calls"] == 2 and top["wall_seconds"] == 2.5 and top["timeouts"] == 1 and top["failures"] == 1
+    table = command_trace.format_trace_summary(summary)
+    assert table.splitlines()[2].strip().startswith("2.500")
+
+def main():
+    """主函数"""
+    print("外部命令跟踪测试脚本")
+    tests = [
+        test_redact_argv,
+        test_raw_subprocess_traced,
+        test_timeout_recorded,
+        test_nested_process_counted_once,
+        test_async_and_stream_traced,
+        test_summary_ranked_by_cost
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"{test.__name__}: 通过")
+        except AssertionError as e:
+            failed += 1
+            print(f"{test.__name__}: 失败 {e}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试守护进程模式的脚本
+验证分区按依赖和各自的间隔刷新、刷新限速和CPU繁忙时推迟、刷新失败时保留上次的结果，
+以及最新清单通过本机HTTP端点和Unix套接字在毫秒级返回，端点只接受本机Host头和访问令牌
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import tempfile
+import threading
+import subprocess
+import http.client
+
+from modules import collector_registry, replay
+from modules.daemon import InventoryDaemon, create_server
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def with_collectors(test):
+    """登记测试用的采集器后运行test：demo_base返回调用次数（state["fail"]为True时失败），demo_derived依赖demo_base"""
+    state = {"calls": 0, "fail": False}
+
+    def base():
+        state["calls"] += 1
+        if state["fail"]:
+            raise RuntimeError("collector failed")
+        return {"calls": state["calls"], "shared": [1, 2, 3]}
+
+    collector_registry.register_collector("demo_base", base, cost="fast", budget=False)
+    collector_registry.register_collector("demo_derived", lambda demo_base: {"base_calls": demo_base["calls"]},
+                                          deps=("demo_base",), budget=False, report_key="derived")
+    try:
+        test(state)
+    finally:
+        collector_registry.unregister_collector("demo_base")
+        collector_registry.unregister_collector("demo_derived")
+
+def new_daemon(**options):
+    """不限速、从不判定为CPU繁忙的守护进程，选项可覆盖"""
+    settings = {"intervals": {"demo_base": 3600, "demo_derived": 3600}, "min_gap": 0, "max_duty_cycle": 1.0,
+                "busy_percent": 101}
+    settings.update(options)
+    return InventoryDaemon(["demo_base", "demo_derived"], **settings)
+
+def test_refresh_follows_dependencies_and_intervals():
+    """测试依赖分区先刷新，未到间隔的分区不刷新，请求刷新后立即刷新"""
+    def run(state):
+        daemon = new_daemon()
+        assert daemon.section_document("demo_derived") is None
+        assert [daemon.run_pending() for _ in range(3)] == ["demo_base", "demo_derived", None]
+        assert json.loads(daemon.section_document("demo_derived")) == {"base_calls": 1}
+        snapshot = json.loads(daemon.snapshot())
+        assert set(snapshot["collected_at"]) == {"demo_base", "demo_derived"}
+        assert snapshot["demo_base"]["calls"] == 1 and snapshot["derived"] == {"base_calls": 1}
+
+        assert daemon.request_refresh("demo_base") and not daemon.request_refresh("no_such_section")
+        assert daemon.run_pending() == "demo_base" and daemon.run_pending() is None
+        status = daemon.status()
+        assert status["refreshes"] == 3 and status["sections"]["demo_base"]["refreshes"] == 2
+        assert status["sections"]["demo_derived"]["next_refresh_seconds"] > 3500
+
+    with_collectors(run)
+
+def test_rate_limit_and_busy_system():
+    """测试刷新后等待min_gap和占空比要求的时间，系统CPU繁忙时推迟刷新"""
+    def run(state):
+        daemon = new_daemon(min_gap=60)
+        assert daemon.run_pending() == "demo_base"
+        daemon.request_refresh()
+        assert daemon.run_pending() is None and state["calls"] == 1
+        assert daemon.status()["rate_limit"]["next_allowed_seconds"] > 50
+
+        daemon = new_daemon(max_duty_cycle=0.1)
+        seconds = daemon.refresh("demo_base")
+        assert daemon.status()["rate_limit"]["next_allowed_seconds"] >= seconds * 9 - 0.01
+
+        daemon = new_daemon(busy_percent=-1)
+        assert daemon.run_pending() is None
+        assert daemon.status()["deferred_busy"] == 1 and daemon.section_document("demo_base") is None
+
+    with_collectors(run)
+
+def test_failed_refresh_keeps_last_result():
+    """测试刷新失败时继续提供上次的结果并在状态中记录错误"""
+    def run(state):
+        daemon = new_daemon()
+        daemon.refresh("demo_base")
+        state["fail"] = True
+        daemon.refresh("demo_base")
+        assert json.loads(daemon.section_document("demo_base"))["calls"] == 1
+        assert daemon.status()["sections"]["demo_base"]["error"] == "collector failed"
+
+    with_collectors(run)
+
+def request(connection, method, path, token=None, host=None):
+    """发送请求（带令牌时加Authorization头，host覆盖Host头），返回 (状态码, 解析后的JSON, 耗时毫秒)"""
+    start = time.perf_counter()
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    if host:
+        headers["Host"] = host
+    connection.request(method, path, headers=headers)
+    response = connection.getresponse()
+    body = response.read()
+    return response.status, json.loads(body), (time.perf_counter() - start) * 1000
+
+class UnixConnection(http.client.HTTPConnection):
+    """通过Unix套接字发送HTTP请求"""
+    def __init__(self, path):
+        super().__init__("localhost")
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+def check_endpoint(daemon, address, connect, token_file):
+    """在address上启动服务器，等待后台刷新完成后检查各路径和响应时间"""
+    server = create_server(daemon, address, token_file)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with open(token_file) as f:
+            token = f.read()
+        assert token == server.token
+        connection = connect(server)
+        deadline = time.time() + 10
+        while request(connection, "GET", "/status", token)[1]["sections"]["demo_derived"]["collected_at"] is None:
+            assert time.time() < deadline, "daemon did not refresh"
+            time.sleep(0.02)
+        status, inventory, _ = request(connection, "GET", "/inventory", token)
+        assert status == 200 and inventory["derived"] == {"base_calls": 1}
+        assert request(connection, "GET", "/sections/demo_base", token)[1]["shared"] == [1, 2, 3]
+        assert request(connection, "GET", "/sections/unknown", token)[0] == 404
+        assert request(connection, "POST", "/refresh/demo_base", token)[0] == 202
+        timings = sorted(request(connection, "GET", "/inventory", token)[2] for _ in range(20))
+        assert timings[10] < 50, timings
+        connection.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_rejects_foreign_host_and_missing_token():
+    """测试Host头不是本机名称（DNS重绑定）的请求返回403，缺少或错误的令牌返回401，令牌文件只有所有者可读"""
+    def run(state):
+        daemon = new_daemon()
+        daemon.refresh("demo_base")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            token_file = os.path.join(temp_dir, "daemon_token")
+            server = create_server(daemon, "127.0.0.1:0", token_file)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            try:
+                if os.name == "posix":
+                    assert os.stat(token_file).st_mode & 0o777 == 0o600
+                host, port = server.address.rsplit(":", 1)
+                connection = http.client.HTTPConnection(host, port, timeout=10)
+                token = server.token
+                assert request(connection, "GET", "/inventory", token, f"attacker.example:{port}")[0] == 403
+                assert request(connection, "POST", "/refresh", token, "attacker.example")[0] == 403
+                assert request(connection, "GET", "/inventory")[0] == 401
+                assert request(connection, "GET", "/inventory", "wrong")[0] == 401
+                assert request(connection, "POST", "/refresh")[0] == 401
+                for name in (f"localhost:{port}", f"127.0.0.1:{port}", "LOCALHOST"):
+                    assert request(connection, "GET", "/sections/demo_base", token, name)[0] == 200
+                assert daemon.status()["sections"]["demo_base"]["requested"] is False
+                connection.close()
+            finally:
+                server.shutdown()
+                server.server_close()
+
+    with_collectors(run)
+
+def test_serves_over_http_and_unix_socket():
+    """测试后台刷新后，清单通过本机HTTP端点和Unix套接字在毫秒级返回"""
+    def run(state):
+        daemon = new_daemon()
+        daemon.start()
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                token_file = os.path.join(temp_dir, "daemon_token")
+                check_endpoint(daemon, "127.0.0.1:0",
+                               lambda server: http.client.HTTPConnection(*server.address.rsplit(":", 1), timeout=10),
+                               token_file)
+                if hasattr(socket, "AF_UNIX"):
+                    path = os.path.join(temp_dir, "inventory.sock")
+                    check_endpoint(daemon, f"unix:{path}", lambda server: UnixConnection(path), token_file)
+                    assert not os.path.exists(path)
+        finally:
+            daemon.stop(timeout=10)
+
+    with_collectors(run)
+
+def test_main_daemon_under_replay():
+    """测试在回放的录制包上运行main.py --daemon，软件分区通过HTTP端点返回，Ctrl+C后正常退出"""
+    uninstall = "HKEY_LOCAL_MACHINE\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Uninstall"
+    registry = replay.build_registry_entries(uninstall, {"subkeys": {
+        f"App{i}": {"values": {"DisplayName": (f"App {i}", 1)}} for i in range(5)}}, "64")
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        bundle = os.path.join(temp_dir, "bundle")
+        token_file = os.path.join(temp_dir, "daemon_token")
+        replay.write_bundle(bundle, [], registry, {"system": "Windows", "release": "10"})
+        process = subprocess.Popen([sys.executable, os.path.join(ROOT, "record_replay.py"), "replay", bundle,
+                                    "--output-dir", os.path.join(temp_dir, "output"), "--",
+                                    "--daemon", "--listen", f"127.0.0.1:{port}", "--token-file", token_file,
+                                    "--only", "software"],
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding='utf-8', errors='ignore')
+        try:
+            deadline = time.time() + 60
+            while True:
+                assert process.poll() is None, process.stderr.read()[-2000:]
+                assert time.time() < deadline, "daemon did not serve the software section"
+                try:
+                    with open(token_file) as f:
+                        token = f.read()
+                    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+                    status, software, _ = request(connection, "GET", "/sections/software", token)
+                    connection.close()
+                    if status == 200:
+                        break
+                except OSError:
+                    pass
+                time.sleep(0.1)
+            assert sorted(item["DisplayName"] for item in software) == [f"App {i}" for i in range(5)]
+            process.send_signal(signal.SIGINT)
+            process.communicate(timeout=30)
+            assert process.returncode == 0
+            assert not os.path.exists(token_file)
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.communicate()
+
+def main():
+    """主函数"""
+    print("守护进程模式测试脚本")
+    tests = [
+        test_refresh_follows_dependencies_and_intervals,
+        test_rate_limit_and_busy_system,
+        test_failed_refresh_keeps_last_result,
+        test_serves_over_http_and_unix_socket,
+        test_rejects_foreign_host_and_missing_token,
+        test_main_daemon_under_replay
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"{test.__name__}: 通过")
+        except AssertionError as e:
+            failed += 1
+            print(f"{test.__name__}: 失败 {e}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
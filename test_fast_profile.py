@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试fast采集配置的脚本
+验证fast配置只运行登记了fast实现的采集器，替代实现只读注册表、psutil和文件元数据，
+需要慢速探测的分区标记为 "not collected in fast profile"，并在回放中不启动任何命令、满足延迟目标
+"""
+
+import os
+import sys
+import glob
+import json
+import tempfile
+import subprocess
+
+from modules import collector_registry, replay
+from modules.config import FAST_PROFILE_TARGET_SECONDS
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+UNINSTALL = "HKEY_LOCAL_MACHINE\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Uninstall"
+HARDWARE = "HKEY_LOCAL_MACHINE\\HARDWARE\\DESCRIPTION\\System"
+DISPLAY_CLASS = "HKEY_LOCAL_MACHINE\\SYSTEM\\CurrentControlSet\\Control\\Class\\{4d36e968-e325-11ce-bfc1-08002be10318}"
+
+def test_profile_selects_fast_implementations():
+    """测试fast配置使用登记的替代实现，没有fast实现的采集器返回未采集标记并记录在摘要中"""
+    try:
+        assert collector_registry.get_profile_summary() is None
+        collector_registry.configure_profile("fast")
+        software = collector_registry.get_collector("software")
+        assert collector_registry.is_collected(software)
+        assert collector_registry.get_collector("environment_variables")["fast"] is True
+        assert not collector_registry.is_collected(collector_registry.get_collector("hardware_batch"))
+
+        calls = []
+        collector_registry.register_collector("demo_slow", lambda: calls.append("slow"), budget=False)
+        collector_registry.register_collector("demo_fast", lambda: "full", fast=lambda: "fast", budget=False)
+        try:
+            assert collector_registry.run_collector("demo_slow") == {"not_collected": True,
+                                                                     "reason": "not collected in fast profile"}
+            assert collector_registry.run_collector("demo_fast") == "fast" and calls == []
+            assert collector_registry.get_profile_summary() == {"profile": "fast", "not_collected": ["demo_slow"]}
+            rows = {row["name"]: row["fast"] for row in collector_registry.describe_collectors()}
+            assert rows["demo_fast"] == "variant" and rows["demo_slow"] == "no" and rows["environment_variables"] == "yes"
+
+            collector_registry.configure_profile("full")
+            assert collector_registry.run_collector("demo_fast") == "full"
+            collector_registry.run_collector("demo_slow")
+            assert calls == ["slow"]
+        finally:
+            collector_registry.unregister_collector("demo_slow")
+            collector_registry.unregister_collector("demo_fast")
+
+        try:
+            collector_registry.configure_profile("thorough")
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+    finally:
+        collector_registry.configure_profile("full")
+
+def fast_bundle(path):
+    """写出包含卸载项、处理器、SMBIOS和显卡注册表项的录制包，不含任何命令"""
+    registry = replay.build_registry_entries(UNINSTALL, {"subkeys": {
+        f"App{i}": {"values": {"DisplayName": (f"App {i}", 1)}} for i in range(30)}}, "64")
+    registry.update(replay.build_registry_entries(HARDWARE, {"subkeys": {
+        "CentralProcessor": {"subkeys": {"0": {"values": {
+            "ProcessorNameString": ("Intel(R) Core(TM) i7-1185G7 @ 3.00GHz  ", 1), "~MHz": (2995, 4)}}}},
+        "BIOS": {"values": {
+            "BIOSVendor": ("LENOVO", 1), "BIOSVersion": ("N32ET86W (1.62 )", 1), "BIOSReleaseDate": ("03/14/2024", 1),
+            "BaseBoardManufacturer": ("LENOVO", 1), "BaseBoardProduct": ("20XWCTO1WW", 1)}}
+    }}))
+    registry.update(replay.build_registry_entries(DISPLAY_CLASS, {"subkeys": {
+        "0000": {"values": {"DriverDesc": ("Intel(R) Iris(R) Xe Graphics", 1), "DriverVersion": ("31.0.101.4502", 1),
+                            "HardwareInformation.qwMemorySize": (2 ** 30, 11)}},
+        "Properties": {}
+    }}))
+    replay.write_bundle(path, [], registry, {
+        "system": "Windows", "release": "10", "version": "10.0.22631", "machine": "AMD64", "node": "FAST-PC",
+        "processor": "Intel64 Family 6 Model 140 Stepping 1, GenuineIntel", "platform": "Windows-10-10.0.22631-SP0",
+        "architecture": ["64bit", "WindowsPE"], "win32_ver": ["10", "10.0.22631", "SP0", "Multiprocessor Free"]})
+
+def test_fast_profile_under_replay():
+    """测试在回放中以fast配置运行main.py：不启动任何命令，硬件分区取自注册表，慢速分区被标记，耗时在目标之内"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        bundle = os.path.join(temp_dir, "bundle")
+        fast_bundle(bundle)
+        output_dir = os.path.join(temp_dir, "output")
+        completed = subprocess.run([sys.executable, os.path.join(ROOT, "record_replay.py"), "replay", bundle, "--strict",
+                                    "--repeat", "2", "--output-dir", output_dir, "--", "--profile", "fast", "--formats", "json"],
+                                   capture_output=True, text=True, encoding='utf-8', errors='ignore', timeout=300)
+        assert completed.returncode == 0, completed.stderr[-2000:]
+        stats = json.loads(completed.stdout.strip().splitlines()[-1])
+        assert stats["commands"] == 0 and stats["missing"] == 0
+        assert stats["best_seconds"] < FAST_PROFILE_TARGET_SECONDS, stats["runs_seconds"]
+
+        json_dir = sorted(glob.glob(os.path.join(output_dir, "Report", "*", "json")))[-1]
+        with open(os.path.join(json_dir, "complete_report_data.json"), encoding='utf-8') as f:
+            report = json.load(f)
+        marker = {"not_collected": True, "reason": "not collected in fast profile"}
+        assert report["dev_environment"] == marker
+        assert sorted(report["profile"]["not_collected"]) == ["dev_environment", "drivers", "user_accounts"]
+        assert len(report["software_list"]) == 30
+
+        with open(os.path.join(json_dir, "system_info.json"), encoding='utf-8') as f:
+            system_info = json.load(f)
+        hardware = system_info["basic_info"]["hardware"]
+        assert hardware["cpu"][0]["Name"] == "Intel(R) Core(TM) i7-1185G7 @ 3.00GHz"
+        assert hardware["cpu"][0]["MaxClockSpeedGHz"] == 3.0
+        assert hardware["bios"]["ReleaseDate"] == "2024-03-14" and hardware["motherboard"]["Product"] == "20XWCTO1WW"
+        assert hardware["graphics"] == [{"Name": "Intel(R) Iris(R) Xe Graphics", "AdapterRAM": 2 ** 30,
+                                         "DriverVersion": "31.0.101.4502", "VideoProcessor": "", "VideoRAM_GB": 1.0}]
+        assert "total_bytes" in hardware["memory"] and "modules" not in hardware["memory"]
+        assert system_info["user_accounts"] == marker and system_info["drivers"] == marker
+        assert isinstance(system_info["network_adapters"], list) and isinstance(system_info["scheduled_tasks"], list)
+
+def main():
+    """主函数"""
+    print("fast采集配置测试脚本")
+    tests = [
+        test_profile_selects_fast_implementations,
+        test_fast_profile_under_replay
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"{test.__name__}: 通过")
+        except AssertionError as e:
+            failed += 1
+            print(f"{test.__name__}: 失败 {e}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
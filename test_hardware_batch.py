@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试硬件批量查询解析的脚本
+验证各分区的解析函数不修改批量查询返回的记录，同一批记录解析两次得到相同的结果
+"""
+
+import sys
+import copy
+
+from modules.collectors.hardware_batch import (
+    parse_cpu_records,
+    parse_memory_module_records,
+    parse_graphics_records,
+    parse_bios_records
+)
+
+BATCH = {
+    "cpu": [{"Name": "Contoso CPU", "MaxClockSpeed": 3600}],
+    "memory": [{"Capacity": 17179869184, "Speed": 3200}, {"Capacity": "not a number"}],
+    "graphics": [{"Name": "Contoso GPU", "AdapterRAM": 4294967296}],
+    "bios": [{"Manufacturer": "Contoso", "ReleaseDate": "20240314000000.000000+000"}]
+}
+
+def test_parsing_twice_is_idempotent():
+    """测试同一批记录解析两次结果相同，且原始记录保持不变"""
+    records = copy.deepcopy(BATCH)
+    parsers = [("cpu", parse_cpu_records), ("memory", parse_memory_module_records),
+               ("graphics", parse_graphics_records), ("bios", parse_bios_records)]
+    first = {section: parser(records[section]) for section, parser in parsers}
+    second = {section: parser(records[section]) for section, parser in parsers}
+    assert first == second
+    assert records == BATCH
+
+    assert [module["Capacity"] for module in first["memory"]] == ["16.0 GB", "Unknown"]
+    assert first["cpu"][0]["MaxClockSpeedGHz"] == 3.6
+    assert first["graphics"][0]["VideoRAM_GB"] == 4.0
+    assert first["bios"]["ReleaseDate"] == "2024-03-14"
+    # 单个记录字典同样不被修改
+    single = {"Capacity": 8589934592}
+    assert parse_memory_module_records(single) == [{"Capacity": "8.0 GB"}] and single == {"Capacity": 8589934592}
+
+def main():
+    """主函数"""
+    print("硬件批量查询解析测试脚本")
+    tests = [
+        test_parsing_twice_is_idempotent
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"{test.__name__}: 通过")
+        except AssertionError as e:
+            failed += 1
+            print(f"{test.__name__}: 失败 {e}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试增量采集的脚本
+验证目录和注册表指纹随内容变化、指纹未变时复用上次运行的结果、变化或过期时重新采集，
+以及在回放的录制包上连续两次运行main.py --incremental时第二次复用软件和开发环境分区
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import tempfile
+import subprocess
+
+from modules import incremental, replay
+from modules.registry_backend import MemoryBackend, use_registry_backend
+from modules.collectors.software_collector import get_registry_installed_software
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+UNINSTALL = "HKEY_LOCAL_MACHINE\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Uninstall"
+
+def uninstall_registry(count, version="1"):
+    """生成包含count个软件的Uninstall键"""
+    return replay.build_registry_entries(UNINSTALL, {"subkeys": {
+        f"App{i}": {"values": {"DisplayName": (f"App {i}", 1), "DisplayVersion": (f"{version}.{i}", 1)}}
+        for i in range(count)}}, "64")
+
+def with_section(sources, test):
+    """在临时状态目录中为测试分区配置指纹来源后运行test"""
+    original = dict(incremental._options)
+    incremental.INCREMENTAL_FINGERPRINTS["test_section"] = sources
+    with tempfile.TemporaryDirectory() as state_dir:
+        incremental.configure_incremental(enabled=True, state_dir=state_dir, max_age=3600)
+        incremental.reset_incremental_stats()
+        try:
+            test()
+        finally:
+            del incremental.INCREMENTAL_FINGERPRINTS["test_section"]
+            incremental.configure_incremental(**original)
+
+def new_run():
+    """把状态写回磁盘并丢弃内存中的记录，模拟下一次运行"""
+    incremental.flush()
+    incremental.configure_incremental(state_dir=incremental._options["state_dir"])
+    incremental.reset_incremental_stats()
+
+def test_directory_fingerprint_changes():
+    """测试目录中新增或修改文件后指纹改变，不存在的目录指纹稳定"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        incremental.INCREMENTAL_FINGERPRINTS["test_section"] = [("tree", temp_dir), ("directory", os.path.join(temp_dir, "missing"))]
+        try:
+            first = incremental.compute_fingerprint("test_section")
+            assert first == incremental.compute_fingerprint("test_section")
+            path = os.path.join(temp_dir, "task.xml")
+            with open(path, 'w') as f:
+                f.write("a")
+            second = incremental.compute_fingerprint("test_section")
+            assert second != first
+            os.utime(path, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+            assert incremental.compute_fingerprint("test_section") != second
+        finally:
+            del incremental.INCREMENTAL_FINGERPRINTS["test_section"]
+    assert incremental.compute_fingerprint("unknown_section") is None
+
+def test_registry_fingerprint_changes():
+    """测试回放的注册表中Uninstall子键增加时软件分区的指纹改变"""
+    fingerprints = []
+    for count in (3, 3, 4):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            replay.write_bundle(temp_dir, registry=uninstall_registry(count))
+            replay.start_replay(temp_dir)
+            try:
+                fingerprints.append(incremental.compute_fingerprint("software"))
+            finally:
+                replay.stop()
+    assert fingerprints[0] is not None
+    assert fingerprints[0] == fingerprints[1] != fingerprints[2]
+
+def test_reuse_when_unchanged():
+    """测试指纹未变时不调用采集函数而返回上次保存的结果，变化和过期时重新采集"""
+    with tempfile.TemporaryDirectory() as watched:
+        calls = []
+
+        def collect():
+            calls.append(1)
+            return {"items": len(calls)}
+
+        def run():
+            assert incremental.reuse_or_collect("test_section", collect) == {"items": 1}
+            assert incremental.get_incremental_summary()["collected"] == {"test_section": "new"}
+            new_run()
+
+            assert incremental.reuse_or_collect("test_section", collect) == {"items": 1}
+            summary = incremental.get_incremental_summary()
+            assert summary["reused"] == ["test_section"] and summary["collected"] == {}
+            assert len(calls) == 1
+            new_run()
+
+            with open(os.path.join(watched, "new_driver.inf"), 'w') as f:
+                f.write("x")
+            assert incremental.reuse_or_collect("test_section", collect) == {"items": 2}
+            assert incremental.get_incremental_summary()["collected"] == {"test_section": "changed"}
+            new_run()
+
+            incremental.configure_incremental(max_age=0)
+            assert incremental.reuse_or_collect("test_section", collect) == {"items": 3}
+            assert incremental.get_incremental_summary()["collected"] == {"test_section": "expired"}
+
+        with_section([("directory", watched)], run)
+
+def test_failed_results_not_saved():
+    """测试带错误项或部分完成标记的结果不被保存，下一次运行重新采集"""
+    results = [[{"error": "Access denied"}], {"partial": True, "reason": "time budget"}, ["ok"]]
+    calls = []
+
+    def collect():
+        calls.append(1)
+        return results[len(calls) - 1]
+
+    def run():
+        for _ in range(3):
+            incremental.reuse_or_collect("test_section", collect)
+            new_run()
+        assert incremental.reuse_or_collect("test_section", collect) == ["ok"]
+        assert len(calls) == 3
+
+    with_section([("environment", "PATH")], run)
+
+def test_per_user_installs_change_software_fingerprint():
+    """测试HKCU和HKEY_USERS\\<SID>下的卸载项变化时软件分区重新采集，而不是复用只含HKLM软件的旧结果"""
+    backend = MemoryBackend()
+    backend.set_value(f"{UNINSTALL}\\A", "DisplayName", "App A")
+    user_uninstall = "SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Uninstall"
+
+    def names():
+        return [item["name"] for item in incremental.reuse_or_collect("software", get_registry_installed_software)]
+
+    original = dict(incremental._options)
+    with tempfile.TemporaryDirectory() as state_dir, use_registry_backend(backend):
+        incremental.configure_incremental(enabled=True, state_dir=state_dir, max_age=3600)
+        incremental.reset_incremental_stats()
+        try:
+            assert names() == ["App A"]
+            new_run()
+            assert names() == ["App A"] and incremental.get_incremental_summary()["reused"] == ["software"]
+            new_run()
+
+            backend.set_value(f"HKEY_CURRENT_USER\\{user_uninstall}\\B", "DisplayName", "User App B")
+            assert names() == ["App A", "User App B"]
+            assert incremental.get_incremental_summary()["collected"] == {"software": "changed"}
+            new_run()
+
+            backend.set_value(f"HKEY_USERS\\S-1-5-21-1001\\{user_uninstall}\\C", "DisplayName", "Other User C")
+            assert names() == ["App A", "Other User C", "User App B"]
+            assert incremental.get_incremental_summary()["collected"] == {"software": "changed"}
+        finally:
+            incremental.configure_incremental(**original)
+            incremental.reset_incremental_stats()
+
+def test_incremental_main_runs():
+    """测试在回放的录制包上连续两次运行main.py --incremental，第二次复用软件和开发环境分区且输出相同"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        bundle = os.path.join(temp_dir, "bundle")
+        replay.write_bundle(bundle, [{"argv": ["python", "--version"], "stdout": "Python 3.11.7\n"}],
+                            uninstall_registry(30), {"system": "Windows", "release": "10"})
+        env = {**os.environ, "LOCALAPPDATA": os.path.join(temp_dir, "appdata")}
+        outputs = []
+        for run in ("first", "second"):
+            output_dir = os.path.join(temp_dir, run)
+            completed = subprocess.run([sys.executable, os.path.join(ROOT, "record_replay.py"), "replay", bundle,
+                                        "--output-dir", output_dir, "--",
+                                        "--incremental", "--only", "software,dev_environment", "--formats", "json"],
+                                       env=env, capture_output=True, text=True, encoding='utf-8', errors='ignore', timeout=300)
+            assert completed.returncode == 0, completed.stderr[-2000:]
+            json_dir = glob.glob(os.path.join(output_dir, "Report", "*", "json"))[0]
+            with open(os.path.join(json_dir, "complete_report_data.json"), encoding='utf-8') as f:
+                report = json.load(f)
+            with open(os.path.join(json_dir, "software_list.json"), 'rb') as f:
+                outputs.append((report["incremental"], f.read()))
+
+        assert outputs[0][0]["reused"] == []
+        assert outputs[0][0]["collected"] == {"software": "new", "dev_environment": "new"}
+        assert outputs[1][0]["reused"] == ["dev_environment", "software"]
+        assert outputs[0][1] == outputs[1][1]
+        assert os.path.exists(os.path.join(temp_dir, "appdata", "PyWindowsSoftwareList", incremental.STATE_FILENAME))
+
+def main():
+    """主函数"""
+    print("增量采集测试脚本")
+    tests = [
+        test_directory_fingerprint_changes,
+        test_registry_fingerprint_changes,
+        test_reuse_when_unchanged,
+        test_failed_results_not_saved,
+        test_per_user_installs_change_software_fingerprint,
+        test_incremental_main_runs
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"{test.__name__}: 通过")
+        except AssertionError as e:
+            failed += 1
+            print(f"{test.__name__}: 失败 {e}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
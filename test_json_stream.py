@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试流式JSON解析的脚本
+用Python替身进程模拟PowerShell逐行输出JSON对象，验证解析、提前停止、超时和失败处理
+"""
+
+import sys
+import time
+import itertools
+
+from modules.json_stream import to_ndjson_command, iter_json_lines, JsonLineStream, STDERR_LIMIT
+
+def fake_process(script):
+    """返回运行一段Python代码的替身进程命令行"""
+    return [sys.executable, "-c", script]
+
+def test_to_ndjson_command():
+    """测试ConvertTo-Json管道改写为逐对象压缩输出，保留-Depth参数"""
+    assert to_ndjson_command("Get-ScheduledTask | Select-Object TaskName | ConvertTo-Json") == \
+        "Get-ScheduledTask | Select-Object TaskName | ForEach-Object { $_ | ConvertTo-Json -Compress }"
+    assert to_ndjson_command("Get-WmiObject Win32_PnPSignedDriver | Where-Object {$_.DeviceName} | ConvertTo-Json -Depth 1 -Compress") == \
+        "Get-WmiObject Win32_PnPSignedDriver | Where-Object {$_.DeviceName} | ForEach-Object { $_ | ConvertTo-Json -Compress -Depth 1 }"
+    try:
+        to_ndjson_command("Get-AppxPackage | Format-List")
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+def test_iter_json_lines_skips_noise():
+    """测试跳过空行、警告行和损坏的行"""
+    lines = ['{"a": 1}\n', '\n', 'WARNING: something\n', '{"b": 2\n', '{"名称": "驱动"}\n']
+    assert list(iter_json_lines(lines)) == [{"a": 1}, {"名称": "驱动"}]
+
+def test_stream_yields_records_and_returncode():
+    """测试逐条产出记录，结束后可读取返回码和标准错误"""
+    stream = JsonLineStream(fake_process(
+        "import json, sys\n"
+        "for i in range(1000): print(json.dumps({'DeviceName': f'dev{i}'}))\n"
+        "sys.stderr.write('done')\n"
+        "sys.exit(2)"
+    ), timeout=30)
+    records = list(stream)
+    assert len(records) == 1000 and records[999] == {"DeviceName": "dev999"}
+    assert stream.returncode == 2
+    assert stream.stderr == "done"
+    assert not stream.timed_out
+
+def test_stopping_early_kills_process():
+    """测试只取前若干条时立即终止仍在输出的进程"""
+    stream = JsonLineStream(fake_process(
+        "import json, itertools\n"
+        "for i in itertools.count(): print(json.dumps({'TaskName': i}), flush=True)"
+    ), timeout=30)
+    started = time.monotonic()
+    first = list(itertools.islice(stream, 100))
+    assert len(first) == 100 and first[-1] == {"TaskName": 99}
+    assert time.monotonic() - started < 10
+    assert stream.stopped_early and stream.returncode is not None
+
+def test_timeout_keeps_partial_records():
+    """测试超时后终止进程，已产出的记录保留"""
+    stream = JsonLineStream(fake_process(
+        "import json, time\n"
+        "print(json.dumps({'Name': 'first'}), flush=True)\n"
+        "time.sleep(30)"
+    ), timeout=1)
+    started = time.monotonic()
+    records = list(stream)
+    assert time.monotonic() - started < 5
+    assert records == [{"Name": "first"}]
+    assert stream.timed_out
+
+def test_heavy_stderr_does_not_block():
+    """测试标准错误输出远超保留上限时进程不会阻塞，标准错误只保留前STDERR_LIMIT个字符"""
+    stream = JsonLineStream(fake_process(
+        "import json, sys\n"
+        "sys.stderr.write('e' * 300000)\n"
+        "sys.stderr.flush()\n"
+        "for i in range(3): print(json.dumps({'Name': i}))"
+    ), timeout=5)
+    records = list(stream)
+    assert records == [{"Name": 0}, {"Name": 1}, {"Name": 2}]
+    assert not stream.timed_out and stream.returncode == 0
+    assert stream.stderr == "e" * STDERR_LIMIT
+
+def test_missing_executable():
+    """测试可执行文件不存在时不产出记录并返回失败"""
+    stream = JsonLineStream(["definitely-not-a-real-command-xyz"])
+    assert list(stream) == []
+    assert stream.returncode == 1
+
+def main():
+    """主函数"""
+    print("流式JSON解析测试脚本")
+    tests = [
+        test_to_ndjson_command,
+        test_iter_json_lines_skips_noise,
+        test_stream_yields_records_and_returncode,
+        test_stopping_early_kills_process,
+        test_timeout_keeps_partial_records,
+        test_heavy_stderr_does_not_block,
+        test_missing_executable
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"{test.__name__}: 通过")
+        except AssertionError as e:
+            failed += 1
+            print(f"{test.__name__}: 失败 {e}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
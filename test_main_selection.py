@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试main.py分区选择和输出格式选择的脚本
+验证--only/--skip的解析、未知名称被拒绝，以及只采集软件、只写JSON时不导入其他采集器和pandas，导入main.py时也不加载psutil
+"""
+
+import os
+import sys
+import glob
+import json
+import tempfile
+import subprocess
+
+from modules import replay
+from main import parse_args, select_sections
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def test_default_selects_everything():
+    """测试不带参数时采集全部分区、写出全部格式"""
+    args = parse_args([])
+    assert args.main_sections == ["software", "system_info", "dev_environment"]
+    assert args.system_sections is None
+    assert args.formats == ["json", "html", "markdown", "excel", "report"]
+
+def test_only_and_skip():
+    """测试--only选择系统信息的单个分区时只运行system_info采集器，--skip去掉的分区不采集"""
+    assert select_sections(["software"]) == (["software"], [])
+    assert select_sections(["cpu", "memory"]) == (["system_info"], ["cpu", "memory"])
+    main_sections, system_sections = select_sections(None, ["dev_environment", "network_adapters"])
+    assert main_sections == ["software", "system_info"]
+    assert "network_adapters" not in system_sections and "cpu" in system_sections
+    assert select_sections(["system_info"], ["system_info"]) == ([], [])
+
+def test_unknown_names_rejected():
+    """测试未知的分区名和格式名导致参数错误"""
+    for argv in (["--only", "softwares"], ["--formats", "json,pdf"], ["--only", "software", "--skip", "software"]):
+        try:
+            parse_args(argv)
+            assert False, f"expected SystemExit for {argv}"
+        except SystemExit as e:
+            assert e.code == 2
+
+def test_software_json_only_run():
+    """测试在回放的录制包上只采集软件、只写JSON时只生成对应文件，且没有导入其他采集器、导出器和pandas"""
+    uninstall = "HKEY_LOCAL_MACHINE\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Uninstall"
+    registry = replay.build_registry_entries(uninstall, {"subkeys": {
+        f"App{i}": {"values": {"DisplayName": (f"App {i}", 1), "DisplayVersion": (f"1.{i}", 1)}} for i in range(20)}}, "64")
+    # 在同一个进程中回放后检查已导入的模块
+    script = (
+        "import sys, json, record_replay\n"
+        "code = record_replay.main(sys.argv[1:])\n"
+        "names = ['pandas', 'openpyxl', 'modules.collectors.dev_env_collector', 'modules.exporters.html_exporter']\n"
+        "print(json.dumps({'exit_code': code, 'imported': [n for n in names if n in sys.modules]}))\n"
+    )
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        bundle = os.path.join(temp_dir, "bundle")
+        replay.write_bundle(bundle, [], registry, {"system": "Windows", "release": "10"})
+        output_dir = os.path.join(temp_dir, "output")
+        completed = subprocess.run([sys.executable, "-c", script, "replay", bundle, "--output-dir", output_dir,
+                                    "--", "--only", "software", "--formats", "json"],
+                                   cwd=ROOT, env={**os.environ, "PYTHONPATH": ROOT},
+                                   capture_output=True, text=True, encoding='utf-8', errors='ignore', timeout=300)
+        assert completed.returncode == 0, completed.stderr[-2000:]
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        assert result == {"exit_code": 0, "imported": []}, result
+
+        report_dir = glob.glob(os.path.join(output_dir, "Report", "*"))[0]
+        assert sorted(name for name in os.listdir(report_dir) if name != "logs") == ["json"]
+        assert sorted(os.listdir(os.path.join(report_dir, "json"))) == ["complete_report_data.json", "software_list.json"]
+        with open(os.path.join(report_dir, "json", "complete_report_data.json"), encoding='utf-8') as f:
+            report = json.load(f)
+        assert sorted(report) == ["software_list", "timestamp"]
+        assert len(report["software_list"]) == 20
+
+def test_import_main_skips_psutil():
+    """测试导入main.py时不加载psutil，只在跟踪、资源统计或隔离运行时才用到"""
+    script = "import sys, main\nprint('psutil' in sys.modules)\n"
+    completed = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env={**os.environ, "PYTHONPATH": ROOT},
+                               capture_output=True, text=True, encoding='utf-8', errors='ignore', timeout=120)
+    assert completed.returncode == 0, completed.stderr[-2000:]
+    assert completed.stdout.strip().splitlines()[-1] == "False", completed.stdout
+
+def main():
+    """主函数"""
+    print("分区选择测试脚本")
+    tests = [
+        test_default_selects_everything,
+        test_only_and_skip,
+        test_unknown_names_rejected,
+        test_software_json_only_run,
+        test_import_main_skips_psutil
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"{test.__name__}: 通过")
+        except AssertionError as e:
+            failed += 1
+            print(f"{test.__name__}: 失败 {e}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试常驻PowerShell宿主池的脚本
+使用一个讲相同帧协议的sh替身脚本，在Linux上验证命令执行、超时重启和崩溃重启
+"""
+
+import os
+import sys
+import stat
+import time
+import tempfile
+import subprocess
+
+from modules.powershell_pool import PowerShellPool
+
+# 替身宿主：逐行读取 "<id> <base64脚本>"，用sh执行后按帧协议回写
+STAND_IN_HOST = r"""#!/bin/sh
+while IFS=' ' read -r id payload; do
+    script=$(printf '%s' "$payload" | base64 -d)
+    errfile=$(mktemp "$(dirname "$0")/stderr.XXXXXX")
+    out=$(sh -c "$script" 2>"$errfile")
+    rc=$?
+    echo "stray banner line"
+    echo "__PSPOOL_BEGIN__ $id"
+    printf '%s' "$out" | base64 | tr -d '\n'; echo
+    base64 < "$errfile" | tr -d '\n'; echo
+    echo "__PSPOOL_END__ $id $rc"
+    rm -f "$errfile"
+done
+"""
+
+def make_stand_in_host(temp_dir):
+    """在临时目录中写出替身宿主脚本并返回启动参数"""
+    path = os.path.join(temp_dir, "stand_in_host.sh")
+    with open(path, 'w') as f:
+        f.write(STAND_IN_HOST)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    return ["/bin/sh", path]
+
+def test_pool_runs_commands():
+    """测试命令输出、错误输出和返回码的帧解析"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pool = PowerShellPool(make_stand_in_host(temp_dir), size=1)
+        try:
+            result = pool.run("echo '{\"Name\": \"测试CPU\"}'", timeout=10)
+            assert result.returncode == 0
+            assert result.stdout.strip() == '{"Name": "测试CPU"}'
+
+            result = pool.run("echo oops >&2; exit 3", timeout=10)
+            assert result.returncode == 3
+            assert "oops" in result.stderr
+
+            # 同一宿主连续执行多条命令
+            for i in range(20):
+                assert pool.run(f"echo {i}", timeout=10).stdout.strip() == str(i)
+            assert pool.restarts == 0
+        finally:
+            pool.close()
+
+def test_pool_restarts_hung_host():
+    """测试宿主挂起时超时并自动重启"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pool = PowerShellPool(make_stand_in_host(temp_dir), size=1)
+        try:
+            started = time.monotonic()
+            try:
+                pool.run("sleep 30", timeout=1)
+                assert False, "expected TimeoutExpired"
+            except subprocess.TimeoutExpired:
+                pass
+            assert time.monotonic() - started < 5
+            assert pool.run("echo alive", timeout=10).stdout.strip() == "alive"
+            assert pool.restarts == 1
+        finally:
+            pool.close()
+
+def test_pool_restarts_crashed_host():
+    """测试宿主崩溃后自动重启"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pool = PowerShellPool(make_stand_in_host(temp_dir), size=1)
+        try:
+            try:
+                pool.run("kill -9 $PPID", timeout=10)
+                assert False, "expected RuntimeError"
+            except RuntimeError:
+                pass
+            assert pool.run("echo back", timeout=10).stdout.strip() == "back"
+            assert pool.restarts == 1
+        finally:
+            pool.close()
+
+def test_reader_cpu_counts_toward_collector():
+    """测试读取线程解析命令输出的CPU时间计入当前采集器"""
+    from modules import resource_accounting
+    resource_accounting.reset_resource_accounting()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pool = PowerShellPool(make_stand_in_host(temp_dir), size=1)
+        try:
+            with resource_accounting.account("demo_pool_reader") as record:
+                result = pool.run("seq 1 20000", timeout=30)
+                assert result.returncode == 0 and result.stdout.split()[-1] == "20000"
+                assert record.worker_cpu_seconds > 0
+        finally:
+            pool.close()
+
+def main():
+    """主函数"""
+    print("常驻PowerShell宿主池测试脚本")
+    tests = [test_pool_runs_commands, test_pool_restarts_hung_host, test_pool_restarts_crashed_host,
+             test_reader_cpu_counts_toward_collector]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"{test.__name__}: 通过")
+        except AssertionError as e:
+            failed += 1
+            print(f"{test.__name__}: 失败 {e}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试分区只采集一次和JSON引用写出的脚本
+验证同名探测在一次运行内只执行一次并共享结果对象，以及共享对象写为 {"$ref": ...} 后可以还原
+"""
+
+import io
+import sys
+import json
+import time
+import tempfile
+import threading
+
+from modules import probe_registry, replay
+from modules.json_refs import dedupe_references, resolve_references, dump_json
+
+def test_probe_runs_once():
+    """测试同名探测只执行一次，之后返回同一个对象并统计省下的时间"""
+    calls = []
+
+    def probe():
+        calls.append(1)
+        time.sleep(0.05)
+        return {"Name": "CPU"}
+
+    registry = probe_registry.start_probe_run()
+    first = probe_registry.run_probe("cpu", probe)
+    second = probe_registry.run_probe("cpu", probe)
+    assert first is second and len(calls) == 1
+    summary = probe_registry.get_probe_summary()
+    assert summary["probes"] == 1 and summary["reused"] == 1
+    assert summary["seconds_saved"] >= 0.04
+
+    # 新的一次运行不复用之前的结果
+    probe_registry.start_probe_run()
+    assert probe_registry.run_probe("cpu", probe) is not first
+    assert len(calls) == 2 and registry.summary()["reused"] == 1
+
+def test_concurrent_callers_share_one_run():
+    """测试多个线程同时请求同一个探测时只执行一次"""
+    calls = []
+
+    def probe():
+        calls.append(1)
+        time.sleep(0.1)
+        return [1, 2, 3]
+
+    probe_registry.start_probe_run()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(probe_registry.run_probe("disks", probe))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+
+def test_failed_probe_not_cached():
+    """测试抛出异常的探测不被记录，下一次调用重新执行"""
+    attempts = []
+
+    def probe():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("first attempt fails")
+        return "ok"
+
+    probe_registry.start_probe_run()
+    try:
+        probe_registry.run_probe("bios", probe)
+        assert False, "expected RuntimeError"
+    except RuntimeError:
+        pass
+    assert probe_registry.run_probe("bios", probe) == "ok"
+
+def test_references_round_trip():
+    """测试共享对象在第一次出现之后写为引用，值相等但不是同一个对象和比引用还短的对象不替换，键中的/和~被转义"""
+    cpu = [{"Name": "Intel(R) Core(TM) i9-13900K", "NumberOfCores": 24, "NumberOfLogicalProcessors": 32}]
+    env = {"a/b~c": {"PATH": "C:\\Windows;C:\\Windows\\System32;C:\\Program Files\\Git\\cmd"}}
+    tiny = {"x": 1}
+    document = {
+        "basic_info": {"hardware": {"cpu": cpu}, "env": env},
+        "cpu": cpu,
+        "env_copy": env["a/b~c"],
+        "equal_but_distinct": [dict(cpu[0])],
+        "tiny": tiny,
+        "tiny_again": tiny,
+        "empty": [],
+        "empty_again": []
+    }
+    deduped, refs = dedupe_references(document)
+    assert refs == 2
+    assert deduped["tiny_again"] == {"x": 1}
+    assert deduped["cpu"] == {"$ref": "#/basic_info/hardware/cpu"}
+    assert deduped["env_copy"] == {"$ref": "#/basic_info/env/a~1b~0c"}
+    assert deduped["equal_but_distinct"] == cpu
+    assert document["cpu"] is cpu
+
+    restored = resolve_references(json.loads(json.dumps(deduped)))
+    assert restored == document
+    assert restored["cpu"] is restored["basic_info"]["hardware"]["cpu"]
+
+    buffer = io.StringIO()
+    stats = dump_json(document, buffer, measure=True, indent=2)
+    assert stats["refs"] == 2 and stats["bytes_saved"] > 0
+    assert len(json.dumps(document, indent=2)) - len(buffer.getvalue()) == stats["bytes_saved"]
+
+def test_collect_all_system_info_shares_sections():
+    """测试collect_all_system_info中basic_info.hardware和顶层的硬件分区是同一个对象"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        replay.write_bundle(temp_dir, platform_identity={"system": "Windows", "release": "10"})
+        replay.start_replay(temp_dir)
+        try:
+            from modules.collectors.system_info_collector import collect_all_system_info
+            info = collect_all_system_info()
+        finally:
+            replay.stop()
+    hardware = info["basic_info"]["hardware"]
+    assert info["cpu"] is hardware["cpu"]
+    assert info["memory"] is hardware["memory"]
+    assert info["disk"] is hardware["disks"]
+    assert info["graphics"] is hardware["graphics"]
+    summary = probe_registry.get_probe_summary()
+    assert summary["reused_probes"] == {"cpu": 1, "memory": 1, "disks": 1, "graphics": 1}
+
+def test_save_system_info_writes_references():
+    """测试模块导出的save_system_info把共享分区写为 {"$ref": ...}"""
+    from modules.collectors import system_info_collector
+    with tempfile.TemporaryDirectory() as temp_dir:
+        replay.write_bundle(temp_dir, platform_identity={"system": "Windows", "release": "10"})
+        replay.start_replay(temp_dir)
+        try:
+            result = system_info_collector.save_system_info(temp_dir)
+        finally:
+            replay.stop()
+        assert result["success"], result["message"]
+        with open(result["file"], 'r', encoding='utf-8') as f:
+            document = json.load(f)
+    assert document["cpu"] == {"$ref": "#/basic_info/hardware/cpu"}
+    assert resolve_references(document)["cpu"] == document["basic_info"]["hardware"]["cpu"]
+
+def main():
+    """主函数"""
+    print("分区复用测试脚本")
+    tests = [
+        test_probe_runs_once,
+        test_concurrent_callers_share_one_run,
+        test_failed_probe_not_cached,
+        test_references_round_trip,
+        test_collect_all_system_info_shares_sections,
+        test_save_system_info_writes_references
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"{test.__name__}: 通过")
+        except AssertionError as e:
+            failed += 1
+            print(f"{test.__name__}: 失败 {e}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
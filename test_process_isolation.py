@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试进程隔离的脚本
+用一直挂起的替身代替主机名解析、网络驱动器和ipconfig，验证超过期限的工作进程（连同其子进程）被结束并替换，
+分区记录为超时，其他探测的结果、异常和崩溃照常返回
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+
+import psutil
+
+from modules import process_isolation, resource_accounting, time_budget, command_trace
+from modules.process_isolation import ProbeTimeout, run_isolated, get_isolation_summary
+
+def hanging_probe():
+    """一直挂起的探测，如DNS不可用时的gethostbyname"""
+    time.sleep(3600)
+
+def hanging_command_probe(pid_path):
+    """启动一个一直挂起的子进程并等待它，如断开的网络驱动器上挂起的ipconfig；子进程号写到pid_path"""
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(3600)"])
+    with open(pid_path, 'w') as f:
+        f.write(str(child.pid))
+    child.wait()
+
+def fast_probe(value):
+    """立即返回的探测，同时返回工作进程号"""
+    return value * 2, os.getpid()
+
+def failing_probe():
+    """抛出异常的探测"""
+    raise ValueError("probe failed")
+
+def crashing_probe():
+    """使工作进程直接退出的探测"""
+    os._exit(3)
+
+def with_isolation(test):
+    """启用单个工作进程的进程隔离后运行test，结束后关闭进程池并恢复选项"""
+    process_isolation.configure_isolation(enabled=True, workers=1)
+    process_isolation.reset_isolation_stats()
+    try:
+        test()
+    finally:
+        process_isolation.shutdown_isolation_pool()
+        process_isolation.configure_isolation(enabled=False, workers=2)
+        process_isolation.reset_isolation_stats()
+
+def test_timeout_kills_and_replaces_worker():
+    """测试挂起的探测在期限后抛出ProbeTimeout，工作进程被结束，下一次调用由新的工作进程完成"""
+    def run():
+        assert run_isolated("fast", fast_probe, (21,))[0] == 42
+        first_pid = run_isolated("fast", fast_probe, (1,))[1]
+
+        start = time.monotonic()
+        try:
+            with resource_accounting.account("demo_section"):
+                run_isolated("gethostbyname", hanging_probe, timeout=0.5)
+            assert False, "expected ProbeTimeout"
+        except ProbeTimeout as e:
+            assert isinstance(e, subprocess.TimeoutExpired) and e.cmd == "gethostbyname"
+        assert time.monotonic() - start < 10
+        assert not psutil.pid_exists(first_pid) or psutil.Process(first_pid).status() == psutil.STATUS_ZOMBIE
+
+        value, second_pid = run_isolated("fast", fast_probe, (5,))
+        assert value == 10 and second_pid != first_pid
+        summary = get_isolation_summary()
+        assert summary["workers_started"] == 2 and summary["workers_killed"] == 1
+        assert summary["timeouts"] == [{"probe": "gethostbyname", "section": "demo_section", "timeout_seconds": 0.5}]
+        assert summary["timed_out_sections"] == ["demo_section"]
+
+    with_isolation(run)
+
+def test_timeout_kills_child_processes():
+    """测试超时时探测启动的子进程（如挂起的ipconfig）一起被结束，分区在时间预算中标记为部分完成"""
+    def run():
+        with tempfile.TemporaryDirectory() as temp_dir:
+            pid_path = os.path.join(temp_dir, "child.pid")
+            time_budget.start_time_budget(600)
+            with time_budget.budget_section("network_config"):
+                try:
+                    run_isolated("ipconfig", hanging_command_probe, (pid_path,), timeout=3)
+                    assert False, "expected ProbeTimeout"
+                except ProbeTimeout:
+                    pass
+            assert time_budget.is_partial("network_config")
+            with open(pid_path) as f:
+                child_pid = int(f.read())
+            deadline = time.monotonic() + 5
+            while psutil.pid_exists(child_pid) and psutil.Process(child_pid).status() != psutil.STATUS_ZOMBIE:
+                assert time.monotonic() < deadline, "child process still running"
+                time.sleep(0.05)
+            assert get_isolation_summary()["timeouts"][0]["section"] == "network_config"
+
+    try:
+        with_isolation(run)
+    finally:
+        time_budget.start_time_budget(None)
+
+def test_errors_and_crashes():
+    """测试探测抛出的异常原样抛出且工作进程继续使用，工作进程崩溃时抛出RuntimeError并被替换"""
+    def run():
+        pid = run_isolated("fast", fast_probe, (1,))[1]
+        try:
+            run_isolated("failing", failing_probe)
+            assert False, "expected ValueError"
+        except ValueError as e:
+            assert str(e) == "probe failed"
+        assert run_isolated("fast", fast_probe, (1,))[1] == pid
+
+        try:
+            run_isolated("crashing", crashing_probe, timeout=10)
+            assert False, "expected RuntimeError"
+        except RuntimeError as e:
+            assert "crashed" in str(e)
+        assert run_isolated("fast", fast_probe, (2,))[0] == 4
+        summary = get_isolation_summary()
+        assert summary["crashes"] == 1 and summary["workers_started"] == 2 and summary["timeouts"] == []
+
+        completed = process_isolation.run_command("python", [sys.executable, "-c", "print('isolated')"],
+                                                  capture_output=True, text=True)
+        assert completed.returncode == 0 and completed.stdout.strip() == "isolated"
+
+    with_isolation(run)
+
+def test_isolated_commands_are_traced_and_accounted():
+    """测试工作进程中运行的命令写入trace.jsonl，其子进程和CPU时间计入当前采集器，失败和超时的命令也被记录"""
+    burn = "import time\nend = time.process_time() + 0.2\nwhile time.process_time() < end: pass\nprint('isolated')"
+    def run():
+        resource_accounting.reset_resource_accounting()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            command_trace.start_trace(temp_dir)
+            try:
+                with resource_accounting.account("demo_section"):
+                    completed = process_isolation.run_command("python", [sys.executable, "-c", burn],
+                                                              capture_output=True, text=True)
+                    assert completed.stdout.strip() == "isolated"
+                    try:
+                        process_isolation.check_output("python", [sys.executable, "-c", "import sys; sys.exit(3)"])
+                        assert False, "expected CalledProcessError"
+                    except subprocess.CalledProcessError as e:
+                        assert e.returncode == 3
+                    try:
+                        process_isolation.run_command("python", [sys.executable, "-c", "import time; time.sleep(60)"],
+                                                      timeout=0.5)
+                        assert False, "expected ProbeTimeout"
+                    except ProbeTimeout:
+                        pass
+            finally:
+                command_trace.stop_trace()
+            with open(os.path.join(temp_dir, command_trace.TRACE_FILENAME), encoding='utf-8') as f:
+                records = [json.loads(line) for line in f]
+        assert [record["returncode"] for record in records] == [0, 3, None]
+        assert [record["timed_out"] for record in records] == [False, False, True]
+        assert all(record["argv"][0] == sys.executable.replace(os.path.expanduser("~"), "~") for record in records)
+        assert records[0]["cpu_seconds"] >= 0.15 and records[0]["stdout_bytes"] == len("isolated" + os.linesep)
+        metrics = resource_accounting.get_resource_summary()["collectors"]["demo_section"]
+        assert metrics["child_processes"] == 3 and metrics["child_cpu_seconds"] >= 0.15
+        resource_accounting.reset_resource_accounting()
+
+    with_isolation(run)
+
+def test_disabled_runs_in_process():
+    """测试未启用隔离时探测在本进程中直接运行，不记录统计"""
+    process_isolation.reset_isolation_stats()
+    assert run_isolated("fast", fast_probe, (3,)) == (6, os.getpid())
+    completed = process_isolation.run_command("python", [sys.executable, "-c", "pass"], timeout=30)
+    assert completed.returncode == 0
+    assert get_isolation_summary() is None
+
+def main():
+    """主函数"""
+    print("进程隔离测试脚本")
+    tests = [
+        test_timeout_kills_and_replaces_worker,
+        test_timeout_kills_child_processes,
+        test_errors_and_crashes,
+        test_isolated_commands_are_traced_and_accounted,
+        test_disabled_runs_in_process
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"{test.__name__}: 通过")
+        except AssertionError as e:
+            failed += 1
+            print(f"{test.__name__}: 失败 {e}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
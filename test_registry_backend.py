@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试注册表后端的脚本
+验证内存注册表的大小写、视图重定向和删除语义，.reg 文件的解析和导出，
+以及软件、系统信息和注册表采集器在非Windows系统上通过内存后端和回放的winreg得到相同的结果
+"""
+
+import os
+import sys
+import tempfile
+import threading
+
+from modules import registry_backend, replay
+from modules.registry_backend import MemoryBackend, load_reg_file, export_reg_file, parse_reg_text, use_registry_backend
+from modules.collectors import software_collector, system_info_collector, registry_collector
+from modules.collectors.uninstall_enumerator import iter_uninstall_entries, iter_hive_entries, list_software_hives, UNINSTALL_PATH, UNINSTALL_PATH_32
+
+UNINSTALL = "SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Uninstall"
+HKLM_UNINSTALL = "HKEY_LOCAL_MACHINE\\" + UNINSTALL
+HKLM_UNINSTALL_32 = "HKEY_LOCAL_MACHINE\\SOFTWARE\\WOW6432Node\\Microsoft\\Windows\\CurrentVersion\\Uninstall"
+
+def test_memory_backend_semantics():
+    """测试键名和值名不区分大小写、32位视图重定向到WOW6432Node、删除和QueryInfoKey形状的信息"""
+    backend = MemoryBackend()
+    backend.set_value(HKLM_UNINSTALL + "\\App64", "DisplayName", "Sixty Four")
+    backend.set_value(HKLM_UNINSTALL_32 + "\\App32", "DisplayName", "Thirty Two")
+    backend.create_key(HKLM_UNINSTALL_32 + "\\App32", last_write=133500000000000000)
+    backend.set_value("HKCU\\Software\\Demo", "", "default value")
+
+    with backend.open_key("HKEY_LOCAL_MACHINE", UNINSTALL.lower(), "64") as key:
+        assert key.subkey_names() == ["App64"]
+        assert key.open("app64").query_value("displayname") == ("Sixty Four", registry_backend.REG_SZ)
+    with backend.open_key("HKEY_LOCAL_MACHINE", UNINSTALL, "32") as key:
+        assert key.subkey_names() == ["App32"]
+        assert key.open("App32").info() == (0, 1, 133500000000000000)
+    # 已经带有WOW6432Node的路径不再重定向
+    with backend.open_key("HKEY_LOCAL_MACHINE", HKLM_UNINSTALL_32.split("\\", 1)[1], "32") as key:
+        assert key.subkey_names() == ["App32"]
+    with use_registry_backend(backend):
+        assert registry_backend.read_values("HKEY_CURRENT_USER", "Software\\Demo") == {"": "default value"}
+    assert registry_backend.read_values("HKEY_CURRENT_USER", "Software\\Demo") == {}
+
+    backend.delete_value("HKEY_CURRENT_USER\\Software\\Demo", "")
+    backend.delete_key(HKLM_UNINSTALL + "\\APP64")
+    with backend.open_key("HKEY_LOCAL_MACHINE", UNINSTALL) as key:
+        assert key.info()[:2] == (0, 0) and key.get_value("Missing", "default") == "default"
+        try:
+            key.open("App64")
+            assert False, "expected FileNotFoundError"
+        except FileNotFoundError:
+            pass
+    try:
+        backend.open_key("HKEY_CURRENT_USER", "Software\\Missing")
+        assert False, "expected FileNotFoundError"
+    except FileNotFoundError:
+        pass
+
+def test_reg_file_round_trip():
+    """测试所有值类型经 .reg 导出再加载后不变，以及regedit文件中的注释、续行、转义和删除语法"""
+    backend = MemoryBackend()
+    path = "HKEY_LOCAL_MACHINE\\SOFTWARE\\Contoso\\Tool"
+    values = [
+        ("", "default", registry_backend.REG_SZ),
+        ('Quoted "name" \\ path', 'C:\\Program Files\\"Contoso"', registry_backend.REG_SZ),
+        ("Expand", "%ProgramFiles%\\Contoso", registry_backend.REG_EXPAND_SZ),
+        ("Binary", bytes(range(40)), registry_backend.REG_BINARY),
+        ("Dword", 0xDEADBEEF, registry_backend.REG_DWORD),
+        ("Qword", 2 ** 40 + 5, registry_backend.REG_QWORD),
+        ("Multi", ["第一项", "second"], registry_backend.REG_MULTI_SZ),
+        ("中文名", "值", registry_backend.REG_SZ),
+    ]
+    for name, data, value_type in values:
+        backend.set_value(path, name, data, value_type)
+    backend.create_key(path + "\\Empty")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        reg_path = os.path.join(temp_dir, "export.reg")
+        export_reg_file(backend, reg_path)
+        with open(reg_path, 'rb') as f:
+            assert f.read(2) == b"\xff\xfe"
+        loaded = load_reg_file(reg_path)
+    with loaded.open_key("HKEY_LOCAL_MACHINE", "SOFTWARE\\Contoso\\Tool") as key:
+        assert list(key.enum_values()) == values
+        assert key.subkey_names() == ["Empty"]
+
+    text = "\r\n".join([
+        "Windows Registry Editor Version 5.00",
+        "",
+        "; exported by regedit",
+        "[HKEY_CURRENT_USER\\Software\\Demo]",
+        '"Size"=dword:00000400',
+        '"Path"=hex(2):25,00,50,00,\\',
+        "  41,00,54,00,48,00,25,00,00,00",
+        '"Gone"="soon"',
+        '"Gone"=-',
+        "",
+        "[HKEY_CURRENT_USER\\Software\\Demo\\Old]",
+        "[-HKEY_CURRENT_USER\\Software\\Demo\\Old]",
+    ])
+    parsed = parse_reg_text(text)
+    with parsed.open_key("HKEY_CURRENT_USER", "Software\\Demo") as key:
+        assert key.values() == {"Size": 1024, "Path": "%PATH%"} and key.subkey_names() == []
+    try:
+        parse_reg_text("not a registry file")
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+def uninstall_backend():
+    """64位、32位和当前用户的卸载项各一个，另有一个没有DisplayName的项"""
+    backend = MemoryBackend()
+    backend.set_value(HKLM_UNINSTALL + "\\App64", "DisplayName", "Sixty Four")
+    backend.set_value(HKLM_UNINSTALL + "\\App64", "DisplayVersion", "6.4")
+    backend.set_value(HKLM_UNINSTALL + "\\App64", "InstallDate", "20240314")
+    backend.set_value(HKLM_UNINSTALL + "\\Patch", "ParentKeyName", "App64")
+    backend.set_value(HKLM_UNINSTALL_32 + "\\App32", "DisplayName", "Thirty Two")
+    backend.set_value(HKLM_UNINSTALL_32 + "\\App32", "Publisher", "Contoso")
+    backend.set_value("HKEY_CURRENT_USER\\" + UNINSTALL + "\\UserApp", "DisplayName", "Per User")
+    return backend
+
+def collect(backend):
+    """用backend运行三个读取卸载项的采集器"""
+    with use_registry_backend(backend):
+        return (software_collector.get_all_installed_software(include_powershell=False),
+                system_info_collector.get_installed_software(),
+                registry_collector.get_software_from_registry())
+
+def test_collectors_on_memory_backend():
+    """测试采集器在非Windows系统上导入，并从内存注册表读出各视图的卸载项"""
+    software, installed, registry_software = collect(uninstall_backend())
+    assert [(item["name"], item["source_hive"], item.get("architecture")) for item in software] == [
+        ("Per User", "HKCU", None), ("Sixty Four", "HKLM\\64", "64-bit"), ("Thirty Two", "HKLM\\32", "32-bit")]
+    assert software[1]["install_date"] == "2024-03-14" and software[1]["DisplayVersion"] == "6.4"
+    assert software[2]["registry_path"].endswith("Uninstall\\App32") and software[2]["Publisher"] == "Contoso"
+    assert [item["name"] for item in installed] == ["Sixty Four", "Thirty Two", "Per User"]
+    assert installed[1] == {"name": "Thirty Two", "version": "", "publisher": "Contoso", "install_date": "",
+                            "install_location": "", "uninstall_string": ""}
+    assert [item["DisplayName"] for item in registry_software] == ["Sixty Four", "Thirty Two"]
+    assert registry_backend.get_registry_backend().name == "winreg"
+
+def test_winreg_backend_under_replay_matches_memory():
+    """测试同一棵注册表树经回放的winreg读取时，采集器的结果与内存后端相同"""
+    registry = replay.build_registry_entries(HKLM_UNINSTALL, {"subkeys": {
+        "App64": {"values": {"DisplayName": ("Sixty Four", 1), "DisplayVersion": ("6.4", 1), "InstallDate": ("20240314", 1)}},
+        "Patch": {"values": {"ParentKeyName": ("App64", 1)}}}}, "64")
+    registry.update(replay.build_registry_entries(HKLM_UNINSTALL_32, {"subkeys": {
+        "App32": {"values": {"DisplayName": ("Thirty Two", 1), "Publisher": ("Contoso", 1)}}}}, "32"))
+    registry.update(replay.build_registry_entries(HKLM_UNINSTALL_32, {"subkeys": {
+        "App32": {"values": {"DisplayName": ("Thirty Two", 1), "Publisher": ("Contoso", 1)}}}}))
+    registry.update(replay.build_registry_entries(HKLM_UNINSTALL, {"subkeys": {
+        "App64": {"values": {"DisplayName": ("Sixty Four", 1), "DisplayVersion": ("6.4", 1), "InstallDate": ("20240314", 1)}},
+        "Patch": {"values": {"ParentKeyName": ("App64", 1)}}}}))
+    registry.update(replay.build_registry_entries("HKEY_CURRENT_USER\\" + UNINSTALL, {"subkeys": {
+        "UserApp": {"values": {"DisplayName": ("Per User", 1)}}}}))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        replay.write_bundle(temp_dir, registry=registry)
+        replay.start_replay(temp_dir)
+        try:
+            replayed = collect(registry_backend.WinregBackend())
+        finally:
+            replay.stop()
+    assert replayed == collect(uninstall_backend())
+
+def test_uninstall_enumerator_projection():
+    """测试统一枚举器按请求的字段顺序投影、惰性返回，并在回放中只用EnumValue读取值（录制包中没有QueryValueEx也能读取）"""
+    locations = [("HKEY_LOCAL_MACHINE", UNINSTALL_PATH, "64"), ("HKEY_LOCAL_MACHINE", UNINSTALL_PATH_32, None),
+                 ("HKEY_USERS", "S-1-5-21-1\\" + UNINSTALL, None)]
+    fields = ("InstallDate", "displayname")
+    with use_registry_backend(uninstall_backend()):
+        entries = iter_uninstall_entries(locations, fields)
+        first = next(entries)
+        assert first == (locations[0], "App64", ("20240314", "Sixty Four")) and first.location is locations[0]
+        assert [entry.values for entry in entries] == [(None, "Thirty Two")]
+        unfiltered = list(iter_uninstall_entries(locations[:1], ("ParentKeyName",), require=None))
+        assert [(entry.subkey, entry.values) for entry in unfiltered] == [("App64", (None,)), ("Patch", ("App64",))]
+
+    registry = replay.build_registry_entries(HKLM_UNINSTALL, {"subkeys": {
+        "App64": {"values": {"DisplayName": ("Sixty Four", 1), "DisplayVersion": ("6.4", 1), "InstallDate": ("20240314", 1)}},
+        "Patch": {"values": {"ParentKeyName": ("App64", 1)}}}}, "64")
+    registry = {signature: entry for signature, entry in registry.items() if not signature.startswith("QueryValueEx|")}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        replay.write_bundle(temp_dir, registry=registry)
+        replay.start_replay(temp_dir)
+        try:
+            with use_registry_backend(registry_backend.WinregBackend()):
+                replayed = list(iter_uninstall_entries(locations[:1], fields))
+        finally:
+            replay.stop()
+    assert replayed == [(locations[0], "App64", ("20240314", "Sixty Four"))]
+
+def test_project_values_reads_only_what_it_needs():
+    """测试winreg键的值投影在请求的字段都找到后停止枚举，缺少字段的键枚举全部的值而不调用QueryValueEx"""
+    fields = ("DisplayName", "InstallDate")
+    wanted = {name.lower(): index for index, name in enumerate(fields)}
+    early = {"DisplayName": ("Early", 1), "InstallDate": ("20240314", 1), "NoModify": (1, 4), "NoRepair": (1, 4)}
+    wide = {"DisplayName": ("Wide", 1), **{f"Extra{i}": (f"extra {i}", 1) for i in range(10)}}
+    registry = replay.build_registry_entries(HKLM_UNINSTALL, {"subkeys": {
+        "Early": {"values": early}, "Wide": {"values": wide}}}, "64")
+    registry = {signature: entry for signature, entry in registry.items() if not signature.startswith("QueryValueEx|")}
+    reads = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        replay.write_bundle(temp_dir, registry=registry)
+        with use_registry_backend(registry_backend.WinregBackend()):
+            for name, expected in (("Early", ("Early", "20240314")), ("Wide", ("Wide", None))):
+                replay.start_replay(temp_dir)
+                try:
+                    with registry_backend.open_key("HKEY_LOCAL_MACHINE", f"{UNINSTALL_PATH}\\{name}", "64") as key:
+                        assert key.project_values(wanted, len(fields)) == expected
+                finally:
+                    reads[name] = replay.stop()["registry_reads"]
+    # OpenKey和QueryInfoKey各一次，Early再枚举前两个值，Wide缺少InstallDate，枚举全部11个值
+    assert reads == {"Early": 4, "Wide": 13}, reads
+
+def test_per_user_hives_read_concurrently():
+    """测试每个已加载的用户配置都被读取、各位置在不同线程中读取，合并结果记录来源且与完成顺序无关"""
+    backend = uninstall_backend()
+    for index in range(40):
+        sid = f"S-1-5-21-1000-{index}"
+        backend.set_value(f"HKEY_USERS\\{sid}\\{UNINSTALL}\\Teams", "DisplayName", "Teams")
+        backend.set_value(f"HKEY_USERS\\{sid}\\{UNINSTALL}\\Teams", "DisplayVersion", "1.7")
+        backend.set_value(f"HKEY_USERS\\{sid}\\{UNINSTALL}\\Tool{index}", "DisplayName", f"User Tool {index}")
+        backend.create_key(f"HKEY_USERS\\{sid}_Classes")
+    backend.create_key("HKEY_USERS\\S-1-5-18")
+
+    # 记录打开键的线程
+    threads = set()
+    open_key = backend.open_key
+    def recording_open_key(root, path, view=None):
+        threads.add(threading.current_thread().name)
+        return open_key(root, path, view)
+    backend.open_key = recording_open_key
+
+    with use_registry_backend(backend):
+        hives = list_software_hives()
+        assert [hive.hive for hive in hives[:4]] == ["HKLM\\64", "HKLM\\32", "HKCU", "HKU\\S-1-5-21-1000-0"]
+        assert len(hives) == 3 + 41 and not any(hive.hive.endswith("_Classes") for hive in hives)
+        entries = list(iter_hive_entries(hives, ("DisplayName",), max_workers=4))
+        assert len(entries) == 3 + 80 and len({name for name in threads if name.startswith("software-hive")}) > 1
+
+        # 提前结束迭代时剩余的读取停止
+        stream = iter_hive_entries(hives, ("DisplayName",), max_workers=4)
+        next(stream)
+        stream.close()
+
+        software = software_collector.get_all_installed_software(include_powershell=False)
+    names = [item["name"] for item in software]
+    assert len(names) == 3 + 41 and names.count("Teams") == 1
+    teams = software[names.index("Teams")]
+    assert teams["source_hive"] == "HKU\\S-1-5-21-1000-0" and "architecture" not in teams
+    assert software[names.index("User Tool 7")]["source_hive"] == "HKU\\S-1-5-21-1000-7"
+    assert software[names.index("User Tool 7")]["registry_path"] == f"S-1-5-21-1000-7\\{UNINSTALL}\\Tool7"
+
+def main():
+    """主函数"""
+    print("注册表后端测试脚本")
+    tests = [
+        test_memory_backend_semantics,
+        test_reg_file_round_trip,
+        test_collectors_on_memory_backend,
+        test_winreg_backend_under_replay_matches_memory,
+        test_uninstall_enumerator_projection,
+        test_project_values_reads_only_what_it_needs,
+        test_per_user_hives_read_concurrently
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"{test.__name__}: 通过")
+        except AssertionError as e:
+            failed += 1
+            print(f"{test.__name__}: 失败 {e}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试离线hive文件后端的脚本
+验证REGF文件中各类型的值、Unicode名称、大数据分段、ri子键索引和最后写入时间的读取，挂载点和CurrentControlSet的解析，
+以及软件、启动项和服务采集器在非Windows系统上从SOFTWARE/SYSTEM/NTUSER.DAT文件得到与内存注册表相同的结果，
+fast配置中的services分区从hive读取服务且不写入注册表快照，注册表快照按hive文件区分不同的镜像
+"""
+
+import os
+import sys
+import struct
+import logging
+import tempfile
+
+from modules import registry_backend, registry_snapshot, collector_registry
+from modules.registry_backend import MemoryBackend, use_registry_backend
+from modules.registry_hive import HiveFile, open_hive_backend, export_hive_file, LEAF_SIZE, BIG_DATA_SEGMENT
+from modules.collectors import software_collector, system_info_collector
+from modules.collectors.uninstall_enumerator import list_software_hives, iter_uninstall_entries, UNINSTALL_PATH
+
+UNINSTALL = "SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Uninstall"
+RUN = "SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Run"
+
+def test_hive_values_and_structure():
+    """测试各值类型、默认值、Unicode名称、大数据、内联数据、ri索引、最后写入时间和无效文件"""
+    backend = MemoryBackend()
+    path = "HKEY_LOCAL_MACHINE\\SOFTWARE\\Contoso\\Tool"
+    values = [
+        ("", "default", registry_backend.REG_SZ),
+        ("Expand", "%ProgramFiles%\\Contoso", registry_backend.REG_EXPAND_SZ),
+        ("Short", b"\x01\x02", registry_backend.REG_BINARY),
+        ("Big", bytes(range(256)) * 100, registry_backend.REG_BINARY),
+        ("Dword", 0xDEADBEEF, registry_backend.REG_DWORD),
+        ("Qword", 2 ** 40 + 5, registry_backend.REG_QWORD),
+        ("Multi", ["第一项", "second"], registry_backend.REG_MULTI_SZ),
+        ("中文名", "值", registry_backend.REG_SZ),
+    ]
+    for name, data, value_type in values:
+        backend.set_value(path, name, data, value_type)
+    backend.create_key(path, last_write=133500000000000000)
+    for i in range(LEAF_SIZE + 10):
+        backend.set_value(f"{path}\\Many\\Key{i:05d}", "Index", i, registry_backend.REG_DWORD)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        hive_path = os.path.join(temp_dir, "SOFTWARE")
+        export_hive_file(backend, "HKLM\\SOFTWARE", hive_path)
+        with open_hive_backend([hive_path]) as hives:
+            with hives.open_key("HKEY_LOCAL_MACHINE", "software\\contoso\\TOOL") as key:
+                assert key.info() == (1, len(values), 133500000000000000)
+                assert list(key.enum_values()) == values
+                assert key.query_value("big")[0] == values[3][1] and len(values[3][1]) > BIG_DATA_SEGMENT
+                assert key.project_values({"dword": 0, "missing": 1}, 2) == (0xDEADBEEF, None)
+                many = key.open("Many")
+                # 超过一个lh列表的子键经ri索引读出，顺序与Windows一样按大写名称排序
+                assert many.subkey_names() == [f"Key{i:05d}" for i in range(LEAF_SIZE + 10)]
+                assert many.open(f"key{LEAF_SIZE + 5:05d}").get_value("Index") == LEAF_SIZE + 5
+            # 32位视图重定向到WOW6432Node，hive中没有时与Windows一样找不到
+            try:
+                hives.open_key("HKEY_LOCAL_MACHINE", "SOFTWARE\\Contoso", "32")
+                assert False, "expected FileNotFoundError"
+            except FileNotFoundError:
+                pass
+            with hives.open_key("HKEY_LOCAL_MACHINE", "") as root:
+                assert root.subkey_names() == ["SOFTWARE"]
+                assert root.open("SOFTWARE").subkey_names() == ["Contoso"]
+
+        # 主次序号不同（文件未正常写回）时仍然读取并记录警告；不是hive的文件抛出ValueError
+        with open(hive_path, 'r+b') as f:
+            f.seek(8)
+            f.write(struct.pack("<I", 2))
+        with _captured_warnings() as warnings:
+            with HiveFile(hive_path) as hive:
+                assert hive.current_control_set() is None
+        assert any("not written back cleanly" in message for message in warnings)
+        with open(hive_path, 'wb') as f:
+            f.write(b"regf" + bytes(100))
+        for invalid in (hive_path, os.path.join(temp_dir, "empty")):
+            open(invalid, 'ab').close()
+            try:
+                HiveFile(invalid)
+                assert False, "expected ValueError"
+            except ValueError:
+                pass
+
+class _captured_warnings:
+    """收集范围内记录的警告"""
+
+    def __enter__(self):
+        self.messages = []
+        self.handler = logging.Handler(logging.WARNING)
+        self.handler.emit = lambda record: self.messages.append(record.getMessage())
+        logging.getLogger().addHandler(self.handler)
+        return self.messages
+
+    def __exit__(self, *exc_info):
+        logging.getLogger().removeHandler(self.handler)
+        return False
+
+def offline_machine():
+    """离线机器的注册表：64位和32位卸载项、Run键、两个控制集中的服务，以及当前用户的卸载项和Run键"""
+    backend = MemoryBackend()
+    hklm = "HKEY_LOCAL_MACHINE\\"
+    backend.set_value(f"{hklm}{UNINSTALL}\\App64", "DisplayName", "Sixty Four")
+    backend.set_value(f"{hklm}{UNINSTALL}\\App64", "DisplayVersion", "6.4")
+    backend.set_value(f"{hklm}{UNINSTALL}\\App64", "InstallDate", "20240314")
+    backend.set_value(f"{hklm}SOFTWARE\\WOW6432Node\\Microsoft\\Windows\\CurrentVersion\\Uninstall\\App32",
+                      "DisplayName", "Thirty Two")
+    backend.set_value(f"{hklm}{RUN}", "Updater", "C:\\Contoso\\update.exe /background")
+    backend.set_value(f"{hklm}SYSTEM\\Select", "Current", 2, registry_backend.REG_DWORD)
+    for control_set, image in (("ControlSet001", "old.exe"), ("ControlSet002", "C:\\Contoso\\agent.exe")):
+        services = f"{hklm}SYSTEM\\{control_set}\\Services"
+        backend.set_value(f"{services}\\ContosoAgent", "DisplayName", "Contoso Agent")
+        backend.set_value(f"{services}\\ContosoAgent", "ImagePath", image, registry_backend.REG_EXPAND_SZ)
+        backend.set_value(f"{services}\\ContosoAgent", "Start", 2, registry_backend.REG_DWORD)
+        backend.set_value(f"{services}\\ContosoAgent", "Type", 0x10, registry_backend.REG_DWORD)
+        # 驱动程序不属于Win32服务
+        backend.set_value(f"{services}\\contosodrv", "Start", 0, registry_backend.REG_DWORD)
+        backend.set_value(f"{services}\\contosodrv", "Type", 0x1, registry_backend.REG_DWORD)
+    backend.set_value(f"HKEY_CURRENT_USER\\{UNINSTALL}\\UserApp", "DisplayName", "Per User")
+    backend.set_value(f"HKEY_CURRENT_USER\\{RUN}", "Chat", "chat.exe --minimized")
+    return backend
+
+def collect(backend):
+    """用backend运行软件、启动项和服务采集器"""
+    with use_registry_backend(backend):
+        return (software_collector.get_registry_installed_software(),
+                system_info_collector.get_startup_items_fast(),
+                system_info_collector.get_services_fast())
+
+def test_collectors_on_hive_files():
+    """测试采集器从导出的hive文件读出的结果与内存注册表相同，服务按Select\\Current取当前控制集"""
+    machine = offline_machine()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        files = []
+        for key_path, name in (("HKLM\\SOFTWARE", "SOFTWARE"), ("HKLM\\SYSTEM", "SYSTEM"), ("HKCU", "NTUSER.DAT")):
+            files.append(os.path.join(temp_dir, name))
+            export_hive_file(machine, key_path, files[-1])
+        with open_hive_backend(files) as hives:
+            software, startup, services = collect(hives)
+        assert (software, startup) == collect(machine)[:2]
+        assert [item["name"] for item in software] == ["Per User", "Sixty Four", "Thirty Two"]
+        assert {item["Name"] for item in startup} >= {"Updater", "Chat"}
+        assert services == [{"Caption": "Contoso Agent", "DisplayName": "Contoso Agent", "Name": "ContosoAgent",
+                             "PathName": "C:\\Contoso\\agent.exe", "StartMode": "Auto", "auto_start": True}]
+
+        # 其他用户的NTUSER.DAT挂载到HKEY_USERS下，与已加载的用户配置一样被列出
+        with open_hive_backend({"HKLM\\SOFTWARE": files[0], "HKU\\alice": files[2]}) as hives:
+            with use_registry_backend(hives):
+                assert [hive.hive for hive in list_software_hives()][-1] == "HKU\\alice"
+                software = software_collector.get_registry_installed_software()
+        assert [(item["name"], item["source_hive"]) for item in software] == [
+            ("Per User", "HKU\\alice"), ("Sixty Four", "HKLM\\64"), ("Thirty Two", "HKLM\\32")]
+        try:
+            open_hive_backend([os.path.join(temp_dir, "UsrClass.dat")])
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+
+def test_services_section_reads_hive_without_snapshot():
+    """测试fast配置中的services分区使用get_services_fast从SYSTEM hive读取服务，服务不写入注册表快照"""
+    original = dict(registry_snapshot._options)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        system_file = os.path.join(temp_dir, "SYSTEM")
+        machine = offline_machine()
+        # 有最后写入时间的键才可能写入快照
+        for name in ("ContosoAgent", "contosodrv"):
+            machine.create_key(f"HKEY_LOCAL_MACHINE\\SYSTEM\\ControlSet002\\Services\\{name}", last_write=133500000000000000)
+        export_hive_file(machine, "HKLM\\SYSTEM", system_file)
+        registry_snapshot.configure_registry_snapshot(enabled=True, bypass=False, refresh=False, state_dir=temp_dir)
+        collector_registry.configure_profile("fast")
+        try:
+            services = collector_registry.get_collector("services")
+            assert collector_registry.resolve(services) is system_info_collector.get_services_fast
+            registry_snapshot.reset_snapshot_stats()
+            with open_hive_backend([system_file]) as hives:
+                with use_registry_backend(hives):
+                    system_info = system_info_collector.collect_all_system_info(["services"])
+            assert [service["Name"] for service in system_info["services"]] == ["ContosoAgent"]
+            assert registry_snapshot.get_snapshot_summary() is None
+            registry_snapshot.flush()
+            assert not os.path.exists(os.path.join(temp_dir, registry_snapshot.SNAPSHOT_FILENAME))
+        finally:
+            collector_registry.configure_profile("full")
+            registry_snapshot.configure_registry_snapshot(**original)
+            registry_snapshot.reset_snapshot_stats()
+
+def test_snapshot_keeps_hive_images_apart():
+    """测试注册表快照按hive文件区分位置：两个镜像中同一路径、同一最后写入时间的卸载项不互相覆盖，同一镜像再次读取时命中"""
+    original = dict(registry_snapshot._options)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        images = []
+        for version in ("1.0", "2.0"):
+            machine = MemoryBackend()
+            machine.set_value(f"HKEY_LOCAL_MACHINE\\{UNINSTALL}\\App", "DisplayName", "Imaged App")
+            machine.set_value(f"HKEY_LOCAL_MACHINE\\{UNINSTALL}\\App", "DisplayVersion", version)
+            machine.create_key(f"HKEY_LOCAL_MACHINE\\{UNINSTALL}\\App", last_write=133500000000000000)
+            os.makedirs(os.path.join(temp_dir, version))
+            images.append(os.path.join(temp_dir, version, "SOFTWARE"))
+            export_hive_file(machine, "HKLM\\SOFTWARE", images[-1])
+        registry_snapshot.configure_registry_snapshot(enabled=True, bypass=False, refresh=False, state_dir=temp_dir)
+        locations = [("HKEY_LOCAL_MACHINE", UNINSTALL_PATH, "64")]
+        try:
+            versions = []
+            for image in images + images[:1]:
+                registry_snapshot.reset_snapshot_stats()
+                with open_hive_backend([image]) as hives:
+                    with use_registry_backend(hives):
+                        versions.append([entry.values[1] for entry in
+                                         iter_uninstall_entries(locations, ("DisplayName", "DisplayVersion"))])
+                versions[-1].append(registry_snapshot.get_snapshot_summary()["hits"])
+                registry_snapshot.flush()
+            assert versions == [["1.0", 0], ["2.0", 0], ["1.0", 1]], versions
+        finally:
+            registry_snapshot.configure_registry_snapshot(**original)
+            registry_snapshot.reset_snapshot_stats()
+
+def main():
+    """主函数"""
+    print("离线hive后端测试脚本")
+    tests = [
+        test_hive_values_and_structure,
+        test_collectors_on_hive_files,
+        test_services_section_reads_hive_without_snapshot,
+        test_snapshot_keeps_hive_images_apart
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"{test.__name__}: 通过")
+        except AssertionError as e:
+            failed += 1
+            print(f"{test.__name__}: 失败 {e}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
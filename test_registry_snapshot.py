@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试注册表快照缓存的脚本
+验证最后写入时间未变的卸载项直接取自快照、新增和修改的子键重新读取、删除的子键从快照中移除，
+快照跨运行从磁盘加载，以及最后写入时间未知或值不能写入JSON时不缓存、bypass和refresh模式
+"""
+
+import os
+import sys
+import json
+import tempfile
+
+from modules import registry_snapshot
+from modules.registry_backend import MemoryBackend, use_registry_backend, REG_BINARY
+from modules.collectors.uninstall_enumerator import iter_uninstall_entries, UNINSTALL_PATH
+
+UNINSTALL = "HKEY_LOCAL_MACHINE\\" + UNINSTALL_PATH
+LOCATIONS = [("HKEY_LOCAL_MACHINE", UNINSTALL_PATH, None)]
+FIELDS = ("DisplayName", "DisplayVersion")
+
+def add_app(backend, name, version, last_write):
+    """添加一个卸载项并设置其最后写入时间"""
+    backend.set_value(f"{UNINSTALL}\\{name}", "DisplayName", name)
+    backend.set_value(f"{UNINSTALL}\\{name}", "DisplayVersion", version)
+    backend.create_key(f"{UNINSTALL}\\{name}", last_write=last_write)
+
+def read(backend):
+    """用backend读取卸载项，返回子键名到值的字典和本次的统计"""
+    registry_snapshot.reset_snapshot_stats()
+    with use_registry_backend(backend):
+        entries = {entry.subkey: entry.values for entry in iter_uninstall_entries(LOCATIONS, FIELDS)}
+    return entries, registry_snapshot.get_snapshot_summary()
+
+def with_snapshot(test):
+    """在临时目录中启用快照缓存后运行test(state_dir)，结束后恢复选项"""
+    original = dict(registry_snapshot._options)
+    with tempfile.TemporaryDirectory() as state_dir:
+        registry_snapshot.configure_registry_snapshot(enabled=True, bypass=False, refresh=False, state_dir=state_dir)
+        try:
+            test(state_dir)
+        finally:
+            registry_snapshot.configure_registry_snapshot(**original)
+            registry_snapshot.reset_snapshot_stats()
+
+def test_unchanged_subkeys_served_from_snapshot():
+    """测试第二次运行只重新读取修改和新增的子键，删除的子键从快照中移除，快照从磁盘重新加载"""
+    def run(state_dir):
+        backend = MemoryBackend()
+        for i in range(10):
+            add_app(backend, f"App{i}", "1.0", 1000 + i)
+        entries, summary = read(backend)
+        assert len(entries) == 10 and summary["hits"] == 0 and summary["misses"] == 10
+        registry_snapshot.flush()
+
+        # 修改一个值但不更新最后写入时间时使用快照中的值，说明确实没有重新读取
+        backend.set_value(f"{UNINSTALL}\\App0", "DisplayVersion", "stale")
+        add_app(backend, "App1", "2.0", 5000)
+        add_app(backend, "App10", "1.0", 5001)
+        backend.delete_key(f"{UNINSTALL}\\App2")
+        registry_snapshot.configure_registry_snapshot(state_dir=state_dir)
+        entries, summary = read(backend)
+        assert entries["App0"] == ("App0", "1.0") and entries["App1"] == ("App1", "2.0") and "App10" in entries
+        assert summary == {"mode": "normal", "hits": 8, "misses": 2, "uncacheable": 0, "hit_rate": 0.8}
+        registry_snapshot.flush()
+
+        with open(os.path.join(state_dir, registry_snapshot.SNAPSHOT_FILENAME), encoding='utf-8') as f:
+            document = json.load(f)
+        (subkeys,) = document["locations"].values()
+        assert sorted(subkeys) == sorted(f"app{i}" for i in range(11) if i != 2)
+        assert subkeys["app1"] == [5000, ["App1", "2.0"]]
+
+    with_snapshot(run)
+
+def test_uncacheable_and_modes():
+    """测试最后写入时间为0（如 .reg 文件加载的树）和二进制值不缓存，refresh模式重新读取并更新快照，bypass模式不参与"""
+    def run(state_dir):
+        backend = MemoryBackend()
+        add_app(backend, "Unknown", "1.0", 0)
+        add_app(backend, "Binary", "1.0", 7000)
+        backend.set_value(f"{UNINSTALL}\\Binary", "DisplayVersion", b"\x01\x02", REG_BINARY)
+        add_app(backend, "Plain", "1.0", 7001)
+        for _ in range(2):
+            entries, summary = read(backend)
+        assert entries["Binary"] == ("Binary", b"\x01\x02")
+        assert summary["hits"] == 1 and summary["misses"] == 2 and summary["uncacheable"] == 2
+
+        registry_snapshot.configure_registry_snapshot(refresh=True)
+        entries, summary = read(backend)
+        assert summary["mode"] == "refresh" and summary["hits"] == 0 and summary["misses"] == 3
+
+        registry_snapshot.configure_registry_snapshot(refresh=False, bypass=True)
+        entries, summary = read(backend)
+        assert len(entries) == 3 and summary is None
+
+    with_snapshot(run)
+
+def main():
+    """主函数"""
+    print("注册表快照缓存测试脚本")
+    tests = [
+        test_unchanged_subkeys_served_from_snapshot,
+        test_uncacheable_and_modes
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"{test.__name__}: 通过")
+        except AssertionError as e:
+            failed += 1
+            print(f"{test.__name__}: 失败 {e}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试录制/回放工具的脚本
+在当前平台录制Python替身进程的输出，再在不启动任何进程的情况下回放；并用构造的录制包在Linux上完整运行main.py
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+import tempfile
+import subprocess
+
+from modules import replay
+from modules.async_runner import run_command_async, run_async
+from modules.json_stream import JsonLineStream
+
+def python_argv(script):
+    """返回运行一段Python代码的替身进程命令行"""
+    return [sys.executable, "-c", script]
+
+def marker_script(marker, output):
+    """替身进程：创建标记文件后输出内容，回放时标记文件不应再出现"""
+    return f"open({marker!r}, 'w').close(); print({output!r})"
+
+def test_command_key():
+    """测试匹配键忽略可执行文件的路径、大小写、.exe后缀和输出目录的时间戳"""
+    assert replay.command_key(["C:\\Windows\\System32\\WindowsPowerShell\\v1.0\\PowerShell.EXE", "-Command", "x"]) == \
+        replay.command_key(["powershell", "-Command", "x"])
+    assert replay.command_key(["netsh", "folder=Report/20240101_120000/wifi"]) == \
+        replay.command_key(["netsh", "folder=Report/20261017_093000/wifi"])
+    assert replay.command_key("python  --version") == replay.command_key("python --version")
+
+def test_record_then_replay():
+    """测试录制的run、check_output、流式和异步命令在回放时得到相同输出，且不启动进程"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        bundle = os.path.join(temp_dir, "bundle")
+        marker = os.path.join(temp_dir, "spawned")
+        commands = {
+            "run": python_argv(marker_script(marker, "run")),
+            "check_output": python_argv(marker_script(marker, "check") + "; import sys; sys.stdout.buffer.write(b'\\xff')"),
+            "stream": python_argv(f"open({marker!r}, 'w').close()\nfor i in range(3): print('{{\"i\": %d}}' % i)"),
+            "async": python_argv(marker_script(marker, "async")),
+            "failed": python_argv("import sys; sys.stderr.write('boom'); sys.exit(4)"),
+        }
+
+        def run_all():
+            run = subprocess.run(commands["run"], capture_output=True, text=True)
+            check = subprocess.check_output(commands["check_output"])
+            stream = list(JsonLineStream(commands["stream"]))
+            async_result = run_async(run_command_async(commands["async"]))
+            failed = subprocess.run(commands["failed"], capture_output=True, text=True)
+            return (run.stdout, check, stream, async_result.stdout, async_result.returncode,
+                    failed.returncode, failed.stderr)
+
+        replay.start_recording(bundle)
+        try:
+            recorded = run_all()
+        finally:
+            stats = replay.stop()
+        assert stats["commands"] == 5
+        assert os.path.exists(marker)
+        os.remove(marker)
+
+        replay.start_replay(bundle, strict=True)
+        try:
+            replayed = run_all()
+        finally:
+            stats = replay.stop()
+        assert replayed == recorded
+        assert recorded[1].endswith(b"\xff") and recorded[5] == 4 and recorded[6] == "boom"
+        assert stats["served"] == 5 and stats["missing"] == 0
+        assert not os.path.exists(marker)
+        assert subprocess.Popen is not replay.ReplayPopen
+
+def test_missing_command():
+    """测试录制包中没有的命令：默认视为命令不存在，严格模式抛出LookupError"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        replay.write_bundle(temp_dir)
+        replay.start_replay(temp_dir)
+        try:
+            try:
+                subprocess.run(["wmic", "cpu", "get", "Name"], capture_output=True)
+                assert False, "expected FileNotFoundError"
+            except FileNotFoundError:
+                pass
+            result = run_async(run_command_async(["wmic", "os"]))
+            assert result.returncode == 1
+        finally:
+            stats = replay.stop()
+        assert stats["missing"] == 2 and len(stats["missing_commands"]) == 2
+
+        replay.start_replay(temp_dir, strict=True)
+        try:
+            try:
+                subprocess.run(["wmic", "cpu"], capture_output=True)
+                assert False, "expected LookupError"
+            except LookupError:
+                pass
+        finally:
+            replay.stop()
+
+def test_recorded_timeout_and_latency():
+    """测试录制时超时的命令在回放时同样超时，recorded latency按录制耗时等待"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        replay.write_bundle(temp_dir, [
+            {"argv": ["slow"], "timed_out": True, "latency": 0.2, "returncode": None},
+            {"argv": ["fast"], "stdout": "ok\n", "latency": 0.3},
+        ])
+        replay.start_replay(temp_dir, latency=True)
+        try:
+            try:
+                subprocess.run(["slow"], capture_output=True, timeout=0.1)
+                assert False, "expected TimeoutExpired"
+            except subprocess.TimeoutExpired:
+                pass
+            started = time.perf_counter()
+            assert subprocess.run(["fast"], capture_output=True, text=True).stdout == "ok\n"
+            assert time.perf_counter() - started >= 0.25
+        finally:
+            replay.stop()
+
+def test_replay_winreg():
+    """测试回放的winreg按路径和视图提供注册表内容，缺失的键和枚举结束抛出与Windows相同的错误"""
+    uninstall = "SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Uninstall"
+    registry = replay.build_registry_entries("HKEY_LOCAL_MACHINE\\" + uninstall, {"subkeys": {
+        "App64": {"values": {"DisplayName": ("Sixty Four", 1)}}}}, "64")
+    registry.update(replay.build_registry_entries("HKEY_LOCAL_MACHINE\\" + uninstall, {"subkeys": {
+        "App32": {"values": {"DisplayName": ("Thirty Two", 1), "EstimatedSize": (1024, 4)}}}}, "32"))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        replay.write_bundle(temp_dir, registry=registry)
+        had_winreg = "winreg" in sys.modules
+        replay.start_replay(temp_dir)
+        try:
+            import winreg
+            names = {}
+            for flag in (winreg.KEY_WOW64_64KEY, winreg.KEY_WOW64_32KEY):
+                with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, uninstall, 0, winreg.KEY_READ | flag) as key:
+                    for i in range(winreg.QueryInfoKey(key)[0]):
+                        # 子键沿用父键的视图
+                        with winreg.OpenKey(key, winreg.EnumKey(key, i)) as subkey:
+                            names[flag] = winreg.QueryValueEx(subkey, "DisplayName")
+                            if flag == winreg.KEY_WOW64_32KEY:
+                                assert winreg.EnumValue(subkey, 1) == ("EstimatedSize", 1024, 4)
+                    try:
+                        winreg.EnumKey(key, 1)
+                        assert False, "expected end of enumeration"
+                    except OSError as e:
+                        assert e.winerror == 259
+            assert names == {winreg.KEY_WOW64_64KEY: ("Sixty Four", 1), winreg.KEY_WOW64_32KEY: ("Thirty Two", 1)}
+            try:
+                winreg.OpenKey(winreg.HKEY_CURRENT_USER, "Software\\Missing")
+                assert False, "expected FileNotFoundError"
+            except FileNotFoundError:
+                pass
+        finally:
+            replay.stop()
+        assert ("winreg" in sys.modules) == had_winreg
+
+def test_main_end_to_end():
+    """测试在构造的Windows录制包上运行main.py，软件列表和硬件信息来自录制包"""
+    uninstall = "HKEY_LOCAL_MACHINE\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Uninstall"
+    registry = replay.build_registry_entries(uninstall, {"subkeys": {
+        "Contoso": {"values": {"DisplayName": ("Contoso Tool", 1), "DisplayVersion": ("1.2.3", 1),
+                               "Publisher": ("Contoso Ltd.", 1)}}}}, "64")
+    identity = {"system": "Windows", "release": "10", "version": "10.0.22631", "machine": "AMD64", "node": "TEST-PC"}
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        bundle = os.path.join(temp_dir, "bundle")
+        output_dir = os.path.join(temp_dir, "output")
+        replay.write_bundle(bundle, [{"argv": ["python", "--version"], "stdout": "Python 3.11.7\n"}], registry, identity)
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "record_replay.py")
+        completed = subprocess.run([sys.executable, script, "replay", bundle, "--output-dir", output_dir, "--", "--no-cache"],
+                                   capture_output=True, text=True, encoding='utf-8', errors='ignore', timeout=300)
+        assert completed.returncode == 0, completed.stderr[-2000:]
+        stats = json.loads(completed.stdout.strip().splitlines()[-1])
+        assert stats["mode"] == "replay" and stats["served"] >= 1
+
+        report_dir = glob.glob(os.path.join(output_dir, "Report", "*"))[0]
+        with open(os.path.join(report_dir, "json", "software_list.json"), 'r', encoding='utf-8') as f:
+            software = json.load(f)
+        assert [s["name"] for s in software] == ["Contoso Tool"]
+        with open(os.path.join(report_dir, "json", "system_info.json"), 'r', encoding='utf-8') as f:
+            system_info = json.load(f)
+        assert system_info["basic_info"]["system"] == "Windows"
+
+def main():
+    """主函数"""
+    print("录制/回放测试脚本")
+    tests = [
+        test_command_key,
+        test_record_then_replay,
+        test_missing_command,
+        test_recorded_timeout_and_latency,
+        test_replay_winreg,
+        test_main_end_to_end
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"{test.__name__}: 通过")
+        except AssertionError as e:
+            failed += 1
+            print(f"{test.__name__}: 失败 {e}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试采集器资源统计的脚本
+验证每个采集器记录墙钟时间、CPU时间、常驻内存峰值增量、子进程数和CPU时间以及写出的字节数，
+内层采集器计入外层，并写入main.py的run_metrics.json和BackupManager的backup_summary.json
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from modules import resource_accounting, replay
+from modules.resource_accounting import account, get_resource_summary, format_resource_summary
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+UNINSTALL = "HKEY_LOCAL_MACHINE\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Uninstall"
+
+def test_cpu_memory_and_child_processes():
+    """测试CPU时间、内存峰值增量和子进程在内层采集器中记录，并计入外层采集器"""
+    resource_accounting.reset_resource_accounting()
+    with account("demo_outer"):
+        with account("demo_inner"):
+            deadline = time.thread_time() + 0.2
+            while time.thread_time() < deadline:
+                pass
+            data = b"x" * (64 * 2 ** 20)
+            time.sleep(0.15)
+            subprocess.run([sys.executable, "-c", "sum(range(3000000))"], check=True)
+            del data
+    summary = get_resource_summary()
+    inner = summary["collectors"]["demo_inner"]
+    outer = summary["collectors"]["demo_outer"]
+    assert inner["status"] == "ok" and inner["parent"] == "demo_outer"
+    assert inner["cpu_seconds"] >= 0.2 and inner["wall_seconds"] >= inner["cpu_seconds"]
+    assert inner["peak_rss_delta_bytes"] >= 48 * 2 ** 20, inner
+    assert inner["child_processes"] == 1 and inner["child_cpu_seconds"] > 0
+    assert outer["child_processes"] == 1 and "parent" not in outer
+    assert summary["totals"]["child_processes"] == 1
+    assert "demo_inner (in demo_outer)" in format_resource_summary(summary)
+
+def test_worker_thread_cpu_counts():
+    """测试经bind_worker交给线程池的工作，其CPU时间计入提交时的采集器和外层采集器"""
+    resource_accounting.reset_resource_accounting()
+
+    def spin():
+        assert resource_accounting.current_account().name == "demo_pool"
+        deadline = time.thread_time() + 0.2
+        while time.thread_time() < deadline:
+            pass
+
+    with account("demo_pool_outer"):
+        with account("demo_pool"):
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                futures = [executor.submit(resource_accounting.bind_worker(spin)) for _ in range(2)]
+                for future in futures:
+                    future.result()
+    summary = get_resource_summary()
+    pool = summary["collectors"]["demo_pool"]
+    assert pool["worker_cpu_seconds"] >= 0.4 and pool["cpu_seconds"] >= 0.4, pool
+    assert summary["collectors"]["demo_pool_outer"]["cpu_seconds"] >= 0.4
+
+def test_bytes_written_and_failures():
+    """测试按监视目录的增量和record_bytes统计写出的字节数，抛出异常的采集器标记为failed"""
+    resource_accounting.reset_resource_accounting()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        with open(os.path.join(temp_dir, "existing.txt"), 'w') as f:
+            f.write("x" * 100)
+        with account("demo_writer", watch_dirs=[temp_dir]):
+            os.makedirs(os.path.join(temp_dir, "sub"))
+            with open(os.path.join(temp_dir, "sub", "out.bin"), 'wb') as f:
+                f.write(b"y" * 4096)
+    resource_accounting.record_bytes("demo_writer", 10)
+    try:
+        with account("demo_failing"):
+            raise RuntimeError("collector failed")
+    except RuntimeError:
+        pass
+    collectors = get_resource_summary()["collectors"]
+    assert collectors["demo_writer"]["bytes_written"] == 4106
+    assert collectors["demo_failing"]["status"] == "failed"
+
+    resource_accounting.configure_resource_accounting(enabled=False)
+    try:
+        resource_accounting.reset_resource_accounting()
+        with account("demo_disabled") as record:
+            assert record is None
+        assert get_resource_summary() is None
+    finally:
+        resource_accounting.configure_resource_accounting(enabled=True)
+
+def uninstall_bundle(path):
+    """写出包含20个软件的录制包"""
+    registry = replay.build_registry_entries(UNINSTALL, {"subkeys": {
+        f"App{i}": {"values": {"DisplayName": (f"App {i}", 1)}} for i in range(20)}}, "64")
+    replay.write_bundle(path, [], registry, {"system": "Windows", "release": "10"})
+
+def test_main_writes_run_metrics():
+    """测试在回放的录制包上运行main.py后run_metrics.json记录软件采集器，写出字节数等于software_list.json的大小"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        bundle = os.path.join(temp_dir, "bundle")
+        uninstall_bundle(bundle)
+        output_dir = os.path.join(temp_dir, "output")
+        completed = subprocess.run([sys.executable, os.path.join(ROOT, "record_replay.py"), "replay", bundle,
+                                    "--output-dir", output_dir, "--", "--only", "software", "--formats", "json,markdown"],
+                                   capture_output=True, text=True, encoding='utf-8', errors='ignore', timeout=300)
+        assert completed.returncode == 0, completed.stderr[-2000:]
+        run_dir = glob.glob(os.path.join(output_dir, "Report", "*"))[0]
+        with open(os.path.join(run_dir, "logs", resource_accounting.METRICS_FILENAME), encoding='utf-8') as f:
+            metrics = json.load(f)
+        software = metrics["collectors"]["software"]
+        assert software["status"] == "ok" and software["wall_seconds"] > 0
+        assert software["bytes_written"] == os.path.getsize(os.path.join(run_dir, "json", "software_list.json"))
+        exports = metrics["collectors"]["software_exports"]
+        assert exports["bytes_written"] == os.path.getsize(os.path.join(run_dir, "markdown", "software_list.md"))
+        assert metrics["schedule"]["mode"] in ("serial", "parallel") and metrics["peak_rss_bytes"] > 0
+
+def test_backup_summary_has_resources():
+    """测试BackupManager的步骤资源使用写入backup_summary.json和run_metrics.json"""
+    script = (
+        "import sys, json\n"
+        "from modules import replay\n"
+        "replay.start_replay(sys.argv[1])\n"
+        "from modules.backup_manager import BackupManager\n"
+        "manager = BackupManager(sys.argv[2])\n"
+        "manager.create_output_dir()\n"
+        "def step():\n"
+        "    (manager.output_dir / 'drivers.txt').write_text('d' * 2048)\n"
+        "    return {'step': 'demo', 'status': 'ok'}\n"
+        "manager.run_budgeted_step('driver_backup', 'demo', step)\n"
+        "print(manager.save_summary())\n"
+    )
+    with tempfile.TemporaryDirectory() as temp_dir:
+        bundle = os.path.join(temp_dir, "bundle")
+        uninstall_bundle(bundle)
+        completed = subprocess.run([sys.executable, "-c", script, bundle, os.path.join(temp_dir, "Report")],
+                                   cwd=ROOT, env={**os.environ, "PYTHONPATH": ROOT},
+                                   capture_output=True, text=True, encoding='utf-8', errors='ignore', timeout=300)
+        assert completed.returncode == 0, completed.stderr[-2000:]
+        summary_path = completed.stdout.strip().splitlines()[-1]
+        with open(summary_path, encoding='utf-8') as f:
+            summary = json.load(f)
+        assert summary["resources"]["collectors"]["driver_backup"]["bytes_written"] == 2048
+        assert os.path.exists(os.path.join(os.path.dirname(summary_path), "logs", resource_accounting.METRICS_FILENAME))
+
+def main():
+    """主函数"""
+    print("采集器资源统计测试脚本")
+    tests = [
+        test_cpu_memory_and_child_processes,
+        test_worker_thread_cpu_counts,
+        test_bytes_written_and_failures,
+        test_main_writes_run_metrics,
+        test_backup_summary_has_resources
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"{test.__name__}: 通过")
+        except AssertionError as e:
+            failed += 1
+            print(f"{test.__name__}: 失败 {e}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
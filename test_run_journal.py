@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试分区结果流式写出和事件日志的脚本
+验证原子写入、截断事件行的容错、分区文件拼接后与整体写出等价，
+以及运行在中途崩溃后 main.py --resume 不重新采集已完成的分区即可完成
+"""
+
+import io
+import os
+import sys
+import glob
+import json
+import tempfile
+import subprocess
+
+from modules import replay
+from modules.json_refs import dump_json, resolve_references
+from modules.run_journal import RunJournal, write_atomic, read_events, find_resumable_run, EVENTS_FILENAME
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def test_write_atomic_keeps_old_file_on_error():
+    """测试写入过程中出错时保留原文件且不留下临时文件"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "section.json")
+        write_atomic(path, lambda f: f.write("old"))
+
+        def fail(f):
+            f.write("half")
+            raise RuntimeError("crash while writing")
+
+        try:
+            write_atomic(path, fail)
+            assert False, "expected RuntimeError"
+        except RuntimeError:
+            pass
+        with open(path) as f:
+            assert f.read() == "old"
+        assert os.listdir(temp_dir) == ["section.json"]
+
+def test_truncated_event_and_resumable_run():
+    """测试崩溃时写了一半的事件行被跳过，只有没有run_finished事件的运行可以继续"""
+    with tempfile.TemporaryDirectory() as base_dir:
+        for name, finished in (("20240101_000000", False), ("20240102_000000", True)):
+            journal = RunJournal(os.path.join(base_dir, name))
+            journal.record("run_started")
+            journal.save_section("software", [{"DisplayName": "App"}])
+            if finished:
+                journal.finish()
+            else:
+                journal.close()
+        events_path = os.path.join(base_dir, "20240101_000000", "logs", EVENTS_FILENAME)
+        with open(events_path, 'a', encoding='utf-8') as f:
+            f.write('{"event": "section_compl')
+        assert [event["event"] for event in read_events(events_path)] == ["run_started", "section_completed"]
+        assert str(find_resumable_run(base_dir)).endswith("20240101_000000")
+
+        resumed = RunJournal(os.path.join(base_dir, "20240101_000000"), resume=True)
+        assert resumed.is_completed("software") and not resumed.is_completed("system_info")
+        assert resumed.load_section("software") == [{"DisplayName": "App"}]
+        resumed.close()
+
+def test_combined_matches_whole_document():
+    """测试由分区文件拼接的完整报告与整体写出的内容相同，分区内的引用改为相对整个文档"""
+    cpu = [{"Name": "Intel(R) Core(TM) i9-13900K", "NumberOfCores": 24, "Note": '"$ref": "#/quoted"'}]
+    system_info = {"basic_info": {"hardware": {"cpu": cpu}}, "cpu": cpu, "tags": []}
+    software = [{"DisplayName": "Café 中文", "DisplayVersion": "1.0\n2"}]
+    whole = {"timestamp": "2024-01-01T00:00:00", "software_list": software, "system_info": system_info,
+             "time_budget": {"partial_sections": {}}}
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        journal = RunJournal(temp_dir)
+        journal.save_section("software", software)
+        journal.save_section("system_info", system_info, os.path.join(temp_dir, "json", "system_info.json"))
+        path = os.path.join(temp_dir, "combined.json")
+        journal.write_combined(path, [("timestamp", whole["timestamp"]), ("software_list", ("section", "software")),
+                                      ("system_info", ("section", "system_info")), ("time_budget", whole["time_budget"])])
+        journal.finish()
+        assert not os.path.exists(journal.partial_dir)
+
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+        expected = io.StringIO()
+        dump_json(whole, expected, indent=2, ensure_ascii=False)
+        assert text == expected.getvalue()
+        restored = resolve_references(json.loads(text))
+        assert restored == whole
+        assert restored["system_info"]["cpu"] is restored["system_info"]["basic_info"]["hardware"]["cpu"]
+
+def run_main(script, bundle, output_dir, main_args):
+    """在子进程中先执行script登记测试采集器，再回放运行main.py，返回子进程结果"""
+    return subprocess.run([sys.executable, "-c", script, "replay", bundle, "--output-dir", output_dir, "--", *main_args],
+                          cwd=ROOT, env={**os.environ, "PYTHONPATH": ROOT},
+                          capture_output=True, text=True, encoding='utf-8', errors='ignore', timeout=300)
+
+def test_resume_after_crash():
+    """测试采集器在软件分区写出后使进程崩溃，--resume继续运行时不再读取注册表并补全其余输出"""
+    crash = (
+        "import os, sys, record_replay\n"
+        "from modules.collector_registry import register_collector\n"
+        "register_collector('demo_summary', lambda software: os._exit(3), deps=('software',))\n"
+        "sys.exit(record_replay.main(sys.argv[1:]))\n"
+    )
+    finish = crash.replace("lambda software: os._exit(3)", "lambda software: {'count': len(software)}")
+    uninstall = "HKEY_LOCAL_MACHINE\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Uninstall"
+    registry = replay.build_registry_entries(uninstall, {"subkeys": {
+        f"App{i}": {"values": {"DisplayName": (f"App {i}", 1)}} for i in range(12)}}, "64")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        bundle = os.path.join(temp_dir, "bundle")
+        replay.write_bundle(bundle, [], registry, {"system": "Windows", "release": "10"})
+        output_dir = os.path.join(temp_dir, "output")
+        main_args = ["--only", "software,demo_summary", "--formats", "json"]
+
+        completed = run_main(crash, bundle, output_dir, main_args)
+        assert completed.returncode == 3, completed.stderr[-2000:]
+        run_dir = glob.glob(os.path.join(output_dir, "Report", "*"))[0]
+        assert os.path.exists(os.path.join(run_dir, "json", "software_list.json"))
+        assert not os.path.exists(os.path.join(run_dir, "json", "complete_report_data.json"))
+
+        completed = run_main(finish, bundle, output_dir, main_args + ["--resume"])
+        assert completed.returncode == 0, completed.stderr[-2000:]
+        stats = json.loads(completed.stdout.strip().splitlines()[-1])
+        assert stats["registry_reads"] == 0, stats
+        assert glob.glob(os.path.join(output_dir, "Report", "*")) == [run_dir]
+        with open(os.path.join(run_dir, "json", "complete_report_data.json"), encoding='utf-8') as f:
+            report = json.load(f)
+        assert list(report) == ["timestamp", "software_list", "demo_summary"]
+        assert report["demo_summary"] == {"count": 12}
+        events = [event["event"] for event in read_events(os.path.join(run_dir, "logs", EVENTS_FILENAME))]
+        assert events.count("run_started") == 2 and events[-1] == "run_finished"
+
+def main():
+    """主函数"""
+    print("分区结果流式写出测试脚本")
+    tests = [
+        test_write_atomic_keeps_old_file_on_error,
+        test_truncated_event_and_resumable_run,
+        test_combined_matches_whole_document,
+        test_resume_after_crash
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"{test.__name__}: 通过")
+        except AssertionError as e:
+            failed += 1
+            print(f"{test.__name__}: 失败 {e}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
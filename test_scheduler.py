@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试采集任务调度器的脚本
+验证依赖顺序、并发运行、线程数上限、耗时等级的启动顺序、异常传递，以及并行与串行运行输出的JSON一致
+"""
+
+import os
+import sys
+import glob
+import time
+import tempfile
+import threading
+import subprocess
+
+from modules import replay
+from modules.scheduler import run_collectors, get_schedule_summary
+
+def sleeper(name, seconds, log):
+    """返回一个记录开始和结束的任务函数"""
+    def run(**deps):
+        log.append(("start", name))
+        time.sleep(seconds)
+        log.append(("end", name))
+        return {"name": name, "deps": sorted(deps)}
+    return run
+
+def test_independent_tasks_run_concurrently():
+    """测试互不依赖的任务同时运行，结果顺序与声明一致"""
+    log = []
+    tasks = [{"name": name, "func": sleeper(name, 0.3, log)} for name in ("software", "system_info", "dev_environment")]
+    started = time.perf_counter()
+    results = run_collectors(tasks, max_workers=4)
+    assert time.perf_counter() - started < 0.8
+    assert list(results) == ["software", "system_info", "dev_environment"]
+    summary = get_schedule_summary()
+    assert summary["mode"] == "parallel" and summary["sum_task_seconds"] >= 0.85
+
+def test_dependencies_respected():
+    """测试依赖任务完成后才启动，并以关键字参数收到依赖的结果"""
+    log = []
+    tasks = [
+        {"name": "exports", "func": sleeper("exports", 0.05, log), "deps": ("software",)},
+        {"name": "software", "func": sleeper("software", 0.2, log)},
+        {"name": "system_info", "func": sleeper("system_info", 0.1, log)},
+    ]
+    results = run_collectors(tasks, max_workers=4)
+    assert log.index(("end", "software")) < log.index(("start", "exports"))
+    assert results["exports"]["deps"] == ["software"]
+    assert list(results) == ["exports", "software", "system_info"]
+
+def test_worker_limit_and_cost_order():
+    """测试同时运行的任务数不超过上限，耗时长的先启动"""
+    active = []
+    peak = []
+    order = []
+    lock = threading.Lock()
+
+    def task(name):
+        def run():
+            with lock:
+                order.append(name)
+                active.append(name)
+                peak.append(len(active))
+            time.sleep(0.1)
+            with lock:
+                active.remove(name)
+        return run
+
+    tasks = [{"name": f"fast{i}", "func": task(f"fast{i}"), "cost": "fast"} for i in range(3)]
+    tasks.append({"name": "slow", "func": task("slow"), "cost": "slow"})
+    run_collectors(tasks, max_workers=2)
+    assert max(peak) <= 2
+    assert order[0] == "slow"
+
+def test_serial_mode():
+    """测试串行模式在当前线程按声明顺序运行"""
+    threads = []
+    tasks = [{"name": name, "func": lambda: threads.append(threading.current_thread())} for name in ("a", "b")]
+    run_collectors(tasks, serial=True)
+    assert threads == [threading.main_thread()] * 2
+    assert get_schedule_summary()["mode"] == "serial"
+
+def test_failure_stops_new_tasks():
+    """测试任务抛出异常后不再启动依赖它的任务，异常被重新抛出"""
+    ran = []
+
+    def fail():
+        raise RuntimeError("collector failed")
+
+    tasks = [
+        {"name": "broken", "func": fail},
+        {"name": "after", "func": lambda broken: ran.append("after"), "deps": ("broken",)},
+    ]
+    try:
+        run_collectors(tasks, max_workers=4)
+        assert False, "expected RuntimeError"
+    except RuntimeError as e:
+        assert str(e) == "collector failed"
+    assert ran == []
+
+def test_invalid_graph():
+    """测试未知依赖和循环依赖被拒绝"""
+    for tasks in (
+        [{"name": "a", "func": lambda b: None, "deps": ("b",)}],
+        [{"name": "a", "func": lambda b: None, "deps": ("b",)}, {"name": "b", "func": lambda a: None, "deps": ("a",)}],
+    ):
+        try:
+            run_collectors(tasks)
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+
+def test_parallel_output_matches_serial():
+    """测试在回放的录制包上并行运行main.py与--serial运行写出的JSON相同"""
+    uninstall = "HKEY_LOCAL_MACHINE\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Uninstall"
+    registry = replay.build_registry_entries(uninstall, {"subkeys": {
+        f"App{i}": {"values": {"DisplayName": (f"App {i}", 1), "DisplayVersion": (f"1.{i}", 1)}} for i in range(50)}}, "64")
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "record_replay.py")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        bundle = os.path.join(temp_dir, "bundle")
+        replay.write_bundle(bundle, [{"argv": ["python", "--version"], "stdout": "Python 3.11.7\n"}],
+                            registry, {"system": "Windows", "release": "10"})
+        outputs = {}
+        for mode, extra in (("serial", ["--serial"]), ("parallel", [])):
+            output_dir = os.path.join(temp_dir, mode)
+            completed = subprocess.run([sys.executable, script, "replay", bundle, "--output-dir", output_dir, "--", *extra],
+                                       capture_output=True, text=True, encoding='utf-8', errors='ignore', timeout=300)
+            assert completed.returncode == 0, completed.stderr[-2000:]
+            json_dir = glob.glob(os.path.join(output_dir, "Report", "*", "json"))[0]
+            outputs[mode] = {}
+            for name in ("software_list.json", "dev_environment.json"):
+                with open(os.path.join(json_dir, name), 'rb') as f:
+                    outputs[mode][name] = f.read()
+        assert outputs["serial"] == outputs["parallel"]
+
+def main():
+    """主函数"""
+    print("采集任务调度器测试脚本")
+    tests = [
+        test_independent_tasks_run_concurrently,
+        test_dependencies_respected,
+        test_worker_limit_and_cost_order,
+        test_serial_mode,
+        test_failure_stops_new_tasks,
+        test_invalid_graph,
+        test_parallel_output_matches_serial
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"{test.__name__}: 通过")
+        except AssertionError as e:
+            failed += 1
+            print(f"{test.__name__}: 失败 {e}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试共享表格解析器的脚本
+用WMIC、net share、driverquery形状的夹具验证CSV、按列对齐和键值块三种格式的解析
+"""
+
+import sys
+import unicodedata
+
+from modules.collectors.tabular_parser import (
+    parse_csv_table,
+    parse_fixed_width_table,
+    parse_list_blocks,
+    iter_rows,
+    row_count
+)
+
+def pad(text, cells):
+    """按控制台列宽补齐，与cmd中中文输出的对齐方式相同"""
+    width = sum(2 if unicodedata.east_asian_width(c) in ("W", "F") else 1 for c in text)
+    return text + " " * (cells - width)
+
+def test_csv_maps_by_header():
+    """测试按标题映射列，忽略Node列、WMIC的\\r\\r\\n行尾和重复的标题行"""
+    text = ("\r\r\nNode,AdapterRAM,DriverVersion,Name,VideoProcessor\r\r\n"
+            "PC,4293918720,31.0.15.5222,NVIDIA GeForce RTX 4090,AD102\r\r\n"
+            "Node,AdapterRAM,DriverVersion,Name,VideoProcessor\r\r\n"
+            "PC,,10.0.1,Microsoft Basic Display Adapter,\r\r\n")
+    columns = parse_csv_table(text)
+    assert "Node" not in columns
+    assert row_count(columns) == 2
+    rows = list(iter_rows(columns))
+    assert rows[0]["Name"] == "NVIDIA GeForce RTX 4090" and rows[0]["DriverVersion"] == "31.0.15.5222"
+    assert rows[1]["AdapterRAM"] == "" and rows[1]["VideoProcessor"] == ""
+
+def test_csv_comma_in_value():
+    """测试值中未转义的逗号并入自由文本列，其余列不错位"""
+    text = ("Node,Manufacturer,Name,ReleaseDate,SMBIOSBIOSVersion\n"
+            "PC,Dell Inc.,Dell BIOS, version 1.2,20230101000000.000000+000,1.2.0\n")
+    row = next(iter_rows(parse_csv_table(text)))
+    assert row["Manufacturer"] == "Dell Inc."
+    assert row["Name"] == "Dell BIOS, version 1.2"
+    assert row["ReleaseDate"] == "20230101000000.000000+000"
+    assert row["SMBIOSBIOSVersion"] == "1.2.0"
+
+def test_fixed_width_wmic_columns():
+    """测试WMIC按字母顺序输出列时按标题位置切分，值中的多个空格和空值都不影响对齐"""
+    names = ["InstallDate", "Name", "Vendor", "Version"]
+    records = [
+        ["20240101", "Python 3.11.7 (64-bit)", "Python Software Foundation", "3.11.7150.0"],
+        ["", "Tool  With  Spaces", "", "1.0"],
+    ]
+    widths = [max(len(name), *(len(r[i]) for r in records)) + 2 for i, name in enumerate(names)]
+    lines = ["".join(name.ljust(w) for name, w in zip(names, widths))]
+    lines += ["".join(value.ljust(w) for value, w in zip(r, widths)) for r in records]
+    rows = list(iter_rows(parse_fixed_width_table("\r\r\n".join(lines) + "\r\r\n\r\r\n")))
+    assert len(rows) == 2
+    assert rows[0] == dict(zip(names, records[0]))
+    assert rows[1]["Name"] == "Tool  With  Spaces" and rows[1]["Vendor"] == "" and rows[1]["Version"] == "1.0"
+
+def test_fixed_width_cjk_by_display_width():
+    """测试中文系统的net share输出按控制台列宽对齐时切分正确"""
+    lines = [
+        pad("共享名", 13) + pad("资源", 32) + "注解",
+        "",
+        "-" * 79,
+        pad("C$", 13) + pad("C:\\", 32) + "默认共享",
+        pad("文档", 13) + pad("D:\\共享文档", 32) + "团队资料",
+        pad("Users", 13) + pad("C:\\Users", 32),
+        "命令成功完成。",
+    ]
+    columns = parse_fixed_width_table("\n".join(lines))
+    assert list(columns) == ["共享名", "资源", "注解"]
+    rows = list(iter_rows(columns))
+    assert rows[1] == {"共享名": "文档", "资源": "D:\\共享文档", "注解": "团队资料"}
+    assert rows[2] == {"共享名": "Users", "资源": "C:\\Users", "注解": ""}
+    # 结尾提示行只落在第一列，调用方据此过滤
+    assert rows[3]["资源"] == ""
+
+def test_fixed_width_separator_segments():
+    """测试driverquery /fo table的分隔行决定列边界"""
+    text = ("Module Name  Display Name           Driver Type   Link Date\n"
+            "============ ====================== ============= ======================\n"
+            "1394ohci     1394 OHCI Compliant Ho Kernel        \n"
+            "ACPI         Microsoft ACPI Driver  Kernel        2023/5/6 10:11:12\n")
+    rows = list(iter_rows(parse_fixed_width_table(text)))
+    assert rows[0]["Display Name"] == "1394 OHCI Compliant Ho"
+    assert rows[0]["Link Date"] == ""
+    assert rows[1] == {"Module Name": "ACPI", "Display Name": "Microsoft ACPI Driver",
+                       "Driver Type": "Kernel", "Link Date": "2023/5/6 10:11:12"}
+
+def test_list_blocks_missing_keys():
+    """测试键值块中缺少的键补为None，各列长度一致"""
+    text = ("\r\r\n\r\r\nName=Dhcp\r\r\nPathName=C:\\Windows\\system32\\svchost.exe -k LocalServiceNetworkRestricted -p\r\r\n"
+            "State=Running\r\r\n\r\r\n\r\r\nName=Fax\r\r\nState=Stopped\r\r\n\r\r\n\r\r\n"
+            "Name=Spooler\r\r\nPathName=C:\\Windows\\System32\\spoolsv.exe\r\r\nState=Running\r\r\n")
+    columns = parse_list_blocks(text)
+    assert row_count(columns) == 3
+    assert all(len(values) == 3 for values in columns.values())
+    rows = list(iter_rows(columns))
+    assert rows[0]["PathName"].endswith("-k LocalServiceNetworkRestricted -p")
+    assert rows[1] == {"Name": "Fax", "PathName": None, "State": "Stopped"}
+    assert rows[2]["Name"] == "Spooler"
+
+def test_list_blocks_colon_separator():
+    """测试"键: 值"格式只按第一个冒号切分，路径中的冒号保留"""
+    text = ("Microsoft PnP Utility\n\n"
+            "Published Name:     oem0.inf\nOriginal Name:      prnms003.inf\nDriver Version:     06/21/2006 10.0.22621.1\n\n"
+            "Published Name:     oem1.inf\nOriginal Name:      C:\\Drivers\\net.inf\n")
+    rows = list(iter_rows(parse_list_blocks(text, ":")))
+    assert len(rows) == 2
+    assert rows[0]["Driver Version"] == "06/21/2006 10.0.22621.1"
+    assert rows[1]["Original Name"] == "C:\\Drivers\\net.inf" and rows[1]["Driver Version"] is None
+
+def test_empty_output():
+    """测试空输出返回空结果"""
+    for parser in (parse_csv_table, parse_fixed_width_table, parse_list_blocks):
+        columns = parser("\r\r\n")
+        assert row_count(columns) == 0
+        assert list(iter_rows(columns)) == []
+
+def main():
+    """主函数"""
+    print("表格解析器测试脚本")
+    tests = [
+        test_csv_maps_by_header,
+        test_csv_comma_in_value,
+        test_fixed_width_wmic_columns,
+        test_fixed_width_cjk_by_display_width,
+        test_fixed_width_separator_segments,
+        test_list_blocks_missing_keys,
+        test_list_blocks_colon_separator,
+        test_empty_output
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"{test.__name__}: 通过")
+        except AssertionError as e:
+            failed += 1
+            print(f"{test.__name__}: 失败 {e}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
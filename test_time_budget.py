@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试运行时间预算调度的脚本
+验证按优先级分配剩余时间、低优先级分区被跳过，以及命令超时被限制在分区截止时间内
+"""
+
+import sys
+import time
+
+from modules import time_budget
+from modules.async_runner import run_command_async, run_async
+
+def test_no_budget_is_transparent():
+    """测试未设置预算时不改变超时，也不跳过任何分区"""
+    time_budget.start_time_budget(None)
+    assert time_budget.clamp_timeout(20) == 20
+    assert time_budget.clamp_timeout(None) is None
+    with time_budget.budget_section("drivers") as allowed:
+        assert allowed
+    assert time_budget.get_budget_summary() is None
+
+def test_shares_follow_priority():
+    """测试高优先级分区分到的时间多于低优先级分区"""
+    time_budget.start_time_budget(70, ["cpu", "graphics", "drivers"])
+    with time_budget.budget_section("cpu"):
+        assert 20 <= time_budget.clamp_timeout(60) <= 40
+    allocations = time_budget.get_budget_summary()["allocations"]
+    # 权重 4:2:1，cpu分到 70 * 4 / 7
+    assert abs(allocations["cpu"] - 40) < 1
+
+    with time_budget.budget_section("graphics"):
+        assert time_budget.clamp_timeout(5) == 5
+    allocations = time_budget.get_budget_summary()["allocations"]
+    # cpu没有用掉的时间留给后面的分区
+    assert allocations["graphics"] > 40
+
+def test_low_priority_skipped_first():
+    """测试剩余时间不足时低优先级分区被跳过并标记为部分完成，高优先级分区照常执行"""
+    time_budget.start_time_budget(4, ["cpu", "scheduled_tasks"])
+    with time_budget.budget_section("cpu") as allowed:
+        assert allowed
+    with time_budget.budget_section("scheduled_tasks") as allowed:
+        assert not allowed
+
+    assert time_budget.is_partial("scheduled_tasks")
+    assert not time_budget.is_partial("cpu")
+    assert time_budget.partial_marker("scheduled_tasks") == {"partial": True, "reason": "skipped: time budget exhausted"}
+
+def test_exhausted_budget_fails_fast():
+    """测试预算用完后命令立即失败并标记分区"""
+    time_budget.start_time_budget(0.2, ["memory"])
+    time.sleep(0.3)
+    with time_budget.budget_section("memory"):
+        assert time_budget.clamp_timeout(15) == 0
+        started = time.monotonic()
+        result = run_async(run_command_async(["sleep", "5"]))
+        assert time.monotonic() - started < 1
+        assert result.returncode == 1
+    assert time_budget.get_budget_summary()["partial_sections"]["memory"] == "time budget exhausted"
+
+def test_hanging_command_cut_at_section_deadline():
+    """测试挂起的命令在分区分到的时间耗尽时被终止，而不是等到它自己的超时"""
+    time_budget.start_time_budget(2, ["software"])
+    started = time.monotonic()
+    with time_budget.budget_section("software"):
+        result = run_async(run_command_async(["sleep", "30"], timeout=30))
+    assert time.monotonic() - started < 4
+    assert result.returncode == 1
+    assert time_budget.is_partial("software")
+    time_budget.start_time_budget(None)
+
+def main():
+    """主函数"""
+    print("运行时间预算测试脚本")
+    tests = [
+        test_no_budget_is_transparent,
+        test_shares_follow_priority,
+        test_low_priority_skipped_first,
+        test_exhausted_budget_fails_fast,
+        test_hanging_command_cut_at_section_deadline
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"{test.__name__}: 通过")
+        except AssertionError as e:
+            failed += 1
+            print(f"{test.__name__}: 失败 {e}")
+    time_budget.start_time_budget(None)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())